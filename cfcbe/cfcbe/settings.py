@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 import warnings
 from dotenv import load_dotenv
@@ -135,6 +136,18 @@ DATABASES = {
     }
 }
 
+# Cache shared by all worker processes: chatbot sessions, WhatsApp tokens,
+# circuit breaker state and CPIMS reference data live here, so it must not be
+# per-process. The default is the database cache table, created by
+# `manage.py createcachetable` in the entrypoint; point CACHE_BACKEND and
+# CACHE_LOCATION at Redis or Memcached to take the load off the database.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cfcbe_cache'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -247,6 +260,28 @@ WHATSAPP_ACCESS_TOKEN = os.getenv('WHATSAPP_ACCESS_TOKEN')
 WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL')
 WHATSAPP_WEBHOOK_VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN')
 
+# Validated access tokens are reused until REVALIDATE_SECONDS elapse or the
+# token is within EXPIRY_MARGIN_SECONDS of expiring
+WHATSAPP_TOKEN_CACHE_CONFIG = {
+    'REVALIDATE_SECONDS': int(os.getenv('WHATSAPP_TOKEN_REVALIDATE_SECONDS', 3600)),
+    'EXPIRY_MARGIN_SECONDS': int(os.getenv('WHATSAPP_TOKEN_EXPIRY_MARGIN_SECONDS', 600)),
+}
+
+# Acknowledge-first webhook processing. Platforms listed here are stored in the
+# WebhookInbox and answered with 200 at once; run `manage.py process_webhook_inbox`
+WEBHOOK_INBOX_CONFIG = {
+    'ACK_FIRST_PLATFORMS': [p.strip() for p in os.getenv('WEBHOOK_ACK_FIRST_PLATFORMS', '').split(',') if p.strip()],
+    'WORKERS': int(os.getenv('WEBHOOK_INBOX_WORKERS', 4)),
+    'MAX_ATTEMPTS': int(os.getenv('WEBHOOK_INBOX_MAX_ATTEMPTS', 3)),
+    'STALE_AFTER_SECONDS': int(os.getenv('WEBHOOK_INBOX_STALE_AFTER', 300)),
+}
+
+# Duplicate delivery detection on (platform, message_id) for UnifiedWebhookView
+WEBHOOK_DEDUP_CONFIG = {
+    'LRU_SIZE': int(os.getenv('WEBHOOK_DEDUP_LRU_SIZE', 10000)),
+    'CLAIM_TIMEOUT_SECONDS': int(os.getenv('WEBHOOK_DEDUP_CLAIM_TIMEOUT', 86400)),
+}
+
 # Media Processing Configuration for Helpline Transmission
 MEDIA_PROCESSING_CONFIG = {
     'MAX_FILE_SIZE_BYTES': int(os.getenv('MEDIA_MAX_FILE_SIZE', 16 * 1024 * 1024)),  # 16MB default
@@ -258,7 +293,20 @@ MEDIA_PROCESSING_CONFIG = {
         'application/pdf', 'text/plain'
     },
     'ENCODING_ENABLED': bool(os.getenv('MEDIA_ENCODING_ENABLED', 'True').lower() in ('true', '1', 'yes')),
-    'FALLBACK_TO_URL_ON_ERROR': bool(os.getenv('MEDIA_FALLBACK_TO_URL', 'True').lower() in ('true', '1', 'yes'))
+    'FALLBACK_TO_URL_ON_ERROR': bool(os.getenv('MEDIA_FALLBACK_TO_URL', 'True').lower() in ('true', '1', 'yes')),
+    # Stream media to the messaging endpoint instead of holding base64 in memory
+    'STREAMING_ENABLED': bool(os.getenv('MEDIA_STREAMING_ENABLED', 'True').lower() in ('true', '1', 'yes')),
+    'DOWNLOAD_CHUNK_SIZE': int(os.getenv('MEDIA_DOWNLOAD_CHUNK_SIZE', 64 * 1024)),
+    'SPOOL_MAX_MEMORY_BYTES': int(os.getenv('MEDIA_SPOOL_MAX_MEMORY', 1024 * 1024)),  # Spill to disk above 1MB
+    # Attachments in one payload (e.g. an album) are downloaded in parallel
+    'MAX_CONCURRENT_DOWNLOADS': int(os.getenv('MEDIA_MAX_CONCURRENT_DOWNLOADS', 4)),
+}
+
+# Content-addressed cache of downloaded WhatsApp media, keyed by the webhook's sha256
+MEDIA_CACHE_CONFIG = {
+    'ENABLED': os.getenv('MEDIA_CACHE_ENABLED', 'True').lower() in ('true', '1', 'yes'),
+    'DIRECTORY': os.getenv('MEDIA_CACHE_DIR', os.path.join(MEDIA_ROOT, 'media_cache')),
+    'MAX_SIZE_BYTES': int(os.getenv('MEDIA_CACHE_MAX_SIZE', 512 * 1024 * 1024)),  # 512MB default
 }
 
 # Add to gateway/settings.py
@@ -274,7 +322,43 @@ CHATBOT_SETTINGS = {
 MISTRAL_API_ENDPOINT = os.getenv('MISTRAL_API_ENDPOINT')
 # Optional additional settings
 CHATBOT_USER_DATA_TTL = 86400  # Session timeout in seconds (24 hours)
+# Chatbot sessions are shared through the cache; each worker keeps a small LRU in front of it
+CHATBOT_SESSION_STORE = {
+    'LOCAL_MAX_ENTRIES': int(os.getenv('CHATBOT_SESSION_LOCAL_MAX_ENTRIES', 1000)),
+    'LOCAL_TTL_SECONDS': float(os.getenv('CHATBOT_SESSION_LOCAL_TTL', 2)),  # How long a worker trusts its copy
+    'LOCK_TIMEOUT_SECONDS': 5,  # Per-user lock held while a session is updated
+    'LOCK_WAIT_SECONDS': 2,  # Longest wait for it before updating anyway
+}
 CHATBOT_DEFAULT_LANGUAGE = 'en'  # Default language for new users
+# Stream model replies to users in sentence-sized parts from a background pool
+CHATBOT_STREAMING = {
+    'ENABLED': os.getenv('CHATBOT_STREAMING', 'False').lower() in ('true', '1', 'yes'),
+    'MAX_WORKERS': int(os.getenv('CHATBOT_STREAMING_WORKERS', 4)),
+    'MIN_CHUNK_CHARS': int(os.getenv('CHATBOT_STREAMING_MIN_CHARS', 80)),  # Shortest part sent on its own
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': int(os.getenv('CHATBOT_STREAMING_READ_TIMEOUT', 60)),  # Longest wait between tokens
+}
+# Per-process cache of model answers, keyed by question, language and trimester
+CHATBOT_RESPONSE_CACHE = {
+    'ENABLED': os.getenv('CHATBOT_RESPONSE_CACHE', 'True').lower() in ('true', '1', 'yes'),
+    'MAX_ENTRIES': int(os.getenv('CHATBOT_RESPONSE_CACHE_MAX_ENTRIES', 2000)),
+    'TTL_SECONDS': int(os.getenv('CHATBOT_RESPONSE_CACHE_TTL', 86400)),
+    'SIMILARITY_THRESHOLD': float(os.getenv('CHATBOT_RESPONSE_CACHE_SIMILARITY', 0.8)),  # 0 = exact matches only
+}
+# Admission control in front of MISTRAL_API_ENDPOINT (per worker process)
+CHATBOT_MODEL_GATEWAY = {
+    'MAX_CONCURRENT': int(os.getenv('CHATBOT_MODEL_MAX_CONCURRENT', 2)),  # Generations run at once
+    'MAX_QUEUE_DEPTH': int(os.getenv('CHATBOT_MODEL_MAX_QUEUE', 8)),  # Beyond this, normal requests get the fallback responses
+    'QUEUE_TIMEOUT': int(os.getenv('CHATBOT_MODEL_QUEUE_TIMEOUT', 20)),  # Longest wait for a slot, in seconds
+}
+# Conversation history sent to the model with each question
+CHATBOT_PROMPT = {
+    'HISTORY_TURNS': int(os.getenv('CHATBOT_HISTORY_TURNS', 4)),  # Question/answer pairs kept per user
+    'HISTORY_TTL_SECONDS': int(os.getenv('CHATBOT_HISTORY_TTL', 1800)),  # Idle conversations start over
+    'MAX_TURN_CHARS': 500,
+    'REUSE_MODEL_CONTEXT': os.getenv('CHATBOT_REUSE_MODEL_CONTEXT', 'True').lower() in ('true', '1', 'yes'),
+    'MAX_CONTEXT_TOKENS': int(os.getenv('CHATBOT_MAX_CONTEXT_TOKENS', 3072)),
+}
 # AI Service Configuration
   # Update with your actual Mistral endpoint
 AI_ENDPOINT = os.getenv('AI_ENDPOINT') # Update with your actual Mistral endpoint
@@ -327,17 +411,29 @@ Chagua lugha:
 
 ENDPOINT_AUTH_TOKEN = os.getenv('ENDPOINT_AUTH_TOKEN')
 
+# Forward CEEMIS <-> Helpline cases through the outbound queue instead of inline;
+# needs `manage.py process_outbound_queue` running
+CEEMIS_ASYNC_FORWARDING = os.getenv('CEEMIS_ASYNC_FORWARDING', 'False').lower() in ('true', '1', 'yes')
+
 
 ENDPOINT_CONFIG = {
     'cases_endpoint': {
         'url': os.getenv('ENDPOINT_CASES_URL'),
         'auth_token': os.getenv('ENDPOINT_AUTH_TOKEN'),
-        'formatter': 'cases'
+        'formatter': 'cases',
+        # Webform callers need the case reference synchronously, so keep this off unless required
+        'queued': os.getenv('ENDPOINT_CASES_QUEUED', 'False').lower() in ('true', '1', 'yes'),
+        'concurrency': int(os.getenv('ENDPOINT_CASES_CONCURRENCY', 2)),
     },
     'messaging_endpoint': {
         'url': os.getenv('ENDPOINT_MESSAGING_URL'),
         'auth_token': os.getenv('ENDPOINT_AUTH_TOKEN'),
-        'formatter': 'messaging'
+        'formatter': 'messaging',
+        # When queued, messages are delivered by `manage.py process_outbound_queue`
+        'queued': os.getenv('ENDPOINT_MESSAGING_QUEUED', 'False').lower() in ('true', '1', 'yes'),
+        'concurrency': int(os.getenv('ENDPOINT_MESSAGING_CONCURRENCY', 4)),
+        'max_attempts': int(os.getenv('ENDPOINT_MESSAGING_MAX_ATTEMPTS', 5)),
+        'retry_backoff_seconds': int(os.getenv('ENDPOINT_MESSAGING_RETRY_BACKOFF', 30)),
     },
         'ceemis': {
         'url': os.getenv('ENDPOINT_CEEMIS_URL'),
@@ -348,7 +444,55 @@ ENDPOINT_CONFIG = {
         'url': os.getenv('ENDPOINT_CEEMIS_UPDATE_URL'),
         'format': 'form',  # CEEMIS expects form data
         'auth_type': 'none',  # No authentication for this endpoint
-    }
+    },
+    # Retry queues for cases that could not be forwarded (upstream down or failing).
+    # When enabled, failed cases are stored and redelivered through the adapter by
+    # `manage.py process_outbound_queue`, so keep them off unless that worker runs.
+    'cpims': {
+        'adapter': 'cpims_abuse',
+        'retry_queue': os.getenv('CPIMS_RETRY_QUEUE', 'False').lower() in ('true', '1', 'yes'),
+        'concurrency': int(os.getenv('CPIMS_RETRY_CONCURRENCY', 2)),
+        'max_attempts': int(os.getenv('CPIMS_RETRY_MAX_ATTEMPTS', 8)),
+        'retry_backoff_seconds': int(os.getenv('CPIMS_RETRY_BACKOFF', 60)),
+        'max_backoff_seconds': int(os.getenv('CPIMS_RETRY_MAX_BACKOFF', 3600)),
+    },
+    'ceemis_create': {
+        'adapter': 'ceemis',
+        'retry_queue': os.getenv('CEEMIS_RETRY_QUEUE', 'False').lower() in ('true', '1', 'yes'),
+        'concurrency': int(os.getenv('CEEMIS_RETRY_CONCURRENCY', 2)),
+        'max_attempts': int(os.getenv('CEEMIS_RETRY_MAX_ATTEMPTS', 8)),
+        'retry_backoff_seconds': int(os.getenv('CEEMIS_RETRY_BACKOFF', 60)),
+        'max_backoff_seconds': int(os.getenv('CEEMIS_RETRY_MAX_BACKOFF', 3600)),
+        # With async forwarding, new Helpline cases are queued here instead of sent inline
+        'queued': CEEMIS_ASYNC_FORWARDING,
+    },
+    # Async CEEMIS <-> Helpline bridge: updates to the same case are coalesced while they
+    # wait `coalesce_seconds`, so a burst of edits becomes one CEEMIS call.
+    'ceemis_case_update': {
+        'adapter': 'ceemis',
+        'adapter_method': 'deliver_update',
+        'queued': CEEMIS_ASYNC_FORWARDING,
+        'coalesce_seconds': int(os.getenv('CEEMIS_UPDATE_COALESCE_SECONDS', 10)),
+        'concurrency': int(os.getenv('CEEMIS_RETRY_CONCURRENCY', 2)),
+        'max_attempts': int(os.getenv('CEEMIS_RETRY_MAX_ATTEMPTS', 8)),
+        'retry_backoff_seconds': int(os.getenv('CEEMIS_RETRY_BACKOFF', 60)),
+        'max_backoff_seconds': int(os.getenv('CEEMIS_RETRY_MAX_BACKOFF', 3600)),
+    },
+    'ceemis_to_helpline': {
+        'adapter': 'ceemis',
+        'adapter_method': 'deliver_to_helpline',
+        'queued': CEEMIS_ASYNC_FORWARDING,
+        'concurrency': int(os.getenv('CEEMIS_RETRY_CONCURRENCY', 2)),
+        'max_attempts': int(os.getenv('CEEMIS_RETRY_MAX_ATTEMPTS', 8)),
+        'retry_backoff_seconds': int(os.getenv('CEEMIS_RETRY_BACKOFF', 60)),
+        'max_backoff_seconds': int(os.getenv('CEEMIS_RETRY_MAX_BACKOFF', 3600)),
+    },
+}
+
+# Circuit breakers for upstream systems (shared.circuit_breaker)
+CIRCUIT_BREAKER_CONFIG = {
+    'FAILURE_THRESHOLD': int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5)),
+    'RESET_TIMEOUT_SECONDS': int(os.getenv('CIRCUIT_BREAKER_RESET_TIMEOUT', 60)),
 }
 
 # Email settings for OTP verification
@@ -365,5 +509,55 @@ EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', 'False') == 'True'
 CPIMS_ENDPOINT_URL = os.getenv('CPIMS_ENDPOINT_URL', 'https://test.cpims.net/api/v1/crs/')
 CPIMS_AUTH_TOKEN = os.getenv('CPIMS_AUTH_TOKEN', '')
 
+# Shared CPIMS reference data cache (geo areas, categories and settings lists)
+CPIMS_REFERENCE_CACHE_CONFIG = {
+    'TTL_SECONDS': int(os.getenv('CPIMS_REFERENCE_TTL', 6 * 60 * 60)),  # Revalidate after 6 hours
+    'LOCAL_RECHECK_SECONDS': int(os.getenv('CPIMS_REFERENCE_LOCAL_RECHECK', 60)),
+    'COLD_WAIT_SECONDS': float(os.getenv('CPIMS_REFERENCE_COLD_WAIT', 0)),  # Max wait for geo data that isn't cached yet
+    'FETCH_TIMEOUT_SECONDS': int(os.getenv('CPIMS_REFERENCE_FETCH_TIMEOUT', 30)),
+}
+
+# Load the reference snapshot and start fetching CPIMS reference data when the
+# app loads. Set it only in the web server's environment (the gunicorn command),
+# not for manage.py commands, the outbound worker or other scripts.
+CPIMS_WARM_ON_STARTUP = os.getenv('CPIMS_WARM_ON_STARTUP', 'False').lower() in ('true', '1', 'yes')
+
+# Offline reference data snapshot (written by `manage.py snapshot_reference_data`)
+REFERENCE_SNAPSHOT_CONFIG = {
+    'PATH': os.getenv('REFERENCE_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'reference_data', 'snapshot.sqlite3')),
+    'MMAP_SIZE': int(os.getenv('REFERENCE_SNAPSHOT_MMAP_SIZE', 256 * 1024 * 1024)),
+    'LOAD_ON_STARTUP': os.getenv('REFERENCE_SNAPSHOT_LOAD_ON_STARTUP', 'True').lower() in ('true', '1', 'yes'),
+    # Older helpline entries are fetched from the live API instead (0 = no limit)
+    'MAX_AGE_SECONDS': int(os.getenv('REFERENCE_SNAPSHOT_MAX_AGE', 7 * 24 * 60 * 60)),
+}
+
+# Batch forwarding of Helpline cases to CPIMS (webhook/helpline/cpims/abuse/batch/)
+CPIMS_BATCH_CONFIG = {
+    'MAX_CONCURRENCY': int(os.getenv('CPIMS_BATCH_MAX_CONCURRENCY', 8)),  # Also capped by HTTP_POOL_MAXSIZE
+    'MAX_CASES': int(os.getenv('CPIMS_BATCH_MAX_CASES', 1000)),  # Queued batches (needs ENDPOINT_CONFIG['cpims']['retry_queue'])
+    # Without the retry queue a batch is forwarded within the request, so keep it
+    # small enough to finish inside the worker timeout (gunicorn's default is 30s)
+    'SYNC_MAX_CASES': int(os.getenv('CPIMS_BATCH_SYNC_MAX_CASES', 50)),
+}
+
+# Optional JSON file with extra/replacement Helpline -> CPIMS codes, merged over
+# platform_adapters/cpims/code_mappings.json (picked up on restart)
+CPIMS_CODE_MAPPINGS_FILE = os.getenv('CPIMS_CODE_MAPPINGS_FILE', '')
+
+# Replacement payload mapping specs by mapping name (see shared/field_mapping.py),
+# e.g. {'cpims_case': '/etc/cfcbe/cpims_case_mapping.json'}
+FIELD_MAPPING_FILES = {}
+
 # SSL Configuration
 DISABLE_SSL_VERIFICATION = os.getenv('DISABLE_SSL_VERIFICATION', 'False').lower() in ('true', '1', 'yes')
+
+# Pooled HTTP client configuration (shared.http_client)
+HTTP_CLIENT_CONFIG = {
+    'POOL_CONNECTIONS': int(os.getenv('HTTP_POOL_CONNECTIONS', 10)),
+    'POOL_MAXSIZE': int(os.getenv('HTTP_POOL_MAXSIZE', 20)),
+    'MAX_RETRIES': int(os.getenv('HTTP_MAX_RETRIES', 0)),
+    'CONNECT_TIMEOUT': float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+    'READ_TIMEOUT': float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+    # Hosts that always verify TLS even when DISABLE_SSL_VERIFICATION is set
+    'VERIFY_SSL_ALWAYS': [h.strip() for h in os.getenv('HTTP_VERIFY_SSL_ALWAYS', 'graph.facebook.com').split(',') if h.strip()],
+}
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import OutboundMessage
 
-# Register your models here.
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'endpoint', 'message_id', 'status', 'attempts', 'available_at', 'delivered_at')
+    list_filter = ('endpoint', 'status')
+    search_fields = ('message_id', 'last_error')
@@ -0,0 +1,128 @@
+import time
+import logging
+from datetime import timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from endpoint_integration.message_router import MessageRouter
+from endpoint_integration.models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound messages to their endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only process the given endpoint (may be repeated)')
+        parser.add_argument('--once', action='store_true',
+                            help='Process the currently available messages and exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Seconds after which a processing message is reclaimed')
+
+    def handle(self, *args, **options):
+        router = MessageRouter()
+        endpoint_config = getattr(settings, 'ENDPOINT_CONFIG', {})
+        endpoints = options['endpoints'] or [
+            name for name, config in endpoint_config.items()
+            if config.get('queued') or config.get('retry_queue')
+        ]
+
+        if not endpoints:
+            self.stdout.write(self.style.WARNING('No queued endpoints configured'))
+            return
+
+        # One bounded pool per endpoint so a slow endpoint cannot starve the others
+        concurrency = {
+            endpoint: max(1, endpoint_config.get(endpoint, {}).get('concurrency', 1))
+            for endpoint in endpoints
+        }
+        executors = {
+            endpoint: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"outbound-{endpoint}")
+            for endpoint, workers in concurrency.items()
+        }
+
+        in_flight = {endpoint: set() for endpoint in endpoints}
+        last_reclaim = 0
+
+        self.stdout.write(f"Processing outbound queue for: {', '.join(endpoints)}")
+
+        try:
+            while True:
+                if time.monotonic() - last_reclaim >= options['poll_interval']:
+                    self._reclaim_stale(options['stale_after'])
+                    last_reclaim = time.monotonic()
+
+                # Each endpoint is topped up as soon as its own deliveries
+                # finish, so a slow endpoint never holds up the others
+                claimed = 0
+                for endpoint in endpoints:
+                    running = in_flight[endpoint]
+                    running.difference_update([future for future in running if future.done()])
+                    free = concurrency[endpoint] - len(running)
+                    if free <= 0:
+                        continue
+                    for outbound in self._claim(endpoint, free):
+                        running.add(executors[endpoint].submit(self._deliver, router, outbound.pk))
+                        claimed += 1
+
+                pending = set().union(*in_flight.values())
+                if options['once'] and claimed == 0 and not pending:
+                    break
+                if claimed == 0:
+                    if pending:
+                        # Wake as soon as any endpoint has room again
+                        wait(pending, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping outbound queue worker')
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS('Outbound queue processed'))
+
+    def _claim(self, endpoint, limit):
+        """Atomically mark up to `limit` due messages for an endpoint as processing."""
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                OutboundMessage.objects
+                .select_for_update(skip_locked=True)
+                .filter(endpoint=endpoint, status=OutboundMessage.STATUS_PENDING, available_at__lte=now)
+                .order_by('available_at', 'id')
+                .values_list('id', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            OutboundMessage.objects.filter(
+                id__in=ids, status=OutboundMessage.STATUS_PENDING
+            ).update(status=OutboundMessage.STATUS_PROCESSING, locked_at=now)
+        return list(OutboundMessage.objects.filter(id__in=ids, locked_at=now))
+
+    def _reclaim_stale(self, stale_after):
+        """Return messages left in processing by a crashed worker to the queue."""
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+        reclaimed = OutboundMessage.objects.filter(
+            status=OutboundMessage.STATUS_PROCESSING, locked_at__lt=cutoff
+        ).update(status=OutboundMessage.STATUS_PENDING, locked_at=None)
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} stale outbound messages")
+
+    def _deliver(self, router, outbound_id):
+        try:
+            outbound = OutboundMessage.objects.get(pk=outbound_id)
+            router.deliver(outbound)
+        except Exception as e:
+            logger.exception(f"Error delivering outbound message {outbound_id}: {str(e)}")
+        finally:
+            # Worker threads hold their own DB connections
+            connection.close()
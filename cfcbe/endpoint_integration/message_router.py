@@ -1,15 +1,29 @@
 import logging
 import json
+import os
 import requests
+from shared import http_client
 import base64
 import time
-from typing import Dict, Any, Optional
+import random
+from datetime import timedelta
+from typing import Dict, Any, List, Optional
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from shared.models.standard_message import StandardMessage
+from shared import media_stream
+from shared.field_mapping import load_mapping
 from webhook_handler.services.conversation_service import ConversationService
 
 logger = logging.getLogger(__name__)
 
+# StandardMessage -> cases endpoint payload, declared in cases_endpoint_mapping.json
+CASES_ENDPOINT_MAPPING = load_mapping(
+    os.path.join(os.path.dirname(__file__), 'cases_endpoint_mapping.json'),
+    name='cases_endpoint'
+)
+
 class MessageRouter:
     """
     Routes standardized messages to appropriate endpoints.
@@ -23,23 +37,33 @@ class MessageRouter:
         self.conversation_service = ConversationService()
         self.endpoint_config = getattr(settings, 'ENDPOINT_CONFIG', {})
         
-    def route_to_endpoint(self, message: StandardMessage) -> Dict[str, Any]:
+    def route_to_endpoint(self, message: StandardMessage, conversation: Any = None) -> Dict[str, Any]:
         """
         Route a standardized message to an endpoint.
         
         Args:
             message: A StandardMessage instance
+            conversation: The message's conversation, if already resolved
             
         Returns:
             Response data from the endpoint
         """
+        try:
+            return self._route_to_endpoint(message, conversation)
+        finally:
+            # The spooled media file is only read while routing; close it
+            # whichever endpoint the message went to, or if routing failed
+            self._close_media(message)
+    
+    def _route_to_endpoint(self, message: StandardMessage, conversation: Any) -> Dict[str, Any]:
         # Choose endpoint based on platform
         endpoint = self._determine_endpoint(message)
         
         # Get or create a conversation for this message
-        conversation = self.conversation_service.get_or_create_conversation(
-            message.source_uid, message.platform
-        )
+        if conversation is None:
+            conversation = self.conversation_service.get_or_create_conversation(
+                message.source_uid, message.platform
+            )
         
         # Get endpoint configuration
         if endpoint not in self.endpoint_config:
@@ -52,13 +76,245 @@ class MessageRouter:
         # Format the message for the endpoint
         formatted_message = self._format_for_endpoint(message, conversation, config, endpoint)
         print(f"THIS IS THE PAYLOAD{formatted_message} THIS IS THE CONFIG{config}")
+        
+        media_file = message.media_file if endpoint == 'messaging_endpoint' else None
+        
+        # Queued endpoints are delivered by the process_outbound_queue worker
+        if config.get('queued'):
+            if media_file:
+                # Queued payloads are persisted as JSON, so the media has to be inlined
+                formatted_message['media_content'] = media_stream.encode_file_base64(media_file)
+            return self.enqueue(endpoint, formatted_message, message.message_id)
+        
         # Send the formatted message to the endpoint
-        response = self._send_to_endpoint(formatted_message, config)
+        response = self._send_to_endpoint(formatted_message, config, media_file=media_file)
         print(f"Response from endpoint: {response}")
         
+        return response
+    
+    @staticmethod
+    def _close_media(message: StandardMessage) -> None:
+        media_file = message.media_file
+        if media_file is not None:
+            try:
+                media_file.close()
+            except Exception as e:
+                logger.warning(f"Error closing media file for message {message.message_id}: {str(e)}")
+    
+    def route_batch(self, messages: List[StandardMessage],
+                    conversations: Optional[Dict[Any, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Route all messages parsed from one webhook payload as a unit.
+        
+        Conversations are resolved with one set of queries for the whole
+        batch, and messages for queued endpoints are written to the outbound
+        queue with a single bulk insert. Messages for synchronous endpoints
+        are still posted one by one, as the endpoints take single messages.
+        
+        Args:
+            messages: StandardMessage instances
+            conversations: Dict mapping (source_uid, platform) to conversations,
+                as returned by ConversationService.get_or_create_conversations
+            
+        Returns:
+            List of responses, in the same order as messages
+        """
+        from endpoint_integration.models import OutboundMessage
+        
+        if conversations is None:
+            conversations = self.conversation_service.get_or_create_conversations(
+                (message.source_uid, message.platform) for message in messages
+            )
+        
+        responses = [None] * len(messages)
+        queued = []
+        for index, message in enumerate(messages):
+            conversation = conversations.get((message.source_uid, message.platform))
+            endpoint = self._determine_endpoint(message)
+            config = self.endpoint_config.get(endpoint)
+            
+            if not config or not config.get('queued'):
+                responses[index] = self.route_to_endpoint(message, conversation=conversation)
+                continue
+            
+            try:
+                formatted_message = self._format_for_endpoint(message, conversation, config, endpoint)
+                media_file = message.media_file if endpoint == 'messaging_endpoint' else None
+                if media_file:
+                    formatted_message['media_content'] = media_stream.encode_file_base64(media_file)
+            finally:
+                self._close_media(message)
+            
+            queued.append((index, OutboundMessage(
+                endpoint=endpoint,
+                payload=formatted_message,
+                message_id=message.message_id or '',
+                max_attempts=config.get('max_attempts', 5)
+            )))
+        
+        if queued:
+            created = OutboundMessage.objects.bulk_create([outbound for _, outbound in queued])
+            logger.info(f"Queued {len(created)} messages from batch of {len(messages)}")
+            for (index, _), outbound in zip(queued, created):
+                responses[index] = {
+                    'status': 'queued',
+                    'outbound_id': outbound.pk,
+                    'endpoint': outbound.endpoint
+                }
+        
+        return responses
+    
+    def enqueue(self, endpoint: str, formatted_message: Dict[str, Any],
+                message_id: Optional[str] = None, coalesce: bool = False) -> Dict[str, Any]:
+        """
+        Persist a formatted message to the outbound queue and return immediately.
+        
+        With ``coalesce``, a message still pending for the same endpoint and
+        message ID absorbs the new payload (later values win) instead of a
+        second row being queued, so a burst of updates to one record becomes
+        a single delivery. New rows then wait the endpoint's
+        ``coalesce_seconds`` before they are due to give the burst time to land.
+        
+        Args:
+            endpoint: The endpoint identifier
+            formatted_message: The message formatted for the endpoint
+            message_id: Optional source message ID for tracing (the coalescing key)
+            coalesce: Merge into a pending message with the same message ID
+            
+        Returns:
+            Queued status with the outbound message ID
+        """
+        from endpoint_integration.models import OutboundMessage
+        
+        config = self.endpoint_config.get(endpoint, {})
+        
+        if coalesce and message_id:
+            with transaction.atomic():
+                pending = (OutboundMessage.objects.select_for_update()
+                           .filter(endpoint=endpoint, message_id=message_id,
+                                   status=OutboundMessage.STATUS_PENDING)
+                           .order_by('id').first())
+                if pending is not None:
+                    pending.payload = {**pending.payload, **formatted_message}
+                    pending.save(update_fields=['payload', 'updated_at'])
+                    logger.info(f"Coalesced message {message_id} for {endpoint} into outbound {pending.pk}")
+                    return {
+                        'status': 'queued',
+                        'outbound_id': pending.pk,
+                        'endpoint': endpoint,
+                        'coalesced': True
+                    }
+        
+        outbound = OutboundMessage.objects.create(
+            endpoint=endpoint,
+            payload=formatted_message,
+            message_id=message_id or '',
+            max_attempts=config.get('max_attempts', 5),
+            available_at=timezone.now() + timedelta(seconds=config.get('coalesce_seconds', 0) if coalesce else 0)
+        )
+        logger.info(f"Queued message {outbound.message_id or outbound.pk} for {endpoint} (outbound {outbound.pk})")
+        
+        return {
+            'status': 'queued',
+            'outbound_id': outbound.pk,
+            'endpoint': endpoint
+        }
+    
+    def deliver(self, outbound) -> Dict[str, Any]:
+        """
+        Deliver a queued outbound message and record the outcome.
+        
+        Failed deliveries are rescheduled with jittered exponential backoff
+        until max_attempts is reached, after which the message is marked
+        failed. While the endpoint's circuit breaker is open the message
+        waits for it without using up an attempt.
         
+        Args:
+            outbound: An OutboundMessage instance claimed by the worker
+            
+        Returns:
+            Response data from the endpoint
+        """
+        config = self.endpoint_config.get(outbound.endpoint)
+        if config is None:
+            response = {'status': 'error', 'error': f"Endpoint not configured: {outbound.endpoint}"}
+        elif config.get('adapter'):
+            response = self._deliver_with_adapter(config['adapter'], outbound.payload,
+                                                  config.get('adapter_method', 'retry_delivery'))
+        else:
+            response = self._send_to_endpoint(outbound.payload, config)
+        
+        outbound.locked_at = None
+        outbound.response = response
+        error = str(response.get('error') or response.get('message') or '')
+        
+        if response.get('circuit_open'):
+            delay = max(1.0, float(response.get('retry_after') or 0))
+            outbound.status = outbound.STATUS_PENDING
+            outbound.available_at = timezone.now() + timedelta(seconds=delay)
+            outbound.last_error = error
+            outbound.save()
+            logger.info(f"Outbound {outbound.pk} to {outbound.endpoint} waiting {delay:.0f}s for circuit to close")
+            return response
+        
+        outbound.attempts += 1
+        
+        if response.get('status') == 'success':
+            outbound.status = outbound.STATUS_DELIVERED
+            outbound.delivered_at = timezone.now()
+            outbound.last_error = ''
+            if outbound.attempts > 1:
+                self._release_backlog(outbound.endpoint)
+        elif outbound.attempts >= outbound.max_attempts or response.get('retryable') is False:
+            outbound.status = outbound.STATUS_FAILED
+            outbound.last_error = error
+            logger.error(f"Outbound {outbound.pk} to {outbound.endpoint} failed after {outbound.attempts} attempts")
+        else:
+            base_delay = (config or {}).get('retry_backoff_seconds', 30)
+            delay = base_delay * (2 ** (outbound.attempts - 1))
+            delay = min(delay, (config or {}).get('max_backoff_seconds', 3600))
+            delay = random.uniform(delay / 2, delay)
+            outbound.status = outbound.STATUS_PENDING
+            outbound.available_at = timezone.now() + timedelta(seconds=delay)
+            outbound.last_error = error
+            logger.warning(f"Outbound {outbound.pk} to {outbound.endpoint} failed, retrying in {delay:.0f}s")
+        
+        outbound.save()
         return response
     
+    def _deliver_with_adapter(self, adapter_name: str, payload: Dict[str, Any],
+                              method: str = 'retry_delivery') -> Dict[str, Any]:
+        """
+        Redeliver a payload queued by a platform adapter (e.g. a CPIMS case).
+        
+        Args:
+            adapter_name: Registered adapter name
+            payload: The payload the adapter queued
+            method: Adapter method that delivers it (the endpoint's ``adapter_method``)
+            
+        Returns:
+            The adapter's delivery result
+        """
+        from platform_adapters.adapter_factory import AdapterFactory
+        
+        try:
+            return getattr(AdapterFactory.get_adapter(adapter_name), method)(payload)
+        except Exception as e:
+            logger.exception(f"Error redelivering with adapter {adapter_name}: {str(e)}")
+            return {'status': 'error', 'error': str(e)}
+    
+    def _release_backlog(self, endpoint: str) -> None:
+        """The endpoint recovered: make its backed-off messages due now."""
+        from endpoint_integration.models import OutboundMessage
+        
+        released = OutboundMessage.objects.filter(
+            endpoint=endpoint,
+            status=OutboundMessage.STATUS_PENDING,
+            available_at__gt=timezone.now()
+        ).update(available_at=timezone.now())
+        if released:
+            logger.info(f"{endpoint} recovered, releasing {released} queued messages")
+    
     def _determine_endpoint(self, message: StandardMessage) -> str:
         """
         Determine which endpoint to use based on the platform.
@@ -112,144 +368,23 @@ class MessageRouter:
         Returns:
             Formatted message for the cases endpoint
         """
-        # Extract metadata from the message
-        metadata = message.metadata
-        
         # Generate or use provided timestamp in Unix format with milliseconds
         source_timestamp = message.source_timestamp
-        unix_timestamp = f"{source_timestamp:.3f}"
         
         # Use the source_uid from the message or generate one
         source_uid = message.source_uid
         if not source_uid.startswith('walkin-'):
             source_uid = f"walkin-100-{int(source_timestamp)}"
         
-        # Create a deterministic uid2 based on source_uid
-        source_uid2 = f"{source_uid}-2"
-        
-        # Extract victim and perpetrator data
-        victim_data = metadata.get('victim', {})
-        perpetrator_data = metadata.get('perpetrator', {})
-        
-        # Prepare client (victim) data
-        # Ensure name is never empty - use "Anonymous" as fallback
-        victim_name = victim_data.get('name', '')
-        if not victim_name or victim_name.strip() == '':
-            victim_name = "Anonymous Victim"
-            
-        client_data = {
-            "fname": victim_name,
-            "age_t": "0",
-            "age": str(victim_data.get('age', '0')),  # Default to "0" if age is empty
-            "dob": "",
-            "age_group_id": "361953",
-            "location_id": "258783",
-            "sex_id": "",
-            "landmark": "",
-            "nationality_id": "",
-            "national_id_type_id": "",
-            "national_id": "",
-            "lang_id": "",
-            "tribe_id": "",
-            "phone": "",
-            "phone2": "",
-            "email": "",
-            ".id": "86164"
-        }
-        
-        # Create gender mapping
-        gender_mapping = {
-            "male": "121",
-            "female": "122",
-        }
-        
-        # Prepare perpetrator data
-        # Ensure perpetrator name is never empty - use "Unknown" as fallback
-        perp_name = perpetrator_data.get('name', '')
-        if not perp_name or perp_name.strip() == '':
-            perp_name = "Unknown Perpetrator"
-            
-        perp_data = {
-            "fname": perp_name,
-            "age_t": "0",
-            "age": str(perpetrator_data.get('age', '0')),  # Default to "0" if age is empty
-            "dob": "",
-            "age_group_id": "361955",
-            "age_group": "31-45",
-            "location_id": "",
-            "sex_id": gender_mapping.get(perpetrator_data.get('gender', '').lower(), ""),
-            "sex": f"^{perpetrator_data.get('gender', '').capitalize()}" if perpetrator_data.get('gender') else "",
-            "landmark": "",
-            "nationality_id": "",
-            "national_id_type_id": "",
-            "national_id": "",
-            "lang_id": "",
-            "tribe_id": "",
-            "phone": "",
-            "phone2": "",
-            "email": "",
-            "relationship_id": "",
-            "shareshome_id": "",
-            "health_id": "",
-            "employment_id": "",
-            "marital_id": "",
-            "guardian_fullname": "",
-            "notes": "",
-            ".id": ""
-        }
-
-        # Ensure narrative is never empty
-        narrative = message.content
-        if not narrative or narrative.strip() == '':
-            narrative = "No details provided"
-
-        # Construct the cases endpoint payload matching the required format
-        cases_payload = {
-            "src": "webform",                     # Fixed source
-            "src_uid": source_uid,               # Maps from message.source_uid (with prefix)
-            "src_address": source_uid2 or "0101010101", # Maps from message.source_address
-            "src_uid2": source_uid2,             # Derived from src_uid
-            "src_usr": "100",                    # Default value
-            "src_vector": "2",                   # Default value
-            "src_callid": message.message_id,    # Maps from message.message_id
-            "src_ts": unix_timestamp,            # Maps from message.source_timestamp
-            
-            "reporters_uuid": client_data,          # Using 'reporters_a' instead of 'reporter'
-            
-            "clients_case": [
-                client_data
-            ],
-            
-            "perpetrators_case": [
-                perp_data
-            ],
-            
-            "attachments_case": [],
-            
-            "services": [],
-            
-            "knowabout116_id": "",
-            
-            "case_category_id": metadata.get('case_category_id', "362484"),
-            
-            "narrative": narrative,              # Maps from message.content with fallback
-            
-            "plan": "---",
-            
-            "justice_id": "",
-            
-            "assessment_id": "",
-            
-            "priority": "1",
-            
-            "status": "1",
-            
-            "escalated_to_id": "0",
-            
-            "gbv_related": "0"                  # Added this field
-        }
-        
-        return cases_payload
+        # The payload layout and defaults are declared in cases_endpoint_mapping.json
+        return CASES_ENDPOINT_MAPPING({
+            'metadata': message.metadata,
+            'narrative': message.content,
+            'message_id': message.message_id,
+            'src_uid': source_uid,
+            'src_uid2': f"{source_uid}-2",
+            'src_ts': f"{source_timestamp:.3f}",
+        })
     
     def _format_messaging_endpoint(self, message: StandardMessage, conversation: Any, 
                                   config: Dict[str, Any]) -> Dict[str, Any]:
@@ -296,8 +431,14 @@ class MessageRouter:
         if message.media_url:
             messaging_payload["media_url"] = message.media_url
         
+        # Streamed media: content is base64-encoded from the file while sending
+        if message.media_file and not message.media_content:
+            messaging_payload["media_mime"] = message.media_mime or ""
+            messaging_payload["media_filename"] = message.media_filename or ""
+            messaging_payload["media_size"] = message.media_size or 0
+            logger.info(f"📦 STREAMED PAYLOAD - Media content will be streamed: {message.media_filename}, size: {message.media_size} bytes")
         # Include base64 encoded media content if available
-        if message.media_content:
+        elif message.media_content:
             messaging_payload["media_content"] = message.media_content
             messaging_payload["media_mime"] = message.media_mime or ""
             messaging_payload["media_filename"] = message.media_filename or ""
@@ -315,13 +456,14 @@ class MessageRouter:
         return messaging_payload
     
     def _send_to_endpoint(self, formatted_message: Dict[str, Any], 
-                     config: Dict[str, Any]) -> Dict[str, Any]:
+                     config: Dict[str, Any], media_file: Optional[Any] = None) -> Dict[str, Any]:
         """
         Send the formatted message to the endpoint.
         
         Args:
             formatted_message: The message formatted for the endpoint
             config: Endpoint configuration
+            media_file: Raw media file to stream into the media_content field (optional)
             
         Returns:
             Response data from the endpoint
@@ -342,7 +484,9 @@ class MessageRouter:
             headers['Authorization'] = f"Bearer {auth_token}"
         
         try:
-            logger.info(f"Sending to endpoint {url}: {json.dumps(formatted_message)}")
+            # Never serialize media content just for logging
+            log_payload = {k: v for k, v in formatted_message.items() if k != 'media_content'}
+            logger.info(f"Sending to endpoint {url}: {json.dumps(log_payload)}")
             
             # Handle SSL verification based on configuration
             disable_ssl = getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
@@ -351,12 +495,22 @@ class MessageRouter:
             if disable_ssl:
                 logger.warning(f"SSL verification disabled by configuration for: {url}")
             
-            response = requests.post(
-                url, 
-                headers=headers, 
-                json=formatted_message,
-                verify=verify_ssl
-            )
+            if media_file:
+                # Stream the JSON body, encoding the media to base64 as it is sent
+                body = media_stream.StreamingJSONBody(formatted_message, 'media_content', media_file)
+                response = http_client.post(
+                    url,
+                    headers=headers,
+                    data=body,
+                    verify=verify_ssl
+                )
+            else:
+                response = http_client.post(
+                    url, 
+                    headers=headers, 
+                    json=formatted_message,
+                    verify=verify_ssl
+                )
             
             # Log the response for debugging
             logger.info(f"Endpoint response: {response.status_code}, {response.text}")
@@ -20,7 +20,7 @@ class MessageRouterTestCase(TestCase):
             }
         }
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_route_to_cases_endpoint(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -44,7 +44,7 @@ class MessageRouterTestCase(TestCase):
         self.assertEqual(response['case_id'], '123')
         mock_post.assert_called_once()
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_route_to_messaging_endpoint(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -65,4 +65,167 @@ class MessageRouterTestCase(TestCase):
         response = self.router.route_to_endpoint(message)
         self.assertEqual(response['status'], 'success')
         self.assertEqual(response['message_id'], 'msg_id_123')
-        mock_post.assert_called_once()
\ No newline at end of file
+        mock_post.assert_called_once()
+
+class OutboundQueueTestCase(TestCase):
+    def setUp(self):
+        self.router = MessageRouter()
+        self.router.endpoint_config = {
+            'messaging_endpoint': {
+                'url': 'http://test.messaging.com/api',
+                'auth_token': 'test_messaging_token',
+                'formatter': 'messaging',
+                'queued': True,
+                'max_attempts': 2,
+                'retry_backoff_seconds': 1
+            }
+        }
+        self.message = StandardMessage(
+            source='whatsapp',
+            source_uid='test_whatsapp_uid',
+            source_address='test_whatsapp_address',
+            message_id='test_queued_message_id',
+            source_timestamp=1678886400.0,
+            content='Hello from WhatsApp',
+            platform='whatsapp',
+            content_type='text/plain'
+        )
+
+    @patch('requests.Session.post')
+    def test_queued_endpoint_returns_immediately(self, mock_post):
+        from endpoint_integration.models import OutboundMessage
+
+        response = self.router.route_to_endpoint(self.message)
+
+        self.assertEqual(response['status'], 'queued')
+        mock_post.assert_not_called()
+        outbound = OutboundMessage.objects.get(pk=response['outbound_id'])
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_PENDING)
+        self.assertEqual(outbound.message_id, 'test_queued_message_id')
+
+    @patch('requests.Session.post')
+    def test_deliver_marks_delivered(self, mock_post):
+        from endpoint_integration.models import OutboundMessage
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {'status': 'success', 'id': 'msg_id_123'}
+        mock_post.return_value = mock_response
+
+        queued = self.router.route_to_endpoint(self.message)
+        outbound = OutboundMessage.objects.get(pk=queued['outbound_id'])
+        self.router.deliver(outbound)
+
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_DELIVERED)
+        self.assertEqual(outbound.attempts, 1)
+        mock_post.assert_called_once()
+
+    @patch('requests.Session.post')
+    def test_deliver_retries_then_fails(self, mock_post):
+        from endpoint_integration.models import OutboundMessage
+
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_response.text = 'Server error'
+        mock_post.return_value = mock_response
+
+        queued = self.router.route_to_endpoint(self.message)
+        outbound = OutboundMessage.objects.get(pk=queued['outbound_id'])
+
+        self.router.deliver(outbound)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_PENDING)
+
+        self.router.deliver(outbound)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_FAILED)
+        self.assertEqual(outbound.attempts, 2)
+
+    @patch('requests.Session.post')
+    def test_streamed_media_is_sent_as_body(self, mock_post):
+        import io
+        import json
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {'status': 'success', 'id': 'msg_id_123'}
+        sent_bodies = []
+
+        def send(url, **kwargs):
+            sent_bodies.append(kwargs['data'].read())
+            return mock_response
+        mock_post.side_effect = send
+
+        self.router.endpoint_config['messaging_endpoint']['queued'] = False
+        media_file = io.BytesIO(b'\x89PNG media bytes')
+        self.message.media_file = media_file
+        self.message.media_mime = 'image/png'
+        self.message.media_filename = 'media.png'
+        self.message.media_size = len(media_file.getvalue())
+
+        response = self.router.route_to_endpoint(self.message)
+
+        self.assertEqual(response['status'], 'success')
+        sent = json.loads(sent_bodies[0])
+        self.assertEqual(sent['media_content'], 'iVBORyBtZWRpYSBieXRlcw==')
+        self.assertEqual(sent['media_filename'], 'media.png')
+        self.assertTrue(media_file.closed)
+
+    @patch('requests.Session.post')
+    def test_media_is_closed_for_every_endpoint(self, mock_post):
+        import io
+
+        mock_post.side_effect = Exception('endpoint down')
+        self.router.endpoint_config['cases_endpoint'] = {'url': 'http://test.cases.com/api', 'formatter': 'cases'}
+
+        for platform, endpoint in (('ceemis', 'cases_endpoint'), ('unknown', 'missing_endpoint')):
+            media_file = io.BytesIO(b'media bytes')
+            self.message.platform = platform
+            self.message.media_file = media_file
+            with patch.object(self.router, '_determine_endpoint', return_value=endpoint):
+                try:
+                    self.router.route_to_endpoint(self.message)
+                except Exception:
+                    pass
+            self.assertTrue(media_file.closed, endpoint)
+
+
+class OutboundQueueWorkerTestCase(TestCase):
+    def test_slow_endpoint_does_not_block_others(self):
+        import threading
+        from django.test import override_settings
+        from endpoint_integration.management.commands.process_outbound_queue import Command
+
+        queues = {'slow_endpoint': [1], 'fast_endpoint': [2, 3, 4]}
+        release_slow = threading.Event()
+        fast_done = threading.Event()
+        delivered = []
+
+        def claim(endpoint, limit):
+            claimed, queues[endpoint] = queues[endpoint][:limit], queues[endpoint][limit:]
+            return [MagicMock(pk=pk) for pk in claimed]
+
+        def deliver(router, outbound_id):
+            if outbound_id == 1:
+                release_slow.wait(5)
+            delivered.append(outbound_id)
+            if delivered == [2, 3, 4]:
+                fast_done.set()
+
+        command = Command()
+        endpoint_config = {name: {'queued': True, 'concurrency': 1} for name in queues}
+        with override_settings(ENDPOINT_CONFIG=endpoint_config), \
+                patch.object(command, '_claim', side_effect=claim), \
+                patch.object(command, '_deliver', side_effect=deliver), \
+                patch.object(command, '_reclaim_stale'):
+            worker = threading.Thread(target=command.handle, kwargs={
+                'endpoints': None, 'once': True, 'poll_interval': 0.01, 'stale_after': 300
+            })
+            worker.start()
+            # All fast deliveries finish while the slow one is still running
+            self.assertTrue(fast_done.wait(5))
+            release_slow.set()
+            worker.join(5)
+
+        self.assertEqual(delivered, [2, 3, 4, 1])
@@ -1,7 +1,10 @@
 import json
 import logging
+import os
 import base64
 import requests
+from shared import http_client
+from shared.field_mapping import load_mapping
 from django.conf import settings
 from django.db import transaction
 from django.db.models.signals import post_save
@@ -15,6 +18,19 @@ HEADERS = {
     "Authorization": f"Bearer {settings.BEARER_TOKEN}",
 }
 
+# Complaint -> helpline case payload, declared in helpline_case_mapping.json
+HELPLINE_CASE_MAPPING = load_mapping(
+    os.path.join(os.path.dirname(__file__), 'helpline_case_mapping.json'),
+    name='feedback_helpline_case'
+)
+
+
+def _person_fields(person):
+    if not person:
+        return None
+    return {'name': person.name, 'age': person.age, 'gender': person.gender}
+
+
 @receiver(post_save, sender=Complaint)
 def create_notification(sender, instance, created, **kwargs):
     if created:
@@ -39,9 +55,6 @@ def generate_notification(instance):
     """
     instance.refresh_from_db()
 
-    victim = instance.victim
-    perpetrator = instance.perpetrator
-    
     # Generate timestamp in Unix format with milliseconds
     current_time = time.time()
     unix_timestamp = f"{current_time:.3f}"
@@ -49,107 +62,14 @@ def generate_notification(instance):
     # Create a unique ID based on the session ID
     source_uid = f"walkin-100-{unix_timestamp.replace('.', '')}"
     
-    # Prepare client (victim) data
-    client_data = {
-        "fname": victim.name if victim and victim.name else "",
-        "age_t": "0",
-        "age": str(victim.age) if victim and victim.age else "",
-        "dob": "",  # You may calculate this from age if needed
-        "age_group_id": "361953",  # Default value - adjust as needed
-        "location_id": "258783",  # Default value - adjust as needed
-        "sex_id": "",
-        "landmark": "",
-        "nationality_id": "",
-        "national_id_type_id": "",
-        "national_id": "",
-        "lang_id": "",
-        "tribe_id": "",
-        "phone": "",
-        "phone2": "",
-        "email": "",
-        ".id": "86164"  # Default value or generate if needed
-    }
-    
-    # Create gender mapping
-    gender_mapping = {
-        "male": "121",  # Assuming these are the correct IDs
-        "female": "122",
-        # Add other mappings as needed
-    }
-    
-    # Prepare perpetrator data
-    perpetrator_data = {
-        "fname": perpetrator.name if perpetrator and perpetrator.name else "",
-        "age_t": "0",
-        "age": str(perpetrator.age) if perpetrator and perpetrator.age else "",
-        "dob": "",  # You may calculate this from age if needed
-        "age_group_id": "361955",  # Default value - adjust as needed
-        "age_group": "31-45",  # Default or calculate based on age
-        "location_id": "",
-        "sex_id": gender_mapping.get(perpetrator.gender.lower() if perpetrator and perpetrator.gender else "", ""),
-        "sex": f"^{perpetrator.gender.capitalize()}" if perpetrator and perpetrator.gender else "",
-        "landmark": "",
-        "nationality_id": "",
-        "national_id_type_id": "",
-        "national_id": "",
-        "lang_id": "",
-        "tribe_id": "",
-        "phone": "",
-        "phone2": "",
-        "email": "",
-        "relationship_id": "",
-        "shareshome_id": "",
-        "health_id": "",
-        "employment_id": "",
-        "marital_id": "",
-        "guardian_fullname": "",
-        "notes": "",
-        ".id": ""
-    }
-
-    # Construct new payload format
-    new_payload = {
-        "src": "walkin",
-        "src_uid": source_uid,
-        "src_address": "",
-        "src_uid2": f"{source_uid}-2",
-        "src_usr": "100",
-        "src_vector": "2",
-        "src_callid": source_uid,
-        "src_ts": unix_timestamp,
-        
-        "reporter": client_data,
-        
-        "clients_case": [
-            client_data
-        ],
-        
-        "perpetrators_case": [
-            perpetrator_data
-        ],
-        
-        "attachments_case": [],
-        
-        "services": [],
-        
-        "knowabout116_id": "",
-        
-        "case_category_id": "362484",  # Default or map from instance.case_category
-        
-        "narrative": instance.complaint_text if instance.complaint_text else "---",
-        
-        "plan": "---",
-        
-        "justice_id": "",
-        
-        "assessment_id": "",
-        
-        "priority": "1",
-        
-        "status": "1",
-        
-        "escalated_to_id": "0"
-    }
+    # The payload layout and defaults are declared in helpline_case_mapping.json
+    new_payload = HELPLINE_CASE_MAPPING({
+        'victim': _person_fields(instance.victim),
+        'perpetrator': _person_fields(instance.perpetrator),
+        'complaint_text': instance.complaint_text,
+        'src_uid': source_uid,
+        'src_ts': unix_timestamp,
+    })
 
     print(f"Sending new payload: {json.dumps(new_payload, indent=2)}")
 
@@ -162,7 +82,7 @@ def generate_notification(instance):
 
     # Send to API
     try:
-        response = requests.post(API_URL, headers=HEADERS, json=new_payload)
+        response = http_client.post(API_URL, headers=HEADERS, json=new_payload)
         print(f"API Response: {response.status_code}, {response.text}")
 
         if response.status_code == 201:
@@ -179,143 +99,3 @@ def generate_notification(instance):
             logging.error(f"API call failed: {response.status_code}, Response: {response.text}")
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to send complaint to API: {e}")
-    victim = instance.victim
-    perpetrator = instance.perpetrator
-    
-    # Generate timestamp in Unix format with milliseconds
-    current_time = time.time()
-    unix_timestamp = f"{current_time:.3f}"
-    
-    # Create a unique ID based on the session ID
-    source_uid = f"walkin-100-{unix_timestamp.replace('.', '')}"
-    
-    # Prepare client (victim) data
-    client_data = {
-        "fname": victim.name if victim and victim.name else "",
-        "age_t": "0",
-        "age": str(victim.age) if victim and victim.age else "",
-        "dob": "",  # You may calculate this from age if needed
-        "age_group_id": "361953",  # Default value - adjust as needed
-        "location_id": "258783",  # Default value - adjust as needed
-        "sex_id": "",
-        "landmark": "",
-        "nationality_id": "",
-        "national_id_type_id": "",
-        "national_id": "",
-        "lang_id": "",
-        "tribe_id": "",
-        "phone": "",
-        "phone2": "",
-        "email": "",
-        ".id": "86164"  # Default value or generate if needed
-    }
-    
-    # Create gender mapping
-    gender_mapping = {
-        "male": "121",  # Assuming these are the correct IDs
-        "female": "122",
-        # Add other mappings as needed
-    }
-    
-    # Prepare perpetrator data
-    perpetrator_data = {
-        "fname": perpetrator.name if perpetrator and perpetrator.name else "",
-        "age_t": "0",
-        "age": str(perpetrator.age) if perpetrator and perpetrator.age else "",
-        "dob": "",  # You may calculate this from age if needed
-        "age_group_id": "361955",  # Default value - adjust as needed
-        "age_group": "31-45",  # Default or calculate based on age
-        "location_id": "",
-        "sex_id": gender_mapping.get(perpetrator.gender.lower() if perpetrator and perpetrator.gender else "", ""),
-        "sex": f"^{perpetrator.gender.capitalize()}" if perpetrator and perpetrator.gender else "",
-        "landmark": "",
-        "nationality_id": "",
-        "national_id_type_id": "",
-        "national_id": "",
-        "lang_id": "",
-        "tribe_id": "",
-        "phone": "",
-        "phone2": "",
-        "email": "",
-        "relationship_id": "",
-        "shareshome_id": "",
-        "health_id": "",
-        "employment_id": "",
-        "marital_id": "",
-        "guardian_fullname": "",
-        "notes": "",
-        ".id": ""
-    }
-
-    # Construct new payload format
-    new_payload = {
-        "src": "walkin",
-        "src_uid": source_uid,
-        "src_address": "",
-        "src_uid2": f"{source_uid}-2",
-        "src_usr": "100",
-        "src_vector": "2",
-        "src_callid": source_uid,
-        "src_ts": unix_timestamp,
-        
-        "reporter": client_data,
-        
-        "clients_case": [
-            client_data
-        ],
-        
-        "perpetrators_case": [
-            perpetrator_data
-        ],
-        
-        "attachments_case": [],
-        
-        "services": [],
-        
-        "knowabout116_id": "",
-        
-        "case_category_id": "362484",  # Default or map from instance.case_category
-        
-        "narrative": instance.complaint_text if instance.complaint_text else "---",
-        
-        "plan": "---",
-        
-        "justice_id": "",
-        
-        "assessment_id": "",
-        
-        "priority": "1",
-        
-        "status": "1",
-        
-        "escalated_to_id": "0"
-    }
-
-    print(f"Sending new payload: {json.dumps(new_payload, indent=2)}")
-
-    # Create Notification
-    message = (
-        f"A new complaint has been filed by {instance.reporter_nickname or 'an anonymous reporter'} "
-        f"in the category {instance.case_category}."
-    )
-    Notification.objects.create(complaint=instance, message=message)
-
-    # Send to API
-    try:
-        response = requests.post(API_URL, headers=HEADERS, json=new_payload)
-        print(f"API Response: {response.status_code}, {response.text}")
-
-        if response.status_code == 201:
-            response_data = response.json()
-            # Update logic to extract message_id based on the new response format
-            message_id = response_data.get("id", "")  # Adjust based on actual API response
-            if message_id:
-                instance.message_id_ref = message_id
-                instance.save(update_fields=["message_id_ref"])
-                logging.info(f"message_id_ref saved: {message_id}")
-            else:
-                logging.error("message_id not found in API response.")
-        else:
-            logging.error(f"API call failed: {response.status_code}, Response: {response.text}")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to send complaint to API: {e}")
\ No newline at end of file
@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import CaseCorrelation, MediaCacheEntry
 
-# Register your models here.
+
+@admin.register(MediaCacheEntry)
+class MediaCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'mime_type', 'size', 'hit_count', 'last_accessed')
+    list_filter = ('mime_type',)
+    search_fields = ('sha256',)
+
+
+@admin.register(CaseCorrelation)
+class CaseCorrelationAdmin(admin.ModelAdmin):
+    list_display = ('platform', 'helpline_case_id', 'external_ref', 'origin', 'updated_at')
+    list_filter = ('platform', 'origin')
+    search_fields = ('helpline_case_id', 'external_ref', 'src_uid', 'src_callid')
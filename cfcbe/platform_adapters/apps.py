@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class PlatformAdaptersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -18,3 +19,23 @@ class PlatformAdaptersConfig(AppConfig):
         AdapterFactory.register_adapter('ceemis', CEEMISAdapter)
         AdapterFactory.register_adapter('eemis', EEMISAdapter)
         AdapterFactory.register_adapter('mamacare', MamaCareAdapter)
+
+        # Only set for the web server (e.g. in the gunicorn command), so migrate,
+        # shell, tests and workers don't load reference data or call CPIMS
+        if getattr(settings, 'CPIMS_WARM_ON_STARTUP', False):
+            self._load_reference_snapshot()
+            self._warm_cpims_reference_data()
+
+    def _load_reference_snapshot(self):
+        """Open the offline reference snapshot and seed the CPIMS cache from it."""
+        config = getattr(settings, 'REFERENCE_SNAPSHOT_CONFIG', {})
+        if not config.get('LOAD_ON_STARTUP', True):
+            return
+
+        from platform_adapters.reference_snapshot import seed_cpims_reference_cache
+        seed_cpims_reference_cache()
+
+    def _warm_cpims_reference_data(self):
+        """Start loading CPIMS reference data in the background when serving requests."""
+        from platform_adapters.cpims.helpline_cpims_abuse_adapter import HelplineCPIMSAbuseAdapter
+        HelplineCPIMSAbuseAdapter().warm_reference_data()
@@ -2,18 +2,79 @@
 
 import json
 import logging
+import os
+import re
 import requests
+from shared import http_client
 from typing import Any, Dict, List, Optional
 from django.http import HttpRequest, HttpResponse, JsonResponse
 import uuid
 from datetime import datetime
 from django.conf import settings
 
+from platform_adapters import correlation
 from platform_adapters.base_adapter import BaseAdapter
+from shared.category_matcher import CategoryMatcher
+from shared.circuit_breaker import get_breaker
+from shared.field_mapping import load_mapping
 
 
 logger = logging.getLogger(__name__)
 
+# ENDPOINT_CONFIG entry for the queue of cases waiting to be resent to CEEMIS
+CEEMIS_RETRY_ENDPOINT = 'ceemis_create'
+# ENDPOINT_CONFIG entries for async forwarding of case updates and CEEMIS cases
+CEEMIS_UPDATE_ENDPOINT = 'ceemis_case_update'
+HELPLINE_FORWARD_ENDPOINT = 'ceemis_to_helpline'
+
+# Platform name used for CEEMIS case correlations
+CORRELATION_PLATFORM = 'ceemis'
+
+# CEEMIS case IDs, e.g. MGLSD7093227
+CEEMIS_CASE_ID_PATTERN = re.compile(r'MGLSD\d+')
+
+# CEEMIS case categories, matched case-insensitively with partial/misspelt input
+CASE_CATEGORY_MATCHER = CategoryMatcher(
+    [
+        {"item_id": "362484", "item_description": "COMPLAINT"},
+        {"item_id": "362485", "item_description": "COMPLIMENT"},
+        {"item_id": "362486", "item_description": "Child Exploitation"},
+        {"item_id": "362487", "item_description": "Labor Abuse"},
+        {"item_id": "362488", "item_description": "Wage Theft"},
+    ],
+    aliases={"labour abuse": "Labor Abuse", "exploitation": "Child Exploitation"}
+)
+
+
+def lookup_case_category_id(category: str) -> str:
+    """Map a CEEMIS complaint category to its case category ID (COMPLAINT if unknown)."""
+    match = CASE_CATEGORY_MATCHER.match(category)
+    return match.item['item_id'] if match else "362484"
+
+
+def helpline_case_id_of(helpline_data: Dict[str, Any]) -> str:
+    """Get the helpline case ID from a Helpline case payload (empty if absent)."""
+    return str(helpline_data.get("case_id") or helpline_data.get("id") or "")
+
+
+def ceemis_ref_of(ceemis_data: Dict[str, Any]) -> str:
+    """Get the CEEMIS case reference from CEEMIS form data (empty if absent)."""
+    for field in ("caseid", "case_id", "ref"):
+        value = ceemis_data.get(field)
+        if isinstance(value, list):
+            value = value[0] if value else ""
+        if value:
+            return str(value)
+    return ""
+
+
+# CEEMIS form -> Helpline case payload, declared in helpline_case_mapping.json
+HELPLINE_CASE_MAPPING = load_mapping(
+    os.path.join(os.path.dirname(__file__), 'helpline_case_mapping.json'),
+    functions={'case_category_id': lookup_case_category_id},
+    name='ceemis_helpline_case'
+)
+
 class CEEMISAdapter(BaseAdapter):
     """
     Adapter for the CEEMIS platform integration.
@@ -148,19 +209,83 @@ class CEEMISAdapter(BaseAdapter):
             logger.info("Case creation operation detected (no ref field)")
             return self._create_case(metadata)  # Pass metadata instead of message_content
     
-    def _create_case(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    def submit_message(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Forward a Helpline case or case update to CEEMIS, asynchronously if enabled.
+        
+        When the endpoint is ``queued`` (CEEMIS_ASYNC_FORWARDING) the case is
+        handed to the outbound queue worker and a "queued" status is returned.
+        Updates are keyed by case, so updates to a case that is still waiting
+        are merged into one CEEMIS call.
+        
+        Args:
+            metadata: The Helpline case payload
+            
+        Returns:
+            Response from CEEMIS, or the queued status
+        """
+        if "ref" in metadata:
+            if not self._is_queued(CEEMIS_UPDATE_ENDPOINT):
+                return self._update_case(metadata)
+            case_key = helpline_case_id_of(metadata) or self._extract_ceemis_case_id(metadata.get("ref", ""))
+            return self._enqueue(CEEMIS_UPDATE_ENDPOINT, metadata, f"case:{case_key}", coalesce=True)
+        
+        if not self._is_queued(CEEMIS_RETRY_ENDPOINT):
+            return self._create_case(metadata)
+        return self._enqueue(CEEMIS_RETRY_ENDPOINT, metadata, str(metadata.get("src_callid", "")))
+    
+    def deliver_update(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a queued case update (called by the outbound queue worker).
+        
+        Args:
+            metadata: The (possibly coalesced) case update
+            
+        Returns:
+            Delivery result
+        """
+        return self._update_case(metadata)
+    
+    def _is_queued(self, endpoint: str) -> bool:
+        """Whether cases for this ENDPOINT_CONFIG entry go through the outbound queue."""
+        return bool(getattr(settings, 'ENDPOINT_CONFIG', {}).get(endpoint, {}).get('queued'))
+    
+    def _enqueue(self, endpoint: str, payload: Dict[str, Any], key: str, coalesce: bool = False) -> Dict[str, Any]:
+        """Queue a payload for the outbound queue worker."""
+        from endpoint_integration.message_router import MessageRouter
+        
+        queued = MessageRouter().enqueue(endpoint, payload, message_id=key, coalesce=coalesce)
+        return {
+            "status": "queued",
+            "message": "Case queued for forwarding",
+            "outbound_id": queued['outbound_id'],
+            "coalesced": queued.get('coalesced', False)
+        }
+    
+    def _create_case(self, metadata: Dict[str, Any], queue_on_failure: bool = True) -> Dict[str, Any]:
         """
         Create a new case in CEEMIS.
         
+        Fails fast while the CEEMIS circuit breaker is open. When the retry
+        queue is enabled, cases that couldn't be delivered because CEEMIS is
+        down or failing are queued and a "queued" status is returned.
+        
         Args:
             metadata: The metadata containing the case information
+            queue_on_failure: Queue the case for retry if CEEMIS is unavailable
             
         Returns:
             Response from CEEMIS
         """
+        breaker = get_breaker('ceemis')
         try:
             # Map Helpline fields to CEEMIS fields
             ceemis_payload = self._map_to_ceemis_format(metadata)
+            
+            if not breaker.allow_request():
+                logger.warning("CEEMIS circuit is open, not sending case")
+                return self._handle_unavailable(metadata, "CEEMIS is unavailable (circuit open)",
+                                                queue_on_failure, retry_after=breaker.retry_after())
         
             # Debug logging
             logger.debug(f"Creating case in CEEMIS: {self.ceemis_create_endpoint}")
@@ -174,15 +299,17 @@ class CEEMISAdapter(BaseAdapter):
                 files[key] = (None, str(value), 'text/plain')
             
             # Send to CEEMIS endpoint - explicitly as multipart/form-data
-            response = requests.post(
+            response = http_client.post(
                 self.ceemis_create_endpoint,
                 files=files  # This ensures multipart/form-data format
             )
+            breaker.record_result(response.status_code)
             
             logger.debug(f"CEEMIS response status: {response.status_code}")
             logger.debug(f"CEEMIS response text: {response.text}")
             
             if response.status_code in (200, 201):
+                self._record_created_case(metadata, response.text)
                 try:
                     result = response.json()
                     return {
@@ -196,6 +323,10 @@ class CEEMISAdapter(BaseAdapter):
                         "message": "Case created in CEEMIS",
                         "ceemis_response": response.text
                     }
+            elif response.status_code >= 500:
+                logger.error(f"CEEMIS API error: {response.status_code} - {response.text}")
+                return self._handle_unavailable(metadata, f"CEEMIS API error: {response.status_code}",
+                                                queue_on_failure, details=response.text)
             else:
                 logger.error(f"CEEMIS API error: {response.status_code} - {response.text}")
                 return {
@@ -204,6 +335,10 @@ class CEEMISAdapter(BaseAdapter):
                     "details": response.text
                 }
                 
+        except requests.RequestException as e:
+            logger.exception(f"Network error creating case in CEEMIS: {str(e)}")
+            breaker.record_failure()
+            return self._handle_unavailable(metadata, f"Network error: {str(e)}", queue_on_failure)
         except Exception as e:
             logger.exception(f"Error creating case in CEEMIS: {str(e)}")
             return {
@@ -211,6 +346,70 @@ class CEEMISAdapter(BaseAdapter):
                 "message": f"Error creating case in CEEMIS: {str(e)}"
             }
     
+    def _handle_unavailable(self, metadata: Dict[str, Any], error: str, queue_on_failure: bool,
+                            retry_after: Optional[float] = None, details: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the result for a case CEEMIS couldn't take, queueing it for retry if enabled.
+        
+        Args:
+            metadata: The case metadata
+            error: What went wrong
+            queue_on_failure: Queue the case if the retry queue is enabled
+            retry_after: Seconds until the circuit allows a retry (when it is open)
+            details: Response text from CEEMIS, if any
+            
+        Returns:
+            A "queued" result, or the error result
+        """
+        if queue_on_failure:
+            config = getattr(settings, 'ENDPOINT_CONFIG', {}).get(CEEMIS_RETRY_ENDPOINT, {})
+            if config.get('retry_queue'):
+                from endpoint_integration.message_router import MessageRouter
+                
+                queued = MessageRouter().enqueue(CEEMIS_RETRY_ENDPOINT, metadata,
+                                                 message_id=str(metadata.get("src_callid", "")))
+                logger.warning(f"Queued case {metadata.get('src_callid')} for CEEMIS retry: {error}")
+                return {
+                    "status": "queued",
+                    "message": "CEEMIS is unavailable, case queued for retry",
+                    "details": error,
+                    "outbound_id": queued['outbound_id']
+                }
+        
+        result = {"status": "error", "message": error}
+        if details is not None:
+            result["details"] = details
+        if retry_after is not None:
+            # Nothing was sent; the retry worker waits for the circuit instead of counting an attempt
+            result.update(circuit_open=True, retry_after=retry_after)
+        return result
+    
+    def _record_created_case(self, metadata: Dict[str, Any], response_text: str) -> None:
+        """Correlate a Helpline case with the CEEMIS case created for it."""
+        from platform_adapters.models import CaseCorrelation
+        
+        match = CEEMIS_CASE_ID_PATTERN.search(response_text or "")
+        correlation.record(
+            CORRELATION_PLATFORM,
+            helpline_case_id=helpline_case_id_of(metadata),
+            external_ref=match.group(0) if match else "",
+            src_uid=metadata.get("src_uid", ""),
+            src_callid=metadata.get("src_callid", ""),
+            origin=CaseCorrelation.ORIGIN_HELPLINE
+        )
+    
+    def retry_delivery(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resend a queued case (called by the outbound queue worker).
+        
+        Args:
+            metadata: The case metadata that was queued
+            
+        Returns:
+            Delivery result
+        """
+        return self._create_case(metadata, queue_on_failure=False)
+    
     def _update_case(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
         Update an existing case in CEEMIS.
@@ -222,9 +421,7 @@ class CEEMISAdapter(BaseAdapter):
             Response from CEEMIS
         """
         try:
-            # Extract the CEEMIS case ID from the ref field
-            ref = metadata.get("ref", "")
-            ceemis_case_id = self._extract_ceemis_case_id(ref)
+            ceemis_case_id = self._resolve_ceemis_case_id(metadata)
             
             # Add the extracted case ID to the metadata
             metadata_with_caseid = metadata.copy()
@@ -246,7 +443,7 @@ class CEEMISAdapter(BaseAdapter):
                 files[key] = (None, str(value), 'text/plain')
             
             # Send to CEEMIS endpoint - explicitly as multipart/form-data
-            response = requests.post(
+            response = http_client.post(
                 self.ceemis_update_endpoint,
                 files=files  # This ensures multipart/form-data format
             )
@@ -293,6 +490,30 @@ class CEEMISAdapter(BaseAdapter):
         else:
             return JsonResponse({"status": "error", "message": "No response from CEEMIS"})
     
+    def _resolve_ceemis_case_id(self, metadata: Dict[str, Any]) -> str:
+        """
+        Resolve the CEEMIS case ID for a Helpline case update.
+        
+        Uses the stored correlation for the helpline case when there is one
+        and otherwise extracts the ID from the ref field, remembering the
+        result so the next update to the case is a lookup.
+        
+        Args:
+            metadata: The case update
+            
+        Returns:
+            CEEMIS case ID
+        """
+        helpline_case_id = helpline_case_id_of(metadata)
+        ceemis_case_id = correlation.external_ref_for(CORRELATION_PLATFORM, helpline_case_id)
+        if ceemis_case_id:
+            return ceemis_case_id
+        
+        ceemis_case_id = self._extract_ceemis_case_id(metadata.get("ref", ""))
+        if helpline_case_id and CEEMIS_CASE_ID_PATTERN.fullmatch(ceemis_case_id):
+            correlation.record(CORRELATION_PLATFORM, helpline_case_id=helpline_case_id, external_ref=ceemis_case_id)
+        return ceemis_case_id
+    
     def _extract_ceemis_case_id(self, ref: str) -> str:
         """
         Extract the CEEMIS case ID from the reference string.
@@ -309,8 +530,7 @@ class CEEMISAdapter(BaseAdapter):
                 return ref
                 
             # Try to extract MGLSD case ID format (e.g., MGLSD7093227)
-            import re
-            match = re.search(r'MGLSD\d+', ref)
+            match = CEEMIS_CASE_ID_PATTERN.search(ref)
             if match:
                 return match.group(0)
             
@@ -445,20 +665,62 @@ class CEEMISAdapter(BaseAdapter):
             logger.error(f"Error validating CEEMIS request: {str(e)}")
             return False
     
-    def send_to_helpline(self, ceemis_data: Dict[str, Any]) -> Dict[str, Any]:
+    def submit_to_helpline(self, ceemis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Forward a CEEMIS case to the Helpline, asynchronously if enabled.
+        
+        The source IDs are generated here and queued with the case, so retries
+        resend the same IDs and the correlation stays stable.
+        
+        Args:
+            ceemis_data: Form data received from CEEMIS
+            
+        Returns:
+            Response from Helpline API, or the queued status
+        """
+        if not self._is_queued(HELPLINE_FORWARD_ENDPOINT):
+            return self.send_to_helpline(ceemis_data)
+        
+        payload = {
+            "form": ceemis_data,
+            "src_uid": f"ceemis-{uuid.uuid4().hex[:8]}-{int(datetime.now().timestamp())}",
+            "src_callid": str(uuid.uuid4()),
+        }
+        return self._enqueue(HELPLINE_FORWARD_ENDPOINT, payload, payload["src_callid"])
+    
+    def deliver_to_helpline(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a queued CEEMIS case to the Helpline (called by the outbound queue worker).
+        
+        Args:
+            payload: The queued form data and source IDs
+            
+        Returns:
+            Delivery result
+        """
+        return self.send_to_helpline(payload["form"], src_uid=payload.get("src_uid"),
+                                     src_callid=payload.get("src_callid"))
+    
+    def send_to_helpline(self, ceemis_data: Dict[str, Any], src_uid: Optional[str] = None,
+                         src_callid: Optional[str] = None) -> Dict[str, Any]:
         """
         Send CEEMIS case data to Helpline API.
         Converts CEEMIS form data to Helpline JSON format.
         
+        The CEEMIS reference, source IDs and the created helpline case ID are
+        recorded as a correlation once the Helpline accepts the case.
+        
         Args:
             ceemis_data: Form data received from CEEMIS
+            src_uid: Source UID to send (generated if not given)
+            src_callid: Source call ID to send (generated if not given)
             
         Returns:
             Response from Helpline API
         """
         try:
             # Convert CEEMIS data to Helpline format
-            helpline_payload = self._map_ceemis_to_helpline_format(ceemis_data)
+            helpline_payload = self._map_ceemis_to_helpline_format(ceemis_data, src_uid, src_callid)
             
             # Get auth token from config
             auth_token = getattr(settings, 'ENDPOINT_AUTH_TOKEN', '')
@@ -483,7 +745,7 @@ class CEEMISAdapter(BaseAdapter):
             logger.debug(f"Payload: {json.dumps(helpline_payload, indent=2)}")
             print(f"Payload: {json.dumps(helpline_payload, indent=2)}")
             # Send to Helpline API
-            response = requests.post(
+            response = http_client.post(
                 helpline_endpoint,
                 json=helpline_payload,
                 headers=headers,
@@ -496,12 +758,14 @@ class CEEMISAdapter(BaseAdapter):
             if response.status_code in (200, 201):
                 try:
                     result = response.json()
+                    self._record_helpline_case(ceemis_data, helpline_payload, result)
                     return {
                         "status": "success",
                         "message": "Case successfully sent to Helpline",
                         "helpline_response": result
                     }
                 except json.JSONDecodeError:
+                    self._record_helpline_case(ceemis_data, helpline_payload, None)
                     return {
                         "status": "success",
                         "message": "Case sent to Helpline",
@@ -528,169 +792,58 @@ class CEEMISAdapter(BaseAdapter):
                 "message": f"Error sending to Helpline: {str(e)}"
             }
     
-    def _map_ceemis_to_helpline_format(self, ceemis_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Convert CEEMIS form data to Helpline JSON format.
-        
-        Args:
-            ceemis_data: CEEMIS form data
-            
-        Returns:
-            Helpline formatted data
+    def _record_helpline_case(self, ceemis_data: Dict[str, Any], helpline_payload: Dict[str, Any],
+                              result: Any) -> None:
         """
-        # Generate UUIDs and timestamps
-        src_uid = f"ceemis-{uuid.uuid4().hex[:8]}-{int(datetime.now().timestamp())}"
-        src_callid = str(uuid.uuid4())
-        session_id = str(uuid.uuid4())
-        current_timestamp = datetime.now().timestamp()
-        
-        # Build the reporters_uuid (victim/client information)
-        reporters_uuid = {
-            "fname": ceemis_data.get("mw_name", ""),
-            "age_t": "0",
-            "age": "",
-            "dob": "",
-            "age_group_id": "",
-            "location_id": self._lookup_location(ceemis_data.get("mw_loca", "")),
-            "sex_id": "",
-            "landmark": "",
-            "nationality_id": "",
-            "national_id_type_id": self._lookup_id_type("Passport"),
-            "national_id": ceemis_data.get("mw_passport", ""),
-            "lang_id": "",
-            "tribe_id": "",
-            "phone": ceemis_data.get("mw_phone", ""),
-            "phone2": "",
-            "email": ceemis_data.get("mw_email", ""),
-            ".id": ""
-        }
-        
-        # Build clients_case (same as reporters_uuid)
-        clients_case = [reporters_uuid.copy()]
-        
-        # Build perpetrators_case (employer information)
-        perpetrators_case = []
-        if ceemis_data.get("emp_name") and ceemis_data.get("emp_name") != "NA":
-            perpetrator = {
-                "fname": ceemis_data.get("emp_name", ""),
-                "age_t": "0",
-                "age": "",
-                "dob": "",
-                "age_group_id": "",
-                "age_group": "",
-                "location_id": self._lookup_location(ceemis_data.get("location", "")),
-                "sex_id": "",
-                "sex": "",
-                "landmark": "",
-                "nationality_id": "",
-                "national_id_type_id": self._lookup_id_type("EMP_NUMBER"),
-                "national_id": ceemis_data.get("emp_number", ""),
-                "lang_id": "",
-                "tribe_id": "",
-                "phone": "",
-                "phone2": "",
-                "email": "",
-                "relationship_id": "",
-                "relationship": "Employer",
-                "shareshome_id": "",
-                "health_id": "",
-                "employment_id": self._lookup_employment(ceemis_data.get("emp_sector", "")),
-                "marital_id": "",
-                "guardian_fullname": "",
-                "notes": f"Employer in {ceemis_data.get('emp_sector', 'Unknown')} sector",
-                ".id": ""
-            }
-            perpetrators_case.append(perpetrator)
-        
-        # Build the complete Helpline payload
-        helpline_payload = {
-            "src": "ceemis",
-            "src_uid": src_uid,
-            # "src_uid": "walkin-100-1743763537",
-            "src_address": ceemis_data.get("mw_phone", ""),
-            # "src_address": "010101010",
-            "src_uid2": "walkin-100-1743763537",
-            "src_usr": "ceemis",
-            "src_vector": "2",
-            "src_callid": src_callid,
-            "src_ts": str(current_timestamp),
-            "reporter_nickname": "ceemis_user",
-            "case_category": ceemis_data.get("comp_category", ""),
-            "case_category_id": self._lookup_case_category(ceemis_data.get("comp_category", "")),
-            "narrative": ceemis_data.get("mw_narative", ""),
-            "complaint_text": None,
-            "complaint_image": None,
-            "complaint_audio": None,
-            "complaint_video": None,
-            "message_id_ref": "",
-            "session_id": session_id,
-            "plan": "---",
-            "priority": "1",
-            "status": "1",
-            "escalated_to_id": "0",
-            "gbv_related": "0",
-            "reporters_uuid": reporters_uuid,
-            "clients_case": clients_case,
-            "perpetrators_case": perpetrators_case,
-            "attachments_case": [],
-            "services": []
-        }
+        Correlate a CEEMIS case with the helpline case created for it.
         
-        return helpline_payload
-    
-    def _lookup_id_type(self, id_type: str) -> str:
+        Called after the helpline accepted the case, so nothing here may fail
+        the send: a retry would create the case again. An unexpected response
+        shape is logged and the correlation recorded without the helpline ID
+        (it is completed from src_callid later).
         """
-        Lookup ID type mapping.
+        from platform_adapters.models import CaseCorrelation
         
-        Args:
-            id_type: The ID type to lookup
-            
-        Returns:
-            Mapped ID type value
-        """
-        lookup_map = {
-            "Passport": "1",
-            "EMP_NUMBER": "2",
-            "National_ID": "3"
-        }
-        return lookup_map.get(id_type, "1")  # Default to Passport
+        try:
+            helpline_case_id = ""
+            cases = result.get("cases") if isinstance(result, dict) else None
+            if isinstance(cases, list) and cases and isinstance(cases[0], (list, tuple)) and cases[0]:
+                helpline_case_id = cases[0][0]
+            elif result is not None:
+                logger.warning(f"No case ID in helpline response for CEEMIS case {ceemis_ref_of(ceemis_data)}: {result}")
+            
+            correlation.record(
+                CORRELATION_PLATFORM,
+                helpline_case_id=helpline_case_id,
+                external_ref=ceemis_ref_of(ceemis_data),
+                src_uid=helpline_payload.get("src_uid", ""),
+                src_callid=helpline_payload.get("src_callid", ""),
+                origin=CaseCorrelation.ORIGIN_PARTNER
+            )
+        except Exception as e:
+            logger.exception(f"Error correlating CEEMIS case with the helpline case: {str(e)}")
     
-    def _lookup_location(self, location: str) -> str:
+    def _map_ceemis_to_helpline_format(self, ceemis_data: Dict[str, Any], src_uid: Optional[str] = None,
+                                       src_callid: Optional[str] = None) -> Dict[str, Any]:
         """
-        Lookup location mapping.
+        Convert CEEMIS form data to Helpline JSON format.
         
         Args:
-            location: The location to lookup
+            ceemis_data: CEEMIS form data
+            src_uid: Source UID (generated if not given)
+            src_callid: Source call ID (generated if not given)
             
         Returns:
-            Mapped location ID
-        """
-        lookup_map = {
-            "Kampala": "258783",
-            "Uganda": "258783",
-            "Entebbe": "258784",
-            "Jinja": "258785"
-        }
-        return lookup_map.get(location, "258783")  # Default to Kampala
-    
-    def _lookup_employment(self, sector: str) -> str:
+            Helpline formatted data
         """
-        Lookup employment sector mapping.
-        
-        Args:
-            sector: The employment sector to lookup
-            
-        Returns:
-            Mapped employment ID
-        """
-        lookup_map = {
-            "Housemaid": "1",
-            "Construction": "2",
-            "Agriculture": "3",
-            "Manufacturing": "4",
-            "Services": "5"
-        }
-        return lookup_map.get(sector, "1")  # Default to Housemaid
+        # Generate UUIDs and timestamps
+        return HELPLINE_CASE_MAPPING({
+            'form': ceemis_data,
+            'src_uid': src_uid or f"ceemis-{uuid.uuid4().hex[:8]}-{int(datetime.now().timestamp())}",
+            'src_callid': src_callid or str(uuid.uuid4()),
+            'session_id': str(uuid.uuid4()),
+            'src_ts': str(datetime.now().timestamp()),
+        })
     
     def _lookup_case_category(self, category: str) -> str:
         """
@@ -702,11 +855,4 @@ class CEEMISAdapter(BaseAdapter):
         Returns:
             Mapped case category ID
         """
-        lookup_map = {
-            "COMPLAINT": "362484",
-            "COMPLIMENT": "362485",
-            "Child Exploitation": "362486",
-            "Labor Abuse": "362487",
-            "Wage Theft": "362488"
-        }
-        return lookup_map.get(category, "362484")  # Default to COMPLAINT
\ No newline at end of file
+        return lookup_case_category_id(category)
\ No newline at end of file
@@ -0,0 +1,124 @@
+# platform_adapters/correlation.py
+
+"""
+Correlation store linking helpline cases to their partner-system counterparts.
+
+Adapters record a correlation whenever a case crosses between the helpline and
+a partner system (currently CEEMIS), and resolve the counterpart ID of later
+updates from it. Each resolve is a single query on a unique index.
+
+Correlation problems are logged and never fail the forwarding itself.
+"""
+
+import logging
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+def record(platform: str, helpline_case_id: str = '', external_ref: str = '', src_uid: str = '',
+           src_callid: str = '', origin: Optional[str] = None):
+    """
+    Create or complete the correlation for a forwarded case.
+
+    An existing row matching any of the given identifiers is updated with the
+    ones it was missing, so both sides of a case end up on one row no matter
+    which was learned first.
+
+    Args:
+        platform: Partner platform name (e.g. "ceemis")
+        helpline_case_id: Helpline case ID, if known
+        external_ref: Partner system case reference, if known
+        src_uid: Source UID sent with the case
+        src_callid: Source call ID sent with the case
+        origin: Which side the case was created on (defaults to the helpline)
+
+    Returns:
+        The CaseCorrelation, or None if it couldn't be recorded
+    """
+    from platform_adapters.models import CaseCorrelation
+
+    identifiers = {
+        'helpline_case_id': str(helpline_case_id or ''),
+        'external_ref': str(external_ref or ''),
+        'src_callid': str(src_callid or ''),
+    }
+    lookup = Q()
+    for field, value in identifiers.items():
+        if value:
+            lookup |= Q(**{field: value})
+    if not lookup:
+        return None
+
+    try:
+        with transaction.atomic():
+            correlation = (CaseCorrelation.objects.select_for_update()
+                           .filter(lookup, platform=platform).order_by('id').first())
+            if correlation is None:
+                correlation = CaseCorrelation(platform=platform, origin=origin or CaseCorrelation.ORIGIN_HELPLINE)
+
+            changed = correlation.pk is None
+            for field, value in dict(identifiers, src_uid=str(src_uid or '')).items():
+                if value and not getattr(correlation, field):
+                    setattr(correlation, field, value)
+                    changed = True
+            if changed:
+                correlation.save()
+            return correlation
+    except IntegrityError as e:
+        # Both IDs are already correlated, on different rows
+        logger.warning(f"Conflicting {platform} correlation for case {helpline_case_id} / {external_ref}: {str(e)}")
+    except Exception as e:
+        logger.exception(f"Error recording {platform} correlation: {str(e)}")
+    return None
+
+
+def external_ref_for(platform: str, helpline_case_id: str) -> str:
+    """
+    Resolve the partner reference of a helpline case.
+
+    Args:
+        platform: Partner platform name
+        helpline_case_id: Helpline case ID
+
+    Returns:
+        The partner reference, or an empty string if not correlated
+    """
+    from platform_adapters.models import CaseCorrelation
+
+    if not helpline_case_id:
+        return ''
+    try:
+        return CaseCorrelation.objects.filter(
+            platform=platform, helpline_case_id=str(helpline_case_id)
+        ).exclude(external_ref='').values_list('external_ref', flat=True).first() or ''
+    except Exception as e:
+        logger.error(f"Error resolving {platform} reference for case {helpline_case_id}: {str(e)}")
+        return ''
+
+
+def helpline_case_for(platform: str, external_ref: str) -> str:
+    """
+    Resolve the helpline case ID of a partner reference.
+
+    Args:
+        platform: Partner platform name
+        external_ref: Partner system case reference
+
+    Returns:
+        The helpline case ID, or an empty string if not correlated
+    """
+    from platform_adapters.models import CaseCorrelation
+
+    if not external_ref:
+        return ''
+    try:
+        return CaseCorrelation.objects.filter(
+            platform=platform, external_ref=str(external_ref)
+        ).exclude(helpline_case_id='').values_list('helpline_case_id', flat=True).first() or ''
+    except Exception as e:
+        logger.error(f"Error resolving helpline case for {platform} reference {external_ref}: {str(e)}")
+        return ''
@@ -0,0 +1,317 @@
+# platform_adapters/cpims/benchmark.py
+
+"""
+Throughput benchmark for the Helpline -> CPIMS mapping pipeline.
+
+Cases are replayed through the same steps as HelplineCPIMSAbuseView
+(validate_request -> parse_messages -> StandardMessage -> send_message) in
+dry-run mode, against CPIMSStubServer: a local HTTP server standing in for
+the CPIMS geo, settings and CRS APIs. Nothing is sent to a real CPIMS.
+
+Used by `manage.py benchmark_cpims_mapping`.
+"""
+
+import copy
+import json
+import logging
+import statistics
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from platform_adapters.cpims.code_mappings import reset_unmapped_counts, unmapped_counts
+from shared.models.standard_message import StandardMessage
+
+logger = logging.getLogger(__name__)
+
+# Real areas used by the sample cases; the rest of the geo list is generated
+SAMPLE_AREAS = [
+    ("Murang'a", [("Kandara", ["Kagundu-Ini", "Ithiru", "Gaichanjiru"]), ("Kigumo", ["Kahumbu", "Muthithi"])]),
+    ("Nairobi", [("Westlands", ["Parklands", "Kangemi"]), ("Kibra", ["Laini Saba", "Makina"])]),
+    ("Kisumu", [("Kisumu Central", ["Railways", "Kondele"]), ("Nyando", ["Ahero", "Awasi"])]),
+]
+
+STUB_SETTINGS = {
+    'case_category_id': [
+        {"item_id": "CSAB", "item_description": "Physical abuse/violence", "item_sub_category": None},
+        {"item_id": "CLAB", "item_description": "Child Labour", "item_sub_category": "child_labour_id"},
+        {"item_id": "CCDF", "item_description": "Defilement", "item_sub_category": None},
+        {"item_id": "CSNG", "item_description": "Neglect", "item_sub_category": None},
+        {"item_id": "CSOS", "item_description": "Child out of school", "item_sub_category": "out_of_school_id"},
+        {"item_id": "CEMA", "item_description": "Emotional Abuse", "item_sub_category": None},
+        {"item_id": "CFGM", "item_description": "FGM", "item_sub_category": None},
+        {"item_id": "CCMA", "item_description": "Child Marriage", "item_sub_category": None},
+    ],
+    'child_labour_id': [
+        {"item_id": "CLDW", "item_description": "Domestic work / Exploitative household chores"},
+        {"item_id": "CLAG", "item_description": "Agriculture / Farming work (Milking, tilling, harvesting, weeding, scarring animals)"},
+    ],
+    'out_of_school_id': [
+        {"item_id": "OSFP", "item_description": "Family Poverty"},
+        {"item_id": "OSCL", "item_description": "Engaged in child labour"},
+    ],
+    'case_nature_id': [
+        {"item_id": "OOEV", "item_description": "One-off event"},
+        {"item_id": "OCGE", "item_description": "Chronic/On-going event"},
+    ],
+    'event_place_id': [
+        {"item_id": "PEHF", "item_description": "Home & Family"},
+        {"item_id": "PESC", "item_description": "School and Educational Settings"},
+        {"item_id": "PECE", "item_description": "Other Community Event"},
+    ],
+}
+
+BASE_CASE = {
+    "id": "31687",
+    "created_on": "1757487391",
+    "created_by": "test",
+    "priority": "3",
+    "narrative": "Agnes from Murang'a is severely beaten by her father when he's drunk for no reason.",
+    "plan": "Agnes needs to be sheltered from her abusive father.",
+    "incidence_when": "1757451600",
+    "incidence_location": "Home & Family",
+    "cat_1": "Physical abuse/violence",
+    "cat_3": "Chronic/On-going event",
+    "reporter_fullname": "Agnes Wacera",
+    "reporter_phone": "254728769034",
+    "reporter_sex": "^Female",
+    "reporter_location": "^Murang'a^Kandara^Kagundu-Ini",
+    "clients": [{
+        "contact_fullname": "Agnes Wacera",
+        "contact_sex": "^Female",
+        "contact_dob": "1252530000",
+        "in_school": "1",
+    }],
+    "perpetrators": [{
+        "contact_fullname": "John Wacera",
+        "contact_sex": "^Male",
+        "relationship": "Father",
+    }],
+}
+
+# Variations that exercise the different lookup paths
+SAMPLE_CASES = [
+    BASE_CASE,
+    dict(BASE_CASE, cat_1="child labor", sub_category="farming", reporter_location="^Nairobi^Westlands^Parklands"),
+    dict(BASE_CASE, cat_1="Rape", incidence_location="school", reporter_location="^Kisumu^Kisumu Central^Kondele"),
+    dict(BASE_CASE, cat_1="Child out of school", cat_2="poverty", reporter_location="^Murang'a^Kigumo^Muthithi"),
+    dict(BASE_CASE, cat_1="Emotinal abuse", clients=[], reporter_location="^Nairobi^Kibra^Makina"),
+    dict(BASE_CASE, cat_1="Not a CPIMS category"),
+]
+
+
+def build_stub_geo_data(counties: int = 47, constituencies: int = 6, wards: int = 5) -> List[Dict[str, Any]]:
+    """
+    Generate a CPIMS-like geo list: the sample areas plus synthetic ones.
+
+    The default size (about 1,700 areas) is in the range of the real list.
+    """
+    areas = []
+    next_id = [1]
+
+    def add(name, area_type, parent_id):
+        area_id = next_id[0]
+        next_id[0] += 1
+        areas.append({
+            "area_id": area_id,
+            "area_type_id": area_type,
+            "area_name": name,
+            "area_code": str(1000 + area_id),
+            "parent_area_id": parent_id,
+        })
+        return area_id
+
+    tree = list(SAMPLE_AREAS)
+    for c in range(max(0, counties - len(SAMPLE_AREAS))):
+        tree.append((f"County {c}", [
+            (f"County {c} Sub {s}", [f"County {c} Sub {s} Ward {w}" for w in range(wards)])
+            for s in range(constituencies)
+        ]))
+
+    for county, sub_counties in tree:
+        county_id = add(county, "GPRV", 0)
+        for sub_county, ward_names in sub_counties:
+            sub_county_id = add(sub_county, "GDIS", county_id)
+            for ward in ward_names:
+                add(ward, "GWRD", sub_county_id)
+
+    return areas
+
+
+class CPIMSStubServer:
+    """
+    Local HTTP server standing in for the CPIMS geo, settings and CRS APIs.
+
+    Usage:
+        with CPIMSStubServer() as stub:
+            adapter.cpims_geo_endpoint = stub.geo_url
+    """
+
+    def __init__(self, geo_data: Optional[List[Dict[str, Any]]] = None,
+                 settings_data: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.geo_data = geo_data if geo_data is not None else build_stub_geo_data()
+        self.settings_data = settings_data if settings_data is not None else STUB_SETTINGS
+        self.requests = []
+        self._server = None
+        self._thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                stub.requests.append(('GET', self.path))
+                if parts.path.endswith('/geo/'):
+                    return self._send(200, stub.geo_data)
+                if parts.path.endswith('/settings/'):
+                    field_name = parse_qs(parts.query).get('field_name', [''])[0]
+                    return self._send(200, stub.settings_data.get(field_name, []))
+                return self._send(404, {"detail": "Not found"})
+
+            def do_POST(self):
+                stub.requests.append(('POST', self.path))
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                return self._send(201, {"status": 0, "message": "Case created (stub)"})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'CPIMSStubServer':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='cpims-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    @property
+    def geo_url(self) -> str:
+        return f"{self.base_url}/geo/"
+
+    @property
+    def settings_url(self) -> str:
+        return f"{self.base_url}/settings/"
+
+    @property
+    def crs_url(self) -> str:
+        return f"{self.base_url}/crs/"
+
+    def __enter__(self) -> 'CPIMSStubServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def process_case(adapter, case: Dict[str, Any], forward: bool = False) -> Dict[str, Any]:
+    """Run one case through the same steps as HelplineCPIMSAbuseView."""
+    if not adapter.validate_request(case):
+        return {"status": "error", "message": "Invalid case data"}
+
+    result = {"status": "error", "message": "Failed to parse case data"}
+    for msg_dict in adapter.parse_messages(case):
+        message = StandardMessage(**msg_dict)
+        result = adapter.send_message("cpims", message.metadata, dry_run=not forward)
+    return result
+
+
+def run_benchmark(adapter, cases: List[Dict[str, Any]], total: int = 1000, forward: bool = False,
+                  alloc_sample: int = 200) -> Dict[str, Any]:
+    """
+    Replay cases through the mapping pipeline and measure it.
+
+    The adapter's CPIMS endpoints should point at a CPIMSStubServer. One
+    warm-up pass loads the reference data, so the timed pass measures
+    mapping only.
+
+    Args:
+        adapter: HelplineCPIMSAbuseAdapter to benchmark
+        cases: Helpline cases to replay (cycled to reach `total`)
+        total: Number of cases to time
+        forward: Also post each case to the (stub) CRS endpoint
+        alloc_sample: Number of cases to run under tracemalloc
+
+    Returns:
+        Dict with counts, cases_per_sec, latency and allocation figures, and
+        the values that had no CPIMS code during the timed pass
+    """
+    if not cases:
+        raise ValueError("No cases to benchmark")
+
+    replay = []
+    for i in range(total):
+        case = copy.deepcopy(cases[i % len(cases)])
+        case['id'] = f"{case.get('id', 'case')}-{i}"
+        replay.append(case)
+
+    adapter.warm_reference_data(wait=True)
+    for case in cases:
+        process_case(adapter, copy.deepcopy(case), forward=False)
+
+    reset_unmapped_counts()
+    statuses = {}
+    durations = []
+    started = time.perf_counter()
+    for case in replay:
+        case_started = time.perf_counter()
+        result = process_case(adapter, case, forward=forward)
+        durations.append(time.perf_counter() - case_started)
+        statuses[result.get('status')] = statuses.get(result.get('status'), 0) + 1
+    elapsed = time.perf_counter() - started
+    unmapped = unmapped_counts()
+
+    # Allocation figures come from a separate pass; tracemalloc slows everything down
+    peaks = []
+    retained = []
+    sample = replay[:max(0, min(alloc_sample, len(replay)))]
+    was_tracing = tracemalloc.is_tracing()
+    if sample and not was_tracing:
+        tracemalloc.start()
+    try:
+        for case in sample:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            process_case(adapter, case, forward=forward)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        if sample and not was_tracing:
+            tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'cases': total,
+        'statuses': statuses,
+        'seconds': round(elapsed, 3),
+        'cases_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.mean(durations) * 1000, 3),
+        'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 3),
+        'peak_alloc_kib_per_case': round(statistics.mean(peaks) / 1024, 1) if peaks else None,
+        'retained_bytes_per_case': round(statistics.mean(retained)) if retained else None,
+        'unmapped_codes': unmapped,
+    }
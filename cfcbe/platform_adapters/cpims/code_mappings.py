@@ -0,0 +1,190 @@
+# platform_adapters/cpims/code_mappings.py
+
+"""
+Helpline value -> CPIMS code mappings (sex, tribe, relationship, ...).
+
+The tables live in code_mappings.json next to this module. A deployment can
+add or override codes without a code change by pointing
+settings.CPIMS_CODE_MAPPINGS_FILE at a JSON file in the same format; its
+entries are merged over the built-in ones.
+
+Data file format:
+    {
+        "strict": ["risk_level"],
+        "mappings": {"sex": {"Male": "SMAL", ...}, ...}
+    }
+
+Keys are matched case-insensitively after stripping the helpline "^" prefix
+and collapsing whitespace. For "strict" types an unmapped value maps to ""
+so the caller can apply a safe default; other types pass the value through.
+
+Values that don't map are counted per mapping type (see unmapped_counts())
+so gaps in the tables show up under real traffic.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAPPINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code_mappings.json')
+
+# Distinct unmapped values tracked per process; later ones are counted per type as "(other)"
+MAX_TRACKED_UNMAPPED = 500
+
+
+def normalize_key(value: Any) -> str:
+    """Normalize a helpline value for lookup: no "^" prefix, single spaces, casefolded."""
+    return " ".join(str(value or "").lstrip("^").split()).casefold()
+
+
+class CodeMappingRegistry:
+    """Immutable, normalized view of the code mapping tables."""
+
+    def __init__(self, mappings: Dict[str, Dict[str, str]], strict: Optional[set] = None):
+        """
+        Build the registry.
+
+        Args:
+            mappings: Dict mapping type name to {helpline value: CPIMS code}
+            strict: Mapping types that return "" for unmapped values
+        """
+        self.mappings = MappingProxyType({
+            mapping_type: MappingProxyType({normalize_key(k): v for k, v in codes.items()})
+            for mapping_type, codes in mappings.items()
+        })
+        self.strict = frozenset(strict or ())
+
+    def lookup(self, value: Any, mapping_type: str) -> Optional[str]:
+        """
+        Look a value up.
+
+        Returns:
+            The CPIMS code, or None if the type or value isn't mapped
+        """
+        codes = self.mappings.get(mapping_type)
+        if codes is None:
+            return None
+        return codes.get(normalize_key(value))
+
+
+def _read_file(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get('mappings', {}), dict):
+        raise ValueError(f"{path} is not a code mapping file")
+    return data
+
+
+def load_registry(override_path: Optional[str] = None) -> CodeMappingRegistry:
+    """
+    Load the built-in tables and merge an override file over them.
+
+    Args:
+        override_path: Optional JSON file with extra or replacement codes
+
+    Returns:
+        CodeMappingRegistry
+    """
+    data = _read_file(DEFAULT_MAPPINGS_FILE)
+    mappings = {mapping_type: dict(codes) for mapping_type, codes in data['mappings'].items()}
+    strict = set(data.get('strict', []))
+
+    if override_path:
+        try:
+            override = _read_file(override_path)
+            for mapping_type, codes in override.get('mappings', {}).items():
+                mappings.setdefault(mapping_type, {}).update(codes)
+            strict.update(override.get('strict', []))
+            logger.info(f"Loaded CPIMS code mapping overrides from {override_path}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring CPIMS code mapping file {override_path}: {str(e)}")
+
+    return CodeMappingRegistry(mappings, strict)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+_unmapped = Counter()
+_unmapped_lock = threading.Lock()
+
+
+def get_registry() -> CodeMappingRegistry:
+    """Get the process-wide registry, loading it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_registry(getattr(settings, 'CPIMS_CODE_MAPPINGS_FILE', '') or None)
+    return _registry
+
+
+def reload_registry() -> CodeMappingRegistry:
+    """Reload the tables (e.g. after editing the override file)."""
+    global _registry
+    with _registry_lock:
+        _registry = None
+    return get_registry()
+
+
+def map_code(value: Any, mapping_type: str) -> Any:
+    """
+    Map a helpline value to a CPIMS code.
+
+    Args:
+        value: The helpline value (e.g. "^Female")
+        mapping_type: The mapping table to use (e.g. "sex")
+
+    Returns:
+        The CPIMS code. Unmapped values return "" for strict types and
+        unknown tables, and the original value otherwise.
+    """
+    registry = get_registry()
+    code = registry.lookup(value, mapping_type)
+    if code is not None:
+        return code
+
+    if mapping_type not in registry.mappings:
+        return ""
+
+    if normalize_key(value):
+        _record_unmapped(mapping_type, value)
+    return "" if mapping_type in registry.strict else value
+
+
+def _record_unmapped(mapping_type: str, value: Any) -> None:
+    key = (mapping_type, str(value).lstrip("^").strip())
+    with _unmapped_lock:
+        if key not in _unmapped and len(_unmapped) >= MAX_TRACKED_UNMAPPED:
+            key = (mapping_type, None)
+        first = key not in _unmapped
+        _unmapped[key] += 1
+    if first and key[1] is not None:
+        logger.warning(f"No CPIMS {mapping_type} code for {key[1]!r}")
+
+
+def unmapped_counts() -> Dict[str, Dict[str, int]]:
+    """
+    Get the unmapped values seen by this process.
+
+    Returns:
+        Dict mapping type to {value: count}; values past MAX_TRACKED_UNMAPPED
+        are counted under "(other)"
+    """
+    counts = {}
+    with _unmapped_lock:
+        for (mapping_type, value), count in _unmapped.items():
+            counts.setdefault(mapping_type, {})["(other)" if value is None else value] = count
+    return counts
+
+
+def reset_unmapped_counts() -> None:
+    with _unmapped_lock:
+        _unmapped.clear()
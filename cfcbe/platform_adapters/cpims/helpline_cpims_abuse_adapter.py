@@ -2,17 +2,170 @@
 
 import json
 import logging
+import os
 import requests
+from shared import http_client
 from typing import Any, Dict, List, Optional
 from django.http import HttpRequest, HttpResponse, JsonResponse
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from django.conf import settings
 
 from platform_adapters.base_adapter import BaseAdapter
+from platform_adapters.cpims.code_mappings import map_code
+from platform_adapters.cpims.reference_cache import CPIMSReferenceCache, ReferenceDataUnavailable
+from shared.category_matcher import CategoryMatcher
+from shared.circuit_breaker import get_breaker
+from shared.field_mapping import load_mapping
 
 logger = logging.getLogger(__name__)
 
+# ENDPOINT_CONFIG entry for the queue of cases waiting to be resent to CPIMS
+CPIMS_RETRY_ENDPOINT = 'cpims'
+
+# Helpline category names that differ from the CPIMS case category descriptions
+CATEGORY_ALIASES = {
+    "child labor": "Child Labour",
+    "child labour": "Child Labour",
+    "abuse": "Physical abuse/violence",
+    "physical abuse": "Physical abuse/violence",
+    "violence": "Physical abuse/violence",
+    "emotional abuse": "Emotional Abuse",
+    "sexual abuse": "Sexual Exploitation and abuse",
+    "sexual assault": "Sexual assault",
+    "sexual exploitation": "Sexual Exploitation and abuse",
+    "rape": "Defilement",
+    "defilement": "Defilement",
+    "neglect": "Neglect",
+    "drug abuse": "Drug and Substance Abuse",
+    "substance abuse": "Drug and Substance Abuse",
+    "drugs": "Drug and Substance Abuse",
+    "trafficking": "Trafficked child",
+    "child trafficking": "Trafficked child",
+    "fgm": "FGM",
+    "female genital mutilation": "FGM",
+    "child marriage": "Child Marriage",
+    "early marriage": "Child Marriage",
+    "abandoned": "Abandoned",
+    "abandonment": "Abandoned",
+    "street children": "Children on the streets",
+    "street child": "Children on the streets",
+    "orphan": "Orphaned Child",
+    "teenage pregnancy": "Child pregnancy",
+    "child pregnancy": "Child pregnancy",
+    "pregnancy": "Child pregnancy",
+    "birth registration": "Registration",
+    "registration": "Registration",
+    "missing child": "Missing Child (Lost & Found)",
+    "lost child": "Missing Child (Lost & Found)",
+    "custody": "Custody",
+    "truancy": "Child truancy",
+    "disability": "Child with disability",
+    "hiv": "Child Affected by HIV/AIDS",
+    "aids": "Child Affected by HIV/AIDS",
+    "incest": "Incest",
+    "sodomy": "Sodomy",
+    "child offender": "Child offender",
+    "out of school": "Child out of school",
+    "radicalization": "Child radicalization",
+    "child radicalization": "Child radicalization",
+    "abduction": "Abduction",
+    "online abuse": "Online Child Exploitation and Abuse",
+    "cyber abuse": "Online Child Exploitation and Abuse",
+    "delinquency": "Child Delinquency",
+}
+
+# Sub-category aliases, grouped by the CPIMS field they apply to
+SUB_CATEGORY_ALIASES = {
+    # Child labour aliases
+    "domestic work": "Domestic work / Exploitative household chores",
+    "agriculture": "Agriculture / Farming work (Milking, tilling, harvesting, weeding, scarring animals)",
+    "farming": "Agriculture / Farming work (Milking, tilling, harvesting, weeding, scarring animals)",
+    "jua kali": "Informal Sector (Jua kali)",
+    "informal": "Informal Sector (Jua kali)",
+    "transport": "Transport industry work (bodaboda, motor cycle taxis, bicycles, carts, matatus, boat rowing, touting)",
+    "bodaboda": "Transport industry work (bodaboda, motor cycle taxis, bicycles, carts, matatus, boat rowing, touting)",
+    "mining": "Mining and quarrying (Sand harvesting, ballast making)",
+    "quarrying": "Mining and quarrying (Sand harvesting, ballast making)",
+    "hotel": "Hotels, restaurants and bars work",
+    "restaurant": "Hotels, restaurants and bars work",
+
+    # Offender type aliases
+    "theft": "Theft",
+    "stealing": "Theft",
+    "robbery": "Robbery with Violence",
+    "burglary": "House breaking/Burglary",
+    "housebreaking": "House breaking/Burglary",
+    "assault": "Assault",
+    "murder": "Murder",
+    "rape": "Attempted Defilement/Rape",
+    "defilement": "Defilement",
+    "drugs": "Possession of narcotics",
+    "narcotics": "Possession of narcotics",
+    "peddling": "Peddling of drugs",
+
+    # Out of school reasons
+    "poverty": "Family Poverty",
+    "family poverty": "Family Poverty",
+    "disability": "Disability/Chronic Illness",
+    "illness": "Disability/Chronic Illness",
+    "work": "Engaged in child labour",
+    "labour": "Engaged in child labour",
+    "preference": "Childs Preference",
+    "caregiver": "Care Givers Decision",
+
+    # Custody
+    "guardianship": "Guardianship",
+    "disputed": "Disputed Custody",
+    "access": "Access denied",
+}
+
+def extract_name_part(full_name: str, part: str) -> str:
+    """
+    Extract part of a full name ("first", "surname" or "other" names).
+    """
+    if not full_name:
+        return ""
+    
+    name_parts = full_name.strip().split()
+    
+    if part == "first":
+        return name_parts[0] if name_parts else ""
+    elif part == "surname":
+        return name_parts[-1] if len(name_parts) > 1 else ""
+    elif part == "other":
+        return " ".join(name_parts[1:-1]) if len(name_parts) > 2 else ""
+    
+    return ""
+
+
+def format_api_date(timestamp_str: str) -> Optional[str]:
+    """
+    Format a Helpline API timestamp (Unix seconds as a string) as YYYY-MM-DD.
+    
+    Returns:
+        The date, the value itself if it isn't numeric, or None for "0" and
+        unparseable values (the mapping then uses the current date)
+    """
+    if not timestamp_str or timestamp_str == "0":
+        return None
+    try:
+        if timestamp_str.isdigit():
+            return datetime.fromtimestamp(int(timestamp_str)).strftime("%Y-%m-%d")
+        return str(timestamp_str)
+    except (ValueError, TypeError, AttributeError, OverflowError, OSError):
+        return None
+
+
+# Helpline case -> CPIMS payload, declared in cpims_case_mapping.json
+CPIMS_CASE_MAPPING = load_mapping(
+    os.path.join(os.path.dirname(__file__), 'cpims_case_mapping.json'),
+    functions={'map_code': map_code, 'name_part': extract_name_part, 'api_date': format_api_date},
+    name='cpims_case'
+)
+
+
 class HelplineCPIMSAbuseAdapter(BaseAdapter):
     """
     Adapter for the CPIMS (Child Protection Information Management System) platform integration ,.
@@ -30,12 +183,11 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         self.cpims_settings_endpoint = getattr(settings, 'CPIMS_SETTINGS_ENDPOINT_URL', 'https://test.cpims.net/api/v1/settings/')
         self.cpims_auth_token = getattr(settings, 'CPIMS_AUTH_TOKEN', '')
 
-        # Cache for data to avoid repeated API calls
-        self._geo_data_cache = None
-        self._category_data_cache = None
-        self._sub_category_caches = {}  # Dict to cache sub-category data by field_name
-        self._case_nature_cache = None
-        self._place_of_event_cache = None
+        # Reference data lives in the Django cache (shared across workers with a
+        # shared CACHES backend) and is refreshed in the background
+        self.reference_cache = CPIMSReferenceCache(self.cpims_auth_token)
+        self._geo_index = None  # Normalized lookup tables built from the geo data
+        self._category_matchers = {}  # field name -> (source list, CategoryMatcher)
 
         # Log token configuration status once at initialization
         logger.info(f"CPIMS adapter initialized - Auth configured: {bool(self.cpims_auth_token)}")
@@ -143,13 +295,14 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         from shared.models.standard_message import StandardMessage
         return StandardMessage(**message_dict)
     
-    def send_message(self, recipient_id: str, message_content: Any) -> Dict[str, Any]:
+    def send_message(self, recipient_id: str, message_content: Any, dry_run: bool = False) -> Dict[str, Any]:
         """
         Send case data to CPIMS CRS endpoint.
         
         Args:
             recipient_id: Target platform identifier (always "cpims")
             message_content: The message content (can be dict or StandardMessage)
+            dry_run: Map the case and return the payload without sending it
             
         Returns:
             Response from CPIMS
@@ -165,14 +318,21 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
                 metadata = message_content
         
         logger.info("Sending case to CPIMS CRS endpoint")
-        return self._send_to_cpims(metadata)
+        return self._send_to_cpims(metadata, dry_run=dry_run)
     
-    def _send_to_cpims(self, helpline_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _send_to_cpims(self, helpline_data: Dict[str, Any], dry_run: bool = False,
+                       queue_on_failure: bool = True) -> Dict[str, Any]:
         """
         Send case data to CPIMS CRS endpoint.
         
+        Fails fast while the CPIMS circuit breaker is open. When the retry
+        queue is enabled, cases that couldn't be delivered because CPIMS is
+        down or failing are queued and a "queued" status is returned.
+        
         Args:
             helpline_data: The helpline case data
+            dry_run: Map the case and return the payload without sending it
+            queue_on_failure: Queue the case for retry if CPIMS is unavailable
             
         Returns:
             Response from CPIMS
@@ -184,6 +344,20 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
             # Flatten the payload: all fields in cpims_payload go to the top level
             outgoing_payload = dict(cpims_payload)
 
+            if dry_run:
+                return {
+                    "status": "success",
+                    "message": "Case mapped for CPIMS (dry run, not sent)",
+                    "dry_run": True,
+                    "payload": outgoing_payload
+                }
+
+            breaker = get_breaker('cpims')
+            if not breaker.allow_request():
+                logger.warning("CPIMS circuit is open, not sending case")
+                return self._handle_unavailable(helpline_data, "CPIMS is unavailable (circuit open)",
+                                                queue_on_failure, retry_after=breaker.retry_after())
+
             # Log what's being sent to CPIMS
             logger.info(f"Sending case to CPIMS: {self.cpims_endpoint}")
             logger.info(f"Payload: {json.dumps(outgoing_payload, indent=2)}")
@@ -208,7 +382,7 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
                 logger.warning(f"SSL verification disabled by configuration for CPIMS: {self.cpims_endpoint}")
 
             # Send to CPIMS endpoint
-            response = requests.post(
+            response = http_client.post(
                 self.cpims_endpoint,
                 json=outgoing_payload,
                 headers=headers,
@@ -216,6 +390,7 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
                 verify=verify_ssl
             )
 
+            breaker.record_result(response.status_code)
             logger.info(f"CPIMS response status: {response.status_code}")
             logger.info(f"CPIMS response text: {response.text}")
 
@@ -253,6 +428,10 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
                     "payload_sent": outgoing_payload,
                     "note": "Check if CPIMS endpoint configuration is correct"
                 }
+            elif response.status_code >= 500:
+                logger.error(f"CPIMS API error: {response.status_code} - {response.text}")
+                return self._handle_unavailable(helpline_data, f"CPIMS API error: {response.status_code}",
+                                                queue_on_failure, details=response.text)
             else:
                 logger.error(f"CPIMS API error: {response.status_code} - {response.text}")
                 return {
@@ -262,6 +441,12 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
                     "payload_sent": outgoing_payload
                 }
 
+        except ReferenceDataUnavailable as e:
+            # Nothing was sent; the case can go once the reference data has loaded.
+            # A dry run is never queued, as the worker would deliver it for real
+            logger.warning(f"Case {helpline_data.get('id')} not sent to CPIMS: {str(e)}")
+            return self._handle_unavailable(helpline_data, str(e), queue_on_failure and not dry_run,
+                                            retry_after=self.reference_cache.config['COLD_RETRY_SECONDS'])
         except ValueError as e:
             # Handle category validation errors
             logger.warning(f"Case rejected due to invalid category: {str(e)}")
@@ -272,10 +457,8 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
             }
         except requests.RequestException as e:
             logger.exception(f"Network error sending to CPIMS: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"Network error: {str(e)}"
-            }
+            get_breaker('cpims').record_failure()
+            return self._handle_unavailable(helpline_data, f"Network error: {str(e)}", queue_on_failure)
         except Exception as e:
             logger.exception(f"Error sending to CPIMS: {str(e)}")
             return {
@@ -283,6 +466,183 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
                 "message": f"Error sending to CPIMS: {str(e)}"
             }
     
+    def _handle_unavailable(self, helpline_data: Dict[str, Any], error: str, queue_on_failure: bool,
+                            retry_after: Optional[float] = None, details: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the result for a case CPIMS couldn't take, queueing it for retry if enabled.
+
+        Args:
+            helpline_data: The helpline case data
+            error: What went wrong
+            queue_on_failure: Queue the case if the retry queue is enabled
+            retry_after: Seconds until a retry can succeed, when nothing was sent
+                (the circuit is open or reference data is still loading)
+            details: Response text from CPIMS, if any
+
+        Returns:
+            A "queued" result, or the error result
+        """
+        if queue_on_failure:
+            if self.retry_queue_enabled():
+                from endpoint_integration.message_router import MessageRouter
+
+                queued = MessageRouter().enqueue(CPIMS_RETRY_ENDPOINT, helpline_data,
+                                                 message_id=str(helpline_data.get("id", "")))
+                logger.warning(f"Queued case {helpline_data.get('id')} for CPIMS retry: {error}")
+                return {
+                    "status": "queued",
+                    "message": "CPIMS is unavailable, case queued for retry",
+                    "details": error,
+                    "outbound_id": queued['outbound_id']
+                }
+
+        result = {"status": "error", "message": error}
+        if details is not None:
+            result["details"] = details
+        if retry_after is not None:
+            # Nothing was sent; the retry worker waits for the circuit instead of counting an attempt
+            result.update(circuit_open=True, retry_after=retry_after)
+        return result
+
+    def retry_delivery(self, helpline_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resend a queued case (called by the outbound queue worker).
+
+        Args:
+            helpline_data: The helpline case data that was queued
+
+        Returns:
+            Delivery result; rejected cases are marked as not retryable
+        """
+        result = self._send_to_cpims(helpline_data, queue_on_failure=False)
+        if result.get("status") == "partial_success":
+            result = dict(result, status="success")
+        elif result.get("status") == "rejected":
+            result = dict(result, retryable=False)
+        result.pop("payload_sent", None)
+        return result
+
+    def retry_queue_enabled(self) -> bool:
+        """Whether the CPIMS retry queue (and so its worker) is enabled."""
+        config = getattr(settings, 'ENDPOINT_CONFIG', {}).get(CPIMS_RETRY_ENDPOINT, {})
+        return bool(config.get('retry_queue'))
+
+    def max_batch_cases(self, queued: bool) -> int:
+        """
+        Largest batch accepted in one request.
+
+        Batches forwarded within the request are limited to
+        CPIMS_BATCH_CONFIG['SYNC_MAX_CASES'] so they finish inside the worker
+        timeout; queued batches only to MAX_CASES.
+        """
+        batch_config = getattr(settings, 'CPIMS_BATCH_CONFIG', {}) or {}
+        if queued:
+            return int(batch_config.get('MAX_CASES', 1000))
+        return int(batch_config.get('SYNC_MAX_CASES', 50))
+
+    def queue_batch(self, cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate many Helpline cases and put the valid ones on the CPIMS outbound queue.
+
+        The cases are written with one bulk insert and delivered by
+        `manage.py process_outbound_queue` through retry_delivery(), so a
+        large back-fill returns at once instead of outliving the request
+        timeout. Mapping errors (e.g. unknown categories) surface on the
+        outbound message, which is marked failed without further retries.
+
+        Args:
+            cases: Helpline case payloads
+
+        Returns:
+            One result per case, in input order, with its index, case_id and,
+            for queued cases, the outbound_id
+        """
+        from endpoint_integration.models import OutboundMessage
+
+        config = getattr(settings, 'ENDPOINT_CONFIG', {}).get(CPIMS_RETRY_ENDPOINT, {})
+        results = []
+        queued = []
+        for index, case in enumerate(cases):
+            case_id = case.get('id') if isinstance(case, dict) else None
+            if not isinstance(case, dict) or not self.validate_request(case):
+                results.append({
+                    "status": "rejected",
+                    "message": "Invalid case data - missing required fields (id, narrative)",
+                    "reason": "invalid_case",
+                    "index": index,
+                    "case_id": case_id
+                })
+                continue
+
+            result = {"status": "queued", "message": "Case queued for CPIMS", "index": index, "case_id": case_id}
+            results.append(result)
+            queued.append((result, OutboundMessage(
+                endpoint=CPIMS_RETRY_ENDPOINT,
+                payload=case,
+                message_id=str(case_id),
+                max_attempts=config.get('max_attempts', 5)
+            )))
+
+        if queued:
+            created = OutboundMessage.objects.bulk_create([outbound for _, outbound in queued])
+            for (result, _), outbound in zip(queued, created):
+                result["outbound_id"] = outbound.pk
+            logger.info(f"Queued {len(created)} of {len(cases)} batch cases for CPIMS")
+
+        return results
+
+    def send_batch(self, cases: List[Dict[str, Any]], dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        Validate, map and forward many Helpline cases to CPIMS concurrently.
+
+        Each case goes through the same path as a single POST
+        (validate_request, then _send_to_cpims), on a pool bounded by
+        CPIMS_BATCH_CONFIG['MAX_CONCURRENCY'] and the HTTP pool size.
+        A failing case never affects the others.
+
+        Args:
+            cases: Helpline case payloads
+            dry_run: Map the cases and return the payloads without sending them
+
+        Returns:
+            One result per case, in input order, with its index and case_id
+            (the mapped payload is left out to keep the response small)
+        """
+        if not cases:
+            return []
+
+        batch_config = getattr(settings, 'CPIMS_BATCH_CONFIG', {}) or {}
+        pool_size = http_client.get_config()['POOL_MAXSIZE']
+        max_workers = max(1, min(int(batch_config.get('MAX_CONCURRENCY', 8)), pool_size, len(cases)))
+
+        # Load the reference lists once up front rather than on each worker's first case
+        self.warm_reference_data(wait=True)
+
+        def forward(index: int, case: Any) -> Dict[str, Any]:
+            case_id = case.get('id') if isinstance(case, dict) else None
+            try:
+                if not isinstance(case, dict) or not self.validate_request(case):
+                    result = {
+                        "status": "rejected",
+                        "message": "Invalid case data - missing required fields (id, narrative)",
+                        "reason": "invalid_case"
+                    }
+                else:
+                    result = self._send_to_cpims(case, dry_run=dry_run)
+            except Exception as e:
+                logger.exception(f"Error forwarding case {case_id} to CPIMS: {str(e)}")
+                result = {"status": "error", "message": f"Error sending to CPIMS: {str(e)}"}
+
+            result.pop("payload_sent", None)
+            return dict(result, index=index, case_id=case_id)
+
+        logger.info(f"Forwarding {len(cases)} cases to CPIMS with {max_workers} workers")
+        if max_workers == 1:
+            return [forward(index, case) for index, case in enumerate(cases)]
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cpims-batch') as executor:
+            return list(executor.map(forward, range(len(cases)), cases))
+
     def format_webhook_response(self, responses: List[Dict[str, Any]]) -> HttpResponse:
         """
         Format response to return to the Helpline webhook.
@@ -339,10 +699,14 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         if not ward_name:
             ward_name = get_safe(case_data, "reporter_location_2", "")
 
+        # Without the geo data every code would be None; the case is retried once it has loaded
+        if (county_name or constituency_name or ward_name) and not self._get_geo_index():
+            raise ReferenceDataUnavailable("CPIMS geo data is not loaded yet")
+
         # Look up area_code values from CPIMS geo API using type-specific lookups
         county_code = self._lookup_area_code_by_type(county_name, "GPRV") if county_name else None
-        constituency_code = self._lookup_area_code_by_type(constituency_name, "GDIS") if constituency_name else None
-        ward_code = self._lookup_area_code_by_type(ward_name, "GWRD") if ward_name else None
+        constituency_code = self._lookup_area_code_by_type(constituency_name, "GDIS", parent_code=county_code) if constituency_name else None
+        ward_code = self._lookup_area_code_by_type(ward_name, "GWRD", parent_code=constituency_code) if ward_name else None
         
         # Fallback to generic lookup if type-specific lookup fails
         if not county_code and county_name:
@@ -401,134 +765,34 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
             else:
                 return get_safe(case_data, reporter_field, default)
         
-        # Extract sex from client or reporter data
-        person_sex = get_person_data("contact_sex", "reporter_sex", "")
-        # Remove the "^" prefix if present (e.g., "^Female" -> "Female")
-        person_sex = person_sex.lstrip("^") if person_sex else ""
-        
-        # Extract full name from client or reporter data
-        person_fullname = get_person_data("contact_fullname", "reporter_fullname", "")
-        
-        # Extract phone from client or reporter
-        person_phone = get_person_data("contact_phone", "reporter_phone", "")
-        
-        # Extract email from client or reporter  
-        person_email = get_person_data("contact_email", "reporter_email", "")
-        
-        # Format timestamp helper
-        def format_api_timestamp(timestamp_str):
-            if not timestamp_str or timestamp_str == "0":
-                return self._get_current_date()
-            try:
-                # API timestamps appear to be Unix timestamps as strings
-                if timestamp_str.isdigit():
-                    from datetime import datetime
-                    dt = datetime.fromtimestamp(int(timestamp_str))
-                    return dt.strftime("%Y-%m-%d")
-                else:
-                    return str(timestamp_str)
-            except (ValueError, TypeError):
-                return self._get_current_date()
-        
-        # Map according to CPIMS format using API payload fields
-        cpims_payload = {
-            # Basic case information
-            "physical_condition": "PNRM",  # Default - not available in API payload
-            "county": county_code or "UNK",  # Use county code instead of name
-            "sub_county_code": constituency_code or "UNK",  # Use constituency code instead of name
-            "hh_economic_status": "UINC",  # Default - not available in API payload
-            "other_condition": "CHNM",  # Default - not available in API payload
-            "child_sex": self._map_code(person_sex, "sex") or "SMAL",
-            "reporter_first_name": self._extract_name(get_safe(case_data, "reporter_fullname", ""), "first") or "Unknown",
-            "ob_number": get_safe(case_data, "police_ob_no", ""),
-            "longitude": None,  # Not available in this API payload structure
-            "recommendation_bic": get_safe(case_data, "plan", ""),
-            "family_status": "FSLA",  # Default - not available in API payload
-            "reporter_other_names": self._extract_name(get_safe(case_data, "reporter_fullname", ""), "other"),
-            "case_date": format_api_timestamp(get_safe(case_data, "created_on", "")),
-            "child_other_names": self._extract_name(person_fullname, "other"),
-            "friends": None,
-            "organization_unit": "Helpline 116",
-            "case_reporter": self._map_code("Helpline 116", "case_reporter") or "CRHE",
-            "child_in_school": get_safe(client_data, "in_school", None) if has_client_data else None,
-            "tribe": get_safe(client_data, "contact_tribe", None) if has_client_data else get_safe(case_data, "reporter_tribe", None),
-            "sublocation": ward_code or "Unk",
-            "child_surname": self._extract_name(person_fullname, "surname") or "Unknown",
-            "case_village": get_safe(case_data, "reporter_location_5", "") or "Unknown Village",  # Lowest level location
-            "latitude": None,  # Not available in this API payload structure
-            "child_first_name": self._extract_name(person_fullname, "first") or "Unknown",
-            "reporter_telephone": get_safe(case_data, "reporter_phone", "0700000000"),
-            "court_number": "",
-            "verification_status": "001",  # Unverified status as default
-            "child_dob": format_api_timestamp(get_safe(client_data, "contact_dob", "")) if has_client_data else "2010-01-01",
-            "perpetrator_status": "PUNK" if not perpetrator_data else "PKNW",  # Unknown if no perpetrator data
-            "reporter_surname": self._extract_name(get_safe(case_data, "reporter_fullname", ""), "surname") or "Unknown",
-            "case_narration": get_safe(case_data, "narrative", "") or "Case reported through helpline",
-            "court_name": "",
-            "case_landmark": get_safe(case_data, "reporter_landmark", "") or ward_name or county_name or "Helpline Report",
-            "religion_type": None,
-            "long_term_needs": None ,
-            "immediate_needs": None,
-            "mental_condition": "MNRM",  # Default
-            "police_station": "",
-            "risk_level": self._map_code(get_safe(case_data, "priority", ""), "risk_level") or "RLMD",
-            "constituency": (constituency_code or "UNK")[:3],  # Max 3 chars  
-            "hobbies": None,
-            "reporter_email": get_safe(case_data, "reporter_email", ""),
-            "location": get_safe(case_data, "reporter_location_5", "") or ward_code or "Unk",
-            "reporter_county": county_code or "UNK",
-            "reporter_sub_county": constituency_code or "UNK", 
-            "reporter_ward": ward_code or "UNK",
-            "reporter_village": get_safe(case_data, "reporter_location_5", "") or "UNK",
-            "has_birth_cert": None,
-            "user": get_safe(case_data, "created_by", "helpline_user"),
-            "area_code": county_code or "UNK",
-            "case_category_id": category_item_id,
-            "case_category": category_info.get('cpims_description', ''),
-            "case_details": [{
-                "place_of_event": self._lookup_place_of_event(get_safe(case_data, "incidence_location", "")) or "PECE",
-                "category": category_item_id,
-                "sub_category": sub_category_id,
-                "nature_of_event": self._lookup_case_nature(get_safe(case_data, "cat_3", "")) or "OOEV",
-                "date_of_event": format_api_timestamp(get_safe(case_data, "incidence_when", ""))
-            }],
-
-            # Categories array
-            "categories": [{
-                "case_category": category_item_id,  # CPIMS code (e.g., "CCDF" for Defilement) - from case_category_id endpoint
-                "case_sub_category": sub_category_id,
-                "case_date_event": format_api_timestamp(get_safe(case_data, "incidence_when", "")),  # Date format YYYY-MM-DD
-                "case_nature": self._lookup_case_nature(get_safe(case_data, "cat_3", "")) or "OOEV",
-                "case_place_of_event": self._lookup_place_of_event(get_safe(case_data, "incidence_location", "")) or "PECE",  # From event_place_id endpoint, fallback to "Other Community Event"
-                "case_id": get_safe(case_data, "id", "")
-            }],
-            
-            # Perpetrators array
-            "perpetrators": [{
-                "first_name": self._extract_name(get_safe(perpetrator_data, "contact_fullname", ""), "first"),
-                "surname": self._extract_name(get_safe(perpetrator_data, "contact_fullname", ""), "surname"),
-                "relationship": self._map_code(get_safe(perpetrator_data, "relationship", ""), "relationship"),
-                "sex": self._map_code(get_safe(perpetrator_data, "contact_sex", "").lstrip("^"), "sex")
-            }] if perpetrator_data else [],
-            
-            # Siblings array (using client data if available)
-            "siblings": [{
-                "surname": self._extract_name(get_safe(client_data, "contact_fullname", ""), "surname"),
-                "dob": format_api_timestamp(get_safe(client_data, "contact_dob", "")),
-                "sex": self._map_code(get_safe(client_data, "contact_sex", "").lstrip("^"), "sex"),
-                "school_name": get_safe(client_data, "school_name", ""),
-                "other_names": self._extract_name(get_safe(client_data, "contact_fullname", ""), "other"),
-                "first_name": self._extract_name(get_safe(client_data, "contact_fullname", ""), "first"),
-                "class": get_safe(client_data, "school_level", ""),
-                "remarks": get_safe(client_data, "special_services", "")
-            }] if has_client_data else [],
-            
-            # Empty arrays for now
-            "parents": [{}, {}],
-            "caregivers": []
-        }
-
-        return cpims_payload
+        # The payload layout and defaults are declared in cpims_case_mapping.json;
+        # everything that needs the CPIMS reference data is resolved here first
+        return CPIMS_CASE_MAPPING({
+            'case': case_data,
+            'client': client_data,
+            'perpetrator': perpetrator_data,
+            'person': {
+                'sex': (get_person_data("contact_sex", "reporter_sex", "") or "").lstrip("^"),
+                'fullname': get_person_data("contact_fullname", "reporter_fullname", ""),
+            },
+            'geo': {
+                'county_code': county_code,
+                'constituency_code': constituency_code,
+                'ward_code': ward_code,
+                'county_name': county_name,
+                'ward_name': ward_name,
+            },
+            'category': {
+                'item_id': category_item_id,
+                'description': cpims_category_description,
+                'sub_category_id': sub_category_id,
+            },
+            'event': {
+                'place': self._lookup_place_of_event(get_safe(case_data, "incidence_location", "")),
+                'nature': self._lookup_case_nature(get_safe(case_data, "cat_3", "")),
+            },
+            'today': self._get_current_date(),
+        })
     
     def _format_timestamp(self, timestamp_str: str) -> str:
         """
@@ -565,114 +829,61 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         from datetime import datetime
         return datetime.now().strftime("%Y-%m-%d")
     
+    def _settings_url(self, field_name: str) -> str:
+        return f"{self.cpims_settings_endpoint}?field_name={field_name}"
+
+    def reference_sources(self) -> Dict[str, str]:
+        """
+        Reference lists used for every case, keyed by label, for cache warming.
+
+        Returns:
+            Dict mapping label to CPIMS URL
+        """
+        return {
+            'geo data': self.cpims_geo_endpoint,
+            'case categories': self._settings_url('case_category_id'),
+            'case nature': self._settings_url('case_nature_id'),
+            'place of event': self._settings_url('event_place_id'),
+        }
+
+    def warm_reference_data(self, wait: bool = False) -> None:
+        """
+        Load the reference lists into the shared cache if they aren't cached yet.
+
+        Args:
+            wait: Block until the fetches finish
+        """
+        self.reference_cache.warm(self.reference_sources(), wait=wait)
+
     def _get_geo_data(self) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch geographic data from CPIMS geo endpoint.
-        Uses caching to avoid repeated API calls.
+        Served from the shared reference cache. When nothing is cached yet
+        and the retry queue is enabled, the list is fetched in the background
+        and the case is queued until it has loaded; without the queue it is
+        fetched on the request thread (up to FETCH_TIMEOUT_SECONDS) so the
+        case can still be forwarded.
         
         Returns:
-            List of geographic areas or None if request fails
+            List of geographic areas or None if not available
         """
-        # Return cached data if available
-        if self._geo_data_cache is not None:
-            return self._geo_data_cache
-
-        try:
-            logger.info(f"Fetching geo data from CPIMS: {self.cpims_geo_endpoint}")
-
-            headers = {'Content-Type': 'application/json'}
-            
-            # Add authorization if token is available
-            if self.cpims_auth_token:
-                headers['Authorization'] = f"Token {self.cpims_auth_token}"
-            
-            # Handle SSL verification
-            disable_ssl = getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
-            verify_ssl = not disable_ssl
-            
-            response = requests.get(
-                self.cpims_geo_endpoint,
-                headers=headers,
-                timeout=30,
-                verify=verify_ssl
-            )
-            
-            logger.info(f"Geo API response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                geo_data = response.json()
-                # Cache the successful response
-                self._geo_data_cache = geo_data
-                logger.info(f"Successfully fetched {len(geo_data)} geographic areas")
-                return geo_data
-            else:
-                logger.error(f"Failed to fetch geo data: {response.status_code} - {response.text}")
-                return None
-                
-        except requests.RequestException as e:
-            logger.error(f"Network error fetching geo data: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching geo data: {str(e)}")
-            return None
+        return self.reference_cache.get(self.cpims_geo_endpoint, 'geo data',
+                                        block_if_cold=not self.retry_queue_enabled())
 
     def _get_category_data(self) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch category data from CPIMS settings endpoint.
-        Uses caching to avoid repeated API calls.
+        Served from the shared reference cache.
 
         Returns:
             List of case categories or None if request fails
         """
-        # Return cached data if available
-        if self._category_data_cache is not None:
-            return self._category_data_cache
-
-        try:
-            # Fetch case_category_id from CPIMS settings API
-            url = f"{self.cpims_settings_endpoint}?field_name=case_category_id"
-            logger.info(f"Fetching category data from CPIMS: {url}")
-
-            headers = {'Content-Type': 'application/json'}
-
-            # Add authorization if token is available
-            if self.cpims_auth_token:
-                headers['Authorization'] = f"Token {self.cpims_auth_token}"
-
-            # Handle SSL verification
-            disable_ssl = getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
-            verify_ssl = not disable_ssl
-
-            response = requests.get(
-                url,
-                headers=headers,
-                timeout=30,
-                verify=verify_ssl
-            )
-
-            logger.info(f"Category API response status: {response.status_code}")
-
-            if response.status_code == 200:
-                category_data = response.json()
-                # Cache the successful response
-                self._category_data_cache = category_data
-                logger.info(f"Successfully fetched {len(category_data)} case categories")
-                return category_data
-            else:
-                logger.error(f"Failed to fetch category data: {response.status_code} - {response.text}")
-                return None
-
-        except requests.RequestException as e:
-            logger.error(f"Network error fetching category data: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching category data: {str(e)}")
-            return None
+        return self.reference_cache.get(self._settings_url('case_category_id'), 'case categories', block_if_cold=True)
 
     def _get_sub_category_data(self, field_name: str) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch sub-category data from CPIMS settings endpoint for a specific field.
-        Uses caching to avoid repeated API calls.
+        Served from the shared reference cache.
 
         Args:
             field_name: The sub-category field name (e.g., 'child_labour_id', 'offender_id')
@@ -683,46 +894,106 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         if not field_name:
             return None
 
-        # Check if already cached
-        if field_name in self._sub_category_caches:
-            return self._sub_category_caches[field_name]
+        return self.reference_cache.get(self._settings_url(field_name), f"sub-categories for {field_name}", block_if_cold=True)
 
-        try:
-            url = f"{self.cpims_settings_endpoint}?field_name={field_name}"
-            logger.info(f"Fetching sub-category data from CPIMS: {url}")
+    def _get_category_matcher(self, field_name: str, items: List[Dict[str, Any]],
+                              aliases: Dict[str, str]) -> CategoryMatcher:
+        """
+        Get the matcher for a CPIMS settings list, building it once per fetch.
 
-            headers = {'Content-Type': 'application/json'}
-            if self.cpims_auth_token:
-                headers['Authorization'] = f"Token {self.cpims_auth_token}"
+        Args:
+            field_name: The settings field the list belongs to
+            items: The list from the reference cache
+            aliases: Alias table for the list
 
-            disable_ssl = getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
-            verify_ssl = not disable_ssl
+        Returns:
+            CategoryMatcher for the current list
+        """
+        cached = self._category_matchers.get(field_name)
+        if cached is not None and cached[0] is items:
+            return cached[1]
 
-            response = requests.get(url, headers=headers, timeout=30, verify=verify_ssl)
+        matcher = CategoryMatcher(items, aliases)
+        self._category_matchers[field_name] = (items, matcher)
+        return matcher
 
-            if response.status_code == 200:
-                sub_category_data = response.json()
-                self._sub_category_caches[field_name] = sub_category_data
-                logger.info(f"Successfully fetched {len(sub_category_data)} sub-categories for {field_name}")
-                return sub_category_data
-            else:
-                logger.error(f"Failed to fetch sub-category data for {field_name}: {response.status_code}")
-                return None
+    @staticmethod
+    def _normalize_area_name(area_name: Optional[str]) -> str:
+        return (area_name or '').lower().strip()
 
-        except requests.RequestException as e:
-            logger.error(f"Network error fetching sub-category data for {field_name}: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching sub-category data for {field_name}: {str(e)}")
+    def _get_geo_index(self) -> Optional[Dict[str, Dict[Any, Any]]]:
+        """
+        Get hash indexes over the CPIMS geo data, building them once per fetch.
+
+        Indexes (area lists keep the order of the geo data, so the first
+        entry is what a linear scan would have found):
+            by_name: normalized area name -> areas
+            by_name_type: (normalized area name, area_type_id) -> areas
+            by_code: area_code -> area
+            children: parent_area_id -> child areas
+
+        Returns:
+            Dict of indexes or None if no geo data is available
+        """
+        geo_data = self._get_geo_data()
+        if not geo_data:
             return None
 
-    def _lookup_area_code_by_type(self, area_name: str, area_type_id: str) -> Optional[str]:
+        if self._geo_index is not None and self._geo_index['source'] is geo_data:
+            return self._geo_index
+
+        by_name = {}
+        by_name_type = {}
+        by_code = {}
+        children = {}
+        for area in geo_data:
+            name = self._normalize_area_name(area.get('area_name'))
+            by_name.setdefault(name, []).append(area)
+            by_name_type.setdefault((name, area.get('area_type_id')), []).append(area)
+            if area.get('area_code') is not None:
+                by_code.setdefault(area['area_code'], area)
+            if area.get('parent_area_id') is not None:
+                children.setdefault(area['parent_area_id'], []).append(area)
+
+        self._geo_index = {
+            'source': geo_data,
+            'by_name': by_name,
+            'by_name_type': by_name_type,
+            'by_code': by_code,
+            'children': children,
+        }
+        logger.info(f"Indexed {len(geo_data)} geographic areas ({len(by_name)} distinct names)")
+        return self._geo_index
+
+    def _get_child_areas(self, area_code: str) -> List[Dict[str, Any]]:
+        """
+        Get the areas directly below an area (e.g. the wards of a constituency).
+
+        Args:
+            area_code: The parent's area_code
+
+        Returns:
+            List of child areas (empty if unknown)
+        """
+        geo_index = self._get_geo_index()
+        if not geo_index or not area_code:
+            return []
+
+        parent = geo_index['by_code'].get(area_code)
+        if not parent or parent.get('area_id') is None:
+            return []
+        return geo_index['children'].get(parent['area_id'], [])
+
+    def _lookup_area_code_by_type(self, area_name: str, area_type_id: str,
+                                  parent_code: Optional[str] = None) -> Optional[str]:
         """
         Look up area_code for a given area name and area_type_id from CPIMS geo data.
         
         Args:
             area_name: The name of the area to look up
             area_type_id: The area type ID to filter by (GPRV, GDIS, GWRD)
+            parent_code: area_code of the enclosing area, used to pick between
+                areas that share a name (optional)
             
         Returns:
             The area_code if found, None otherwise
@@ -730,22 +1001,25 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         if not area_name:
             return None
         
-        geo_data = self._get_geo_data()
-        if not geo_data:
+        geo_index = self._get_geo_index()
+        if not geo_index:
             logger.warning(f"No geo data available for lookup of: {area_name}")
             return None
         
-        # Search for the area by name and area_type_id (case-insensitive)
-        area_name_lower = area_name.lower().strip()
-        
-        for area in geo_data:
-            if (area.get('area_name', '').lower().strip() == area_name_lower and
-                area.get('area_type_id') == area_type_id):
-                area_code = area.get('area_code')
-                return area_code
+        # Case-insensitive match on name and area_type_id
+        matches = geo_index['by_name_type'].get((self._normalize_area_name(area_name), area_type_id))
+        if not matches:
+            logger.warning(f"Area '{area_name}' with type '{area_type_id}' not found in CPIMS geo data")
+            return None
 
-        logger.warning(f"Area '{area_name}' with type '{area_type_id}' not found in CPIMS geo data")
-        return None
+        if len(matches) > 1 and parent_code:
+            parent = geo_index['by_code'].get(parent_code)
+            parent_id = parent.get('area_id') if parent else None
+            for area in matches:
+                if parent_id is not None and area.get('parent_area_id') == parent_id:
+                    return area.get('area_code')
+
+        return matches[0].get('area_code')
     
     def _lookup_area_type_id(self, area_name: str) -> Optional[str]:
         """
@@ -760,18 +1034,15 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         if not area_name:
             return None
         
-        geo_data = self._get_geo_data()
-        if not geo_data:
+        geo_index = self._get_geo_index()
+        if not geo_index:
             logger.warning(f"No geo data available for lookup of: {area_name}")
             return None
         
-        # Search for the area by name (case-insensitive)
-        area_name_lower = area_name.lower().strip()
-        
-        for area in geo_data:
-            if area.get('area_name', '').lower().strip() == area_name_lower:
-                area_type_id = area.get('area_type_id')
-                return area_type_id
+        # Case-insensitive match on name
+        matches = geo_index['by_name'].get(self._normalize_area_name(area_name))
+        if matches:
+            return matches[0].get('area_type_id')
 
         logger.warning(f"Area '{area_name}' not found in CPIMS geo data")
         return None
@@ -789,18 +1060,15 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         if not area_name:
             return None
             
-        geo_data = self._get_geo_data()
-        if not geo_data:
+        geo_index = self._get_geo_index()
+        if not geo_index:
             logger.warning(f"No geo data available for lookup of: {area_name}")
             return None
             
-        # Search for the area by name (case-insensitive)
-        area_name_lower = area_name.lower().strip()
-        
-        for area in geo_data:
-            if area.get('area_name', '').lower().strip() == area_name_lower:
-                area_code = area.get('area_code')
-                return area_code
+        # Case-insensitive match on name
+        matches = geo_index['by_name'].get(self._normalize_area_name(area_name))
+        if matches:
+            return matches[0].get('area_code')
 
         logger.warning(f"Area '{area_name}' not found in CPIMS geo data")
         return None
@@ -815,6 +1083,10 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
             
         Returns:
             Category dict with item_id, cpims_description, has_sub_category, item_sub_category if found
+
+        Raises:
+            ReferenceDataUnavailable: If the CPIMS category list couldn't be loaded, so
+                the case is retried rather than rejected as having an invalid category
         """
         if not helpline_category:
             return None
@@ -823,96 +1095,19 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         category_data = self._get_category_data()
         if not category_data:
             logger.warning(f"No category data available for lookup of: {helpline_category}")
-            return None
-
-        # Common category aliases mapping
-        category_aliases = {
-            "child labor": "Child Labour",
-            "child labour": "Child Labour", 
-            "abuse": "Physical abuse/violence",
-            "physical abuse": "Physical abuse/violence",
-            "violence": "Physical abuse/violence",
-            "emotional abuse": "Emotional Abuse",
-            "sexual abuse": "Sexual Exploitation and abuse",
-            "sexual assault": "Sexual assault",
-            "sexual exploitation": "Sexual Exploitation and abuse",
-            "rape": "Defilement",
-            "defilement": "Defilement",
-            "neglect": "Neglect",
-            "drug abuse": "Drug and Substance Abuse",
-            "substance abuse": "Drug and Substance Abuse",
-            "drugs": "Drug and Substance Abuse",
-            "trafficking": "Trafficked child",
-            "child trafficking": "Trafficked child",
-            "fgm": "FGM",
-            "female genital mutilation": "FGM",
-            "child marriage": "Child Marriage",
-            "early marriage": "Child Marriage",
-            "abandoned": "Abandoned",
-            "abandonment": "Abandoned",
-            "street children": "Children on the streets",
-            "street child": "Children on the streets",
-            "orphan": "Orphaned Child",
-            "teenage pregnancy": "Child pregnancy",
-            "child pregnancy": "Child pregnancy",
-            "pregnancy": "Child pregnancy",
-            "birth registration": "Registration",
-            "registration": "Registration",
-            "missing child": "Missing Child (Lost & Found)",
-            "lost child": "Missing Child (Lost & Found)",
-            "custody": "Custody",
-            "truancy": "Child truancy",
-            "disability": "Child with disability",
-            "hiv": "Child Affected by HIV/AIDS",
-            "aids": "Child Affected by HIV/AIDS",
-            "incest": "Incest",
-            "sodomy": "Sodomy",
-            "child offender": "Child offender",
-            "out of school": "Child out of school",
-            "radicalization": "Child radicalization",
-            "child radicalization": "Child radicalization",
-            "abduction": "Abduction",
-            "online abuse": "Online Child Exploitation and Abuse",
-            "cyber abuse": "Online Child Exploitation and Abuse",
-            "delinquency": "Child Delinquency",
-        }
+            raise ReferenceDataUnavailable("CPIMS case categories could not be loaded")
 
-        helpline_category_lower = helpline_category.lower().strip()
-
-        # Try exact match first
-        for category in category_data:
-            if category.get('item_description', '').lower().strip() == helpline_category_lower:
-                return {
-                    'item_id': category.get('item_id'),
-                    'cpims_description': category.get('item_description'),
-                    'has_sub_category': bool(category.get('item_sub_category')),
-                    'item_sub_category': category.get('item_sub_category')
-                }
-
-        # Try alias mapping
-        mapped_category = category_aliases.get(helpline_category_lower)
-        if mapped_category:
-            for category in category_data:
-                if category.get('item_description', '').lower().strip() == mapped_category.lower().strip():
-                    logger.info(f"Matched category '{helpline_category}' via alias to '{mapped_category}'")
-                    return {
-                        'item_id': category.get('item_id'),
-                        'cpims_description': category.get('item_description'),
-                        'has_sub_category': bool(category.get('item_sub_category')),
-                        'item_sub_category': category.get('item_sub_category')
-                    }
-
-        # Try partial matching (e.g., "Labour" in "Child Labour")
-        for category in category_data:
-            item_desc = category.get('item_description', '').lower()
-            if helpline_category_lower in item_desc or item_desc in helpline_category_lower:
-                logger.info(f"Matched category '{helpline_category}' via partial match to '{category.get('item_description')}'")
-                return {
-                    'item_id': category.get('item_id'),
-                    'cpims_description': category.get('item_description'),
-                    'has_sub_category': bool(category.get('item_sub_category')),
-                    'item_sub_category': category.get('item_sub_category')
-                }
+        match = self._get_category_matcher('case_category_id', category_data, CATEGORY_ALIASES).match(helpline_category)
+        if match:
+            category = match.item
+            if match.method != 'exact':
+                logger.info(f"Matched category '{helpline_category}' via {match.method} match to '{category.get('item_description')}' (score {match.score})")
+            return {
+                'item_id': category.get('item_id'),
+                'cpims_description': category.get('item_description'),
+                'has_sub_category': bool(category.get('item_sub_category')),
+                'item_sub_category': category.get('item_sub_category')
+            }
 
         logger.warning(f"Helpline category '{helpline_category}' not found in CPIMS API data")
         return None
@@ -945,85 +1140,19 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         """
         if not sub_category_name or not field_name:
             return None
-            
-        # Context-aware aliases based on field type
-        sub_category_aliases = {
-            # Child labour aliases
-            "domestic work": "Domestic work / Exploitative household chores",
-            "agriculture": "Agriculture / Farming work (Milking, tilling, harvesting, weeding, scarring animals)",
-            "farming": "Agriculture / Farming work (Milking, tilling, harvesting, weeding, scarring animals)",
-            "jua kali": "Informal Sector (Jua kali)",
-            "informal": "Informal Sector (Jua kali)",
-            "transport": "Transport industry work (bodaboda, motor cycle taxis, bicycles, carts, matatus, boat rowing, touting)",
-            "bodaboda": "Transport industry work (bodaboda, motor cycle taxis, bicycles, carts, matatus, boat rowing, touting)",
-            "mining": "Mining and quarrying (Sand harvesting, ballast making)",
-            "quarrying": "Mining and quarrying (Sand harvesting, ballast making)",
-            "hotel": "Hotels, restaurants and bars work",
-            "restaurant": "Hotels, restaurants and bars work",
-            
-            # Offender type aliases
-            "theft": "Theft",
-            "stealing": "Theft",
-            "robbery": "Robbery with Violence",
-            "burglary": "House breaking/Burglary",
-            "housebreaking": "House breaking/Burglary",
-            "assault": "Assault",
-            "murder": "Murder",
-            "rape": "Attempted Defilement/Rape",
-            "defilement": "Defilement",
-            "drugs": "Possession of narcotics",
-            "narcotics": "Possession of narcotics",
-            "peddling": "Peddling of drugs",
-            
-            # Out of school reasons
-            "poverty": "Family Poverty",
-            "family poverty": "Family Poverty",
-            "disability": "Disability/Chronic Illness",
-            "illness": "Disability/Chronic Illness",
-            "work": "Engaged in child labour",
-            "labour": "Engaged in child labour",
-            "preference": "Childs Preference",
-            "caregiver": "Care Givers Decision",
-            
-            # Custody
-            "guardianship": "Guardianship",
-            "disputed": "Disputed Custody",
-            "access": "Access denied",
-        }
-        
+
         # Fetch data for this sub-category type
         sub_category_data = self._get_sub_category_data(field_name)
         if not sub_category_data:
             logger.warning(f"No data available for sub-category field: {field_name}")
             return None
-            
-        # Search for the sub-category by name (case-insensitive)
-        name_lower = sub_category_name.lower().strip()
-        
-        # Try exact match first
-        for item in sub_category_data:
-            # Check if name matches description (case-insensitive)
-            if item.get('item_description', '').lower().strip() == name_lower:
-                return item.get('item_id')
-            # Also check if the input IS the ID itself
-            if item.get('item_id', '') == sub_category_name:
-                 return item.get('item_id')
-        
-        # Try alias mapping
-        mapped_sub_category = sub_category_aliases.get(name_lower)
-        if mapped_sub_category:
-            for item in sub_category_data:
-                if item.get('item_description', '').lower().strip() == mapped_sub_category.lower().strip():
-                    logger.info(f"Matched sub-category '{sub_category_name}' via alias to '{mapped_sub_category}'")
-                    return item.get('item_id')
-        
-        # Try partial matching
-        for item in sub_category_data:
-            item_desc = item.get('item_description', '').lower()
-            if name_lower in item_desc or item_desc in name_lower:
-                logger.info(f"Matched sub-category '{sub_category_name}' via partial match to '{item.get('item_description')}'")
-                return item.get('item_id')
-                
+
+        match = self._get_category_matcher(field_name, sub_category_data, SUB_CATEGORY_ALIASES).match(sub_category_name)
+        if match:
+            if match.method not in ('exact', 'id'):
+                logger.info(f"Matched sub-category '{sub_category_name}' via {match.method} match to '{match.item.get('item_description')}' (score {match.score})")
+            return match.item.get('item_id')
+
         logger.warning(f"Sub-category '{sub_category_name}' not found in {field_name}")
         return None
 
@@ -1031,43 +1160,19 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         """
         Fetch case nature data from CPIMS settings endpoint.
         """
-        if self._case_nature_cache is not None:
-            return self._case_nature_cache
-
-        return self._fetch_settings_data("case_nature_id", "_case_nature_cache")
+        return self._fetch_settings_data("case_nature_id")
 
     def _get_place_of_event_data(self) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch place of event data from CPIMS settings endpoint.
         """
-        if self._place_of_event_cache is not None:
-            return self._place_of_event_cache
+        return self._fetch_settings_data("event_place_id")
 
-        return self._fetch_settings_data("event_place_id", "_place_of_event_cache")
-
-    def _fetch_settings_data(self, field_name: str, cache_attr: str) -> Optional[List[Dict[str, Any]]]:
+    def _fetch_settings_data(self, field_name: str) -> Optional[List[Dict[str, Any]]]:
         """
-        Generic method to fetch settings data.
+        Generic method to fetch settings data through the shared reference cache.
         """
-        try:
-            url = f"{self.cpims_settings_endpoint}?field_name={field_name}"
-            headers = {'Content-Type': 'application/json'}
-            if self.cpims_auth_token:
-                headers['Authorization'] = f"Token {self.cpims_auth_token}"
-
-            disable_ssl = getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
-            response = requests.get(url, headers=headers, timeout=30, verify=not disable_ssl)
-
-            if response.status_code == 200:
-                data = response.json()
-                setattr(self, cache_attr, data)
-                return data
-            else:
-                logger.error(f"Failed to fetch {field_name}: {response.status_code}")
-                return None
-        except Exception as e:
-            logger.error(f"Error fetching {field_name}: {str(e)}")
-            return None
+        return self.reference_cache.get(self._settings_url(field_name), field_name, block_if_cold=True)
 
     def _lookup_case_nature(self, nature_description: str) -> Optional[str]:
         """Look up item_id for case nature."""
@@ -1140,24 +1245,15 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         Returns:
             The requested part of the name
         """
-        if not full_name:
-            return ""
-        
-        name_parts = full_name.strip().split()
-        
-        if part == "first":
-            return name_parts[0] if name_parts else ""
-        elif part == "surname":
-            return name_parts[-1] if len(name_parts) > 1 else ""
-        elif part == "other":
-            return " ".join(name_parts[1:-1]) if len(name_parts) > 2 else ""
-        
-        return ""
+        return extract_name_part(full_name, part)
     
     def _map_code(self, value: str, mapping_type: str) -> str:
         """
         Map helpline values to CPIMS codes.
         
+        The tables are compiled once in platform_adapters.cpims.code_mappings.
+        Case category and case nature are looked up from the CPIMS API instead.
+        
         Args:
             value: The value to map
             mapping_type: The type of mapping to use
@@ -1165,210 +1261,4 @@ class HelplineCPIMSAbuseAdapter(BaseAdapter):
         Returns:
             The mapped CPIMS code
         """
-        # Sex codes
-        sex_codes = {
-            "Male": "SMAL",
-            "Female": "SFEM", 
-            "Intersex": "SINT"
-        }
-        
-        # Yes/No codes
-        yes_no_codes = {
-            "No": "ANNO",
-            "Yes": "AYES"  # Assuming this exists
-        }
-        
-        # Economic status codes
-        economic_status_codes = {
-            "High Income (apparent)": "HINC",
-            "Middle Income (apparent)": "MINC", 
-            "Low Income (apparent)": "LINC",
-            "Unknown": "UINC"
-        }
-        
-        # Physical condition codes
-        physical_condition_codes = {
-            "Appears Normal": "PNRM",
-            "Challenged (unverified)": "PHAU",
-            "Challenged (verified)": "PHAV"
-        }
-        
-        # Mental condition codes
-        mental_condition_codes = {
-            "Appears Normal": "MNRM",
-            "Challenged (verified)": "MCAV",
-            "Challenged (unverified)": "MCAU"
-        }
-        
-        # Other condition codes
-        other_condition_codes = {
-            "Appears Normal": "CHNM",
-            "Chronic": "CHRO"
-        }
-        
-        # Risk level codes
-        risk_level_codes = {
-            "Low": "RLLW",
-            "Medium": "RLMD", 
-            "High": "RLHG",
-            "1": "RLLW",
-            "2": "RLMD", 
-            "3": "RLHG"
-        }
-        
-        # Case reporter codes - sorted A-Z
-        case_reporter_codes = {
-            "Chief": "CRCH",
-            "Court": "CRCO",
-            "Diplomatic missions": "CRDM",
-            "Father": "CRFA",
-            "Helpline 116": "CRHE",
-            "Helpline 1195": "CRHL",
-            "Immigration": "CRIM",
-            "Labour Officers": "CRLO",
-            "Ministry of Tourism": "CRMT",
-            "Mother": "CRMO",
-            "Other Government agency": "CROG",
-            "Other non-relative(s)": "CRON",
-            "Other relative(s)": "CROR",
-            "Police": "CRPO",
-            "Probation": "CRPR",
-            "Self": "CRSF",
-            "Service Providers": "CRSP",
-            "Trade Union": "CRTU"
-        }
-        
-        # Family status codes - sorted A-Z
-        family_status_codes = {
-            "Caregiver is chronically ill": "FSCI",
-            "Caregiver is disabled": "FSCD",
-            "Caregiver is more than 60 years old": "FSOL",
-            "In institution with mother (has child mother)": "RSMI",
-            "Informal Guardian": "CCIG",
-            "Living alone": "FSLA",
-            "Living in child-headed household (no adult caregiver)": "FSHD",
-            "Living in children home": "FSCH",
-            "Living in poor household (destitute)": "FSPH",
-            "Living on the Street": "CCLS",
-            "Living with a friend": "FSLF",
-            "Living with adoptive parents": "CCAP",
-            "Living with biological parents": "CCBP",
-            "Living with father only": "CCFO",
-            "Living with mother only": "CCMO",
-            "Orphaned - father dead": "FSOF",
-            "Orphaned - mother dead": "FSOM",
-            "Other Family": "CCOF"
-        }
-        
-        # Tribe codes - sorted A-Z
-        tribe_codes = {
-            "American": "TRAM",
-            "European": "TREU",
-            "Kalenjin": "TRKE",
-            "Kamba": "TRKA",
-            "Kenyan Somali": "TRKS",
-            "Kikuyu": "TRKI",
-            "Kisii": "TRII",
-            "Kuria": "TRKU",
-            "Luhya": "TRLU",
-            "Luo": "TRLO",
-            "Maasai": "TRAA",
-            "Mbeere": "TRMB",
-            "Meru": "TRME",
-            "Mijikenda": "TRMJ",
-            "Nubi": "TRNU",
-            "Orma": "TROR",
-            "Pokomo": "TRPO",
-            "Rendile": "TRRE",
-            "Swahili": "TRSW",
-            "Taita": "TRTT"
-        }
-        
-        # Religion codes
-        religion_codes = {
-            "Christian": "RECH",
-            "Muslim": "REMU",
-            "Buddhist": "REBU",
-            "Atheist": "REAT",
-            "Other": "REOT"
-        }
-        
-        # Perpetrator status codes
-        perpetrator_status_codes = {
-            "Known": "PKNW",
-            "Unknown": "PUNK", 
-            "Self": "PSSL",
-            "Not Applicable": "PSNA"
-        }
-        
-        # Note: Case category codes and case nature codes are now fetched dynamically
-        # from CPIMS API via _lookup_category_info() and _lookup_case_nature()
-        # No hardcoded mappings needed here
-        
-        # Relationship codes (for perpetrators) - sorted A-Z
-        relationship_codes = {
-            "Commercial Drivers": "RCCD",
-            "Employer": "RCEP",
-            "Friend": "RCFD",
-            "Health care worker": "RCHW",
-            "Local Influentials": "RCLI",
-            "Neighbour": "RCNB",
-            "Other family member": "ROFM",
-            "Other Humanitarian Worker": "ROHW",
-            "Other non-family": "RCOT",
-            "Other person in positions of authority": "ROPA",
-            "Other Primary Care Giver/Guardian": "ROCG",
-            "Parent": "RCPT",
-            "Religious Leader": "RCRL",
-            "Security Guards": "RCSG",
-            "Security Personnel/Disciplined force member": "RCSP",
-            "Strangers": "RCST",
-            "Teacher": "RCTC",
-            "Tourist": "RCTR",
-            "Unknown/Not Recorded": "RCUN"
-        }
-        
-        # Select the appropriate mapping
-        mapping_dict = {}
-        if mapping_type == "sex":
-            mapping_dict = sex_codes
-        elif mapping_type == "yes_no":
-            mapping_dict = yes_no_codes
-        elif mapping_type == "economic_status":
-            mapping_dict = economic_status_codes
-        elif mapping_type == "physical_condition":
-            mapping_dict = physical_condition_codes
-        elif mapping_type == "mental_condition":
-            mapping_dict = mental_condition_codes
-        elif mapping_type == "other_condition":
-            mapping_dict = other_condition_codes
-        elif mapping_type == "risk_level":
-            mapping_dict = risk_level_codes
-        elif mapping_type == "case_reporter":
-            mapping_dict = case_reporter_codes
-        elif mapping_type == "family_status":
-            mapping_dict = family_status_codes
-        elif mapping_type == "tribe":
-            mapping_dict = tribe_codes
-        elif mapping_type == "religion":
-            mapping_dict = religion_codes
-        elif mapping_type == "perpetrator_status":
-            mapping_dict = perpetrator_status_codes
-        elif mapping_type == "relationship":
-            mapping_dict = relationship_codes
-        # Note: case_category and case_nature are fetched via API, not hardcoded mappings
-        
-        # Normalize incoming value (remove caret prefixes and trim whitespace)
-        normalized_value = (value or "").lstrip("^").strip()
-
-        # If no mapping dict found (e.g., for case_category/case_nature which use API), return empty
-        if not mapping_dict:
-            return ""
-
-        # For risk_level, enforce strict mapping to ensure CPIMS codes are emitted
-        if mapping_type == "risk_level":
-            # Return empty string if not found so caller can apply a safe default
-            return mapping_dict.get(normalized_value, "")
-
-        # Return the mapped value or the original value if not found (non-strict)
-        return mapping_dict.get(normalized_value, value)
\ No newline at end of file
+        return map_code(value, mapping_type)
\ No newline at end of file
@@ -0,0 +1,317 @@
+# platform_adapters/cpims/reference_cache.py
+
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from shared import http_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'TTL_SECONDS': 6 * 60 * 60,
+    'LOCAL_RECHECK_SECONDS': 60,
+    'COLD_WAIT_SECONDS': 0,
+    'COLD_RETRY_SECONDS': 30,  # How long a case that needed uncached data waits before it is retried
+    'FETCH_TIMEOUT_SECONDS': 30,
+    'REFRESH_LOCK_SECONDS': 120,
+}
+
+
+class ReferenceDataUnavailable(Exception):
+    """Raised when reference data a case needs hasn't been loaded yet."""
+
+
+class CPIMSReferenceCache:
+    """
+    Shared cache for CPIMS reference data (geo areas and settings lists).
+
+    Entries live in the Django cache, so workers share one copy when CACHES
+    is a shared backend (the database cache by default); under a per-process
+    backend such as LocMemCache each process loads its own. Each process
+    also keeps the decoded lists in memory, re-reading the shared entry
+    every LOCAL_RECHECK_SECONDS to pick up refreshes made elsewhere.
+
+    A list that isn't cached yet is fetched in the background and get()
+    returns None, waiting at most COLD_WAIT_SECONDS; callers that can't do
+    without it raise ReferenceDataUnavailable rather than guess.
+
+    Entries older than TTL_SECONDS are served as-is while a background
+    thread revalidates them with If-None-Match / If-Modified-Since, so
+    an unchanged list costs a 304 rather than a full download. A failed
+    refresh keeps serving the previous data.
+    """
+
+    CACHE_KEY_PREFIX = 'cpims_reference'
+
+    # Shared by all instances in the process
+    _local = {}  # cache key -> (entry, time read from the shared cache)
+    _lock = threading.Lock()
+    _fetch_locks = {}
+    _refreshing = set()
+    _executor = None
+
+    def __init__(self, auth_token: Optional[str] = None):
+        """
+        Initialize the CPIMSReferenceCache.
+
+        Args:
+            auth_token: CPIMS API token (defaults to settings.CPIMS_AUTH_TOKEN)
+        """
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(getattr(settings, 'CPIMS_REFERENCE_CACHE_CONFIG', {}) or {})
+        self.auth_token = getattr(settings, 'CPIMS_AUTH_TOKEN', '') if auth_token is None else auth_token
+
+    def _cache_key(self, url: str) -> str:
+        return f"{self.CACHE_KEY_PREFIX}:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+    def _is_stale(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry['fetched_at'] > self.config['TTL_SECONDS']
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            local = self._local.get(key)
+        if local and now - local[1] < self.config['LOCAL_RECHECK_SECONDS']:
+            return local[0]
+
+        # The small metadata record says whether our decoded copy is current,
+        # so the (large) data is only read from the shared cache when it changed
+        meta = cache.get(f"{key}:meta")
+        if meta is None:
+            if not local:
+                return None
+            # The shared cache was cleared or evicted; republish what we have
+            self._write(key, local[0])
+            return local[0]
+
+        if local and local[0]['version'] == meta['version']:
+            entry = dict(local[0], **meta)
+        else:
+            data = cache.get(f"{key}:data")
+            if data is None or data.get('version') != meta['version']:
+                return local[0] if local else None
+            entry = dict(meta, data=data['data'])
+
+        with self._lock:
+            self._local[key] = (entry, now)
+        return entry
+
+    def _write(self, key: str, entry: Dict[str, Any], data_changed: bool = True) -> None:
+        meta = {k: entry.get(k) for k in ('version', 'etag', 'last_modified', 'fetched_at')}
+        if data_changed:
+            cache.set(f"{key}:data", {'version': entry['version'], 'data': entry['data']}, timeout=None)
+        cache.set(f"{key}:meta", meta, timeout=None)
+        with self._lock:
+            self._local[key] = (entry, time.time())
+
+    def get(self, url: str, label: str, block_if_cold: bool = False) -> Optional[Any]:
+        """
+        Get reference data, refreshing it in the background when stale.
+
+        Args:
+            url: The CPIMS endpoint URL for the list
+            label: Human-readable name used in logs
+            block_if_cold: Fetch synchronously when nothing is cached (for
+                small lists); otherwise the fetch runs in the background and
+                the call waits at most COLD_WAIT_SECONDS
+
+        Returns:
+            The decoded reference data, or None if it isn't available yet
+        """
+        key = self._cache_key(url)
+        entry = self._read(key)
+
+        if entry is not None:
+            if self._is_stale(entry):
+                self.refresh_async(url, label)
+            return entry['data']
+
+        if block_if_cold:
+            self.refresh(url, label)
+        else:
+            logger.warning(f"CPIMS {label} not cached yet, fetching in the background")
+            future = self.refresh_async(url, label)
+            wait = self.config['COLD_WAIT_SECONDS']
+            if future is not None and wait:
+                try:
+                    future.result(timeout=wait)
+                except Exception:
+                    pass
+
+        entry = self._read(key)
+        return entry['data'] if entry else None
+
+    def get_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached entry for a list with its version and validators.
+
+        Returns:
+            Dict with data, version, etag, last_modified and fetched_at, or None
+        """
+        return self._read(self._cache_key(url))
+
+    def seed(self, url: str, entry: Dict[str, Any]) -> bool:
+        """
+        Store an entry loaded from elsewhere (e.g. a snapshot) if none is cached.
+
+        The entry keeps its original fetched_at, so an old one is still
+        revalidated in the background once it passes the TTL.
+
+        Args:
+            url: The CPIMS endpoint URL for the list
+            entry: Dict with data, version, etag, last_modified and fetched_at
+
+        Returns:
+            True if the entry was stored
+        """
+        key = self._cache_key(url)
+        if not entry or self._read(key) is not None:
+            return False
+
+        self._write(key, {
+            'data': entry['data'],
+            'version': entry['version'],
+            'etag': entry.get('etag'),
+            'last_modified': entry.get('last_modified'),
+            'fetched_at': entry.get('fetched_at') or 0,
+        })
+        return True
+
+    def _get_fetch_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def refresh(self, url: str, label: str) -> bool:
+        """
+        Fetch or revalidate one reference list and store it in the shared cache.
+
+        Args:
+            url: The CPIMS endpoint URL for the list
+            label: Human-readable name used in logs
+
+        Returns:
+            True if the cache holds current data after the call
+        """
+        key = self._cache_key(url)
+
+        with self._get_fetch_lock(key):
+            # Another thread may have refreshed while we waited
+            current = self._read(key)
+            if current is not None and not self._is_stale(current):
+                return True
+
+            headers = {'Content-Type': 'application/json'}
+            if self.auth_token:
+                headers['Authorization'] = f"Token {self.auth_token}"
+            if current is not None:
+                if current.get('etag'):
+                    headers['If-None-Match'] = current['etag']
+                if current.get('last_modified'):
+                    headers['If-Modified-Since'] = current['last_modified']
+
+            try:
+                logger.info(f"Fetching {label} from CPIMS: {url}")
+                response = http_client.get(
+                    url,
+                    headers=headers,
+                    timeout=self.config['FETCH_TIMEOUT_SECONDS'],
+                    verify=not getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
+                )
+
+                if response.status_code == 304 and current is not None:
+                    self._write(key, dict(current, fetched_at=time.time()), data_changed=False)
+                    logger.info(f"CPIMS {label} unchanged (304)")
+                    return True
+
+                if response.status_code == 200:
+                    data = response.json()
+                    self._write(key, {
+                        'data': data,
+                        'version': hashlib.sha1(response.content).hexdigest(),
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'fetched_at': time.time(),
+                    })
+                    count = len(data) if hasattr(data, '__len__') else 0
+                    logger.info(f"Cached {count} CPIMS {label} entries")
+                    return True
+
+                logger.error(f"Failed to fetch {label}: {response.status_code} - {response.text}")
+            except requests.RequestException as e:
+                logger.error(f"Network error fetching {label}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error fetching {label}: {str(e)}")
+
+            return False
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cpims-reference')
+            return cls._executor
+
+    def refresh_async(self, url: str, label: str):
+        """
+        Refresh a list in the background unless a refresh is already running.
+
+        A cache.add() lock keeps workers sharing the cache from all
+        refreshing the same list at once.
+
+        Returns:
+            The Future for the refresh, or None if one is already in progress
+        """
+        key = self._cache_key(url)
+        with self._lock:
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+
+        lock_key = f"{key}:refreshing"
+        if not cache.add(lock_key, 1, timeout=self.config['REFRESH_LOCK_SECONDS']):
+            with self._lock:
+                self._refreshing.discard(key)
+            return None
+
+        def run():
+            try:
+                return self.refresh(url, label)
+            finally:
+                cache.delete(lock_key)
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        return self._get_executor().submit(run)
+
+    def warm(self, sources: Dict[str, str], wait: bool = False) -> None:
+        """
+        Load reference lists that aren't cached yet, in the background.
+
+        Args:
+            sources: Dict mapping label to URL
+            wait: Block until the fetches finish (for management commands)
+        """
+        futures = []
+        for label, url in sources.items():
+            entry = self._read(self._cache_key(url))
+            if entry is None or self._is_stale(entry):
+                futures.append(self.refresh_async(url, label))
+
+        if wait:
+            for future in futures:
+                if future is not None:
+                    future.result()
+
+    @classmethod
+    def clear_local(cls) -> None:
+        """Drop this process's in-memory copies (the shared cache is untouched)."""
+        with cls._lock:
+            cls._local.clear()
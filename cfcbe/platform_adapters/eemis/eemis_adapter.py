@@ -1,7 +1,7 @@
 # platform_adapters/eemis/eemis_adapter.py
 
 import json
-import requests
+from shared import http_client
 import logging
 from django.http import HttpResponse, JsonResponse
 from platform_adapters.base_adapter import BaseAdapter
@@ -101,7 +101,7 @@ class EEMISAdapter(BaseAdapter):
                 }
             
             # Make request to EEMIS API
-            response = requests.get(
+            response = http_client.get(
                 f"{self.EEMIS_API_URL}{national_id}",
                 headers={
                     'Content-Type': 'application/json',
@@ -1,7 +1,7 @@
 # platform_adapters/mamacare/mamacare_adapter.py
 
 import json
-import requests
+from shared import http_client
 import logging
 import uuid
 import base64
@@ -221,7 +221,7 @@ class MamaCareAdapter(BaseAdapter):
                 "Authorization": f"Bearer {access_token}"
             }
             
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             
             if response.status_code == 200:
                 media_url = response.json().get('url')
@@ -366,7 +366,7 @@ class MamaCareAdapter(BaseAdapter):
             # Make API request
             logger.info(f"Sending MamaCare message to {recipient_id}")
             
-            response = requests.post(url, json=request_body, headers=headers)
+            response = http_client.post(url, json=request_body, headers=headers)
             
             # Check response
             if response.status_code == 200:
@@ -500,13 +500,18 @@ class MamaCareAdapter(BaseAdapter):
                 
                 # Process with MamaCare chatbot
                 if self.chatbot.is_active_session(sender_id) or message_text.strip().upper() == 'HEALTH':
-                    response_text = self.chatbot.process_message(sender_id, message_text)
+                    def send_reply(text, recipient=sender_id):
+                        return self.send_message(recipient, {
+                            'message_type': 'text',
+                            'content': text
+                        })
                     
-                    # Send response back to user
-                    self.send_message(sender_id, {
-                        'message_type': 'text',
-                        'content': response_text
-                    })
+                    # Model answers are streamed from the background when enabled
+                    if not self.chatbot.start_streaming_reply(sender_id, message_text, send_reply):
+                        response_text = self.chatbot.process_message(sender_id, message_text)
+                        
+                        # Send response back to user
+                        send_reply(response_text)
                     
                 # If message wasn't handled by chatbot, you could add alternate handling here
             
@@ -0,0 +1,76 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from platform_adapters.cpims.benchmark import SAMPLE_CASES, CPIMSStubServer, run_benchmark
+from platform_adapters.cpims.helpline_cpims_abuse_adapter import HelplineCPIMSAbuseAdapter
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Helpline -> CPIMS case mapping against a local CPIMS stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payload', action='append', dest='payloads',
+                            help='JSON file with a Helpline case or a list of cases '
+                                 '(e.g. test_new_payload.json; may be repeated, defaults to built-in samples)')
+        parser.add_argument('--cases', type=int, default=1000,
+                            help='Number of cases to time')
+        parser.add_argument('--forward', action='store_true',
+                            help='Also post each case to the stub CRS endpoint')
+        parser.add_argument('--alloc-sample', type=int, default=200,
+                            help='Number of cases to run under tracemalloc for allocation figures')
+        parser.add_argument('--min-cases-per-sec', type=float,
+                            help='Fail if throughput falls below this (for CI regression checks)')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON')
+        parser.add_argument('--verbose-logs', action='store_true',
+                            help='Keep adapter logging on (it is muted by default)')
+
+    def handle(self, *args, **options):
+        cases = self._load_cases(options['payloads']) if options['payloads'] else SAMPLE_CASES
+
+        if not options['verbose_logs']:
+            logging.disable(logging.WARNING)
+        try:
+            with CPIMSStubServer() as stub:
+                adapter = HelplineCPIMSAbuseAdapter()
+                adapter.cpims_endpoint = stub.crs_url
+                adapter.cpims_geo_endpoint = stub.geo_url
+                adapter.cpims_settings_endpoint = stub.settings_url
+
+                results = run_benchmark(
+                    adapter, cases,
+                    total=options['cases'],
+                    forward=options['forward'],
+                    alloc_sample=options['alloc_sample']
+                )
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(f"Cases:             {results['cases']} ({len(cases)} distinct)")
+            self.stdout.write(f"Outcomes:          {results['statuses']}")
+            self.stdout.write(f"Throughput:        {results['cases_per_sec']} cases/sec")
+            self.stdout.write(f"Latency:           mean {results['mean_ms']} ms, p95 {results['p95_ms']} ms")
+            self.stdout.write(f"Peak allocation:   {results['peak_alloc_kib_per_case']} KiB per case")
+            self.stdout.write(f"Retained memory:   {results['retained_bytes_per_case']} bytes per case")
+            for mapping_type, values in sorted(results['unmapped_codes'].items()):
+                self.stdout.write(f"Unmapped {mapping_type}: {values}")
+
+        minimum = options['min_cases_per_sec']
+        if minimum and results['cases_per_sec'] < minimum:
+            raise CommandError(f"Throughput {results['cases_per_sec']} cases/sec is below {minimum}")
+
+    def _load_cases(self, paths):
+        cases = []
+        for path in paths:
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f"Could not read {path}: {str(e)}")
+            cases.extend(data if isinstance(data, list) else [data])
+        return cases
@@ -0,0 +1,85 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from platform_adapters.cpims.helpline_cpims_abuse_adapter import HelplineCPIMSAbuseAdapter
+from platform_adapters.reference_snapshot import get_config, make_entry, write_snapshot
+from platform_adapters.webform.webform_adapter import WebformAdapter
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('cpims', 'helpline', 'locations')
+
+
+class Command(BaseCommand):
+    help = 'Write CPIMS and helpline reference data to an offline snapshot file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output',
+                            help='Snapshot file to write (defaults to REFERENCE_SNAPSHOT_CONFIG["PATH"])')
+        parser.add_argument('--section', action='append', dest='sections', choices=SECTIONS,
+                            help='Only snapshot the given section (may be repeated)')
+        parser.add_argument('--allow-partial', action='store_true',
+                            help='Write the snapshot even if some lists could not be fetched')
+
+    def handle(self, *args, **options):
+        path = options['output'] or get_config()['PATH']
+        if not path:
+            raise CommandError('No output file given and REFERENCE_SNAPSHOT_CONFIG["PATH"] is not set')
+
+        sections = options['sections'] or SECTIONS
+        entries = []
+        failures = []
+
+        if 'cpims' in sections:
+            self._collect_cpims(entries, failures)
+        if 'helpline' in sections:
+            self._collect_helpline_categories(entries, failures)
+        if 'locations' in sections:
+            result = WebformAdapter().export_all_locations(use_snapshot=False)
+            self._add_result(entries, failures, 'locations', result)
+
+        if failures and not options['allow_partial']:
+            raise CommandError(f"Failed to fetch: {', '.join(failures)} (use --allow-partial to write anyway)")
+
+        count = write_snapshot(path, entries)
+        for failure in failures:
+            self.stdout.write(self.style.WARNING(f"Skipped {failure}"))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} reference lists to {path}"))
+
+    def _collect_cpims(self, entries, failures):
+        """CPIMS geo data and settings lists, including every sub-category list."""
+        adapter = HelplineCPIMSAbuseAdapter()
+        reference_cache = adapter.reference_cache
+        sources = dict(adapter.reference_sources())
+
+        categories = reference_cache.get(sources['case categories'], 'case categories', block_if_cold=True) or []
+        for field_name in sorted({c.get('item_sub_category') for c in categories if c.get('item_sub_category')}):
+            sources[f"sub-categories for {field_name}"] = adapter._settings_url(field_name)
+
+        for label, url in sources.items():
+            self.stdout.write(f"Fetching CPIMS {label}")
+            entry = reference_cache.get_entry(url) if reference_cache.refresh(url, label) else None
+            if entry is None:
+                failures.append(f"CPIMS {label}")
+                continue
+            entries.append(('cpims', url, entry))
+
+    def _collect_helpline_categories(self, entries, failures):
+        adapter = WebformAdapter()
+        self.stdout.write('Fetching helpline categories')
+        result = adapter.get_categories(use_snapshot=False)
+        if not self._add_result(entries, failures, 'categories', result):
+            return
+
+        for category in result.get('categories', []):
+            key = f"subcategories:{category['id']}"
+            self._add_result(entries, failures, key, adapter.get_subcategories(category['id'], use_snapshot=False))
+
+    def _add_result(self, entries, failures, key, result):
+        if result.get('status') != 'success':
+            logger.error(f"Could not snapshot helpline {key}: {result.get('error')}")
+            failures.append(f"helpline {key}")
+            return False
+        entries.append(('helpline', key, make_entry(result)))
+        return True
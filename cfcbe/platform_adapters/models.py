@@ -1,3 +1,70 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class MediaCacheEntry(models.Model):
+    """
+    Index of media files held in the content-addressed media cache.
+
+    Files are stored on disk under their sha256 digest; this table tracks
+    their size and last use so the cache can be trimmed least recently used first.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=500)
+    size = models.PositiveBigIntegerField()
+    mime_type = models.CharField(max_length=100, blank=True, default='')
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'Media cache entries'
+
+    def __str__(self):
+        return f"{self.sha256} ({self.size} bytes)"
+
+
+class CaseCorrelation(models.Model):
+    """
+    Link between a helpline case and its counterpart in a partner system.
+
+    Recorded when a case is forwarded in either direction so later updates can
+    resolve the other side's ID with a single indexed lookup instead of
+    re-deriving it from the payload.
+    """
+    ORIGIN_HELPLINE = 'helpline'
+    ORIGIN_PARTNER = 'partner'
+
+    ORIGIN_CHOICES = [
+        (ORIGIN_HELPLINE, 'Helpline'),
+        (ORIGIN_PARTNER, 'Partner system'),
+    ]
+
+    platform = models.CharField(max_length=50)
+    helpline_case_id = models.CharField(max_length=100, blank=True, default='')
+    external_ref = models.CharField(max_length=100, blank=True, default='')
+    src_uid = models.CharField(max_length=255, blank=True, default='')
+    src_callid = models.CharField(max_length=255, blank=True, default='')
+    origin = models.CharField(max_length=20, choices=ORIGIN_CHOICES, default=ORIGIN_HELPLINE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['platform', 'helpline_case_id'],
+                condition=~models.Q(helpline_case_id=''),
+                name='unique_correlation_helpline_case'
+            ),
+            models.UniqueConstraint(
+                fields=['platform', 'external_ref'],
+                condition=~models.Q(external_ref=''),
+                name='unique_correlation_external_ref'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['platform', 'src_callid']),
+        ]
+
+    def __str__(self):
+        return f"{self.platform}: {self.helpline_case_id or '?'} <-> {self.external_ref or '?'}"
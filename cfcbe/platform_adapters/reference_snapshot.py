@@ -0,0 +1,271 @@
+# platform_adapters/reference_snapshot.py
+
+"""
+Offline snapshot of the reference data the adapters look up.
+
+`manage.py snapshot_reference_data` writes CPIMS geo/settings lists, the
+helpline categories/subcategories and the helpline location tree into a
+single SQLite file. Server processes open it read-only (memory-mapped) at
+startup, so lookups work without a network fetch after a deploy:
+
+- CPIMS lists are seeded into CPIMSReferenceCache, which keeps revalidating
+  them against CPIMS in the background as usual
+- WebformAdapter serves categories, subcategories and locations from it
+  until they are MAX_AGE_SECONDS old, then goes back to the live API
+
+Each entry is stored as zlib-compressed JSON with a content version (sha1),
+and the file records its format version so an incompatible file is ignored.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+DEFAULT_CONFIG = {
+    'PATH': '',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'LOAD_ON_STARTUP': True,
+    'MAX_AGE_SECONDS': 7 * 24 * 60 * 60,  # 0 = entries never expire
+}
+
+
+def get_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_CONFIG)
+    config.update(getattr(settings, 'REFERENCE_SNAPSHOT_CONFIG', {}) or {})
+    return config
+
+
+def make_entry(data: Any, **extra) -> Dict[str, Any]:
+    """
+    Build a snapshot entry for some reference data.
+
+    Args:
+        data: JSON-serializable reference data
+        extra: Additional fields to keep (etag, last_modified, fetched_at)
+
+    Returns:
+        Entry dict with data, version and fetched_at
+    """
+    encoded = json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    entry = {'data': data, 'version': hashlib.sha1(encoded).hexdigest(), 'fetched_at': time.time()}
+    entry.update({key: value for key, value in extra.items() if value is not None})
+    return entry
+
+
+def write_snapshot(path: str, entries: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+    """
+    Write a snapshot file, replacing any existing one atomically.
+
+    Args:
+        path: Destination file
+        entries: (section, key, entry) tuples; entries come from make_entry()
+            or CPIMSReferenceCache.get_entry()
+
+    Returns:
+        Number of entries written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    os.close(fd)
+
+    count = 0
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE entries (section TEXT, key TEXT, version TEXT, etag TEXT, "
+                "last_modified TEXT, fetched_at REAL, data BLOB, PRIMARY KEY (section, key))"
+            )
+            for section, key, entry in entries:
+                payload = json.dumps(entry['data'], separators=(',', ':')).encode('utf-8')
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (section, key, entry['version'], entry.get('etag'), entry.get('last_modified'),
+                     entry.get('fetched_at'), zlib.compress(payload, 6))
+                )
+                count += 1
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('format', str(SNAPSHOT_FORMAT)),
+                ('created_at', str(time.time())),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return count
+
+
+class ReferenceSnapshot:
+    """Read-only access to a snapshot file."""
+
+    def __init__(self, path: str, mmap_size: int = DEFAULT_CONFIG['MMAP_SIZE'], max_age: float = 0):
+        """
+        Open a snapshot file.
+
+        Args:
+            path: The snapshot file
+            mmap_size: Bytes of the file SQLite may memory-map
+            max_age: Seconds after which get_data() no longer serves an entry (0 = no limit)
+
+        Raises:
+            ValueError: If the file isn't a snapshot in the current format
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._decoded = {}
+        self._expired = set()
+        self._conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro&immutable=1",
+                                     uri=True, check_same_thread=False)
+        try:
+            self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            meta = dict(self._conn.execute("SELECT name, value FROM meta"))
+        except sqlite3.DatabaseError as e:
+            self._conn.close()
+            raise ValueError(f"Not a reference snapshot: {str(e)}")
+
+        if meta.get('format') != str(SNAPSHOT_FORMAT):
+            self._conn.close()
+            raise ValueError(f"Unsupported snapshot format: {meta.get('format')}")
+        self.created_at = float(meta.get('created_at', 0))
+
+    def _decode(self, row) -> Dict[str, Any]:
+        version, etag, last_modified, fetched_at, data = row
+        return {
+            'data': json.loads(zlib.decompress(data)),
+            'version': version,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+        }
+
+    def get(self, section: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get one entry, decoding it on first use.
+
+        Returns:
+            Entry dict (data, version, etag, last_modified, fetched_at) or None
+        """
+        with self._lock:
+            if (section, key) in self._decoded:
+                return self._decoded[(section, key)]
+            row = self._conn.execute(
+                "SELECT version, etag, last_modified, fetched_at, data FROM entries WHERE section = ? AND key = ?",
+                (section, key)
+            ).fetchone()
+            entry = self._decode(row) if row else None
+            self._decoded[(section, key)] = entry
+            return entry
+
+    def get_data(self, section: str, key: str) -> Optional[Any]:
+        """
+        Get just the data of an entry.
+
+        Returns:
+            The data, or None if it isn't in the snapshot or was fetched more
+            than max_age seconds ago (callers then fetch it live)
+        """
+        entry = self.get(section, key)
+        if entry is None:
+            return None
+
+        if self.max_age:
+            age = time.time() - (entry.get('fetched_at') or self.created_at)
+            if age > self.max_age:
+                if (section, key) not in self._expired:
+                    self._expired.add((section, key))
+                    logger.warning(f"Snapshot entry {section}/{key} is {age / 3600:.0f}h old, not serving it; "
+                                   f"run `manage.py snapshot_reference_data` to refresh the snapshot")
+                return None
+        return entry['data']
+
+    def keys(self, section: str) -> list:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM entries WHERE section = ? ORDER BY key", (section,))]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+            self._decoded.clear()
+
+
+_snapshot = None
+_snapshot_loaded = False
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[ReferenceSnapshot]:
+    """
+    Get the process-wide snapshot, opening it on first use.
+
+    Returns:
+        ReferenceSnapshot, or None if none is configured or it can't be read
+    """
+    global _snapshot, _snapshot_loaded
+    if _snapshot_loaded:
+        return _snapshot
+
+    with _snapshot_lock:
+        if not _snapshot_loaded:
+            config = get_config()
+            path = config['PATH']
+            if path and os.path.exists(path):
+                try:
+                    _snapshot = ReferenceSnapshot(path, config['MMAP_SIZE'], config['MAX_AGE_SECONDS'])
+                    logger.info(f"Loaded reference snapshot {path}")
+                except (ValueError, sqlite3.Error) as e:
+                    logger.error(f"Ignoring reference snapshot {path}: {str(e)}")
+            _snapshot_loaded = True
+    return _snapshot
+
+
+def reset_snapshot() -> None:
+    """Forget the loaded snapshot so the next get_snapshot() reopens it."""
+    global _snapshot, _snapshot_loaded
+    with _snapshot_lock:
+        if _snapshot is not None:
+            _snapshot.close()
+        _snapshot = None
+        _snapshot_loaded = False
+
+
+def seed_cpims_reference_cache(snapshot: Optional[ReferenceSnapshot] = None) -> int:
+    """
+    Seed the shared CPIMS reference cache from the snapshot.
+
+    Lists already in the shared cache are left alone.
+
+    Returns:
+        Number of lists seeded
+    """
+    snapshot = snapshot or get_snapshot()
+    if snapshot is None:
+        return 0
+
+    from platform_adapters.cpims.reference_cache import CPIMSReferenceCache
+
+    reference_cache = CPIMSReferenceCache()
+    seeded = sum(1 for url in snapshot.keys('cpims') if reference_cache.seed(url, snapshot.get('cpims', url)))
+    if seeded:
+        logger.info(f"Seeded {seeded} CPIMS reference lists from snapshot")
+    return seeded
@@ -1,6 +1,54 @@
 from django.test import TestCase
 from platform_adapters.base_adapter import BaseAdapter
 from abc import ABC, abstractmethod
+import base64
+import dataclasses
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+import requests
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from endpoint_integration.message_router import MessageRouter
+from endpoint_integration.models import OutboundMessage
+from platform_adapters import correlation, reference_snapshot
+from platform_adapters.adapter_factory import AdapterFactory
+from platform_adapters.ceemis.ceemis_adapter import CEEMISAdapter
+from platform_adapters.cpims import code_mappings
+from platform_adapters.cpims.benchmark import CPIMSStubServer, SAMPLE_CASES, run_benchmark
+from platform_adapters.cpims.helpline_cpims_abuse_adapter import HelplineCPIMSAbuseAdapter
+from platform_adapters.cpims.reference_cache import CPIMSReferenceCache
+from platform_adapters.models import CaseCorrelation, MediaCacheEntry
+from platform_adapters.webform.webform_adapter import WebformAdapter
+from platform_adapters.whatsApp import chatbot_adapter, prompt_builder
+from platform_adapters.whatsApp.chatbot_adapter import MaternalHealthChatbot, take_sentences
+from platform_adapters.whatsApp.media_cache import MediaCache
+from platform_adapters.whatsApp.model_gateway import (
+    ModelGateway, ModelOverloaded, PRIORITY_EMERGENCY, PRIORITY_NORMAL, message_priority
+)
+from platform_adapters.whatsApp.payload_parser import WhatsAppInboundMessage, parse_whatsapp_payload
+from platform_adapters.whatsApp.response_cache import ResponseCache
+from platform_adapters.whatsApp.session_store import ChatbotSessionStore
+from platform_adapters.whatsApp.token_manager import TokenManager
+from platform_adapters.whatsApp.whatsapp_adapter import WhatsAppAdapter
+from shared.category_matcher import CategoryMatcher
+from webhook_handler.models import Conversation, Organization, WhatsAppCredential
+
+# The database cache is written inside each test's transaction, which blocks
+# cache access from the worker threads some tests start
+THREAD_SAFE_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 class ConcreteAdapter(BaseAdapter):
     def handle_verification(self, request):
@@ -21,4 +69,1170 @@ class ConcreteAdapter(BaseAdapter):
 class BaseAdapterTestCase(TestCase):
     def test_get_platform_name(self):
         adapter = ConcreteAdapter()
-        self.assertEqual(adapter.get_platform_name(), 'concrete')
\ No newline at end of file
+        self.assertEqual(adapter.get_platform_name(), 'concrete')
+
+
+class TokenManagerCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        TokenManager._token_cache.clear()
+        TokenManager._default_org_id = None
+        self.org = Organization.objects.create(name='Test Org', email='org@example.com')
+        WhatsAppCredential.objects.create(
+            organization=self.org,
+            access_token='stored_token',
+            token_expiry=timezone.now() + timedelta(days=30)
+        )
+
+    def tearDown(self):
+        TokenManager._token_cache.clear()
+        TokenManager._default_org_id = None
+
+    @patch.object(TokenManager, 'check_token_validity')
+    def test_validated_token_is_cached(self, mock_check):
+        mock_check.return_value = {'is_valid': True, 'expires_at': 0}
+
+        self.assertEqual(TokenManager.get_access_token(), 'stored_token')
+        self.assertEqual(TokenManager.get_access_token(), 'stored_token')
+        mock_check.assert_called_once()
+
+    @patch.object(TokenManager, 'check_token_validity')
+    def test_invalidate_forces_revalidation(self, mock_check):
+        mock_check.return_value = {'is_valid': True, 'expires_at': 0}
+
+        TokenManager.get_access_token()
+        TokenManager.invalidate_token()
+        TokenManager.get_access_token()
+        self.assertEqual(mock_check.call_count, 2)
+
+    @patch.object(TokenManager, 'check_token_validity')
+    def test_token_near_expiry_is_revalidated(self, mock_check):
+        near_expiry = (timezone.now() + timedelta(seconds=60)).timestamp()
+        mock_check.return_value = {'is_valid': True, 'expires_at': near_expiry}
+
+        TokenManager.get_access_token()
+        TokenManager.get_access_token()
+        self.assertEqual(mock_check.call_count, 2)
+
+    @patch('platform_adapters.whatsApp.token_manager.time.sleep')
+    @patch.object(TokenManager, 'check_token_validity')
+    def test_lock_held_by_another_worker_is_not_released(self, mock_check, mock_sleep):
+        mock_check.return_value = {'is_valid': True, 'expires_at': 0}
+        lock_key = f"{TokenManager._cache_key(self.org.id)}:lock"
+        cache.set(lock_key, 'other-worker', timeout=30)
+
+        self.assertEqual(TokenManager.get_access_token(self.org.id), 'stored_token')
+        self.assertEqual(cache.get(lock_key), 'other-worker')
+
+        cache.delete(lock_key)
+        TokenManager.invalidate_token(self.org.id)
+        TokenManager.get_access_token(self.org.id)
+        self.assertIsNone(cache.get(lock_key))
+
+
+class MediaCacheTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_CACHE_CONFIG={
+            'ENABLED': True, 'DIRECTORY': self.directory, 'MAX_SIZE_BYTES': 25
+        })
+        self.settings_override.enable()
+        self.cache = MediaCache()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _put(self, content):
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.assertTrue(self.cache.put(sha256, io.BytesIO(content), 'image/jpeg'))
+        return sha256
+
+    def test_put_and_open(self):
+        sha256 = self._put(b'forwarded image')
+
+        cached = self.cache.open(sha256.upper())
+        with cached['file'] as cached_file:
+            self.assertEqual(cached_file.read(), b'forwarded image')
+        self.assertEqual(cached['mime_type'], 'image/jpeg')
+        self.assertEqual(MediaCacheEntry.objects.get(sha256=sha256).hit_count, 1)
+
+    def test_base64_key_and_content_mismatch(self):
+        content = b'voice note'
+        b64_key = base64.b64encode(hashlib.sha256(content).digest()).decode()
+        self.assertTrue(self.cache.put(b64_key, io.BytesIO(content)))
+        self.assertTrue(self.cache.contains(hashlib.sha256(content).hexdigest()))
+
+        self.assertFalse(self.cache.put(hashlib.sha256(b'other').hexdigest(), io.BytesIO(content)))
+
+    def test_lru_eviction(self):
+        first = self._put(b'a' * 10)
+        second = self._put(b'b' * 10)
+        self.cache.get(first)  # first is now more recently used than second
+        self._put(b'c' * 10)
+
+        self.assertTrue(self.cache.contains(first))
+        self.assertFalse(self.cache.contains(second))
+
+
+def whatsapp_album_payload(count):
+    """Build a WhatsApp payload with `count` image messages."""
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "WHATSAPP_BUSINESS_ACCOUNT_ID",
+            "changes": [{
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "contacts": [{"profile": {"name": "Test User"}, "wa_id": "ALBUM_SENDER"}],
+                    "messages": [
+                        {
+                            "from": "ALBUM_SENDER",
+                            "id": f"ALBUM_MESSAGE_{index}",
+                            "timestamp": "1678886400",
+                            "type": "image",
+                            "image": {"id": f"MEDIA_{index}", "mime_type": "image/jpeg"}
+                        }
+                        for index in range(count)
+                    ]
+                },
+                "field": "messages"
+            }]
+        }]
+    }
+
+
+@override_settings(MEDIA_CACHE_CONFIG={'ENABLED': False})
+class ParallelMediaFetchTestCase(TestCase):
+    DELAY = 0.2
+
+    def setUp(self):
+        WhatsAppAdapter._media_executor = None
+        self.adapter = WhatsAppAdapter()
+
+    def tearDown(self):
+        if WhatsAppAdapter._media_executor:
+            WhatsAppAdapter._media_executor.shutdown()
+        WhatsAppAdapter._media_executor = None
+
+    def _download(self, media_id, media_type, sha256=None, media_url=None):
+        time.sleep(self.DELAY)
+        return {
+            'media_content': None,
+            'media_mime': 'image/jpeg',
+            'media_filename': f"{media_id}.jpg",
+            'media_size': 10
+        }
+
+    def _parse_album(self, count):
+        with patch.object(WhatsAppAdapter, 'get_media_url_from_whatsapp', side_effect=lambda media_id: f"https://cdn.test/{media_id}"), \
+                patch.object(WhatsAppAdapter, 'download_and_encode_media_for_transmission', side_effect=self._download):
+            started = time.monotonic()
+            messages = self.adapter.parse_messages(whatsapp_album_payload(count))
+            return messages, time.monotonic() - started
+
+    def test_album_is_downloaded_in_parallel(self):
+        media_config = dict(settings.MEDIA_PROCESSING_CONFIG, MAX_CONCURRENT_DOWNLOADS=4)
+        with override_settings(MEDIA_PROCESSING_CONFIG=media_config):
+            messages, elapsed = self._parse_album(4)
+
+        self.assertLess(elapsed, self.DELAY * 3)
+        self.assertEqual([m['message_id'] for m in messages], [f"ALBUM_MESSAGE_{i}" for i in range(4)])
+        self.assertEqual([m['media_filename'] for m in messages], [f"MEDIA_{i}.jpg" for i in range(4)])
+
+    def test_concurrency_of_one_downloads_serially(self):
+        media_config = dict(settings.MEDIA_PROCESSING_CONFIG, MAX_CONCURRENT_DOWNLOADS=1)
+        with override_settings(MEDIA_PROCESSING_CONFIG=media_config):
+            messages, elapsed = self._parse_album(3)
+
+        self.assertGreaterEqual(elapsed, self.DELAY * 3)
+        self.assertIsNone(WhatsAppAdapter._media_executor)
+        self.assertEqual(len(messages), 3)
+
+
+class WhatsAppPayloadParserTestCase(TestCase):
+    def test_parses_text_and_media_messages_in_order(self):
+        payload = whatsapp_album_payload(2)
+        value = payload['entry'][0]['changes'][0]['value']
+        value['messages'].insert(0, {
+            "from": "ALBUM_SENDER", "id": "TEXT_MESSAGE", "timestamp": "1678886400",
+            "type": "text", "text": {"body": "Hello"}
+        })
+        payload['entry'].append({"id": "OTHER", "changes": [{"value": {"statuses": [{"id": "STATUS"}]}}]})
+
+        records = parse_whatsapp_payload(payload)
+
+        self.assertEqual([r.message_id for r in records], ['TEXT_MESSAGE', 'ALBUM_MESSAGE_0', 'ALBUM_MESSAGE_1'])
+        self.assertEqual(records[0].text, 'Hello')
+        self.assertFalse(records[0].is_media)
+        self.assertTrue(records[1].is_media)
+        self.assertEqual(records[1].media_id, 'MEDIA_0')
+        self.assertEqual(records[1].media_mime, 'image/jpeg')
+        self.assertEqual(records[1].contact_info, {'name': 'Test User', 'wa_id': 'ALBUM_SENDER'})
+
+    def test_records_are_compact_and_immutable(self):
+        record = WhatsAppInboundMessage.from_message({"id": "ID", "from": "SENDER", "type": "text"})
+        self.assertFalse(hasattr(record, '__dict__'))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            record.text = 'changed'
+
+    def test_non_whatsapp_payload_yields_nothing(self):
+        self.assertEqual(parse_whatsapp_payload(None), [])
+        self.assertEqual(parse_whatsapp_payload({'message': 'hi'}), [])
+
+
+CPIMS_GEO_DATA = [
+    {"area_id": 1, "area_type_id": "GPRV", "area_name": "Nairobi", "area_code": "047", "parent_area_id": 0},
+    {"area_id": 2, "area_type_id": "GPRV", "area_name": "Kisumu", "area_code": "042", "parent_area_id": 0},
+    {"area_id": 10, "area_type_id": "GDIS", "area_name": "Westlands", "area_code": "274", "parent_area_id": 1},
+    {"area_id": 11, "area_type_id": "GDIS", "area_name": "Kisumu Central", "area_code": "240", "parent_area_id": 2},
+    {"area_id": 100, "area_type_id": "GWRD", "area_name": "Central", "area_code": "1361", "parent_area_id": 10},
+    {"area_id": 101, "area_type_id": "GWRD", "area_name": "Central", "area_code": "1207", "parent_area_id": 11},
+]
+
+
+class CPIMSGeoIndexTestCase(TestCase):
+    def setUp(self):
+        self.adapter = HelplineCPIMSAbuseAdapter()
+        patcher = patch.object(self.adapter, '_get_geo_data', return_value=CPIMS_GEO_DATA)
+        self.get_geo_data = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookups_are_case_insensitive(self):
+        self.assertEqual(self.adapter._lookup_area_code_by_type(' nairobi ', 'GPRV'), '047')
+        self.assertEqual(self.adapter._lookup_area_code('WESTLANDS'), '274')
+        self.assertEqual(self.adapter._lookup_area_type_id('Kisumu Central'), 'GDIS')
+        self.assertIsNone(self.adapter._lookup_area_code_by_type('Nairobi', 'GWRD'))
+        self.assertIsNone(self.adapter._lookup_area_code('Atlantis'))
+
+    def test_shared_names_resolve_through_parent(self):
+        self.assertEqual(self.adapter._lookup_area_code_by_type('Central', 'GWRD'), '1361')
+        self.assertEqual(self.adapter._lookup_area_code_by_type('Central', 'GWRD', parent_code='240'), '1207')
+        self.assertEqual([a['area_code'] for a in self.adapter._get_child_areas('274')], ['1361'])
+
+    def test_index_is_built_once_per_fetch(self):
+        index = self.adapter._get_geo_index()
+        self.assertIs(self.adapter._get_geo_index(), index)
+
+        self.get_geo_data.return_value = CPIMS_GEO_DATA[:2]
+        self.assertIsNot(self.adapter._get_geo_index(), index)
+        self.assertIsNone(self.adapter._lookup_area_code('Westlands'))
+
+
+def cpims_response(status_code=200, data=None, etag=None):
+    response = MagicMock(status_code=status_code, headers={'ETag': etag} if etag else {})
+    response.json.return_value = data
+    response.content = json.dumps(data).encode('utf-8')
+    return response
+
+
+@override_settings(CPIMS_REFERENCE_CACHE_CONFIG={'TTL_SECONDS': 60, 'LOCAL_RECHECK_SECONDS': 0},
+                   CACHES=THREAD_SAFE_CACHES)
+class CPIMSReferenceCacheTestCase(TestCase):
+    URL = 'https://cpims.test/api/v1/geo/'
+
+    def setUp(self):
+        cache.clear()
+        CPIMSReferenceCache.clear_local()
+        self.reference_cache = CPIMSReferenceCache(auth_token='token')
+
+    def tearDown(self):
+        cache.clear()
+        CPIMSReferenceCache.clear_local()
+
+    @patch('platform_adapters.cpims.reference_cache.http_client.get')
+    def test_cold_geo_data_is_fetched_inline_without_the_retry_queue(self, mock_get):
+        mock_get.return_value = cpims_response(data=CPIMS_GEO_DATA)
+
+        self.assertEqual(HelplineCPIMSAbuseAdapter()._get_geo_data(), CPIMS_GEO_DATA)
+        mock_get.assert_called_once()
+
+    @patch('platform_adapters.cpims.reference_cache.http_client.get')
+    def test_cached_data_is_shared_without_refetching(self, mock_get):
+        mock_get.return_value = cpims_response(data=CPIMS_GEO_DATA, etag='"v1"')
+
+        self.assertEqual(self.reference_cache.get(self.URL, 'geo data', block_if_cold=True), CPIMS_GEO_DATA)
+
+        # Another worker: nothing in memory, but the shared cache has it
+        CPIMSReferenceCache.clear_local()
+        self.assertEqual(CPIMSReferenceCache().get(self.URL, 'geo data'), CPIMS_GEO_DATA)
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs['headers']['Authorization'], 'Token token')
+
+    @patch('platform_adapters.cpims.reference_cache.http_client.get')
+    def test_stale_entry_is_served_while_revalidating(self, mock_get):
+        mock_get.return_value = cpims_response(data=CPIMS_GEO_DATA, etag='"v1"')
+        self.reference_cache.get(self.URL, 'geo data', block_if_cold=True)
+
+        mock_get.return_value = cpims_response(status_code=304)
+        with patch('platform_adapters.cpims.reference_cache.time.time', return_value=time.time() + 120):
+            self.assertEqual(self.reference_cache.get(self.URL, 'geo data'), CPIMS_GEO_DATA)
+            # Wait for the background revalidation to finish
+            while CPIMSReferenceCache._refreshing:
+                time.sleep(0.01)
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(self.reference_cache.get(self.URL, 'geo data'), CPIMS_GEO_DATA)
+
+    @patch('platform_adapters.cpims.reference_cache.http_client.get')
+    def test_cold_geo_lookup_does_not_block(self, mock_get):
+        fetched = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch(*args, **kwargs):
+            fetched.set()
+            release.wait(5)
+            return cpims_response(data=CPIMS_GEO_DATA)
+
+        mock_get.side_effect = slow_fetch
+
+        self.assertIsNone(self.reference_cache.get(self.URL, 'geo data'))
+        self.assertTrue(fetched.wait(5))
+        release.set()
+        while CPIMSReferenceCache._refreshing:
+            time.sleep(0.01)
+        self.assertEqual(self.reference_cache.get(self.URL, 'geo data'), CPIMS_GEO_DATA)
+
+
+class ReferenceDataStartupTestCase(TestCase):
+    @patch('platform_adapters.reference_snapshot.seed_cpims_reference_cache')
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.HelplineCPIMSAbuseAdapter.warm_reference_data')
+    def test_warming_only_runs_when_enabled(self, mock_warm, mock_seed):
+        config = apps.get_app_config('platform_adapters')
+
+        with override_settings(CPIMS_WARM_ON_STARTUP=False):
+            config.ready()
+        mock_warm.assert_not_called()
+        mock_seed.assert_not_called()
+
+        with override_settings(CPIMS_WARM_ON_STARTUP=True):
+            config.ready()
+        mock_warm.assert_called_once_with()
+        mock_seed.assert_called_once_with()
+
+
+CPIMS_CATEGORY_DATA = [
+    {"item_id": "CSAB", "item_description": "Physical abuse/violence", "item_sub_category": None},
+    {"item_id": "CLAB", "item_description": "Child Labour", "item_sub_category": "child_labour_id"},
+    {"item_id": "CDEF", "item_description": "Defilement", "item_sub_category": None},
+    {"item_id": "CSOS", "item_description": "Child out of school", "item_sub_category": "out_of_school_id"},
+    {"item_id": "CEMP", "item_description": "", "item_sub_category": None},
+]
+
+
+class CategoryMatcherTestCase(TestCase):
+    def setUp(self):
+        self.matcher = CategoryMatcher(CPIMS_CATEGORY_DATA, aliases={'rape': 'Defilement', 'bogus': 'Missing'})
+
+    def test_match_precedence(self):
+        exact = self.matcher.match(' CHILD LABOUR ')
+        self.assertEqual((exact.item['item_id'], exact.method, exact.score), ('CLAB', 'exact', 1.0))
+        self.assertEqual(self.matcher.match('CDEF').method, 'id')
+        self.assertEqual(self.matcher.match('Rape').item['item_id'], 'CDEF')
+        self.assertEqual(self.matcher.match('Rape').method, 'alias')
+
+        partial = self.matcher.match('labour')
+        self.assertEqual((partial.item['item_id'], partial.method), ('CLAB', 'contains'))
+
+    def test_misspelt_input_is_ranked(self):
+        candidates = self.matcher.candidates('child labur')
+        self.assertEqual(candidates[0].item['item_id'], 'CLAB')
+        self.assertEqual(candidates[0].method, 'fuzzy')
+        self.assertEqual(candidates, sorted(candidates, key=lambda c: -c.score))
+
+    def test_unmatched_input(self):
+        self.assertIsNone(self.matcher.match('zzz'))
+        self.assertIsNone(self.matcher.match(''))
+        self.assertIsNone(self.matcher.match('bogus'))
+        # Items without a description never match
+        self.assertEqual(len(self.matcher), 4)
+
+    def test_cpims_matcher_is_built_once_per_fetch(self):
+        adapter = HelplineCPIMSAbuseAdapter()
+        with patch.object(adapter, '_get_category_data', return_value=CPIMS_CATEGORY_DATA) as get_data:
+            self.assertEqual(adapter._lookup_category_info('child labor')['item_id'], 'CLAB')
+            matcher = adapter._category_matchers['case_category_id'][1]
+            self.assertEqual(adapter._lookup_category_info('rape')['cpims_description'], 'Defilement')
+            self.assertIs(adapter._category_matchers['case_category_id'][1], matcher)
+
+            get_data.return_value = CPIMS_CATEGORY_DATA[:2]
+            self.assertIsNone(adapter._lookup_category_info('rape'))
+            self.assertIsNot(adapter._category_matchers['case_category_id'][1], matcher)
+
+    def test_ceemis_case_category(self):
+        adapter = CEEMISAdapter()
+        self.assertEqual(adapter._lookup_case_category('Labor Abuse'), '362487')
+        self.assertEqual(adapter._lookup_case_category('wage theft'), '362488')
+        self.assertEqual(adapter._lookup_case_category('Unknown'), '362484')
+
+
+HELPLINE_CATEGORIES = {'status': 'success', 'categories': [{'id': '362558', 'name': 'Abuse', 'subcategories': []}]}
+HELPLINE_SUBCATEGORIES = {'status': 'success', 'category_id': '362558', 'subcategories': [{'id': '1', 'name': 'Neglect'}]}
+HELPLINE_LOCATIONS = {'status': 'success', 'total_locations': 1, 'location_hierarchy': [{'id': '88', 'name': 'Kenya'}]}
+
+
+@override_settings(CPIMS_REFERENCE_CACHE_CONFIG={'TTL_SECONDS': 60, 'LOCAL_RECHECK_SECONDS': 0})
+class ReferenceSnapshotTestCase(TestCase):
+    GEO_URL = 'https://cpims.test/api/v1/geo/'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'snapshot.sqlite3')
+        settings_patcher = override_settings(REFERENCE_SNAPSHOT_CONFIG={'PATH': self.path})
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        cache.clear()
+        CPIMSReferenceCache.clear_local()
+        reference_snapshot.reset_snapshot()
+
+    def tearDown(self):
+        reference_snapshot.reset_snapshot()
+        cache.clear()
+        CPIMSReferenceCache.clear_local()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write(self):
+        return reference_snapshot.write_snapshot(self.path, [
+            ('cpims', self.GEO_URL, reference_snapshot.make_entry(CPIMS_GEO_DATA, etag='"v1"')),
+            ('helpline', 'categories', reference_snapshot.make_entry(HELPLINE_CATEGORIES)),
+            ('helpline', 'subcategories:362558', reference_snapshot.make_entry(HELPLINE_SUBCATEGORIES)),
+        ])
+
+    @patch('platform_adapters.cpims.reference_cache.http_client.get')
+    def test_snapshot_seeds_cpims_cache_without_fetching(self, mock_get):
+        self.assertEqual(self.write(), 3)
+
+        self.assertEqual(reference_snapshot.seed_cpims_reference_cache(), 1)
+        reference_cache = CPIMSReferenceCache()
+        self.assertEqual(reference_cache.get(self.GEO_URL, 'geo data'), CPIMS_GEO_DATA)
+        self.assertEqual(reference_cache.get_entry(self.GEO_URL)['etag'], '"v1"')
+        mock_get.assert_not_called()
+
+        # Data already in the shared cache is not overwritten
+        self.assertEqual(reference_snapshot.seed_cpims_reference_cache(), 0)
+
+    @patch('platform_adapters.webform.webform_adapter.http_client.get')
+    def test_webform_lookups_are_served_from_snapshot(self, mock_get):
+        self.write()
+        adapter = WebformAdapter()
+
+        self.assertEqual(adapter.get_categories(), HELPLINE_CATEGORIES)
+        self.assertEqual(adapter.get_subcategories(362558), HELPLINE_SUBCATEGORIES)
+        mock_get.assert_not_called()
+
+    @patch('platform_adapters.webform.webform_adapter.http_client.get')
+    def test_old_snapshot_entries_fall_back_to_the_live_api(self, mock_get):
+        mock_get.side_effect = requests.ConnectionError('offline')
+        week_old = time.time() - 7 * 24 * 60 * 60
+        reference_snapshot.write_snapshot(self.path, [
+            ('helpline', 'categories', reference_snapshot.make_entry(HELPLINE_CATEGORIES, fetched_at=week_old)),
+            ('helpline', 'subcategories:362558', reference_snapshot.make_entry(HELPLINE_SUBCATEGORIES)),
+        ])
+        adapter = WebformAdapter()
+        adapter.config = {'api_token': 'token'}
+
+        with override_settings(REFERENCE_SNAPSHOT_CONFIG={'PATH': self.path, 'MAX_AGE_SECONDS': 24 * 60 * 60}):
+            reference_snapshot.reset_snapshot()
+            self.assertNotEqual(adapter.get_categories(), HELPLINE_CATEGORIES)
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(adapter.get_subcategories(362558), HELPLINE_SUBCATEGORIES)
+            self.assertEqual(mock_get.call_count, 1)
+
+        with override_settings(REFERENCE_SNAPSHOT_CONFIG={'PATH': self.path, 'MAX_AGE_SECONDS': 0}):
+            reference_snapshot.reset_snapshot()
+            self.assertEqual(adapter.get_categories(), HELPLINE_CATEGORIES)
+
+    def test_incompatible_file_is_ignored(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertIsNone(reference_snapshot.get_snapshot())
+
+    @patch.object(WebformAdapter, 'export_all_locations', return_value=HELPLINE_LOCATIONS)
+    @patch.object(WebformAdapter, 'get_subcategories', return_value=HELPLINE_SUBCATEGORIES)
+    @patch.object(WebformAdapter, 'get_categories', return_value=HELPLINE_CATEGORIES)
+    def test_command_writes_helpline_sections(self, mock_categories, mock_subcategories, mock_locations):
+        call_command('snapshot_reference_data', '--section', 'helpline', '--section', 'locations', stdout=io.StringIO())
+
+        mock_categories.assert_called_once_with(use_snapshot=False)
+        mock_subcategories.assert_called_once_with('362558', use_snapshot=False)
+        snapshot = reference_snapshot.get_snapshot()
+        self.assertEqual(snapshot.keys('helpline'), ['categories', 'locations', 'subcategories:362558'])
+        self.assertEqual(snapshot.get_data('helpline', 'locations'), HELPLINE_LOCATIONS)
+
+
+@override_settings(CACHES=THREAD_SAFE_CACHES)
+class CPIMSMappingBenchmarkTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        CPIMSReferenceCache.clear_local()
+
+    def tearDown(self):
+        cache.clear()
+        CPIMSReferenceCache.clear_local()
+
+    def test_benchmark_maps_cases_against_stub(self):
+        with CPIMSStubServer() as stub:
+            adapter = HelplineCPIMSAbuseAdapter()
+            adapter.cpims_endpoint = stub.crs_url
+            adapter.cpims_geo_endpoint = stub.geo_url
+            adapter.cpims_settings_endpoint = stub.settings_url
+
+            results = run_benchmark(adapter, SAMPLE_CASES, total=12, alloc_sample=2)
+
+        # The last sample case has a category CPIMS doesn't know
+        self.assertEqual(results['statuses'], {'success': 10, 'rejected': 2})
+        self.assertGreater(results['cases_per_sec'], 0)
+        self.assertIsNotNone(results['peak_alloc_kib_per_case'])
+        # Dry run: reference data was fetched, nothing was posted to the CRS endpoint
+        self.assertTrue(any(path.endswith('/geo/') for method, path in stub.requests))
+        self.assertFalse(any(method == 'POST' for method, path in stub.requests))
+
+    def test_dry_run_returns_mapped_payload(self):
+        adapter = HelplineCPIMSAbuseAdapter()
+        with patch.object(adapter, '_map_to_cpims_format', return_value={'case_category_id': 'CSAB'}), \
+                patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.http_client.post') as mock_post:
+            result = adapter.send_message('cpims', SAMPLE_CASES[0], dry_run=True)
+
+        mock_post.assert_not_called()
+        self.assertEqual(result['status'], 'success')
+        self.assertTrue(result['dry_run'])
+        self.assertEqual(result['payload'], {'case_category_id': 'CSAB'})
+
+
+CPIMS_RETRY_ENDPOINT_CONFIG = {
+    'cpims': {'adapter': 'cpims_abuse', 'retry_queue': True, 'max_attempts': 3, 'retry_backoff_seconds': 1},
+}
+
+
+@override_settings(ENDPOINT_CONFIG=CPIMS_RETRY_ENDPOINT_CONFIG,
+                   CIRCUIT_BREAKER_CONFIG={'FAILURE_THRESHOLD': 2, 'RESET_TIMEOUT_SECONDS': 30})
+class CPIMSRetryQueueTestCase(TestCase):
+    CASE = {"id": "C1", "narrative": "Child reported missing"}
+
+    def setUp(self):
+        cache.clear()
+        self.adapter = HelplineCPIMSAbuseAdapter()
+        patcher = patch.object(self.adapter, '_map_to_cpims_format', return_value={'case_category_id': 'CSAB'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cache.clear()
+        AdapterFactory._adapter_instances.clear()
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.http_client.post')
+    def test_failed_case_is_queued_and_redelivered(self, mock_post):
+        mock_post.side_effect = requests.ConnectionError('connection refused')
+
+        result = self.adapter._send_to_cpims(self.CASE)
+
+        self.assertEqual(result['status'], 'queued')
+        outbound = OutboundMessage.objects.get(pk=result['outbound_id'])
+        self.assertEqual((outbound.endpoint, outbound.payload), ('cpims', self.CASE))
+
+        # CPIMS is back: the worker resends the case through the adapter
+        mock_post.side_effect = None
+        mock_post.return_value = MagicMock(status_code=201, text='{}')
+        mock_post.return_value.json.return_value = {'case_id': 'X1'}
+        with patch.object(AdapterFactory, 'get_adapter', return_value=self.adapter):
+            MessageRouter().deliver(outbound)
+
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_DELIVERED)
+        self.assertEqual(OutboundMessage.objects.count(), 1)
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.http_client.post')
+    def test_open_circuit_fails_fast(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=503, text='Service unavailable')
+        self.adapter._send_to_cpims(self.CASE)
+        self.adapter._send_to_cpims(self.CASE)
+        self.assertEqual(mock_post.call_count, 2)
+
+        result = self.adapter.retry_delivery(self.CASE)
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertTrue(result['circuit_open'])
+
+        # Waiting for the circuit doesn't use up a retry attempt
+        outbound = OutboundMessage.objects.first()
+        with patch.object(AdapterFactory, 'get_adapter', return_value=self.adapter):
+            MessageRouter().deliver(outbound)
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attempts), (OutboundMessage.STATUS_PENDING, 0))
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.http_client.post')
+    def test_case_waits_for_geo_data_instead_of_sending_empty_codes(self, mock_post):
+        adapter = HelplineCPIMSAbuseAdapter()
+        case = dict(self.CASE, reporter_location="^Nairobi^Westlands^Central")
+
+        with patch.object(adapter, '_get_geo_data', return_value=None):
+            result = adapter._send_to_cpims(case)
+            self.assertEqual(result['status'], 'queued')
+
+            outbound = OutboundMessage.objects.get(pk=result['outbound_id'])
+            with patch.object(AdapterFactory, 'get_adapter', return_value=adapter):
+                MessageRouter().deliver(outbound)
+
+        mock_post.assert_not_called()
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attempts), (OutboundMessage.STATUS_PENDING, 0))
+        self.assertIn("geo data is not loaded", outbound.last_error)
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.http_client.post')
+    def test_case_is_retried_when_categories_cannot_be_loaded(self, mock_post):
+        adapter = HelplineCPIMSAbuseAdapter()
+        case = dict(self.CASE, cat_1="Child Labour")
+
+        with patch.object(adapter, '_get_category_data', return_value=None):
+            result = adapter._send_to_cpims(case)
+            self.assertEqual(result['status'], 'queued')
+
+            outbound = OutboundMessage.objects.get(pk=result['outbound_id'])
+            with patch.object(AdapterFactory, 'get_adapter', return_value=adapter):
+                MessageRouter().deliver(outbound)
+
+        mock_post.assert_not_called()
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attempts), (OutboundMessage.STATUS_PENDING, 0))
+
+        # A category CPIMS doesn't have is still rejected for good
+        with patch.object(adapter, '_get_category_data', return_value=CPIMS_CATEGORY_DATA):
+            self.assertEqual(adapter.retry_delivery(dict(self.CASE, cat_1="Unknown category"))['retryable'], False)
+
+    def test_dry_run_is_never_queued(self):
+        adapter = HelplineCPIMSAbuseAdapter()
+        case = dict(self.CASE, reporter_location="^Nairobi^Westlands^Central")
+
+        with patch.object(adapter, '_get_geo_data', return_value=None):
+            result = adapter._send_to_cpims(case, dry_run=True)
+
+        self.assertEqual(result['status'], 'error')
+        self.assertFalse(OutboundMessage.objects.exists())
+
+
+class CPIMSCodeMappingTestCase(TestCase):
+    def setUp(self):
+        code_mappings.reset_unmapped_counts()
+        self.adapter = HelplineCPIMSAbuseAdapter()
+
+    def tearDown(self):
+        code_mappings.reset_unmapped_counts()
+        code_mappings.reload_registry()
+
+    def test_lookup_is_case_insensitive(self):
+        self.assertEqual(self.adapter._map_code("^Female", "sex"), "SFEM")
+        self.assertEqual(self.adapter._map_code("female ", "sex"), "SFEM")
+        self.assertEqual(self.adapter._map_code("living  with MOTHER only", "family_status"), "CCMO")
+
+    def test_unmapped_values_keep_previous_behaviour(self):
+        self.assertEqual(self.adapter._map_code("Uncle", "relationship"), "Uncle")
+        self.assertEqual(self.adapter._map_code("Critical", "risk_level"), "")
+        self.assertEqual(self.adapter._map_code("Anything", "case_category"), "")
+
+    def test_unmapped_values_are_counted(self):
+        self.adapter._map_code("Uncle", "relationship")
+        self.adapter._map_code("^Uncle", "relationship")
+        self.adapter._map_code("", "relationship")
+        self.adapter._map_code("Male", "sex")
+
+        self.assertEqual(code_mappings.unmapped_counts(), {"relationship": {"Uncle": 2}})
+
+    def test_registry_is_immutable(self):
+        with self.assertRaises(TypeError):
+            code_mappings.get_registry().mappings["sex"]["other"] = "SOTH"
+
+    def test_override_file_adds_codes(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({"mappings": {"relationship": {"Uncle": "ROFM"}}}, f)
+        self.addCleanup(os.remove, f.name)
+
+        with override_settings(CPIMS_CODE_MAPPINGS_FILE=f.name):
+            code_mappings.reload_registry()
+            self.assertEqual(self.adapter._map_code("uncle", "relationship"), "ROFM")
+            # Built-in codes are still there
+            self.assertEqual(self.adapter._map_code("Teacher", "relationship"), "RCTC")
+
+
+CEEMIS_ASYNC_ENDPOINT_CONFIG = {
+    'ceemis_create': {'adapter': 'ceemis', 'queued': True},
+    'ceemis_case_update': {'adapter': 'ceemis', 'adapter_method': 'deliver_update', 'queued': True,
+                           'coalesce_seconds': 10},
+    'ceemis_to_helpline': {'adapter': 'ceemis', 'adapter_method': 'deliver_to_helpline', 'queued': True},
+}
+
+
+class CEEMISCorrelationTestCase(TestCase):
+    CASE = {"id": "H100", "src": "helpline", "src_uid": "U1", "src_callid": "CALL1",
+            "narrative": "Wages withheld", "case_category": "Wage Theft"}
+
+    def setUp(self):
+        cache.clear()
+        self.adapter = CEEMISAdapter()
+
+    def tearDown(self):
+        cache.clear()
+        AdapterFactory._adapter_instances.clear()
+
+    @patch('platform_adapters.ceemis.ceemis_adapter.http_client.post')
+    def test_created_case_is_correlated_and_updates_use_it(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=201, text='{"caseid": "MGLSD7093227"}')
+        mock_post.return_value.json.return_value = {"caseid": "MGLSD7093227"}
+
+        self.adapter.send_message("ceemis", self.CASE)
+        self.assertEqual(correlation.external_ref_for('ceemis', 'H100'), 'MGLSD7093227')
+
+        # The update's ref doesn't carry the CEEMIS ID; the correlation resolves it
+        self.adapter.send_message("ceemis", {"id": "H100", "ref": "helpline-100", "narrative": "Paid"})
+        self.assertEqual(mock_post.call_args.kwargs['files']['caseid'][1], 'MGLSD7093227')
+
+    def test_record_completes_existing_correlation(self):
+        correlation.record('ceemis', external_ref='MGLSD1', src_callid='CALL9',
+                           origin=CaseCorrelation.ORIGIN_PARTNER)
+        correlation.record('ceemis', helpline_case_id='H9', src_callid='CALL9')
+
+        self.assertEqual(CaseCorrelation.objects.count(), 1)
+        self.assertEqual(correlation.helpline_case_for('ceemis', 'MGLSD1'), 'H9')
+        self.assertEqual(CaseCorrelation.objects.get().origin, CaseCorrelation.ORIGIN_PARTNER)
+
+    @override_settings(ENDPOINT_CONFIG=CEEMIS_ASYNC_ENDPOINT_CONFIG)
+    @patch('platform_adapters.ceemis.ceemis_adapter.http_client.post')
+    def test_burst_of_updates_is_one_ceemis_call(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200, text='{}')
+        mock_post.return_value.json.return_value = {}
+        correlation.record('ceemis', helpline_case_id='H100', external_ref='MGLSD5')
+
+        results = [
+            self.adapter.submit_message({"id": "H100", "ref": "MGLSD5", "narrative": "Edit 1", "status": "1"}),
+            self.adapter.submit_message({"id": "H100", "ref": "MGLSD5", "narrative": "Edit 2"}),
+            self.adapter.submit_message({"id": "H100", "ref": "MGLSD5", "narrative": "Edit 3"}),
+        ]
+
+        self.assertEqual(mock_post.call_count, 0)
+        self.assertEqual([r['coalesced'] for r in results], [False, True, True])
+        outbound = OutboundMessage.objects.get()
+        self.assertGreater(outbound.available_at, timezone.now())
+
+        with patch.object(AdapterFactory, 'get_adapter', return_value=self.adapter):
+            MessageRouter().deliver(outbound)
+
+        self.assertEqual(mock_post.call_count, 1)
+        files = mock_post.call_args.kwargs['files']
+        self.assertEqual((files['caseid'][1], files['mw_narative'][1], files['status'][1]),
+                         ('MGLSD5', 'Edit 3', '1'))
+
+    @override_settings(ENDPOINT_CONFIG=CEEMIS_ASYNC_ENDPOINT_CONFIG, ENDPOINT_AUTH_TOKEN='token')
+    @patch('platform_adapters.ceemis.ceemis_adapter.http_client.post')
+    def test_ceemis_case_is_forwarded_async_and_correlated(self, mock_post):
+        form = {"caseid": "MGLSD42", "mw_name": "Jane", "mw_phone": "0700000000",
+                "comp_category": "Labor Abuse", "mw_narative": "Passport taken"}
+        mock_post.return_value = MagicMock(status_code=201, text='{}')
+        mock_post.return_value.json.return_value = {"cases": [["31661"]]}
+
+        result = self.adapter.submit_to_helpline(form)
+
+        self.assertEqual(result['status'], 'queued')
+        outbound = OutboundMessage.objects.get(pk=result['outbound_id'])
+        with patch.object(AdapterFactory, 'get_adapter', return_value=self.adapter):
+            MessageRouter().deliver(outbound)
+
+        sent = mock_post.call_args.kwargs['json']
+        self.assertEqual(sent['src_callid'], outbound.payload['src_callid'])
+        row = CaseCorrelation.objects.get()
+        self.assertEqual((row.helpline_case_id, row.external_ref, row.src_uid),
+                         ('31661', 'MGLSD42', outbound.payload['src_uid']))
+
+    @override_settings(ENDPOINT_CONFIG=CEEMIS_ASYNC_ENDPOINT_CONFIG, ENDPOINT_AUTH_TOKEN='token')
+    @patch('platform_adapters.ceemis.ceemis_adapter.http_client.post')
+    def test_unexpected_helpline_response_does_not_fail_the_send(self, mock_post):
+        form = {"caseid": "MGLSD43", "mw_name": "Jane", "comp_category": "Labor Abuse", "mw_narative": "Unpaid"}
+        mock_post.return_value = MagicMock(status_code=201, text='{}')
+        mock_post.return_value.json.return_value = {"cases": [[]]}
+
+        result = self.adapter.submit_to_helpline(form)
+        outbound = OutboundMessage.objects.get(pk=result['outbound_id'])
+        with patch.object(AdapterFactory, 'get_adapter', return_value=self.adapter):
+            MessageRouter().deliver(outbound)
+
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_DELIVERED)
+        self.assertEqual(mock_post.call_count, 1)
+        row = CaseCorrelation.objects.get()
+        self.assertEqual((row.helpline_case_id, row.external_ref), ('', 'MGLSD43'))
+
+
+@override_settings(CACHES=THREAD_SAFE_CACHES)
+class ChatbotSessionStoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+
+    def tearDown(self):
+        cache.clear()
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+
+    @override_settings(CHATBOT_SESSION_STORE={'LOCAL_TTL_SECONDS': 0})
+    def test_sessions_are_shared_between_workers(self):
+        worker_a, worker_b = ChatbotSessionStore('test'), ChatbotSessionStore('test')
+
+        worker_a.update('254700000001', {'user_language': 'sw'})
+        worker_b.update('254700000001', {'gestational_week': 20})
+
+        self.assertEqual(worker_a.get('254700000001'), {'user_language': 'sw', 'gestational_week': 20})
+
+    def test_concurrent_updates_are_not_lost(self):
+        workers = [ChatbotSessionStore('test') for _ in range(2)]
+
+        def add_answers(store, worker):
+            def add(session):
+                answers = session.setdefault('answers', [])
+                time.sleep(0.001)  # Give the other worker a chance to interleave
+                answers.append(worker)
+
+            for _ in range(10):
+                store.modify('254700000001', add)
+
+        threads = [threading.Thread(target=add_answers, args=(store, index)) for index, store in enumerate(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(len(ChatbotSessionStore('test').get('254700000001')['answers']), 20)
+
+    def test_callers_get_deep_copies(self):
+        store = ChatbotSessionStore('test')
+        store.set('254700000001', {'answers': ['yes']})
+
+        store.get('254700000001')['answers'].append('no')
+
+        self.assertEqual(store.get('254700000001'), {'answers': ['yes']})
+
+    def test_local_copies_are_bounded(self):
+        store = ChatbotSessionStore('test')
+        with override_settings(CHATBOT_SESSION_STORE={'LOCAL_MAX_ENTRIES': 2}):
+            for user_id in ('a', 'b', 'c'):
+                store.set(user_id, {'active': True})
+
+        self.assertEqual(list(store._local), ['b', 'c'])
+        # Evicted sessions are still in the shared cache
+        self.assertEqual(store.get('a'), {'active': True})
+
+    def test_session_check_queries_database_once(self):
+        Conversation.objects.create(sender_id='254700000002', platform='whatsapp', conversation_id='whatsapp-2',
+                                    is_active=True, metadata={'chatbot_active': True})
+        chatbot = MaternalHealthChatbot()
+
+        self.assertTrue(chatbot.is_active_session('254700000002'))
+        self.assertFalse(chatbot.is_active_session('254700000003'))
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+        with self.assertNumQueries(0):
+            self.assertTrue(MaternalHealthChatbot().is_active_session('254700000002'))
+            self.assertFalse(MaternalHealthChatbot().is_active_session('254700000003'))
+            self.assertEqual(chatbot.get_active_sessions(['254700000002', '254700000003']), {'254700000002'})
+
+    def test_user_data_survives_new_instances(self):
+        with patch.object(Conversation.objects, 'get_or_create', return_value=(MagicMock(), True)):
+            MaternalHealthChatbot().activate_session('254700000004')
+        MaternalHealthChatbot().process_command('254700000004', 'SW')
+        MaternalHealthChatbot().process_command('254700000004', 'WEEK 24')
+
+        self.assertEqual(MaternalHealthChatbot().get_user_data('254700000004'),
+                         {'user_language': 'sw', 'gestational_week': 24, 'is_postnatal': False})
+        self.assertTrue(MaternalHealthChatbot().is_active_session('254700000004'))
+
+
+def ollama_stream(*tokens):
+    """A streamed Ollama /api/generate response yielding the given tokens."""
+    response = MagicMock(status_code=200)
+    response.__enter__.return_value = response
+    lines = [json.dumps({'response': token, 'done': False}).encode() for token in tokens]
+    response.iter_lines.return_value = lines + [json.dumps({'response': '', 'done': True}).encode()]
+    return response
+
+
+@override_settings(CHATBOT_STREAMING={'ENABLED': True, 'MAX_WORKERS': 1, 'MIN_CHUNK_CHARS': 10})
+class ChatbotStreamingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+        self.chatbot = MaternalHealthChatbot()
+
+    def tearDown(self):
+        cache.clear()
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+        if MaternalHealthChatbot._stream_executor:
+            MaternalHealthChatbot._stream_executor.shutdown(wait=True)
+            MaternalHealthChatbot._stream_executor = None
+
+    def test_take_sentences(self):
+        self.assertEqual(take_sentences("Hi. Drink water daily. Rest", 10), ("Hi. Drink water daily.", "Rest"))
+        self.assertEqual(take_sentences("Drink water daily", 10), ("", "Drink water daily"))
+        self.assertEqual(take_sentences("Weigh 3.5 kg? Yes", 5), ("Weigh 3.5 kg?", "Yes"))
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_reply_is_split_at_sentence_boundaries(self, mock_post):
+        mock_post.return_value = ollama_stream("Eat ", "greens daily", ". Drink ", "water.\n", "See a ", "nurse")
+
+        parts = list(self.chatbot.stream_model_response('254700000010', 'What should I eat?'))
+
+        self.assertEqual(parts, ["Eat greens daily.", "Drink water.", "See a nurse"])
+        self.assertIs(json.loads(mock_post.call_args.kwargs['data'])['stream'], True)
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_failure_before_any_output_sends_fallback(self, mock_post):
+        mock_post.side_effect = requests.ConnectionError('refused')
+
+        parts = list(self.chatbot.stream_model_response('254700000010', 'What should I eat?'))
+
+        self.assertEqual(len(parts), 1)
+        self.assertIn("trouble connecting", parts[0])
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_questions_are_answered_in_background(self, mock_post):
+        mock_post.return_value = ollama_stream("Rest well tonight. ", "Drink water.")
+        sent, completed = [], []
+
+        self.assertFalse(self.chatbot.start_streaming_reply('254700000010', 'WEEK 20', sent.append))
+        self.assertTrue(self.chatbot.start_streaming_reply('254700000010', 'I feel tired', sent.append,
+                                                          on_complete=completed.append))
+        MaternalHealthChatbot._stream_executor.shutdown(wait=True)
+        MaternalHealthChatbot._stream_executor = None
+
+        self.assertEqual(sent, ["Rest well tonight.", "Drink water."])
+        self.assertEqual(completed, ["Rest well tonight.\nDrink water."])
+
+
+class ChatbotResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+        self.response_cache = ResponseCache()
+
+    def tearDown(self):
+        cache.clear()
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+
+    def test_answers_are_keyed_by_language_and_trimester(self):
+        self.response_cache.set("What should I eat?", "Greens.", 'en', gestational_week=8)
+
+        self.assertEqual(self.response_cache.get("what should i eat", 'en', gestational_week=10), "Greens.")
+        self.assertIsNone(self.response_cache.get("What should I eat?", 'sw', gestational_week=10))
+        self.assertIsNone(self.response_cache.get("What should I eat?", 'en', gestational_week=30))
+
+    def test_near_matches_must_mention_the_same_numbers(self):
+        self.response_cache.set("What happens in week 20 of pregnancy?", "Halfway!")
+
+        self.assertEqual(self.response_cache.get("what happens in week 20 of my pregnancy"), "Halfway!")
+        self.assertIsNone(self.response_cache.get("What happens in week 21 of pregnancy?"))
+        self.assertIsNone(self.response_cache.get("Is bleeding normal?"))
+        self.assertEqual(self.response_cache.stats()['near_hits'], 1)
+        self.assertEqual(self.response_cache.stats()['misses'], 2)
+
+    def test_near_matches_must_use_the_same_qualifiers(self):
+        pairs = [
+            ("Can I drink water while pregnant?", "Can I drink alcohol while pregnant?"),
+            ("Is it safe to eat raw fish?", "Is it safe to eat fish?"),
+            ("My baby is moving a lot", "My baby is not moving"),
+            ("I am not bleeding, is that normal?", "I am bleeding, is that normal?"),
+            ("Is light bleeding normal?", "Is heavy bleeding normal?"),
+        ]
+        for cached, asked in pairs:
+            self.response_cache.set(cached, f"About: {cached}")
+        for cached, asked in pairs:
+            self.assertIsNone(self.response_cache.get(asked), asked)
+
+        self.assertEqual(self.response_cache.get("is light bleeding normal"), "About: Is light bleeding normal?")
+
+    def test_lru_and_ttl_eviction(self):
+        with override_settings(CHATBOT_RESPONSE_CACHE={'MAX_ENTRIES': 2, 'SIMILARITY_THRESHOLD': 0}):
+            for question in ("bleeding", "headache", "swollen feet"):
+                self.response_cache.set(question, f"About {question}")
+            self.assertIsNone(self.response_cache.get("bleeding"))
+            self.assertEqual(self.response_cache.stats()['evictions'], 1)
+
+        with override_settings(CHATBOT_RESPONSE_CACHE={'TTL_SECONDS': -1}):
+            self.response_cache.set("back pain", "Rest.")
+            self.assertIsNone(self.response_cache.get("back pain"))
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_repeated_question_skips_the_model(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {'response': "[en] Response: Eat greens."}
+        chatbot = MaternalHealthChatbot()
+
+        first = chatbot.get_model_response('254700000020', 'What should I eat?')
+        second = chatbot.get_model_response('254700000021', 'what should i eat')
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(chatbot_adapter.RESPONSE_CACHE.stats()['hit_rate'], 0.5)
+
+        # When the model is down, a merely similar question gets the generic fallback, not a cached answer
+        mock_post.side_effect = ValueError('bad response')
+        fallback = chatbot.get_model_response('254700000020', 'what should I eat today?')
+        self.assertNotEqual(fallback, "[en] Response: Eat greens.")
+        self.assertIn("Good nutrition during pregnancy", fallback)
+
+
+@override_settings(CACHES=THREAD_SAFE_CACHES)
+class ModelGatewayTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+        self.gateway = ModelGateway()
+
+    def tearDown(self):
+        cache.clear()
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def test_message_priority(self):
+        self.assertEqual(message_priority("I am bleeding heavily"), PRIORITY_EMERGENCY)
+        self.assertEqual(message_priority("Nina damu nyingi"), PRIORITY_EMERGENCY)
+        self.assertEqual(message_priority("What are the benefits of iron?"), PRIORITY_NORMAL)
+
+    def test_identical_prompts_in_flight_share_one_call(self):
+        release = threading.Event()
+        calls, results = [], []
+
+        def generate():
+            calls.append(1)
+            release.wait(5)
+            return "Rest."
+
+        threads = [threading.Thread(target=lambda: results.append(self.gateway.call("prompt", generate)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.wait_for(lambda: self.gateway.stats()['coalesced'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["Rest."] * 3)
+
+    @override_settings(CHATBOT_MODEL_GATEWAY={'MAX_CONCURRENT': 1, 'MAX_QUEUE_DEPTH': 1})
+    def test_emergencies_go_first_and_full_queue_sheds(self):
+        release = threading.Event()
+        order = []
+
+        def run(key, priority):
+            self.gateway.call(key, lambda: order.append(key) or release.wait(5), priority)
+
+        busy = threading.Thread(target=run, args=("busy", PRIORITY_NORMAL))
+        busy.start()
+        self.wait_for(lambda: self.gateway.stats()['active'] == 1)
+        normal = threading.Thread(target=run, args=("normal", PRIORITY_NORMAL))
+        normal.start()
+        self.wait_for(lambda: self.gateway.stats()['queued'] == 1)
+
+        with self.assertRaises(ModelOverloaded):
+            self.gateway.call("shed", lambda: None)
+        emergency = threading.Thread(target=run, args=("emergency", PRIORITY_EMERGENCY))
+        emergency.start()
+        self.wait_for(lambda: self.gateway.stats()['queued'] == 2)
+
+        release.set()
+        for thread in (busy, normal, emergency):
+            thread.join(5)
+        self.assertEqual(order, ["busy", "emergency", "normal"])
+        self.assertEqual(self.gateway.stats()['shed'], 1)
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_overloaded_model_answers_from_fallbacks(self, mock_post):
+        chatbot = MaternalHealthChatbot()
+        with patch.object(chatbot_adapter.MODEL_GATEWAY, '_acquire', side_effect=ModelOverloaded("full")):
+            response = chatbot.get_model_response('254700000010', 'What food is good for me?')
+
+        mock_post.assert_not_called()
+        self.assertIn("Good nutrition during pregnancy", response)
+
+
+class ChatbotPromptBuilderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+        self.chatbot = MaternalHealthChatbot()
+
+    def tearDown(self):
+        cache.clear()
+        chatbot_adapter.SESSION_STORE.clear_local()
+        chatbot_adapter.CONVERSATION_HISTORY.store.clear_local()
+        chatbot_adapter.RESPONSE_CACHE.clear()
+
+    def model_reply(self, text, context=None):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'response': text, **({'context': context} if context else {})}
+        return response
+
+    def test_system_prompt_is_rendered_once_per_language(self):
+        self.assertIs(prompt_builder.system_prompt('sw'), prompt_builder.system_prompt('sw'))
+        self.assertIn("[sw] Response:", prompt_builder.system_prompt('sw'))
+
+        request = prompt_builder.build_request("Hi", 'en', 20, False, {'turns': [["Q1", "A1"]]})
+        self.assertTrue(request['prompt'].startswith(prompt_builder.system_prompt('en')))
+        self.assertIn("is 20 weeks pregnant", request['prompt'])
+        self.assertTrue(request['prompt'].endswith("User: Q1\nMamaCare: A1\nUser: Hi"))
+
+    @override_settings(CHATBOT_PROMPT={'HISTORY_TURNS': 2, 'REUSE_MODEL_CONTEXT': False})
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_history_window_is_bounded(self, mock_post):
+        for number in range(3):
+            mock_post.return_value = self.model_reply(f"Answer {number}")
+            self.chatbot.get_model_response('254700000030', f"Question {number}?")
+
+        mock_post.return_value = self.model_reply("Answer 3")
+        self.chatbot.get_model_response('254700000030', "Question 3?")
+
+        prompt = json.loads(mock_post.call_args.kwargs['data'])['prompt']
+        self.assertNotIn("Question 0", prompt)
+        self.assertIn("User: Question 1?\nMamaCare: Answer 1\nUser: Question 2?\nMamaCare: Answer 2\nUser: Question 3?",
+                      prompt)
+        # Answers that depended on earlier turns aren't shared
+        self.assertEqual(chatbot_adapter.RESPONSE_CACHE.stats()['stores'], 1)
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_follow_up_questions_skip_the_response_cache(self, mock_post):
+        mock_post.return_value = self.model_reply("Fish is a good source of protein.")
+        self.chatbot.get_model_response('254700000032', "What about fish?")
+
+        mock_post.return_value = self.model_reply("Avoid raw or undercooked fish.")
+        self.chatbot.get_model_response('254700000033', "Is sushi safe?")
+        answer = self.chatbot.get_model_response('254700000033', "What about fish?")
+
+        self.assertEqual(answer, "Avoid raw or undercooked fish.")
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertIn("User: Is sushi safe?", json.loads(mock_post.call_args.kwargs['data'])['prompt'])
+
+    @patch('platform_adapters.whatsApp.chatbot_adapter.http_client.post')
+    def test_model_context_is_reused_until_user_context_changes(self, mock_post):
+        mock_post.return_value = self.model_reply("Eat greens.", context=[1, 2, 3])
+        self.chatbot.get_model_response('254700000031', "What should I eat?")
+
+        mock_post.return_value = self.model_reply("Yes, beans too.", context=[1, 2, 3, 4, 5])
+        self.chatbot.get_model_response('254700000031', "Beans?")
+        payload = json.loads(mock_post.call_args.kwargs['data'])
+        self.assertEqual(payload['prompt'], "User: Beans?")
+        self.assertEqual(payload['context'], [1, 2, 3])
+
+        self.chatbot.update_user_data('254700000031', gestational_week=30)
+        self.chatbot.get_model_response('254700000031', "And fish?")
+        payload = json.loads(mock_post.call_args.kwargs['data'])
+        self.assertNotIn('context', payload)
+        self.assertIn("MamaCare: Yes, beans too.\nUser: And fish?", payload['prompt'])
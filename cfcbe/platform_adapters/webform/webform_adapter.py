@@ -6,15 +6,15 @@ import uuid
 import time
 import logging
 from datetime import datetime
-import requests
+from shared import http_client
 from datetime import datetime
 import logging
-import requests
 import csv
 from django.http import JsonResponse, HttpResponse
 
 
 from platform_adapters.base_adapter import BaseAdapter
+from platform_adapters.reference_snapshot import get_snapshot
 from shared.models.standard_message import StandardMessage
 
 
@@ -320,13 +320,26 @@ class WebformAdapter(BaseAdapter):
         platform_configs = getattr(settings, 'PLATFORM_CONFIGS', {})
         return platform_configs.get('webform', {})
     
-    def get_categories(self) -> Dict[str, Any]:
+    def _from_snapshot(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a helpline reference result from the offline snapshot, if one is loaded and not too old."""
+        snapshot = get_snapshot()
+        return snapshot.get_data('helpline', key) if snapshot else None
+
+    def get_categories(self, use_snapshot: bool = True) -> Dict[str, Any]:
         """
         Fetch categories from the external API and format them for easy use.
 
+        Args:
+            use_snapshot: Serve the categories from the reference snapshot when available
+
         Returns:
             Dictionary containing categories with their IDs, names, and subcategories
         """
+        if use_snapshot:
+            snapshot_result = self._from_snapshot('categories')
+            if snapshot_result is not None:
+                return snapshot_result
+
         try:
             # Get configuration
             auth_token = self.config.get('api_token')
@@ -349,7 +362,7 @@ class WebformAdapter(BaseAdapter):
             
             # Make API request
             logger.info(f"Fetching categories from {url}")
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             
             # Check response
             if response.status_code == 200:
@@ -394,16 +407,22 @@ class WebformAdapter(BaseAdapter):
                 'error': str(e)
             }
     
-    def get_subcategories(self, category_id: int) -> Dict[str, Any]:
+    def get_subcategories(self, category_id: int, use_snapshot: bool = True) -> Dict[str, Any]:
         """
         Fetch subcategories for a specific category from the external API.
 
         Args:
             category_id (int): The ID of the category for which subcategories are fetched.
+            use_snapshot (bool): Serve the subcategories from the reference snapshot when available.
 
         Returns:
             dict: Dictionary containing subcategories with their IDs and names.
         """
+        if use_snapshot:
+            snapshot_result = self._from_snapshot(f"subcategories:{category_id}")
+            if snapshot_result is not None:
+                return snapshot_result
+
         try:
             # Get API token from configuration
             auth_token = self.config.get('api_token')
@@ -426,7 +445,7 @@ class WebformAdapter(BaseAdapter):
 
             # Fetch data from API
             logger.info(f"Fetching subcategories for category ID {category_id} from {url}")
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
 
             if response.status_code == 200:
                 data = response.json()
@@ -461,15 +480,23 @@ class WebformAdapter(BaseAdapter):
                 'status': 'error',
                 'error': str(e)
             }
-    def export_all_locations(self) -> dict:
+    def export_all_locations(self, use_snapshot: bool = True) -> dict:
         """
         Exports all locations from the system in a hierarchical structure.
         This function traverses the entire location hierarchy, starting from regions,
         and builds a complete tree of all locations with their IDs.
         
+        Args:
+            use_snapshot (bool): Serve the hierarchy from the reference snapshot when available.
+
         Returns:
             dict: A dictionary containing the full location hierarchy with IDs
         """
+        if use_snapshot:
+            snapshot_result = self._from_snapshot('locations')
+            if snapshot_result is not None:
+                return snapshot_result
+
         try:
             # Get API token from configuration
             auth_token = self.config.get('api_token')
@@ -508,7 +535,7 @@ class WebformAdapter(BaseAdapter):
                 
                 # Fetch data for the current location
                 url = f"{base_url}{location_id}"
-                response = requests.get(url, headers=headers)
+                response = http_client.get(url, headers=headers)
                 
                 if response.status_code != 200:
                     logger.error(f"{indent}API error when fetching location {location_id}: {response.status_code}")
@@ -693,7 +720,7 @@ class WebformAdapter(BaseAdapter):
                 
                 # Fetch data for the current category
                 url = f"{base_url}{category_id}"
-                response = requests.get(url, headers=headers)
+                response = http_client.get(url, headers=headers)
                 
                 if response.status_code != 200:
                     logger.error(f"{indent}API error when fetching case category {category_id}: {response.status_code}")
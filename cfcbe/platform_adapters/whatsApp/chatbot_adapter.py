@@ -1,14 +1,73 @@
 from datetime import datetime
 import json
+import re
+import threading
 import requests
+from shared import http_client
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
-from typing import Dict, Any, List, Optional
+from django.db import connection
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
+from platform_adapters.whatsApp import prompt_builder
+from platform_adapters.whatsApp.model_gateway import ModelGateway, ModelOverloaded, message_priority
+from platform_adapters.whatsApp.prompt_builder import ConversationHistory
+from platform_adapters.whatsApp.response_cache import ResponseCache
+from platform_adapters.whatsApp.session_store import ChatbotSessionStore
 from webhook_handler.models import Conversation
 
 logger = logging.getLogger(__name__)
 
+# Chatbot sessions (active flag and user context), shared by all workers
+SESSION_STORE = ChatbotSessionStore('mamacare')
+
+# Recent questions and answers per user, sent back to the model
+CONVERSATION_HISTORY = ConversationHistory(ChatbotSessionStore('mamacare_history'))
+
+# Model answers to common questions
+RESPONSE_CACHE = ResponseCache()
+
+# Concurrency limit, priority queue and coalescing in front of the model server
+MODEL_GATEWAY = ModelGateway()
+
+# User context for users who haven't set anything yet
+DEFAULT_USER_DATA = {
+    'user_language': 'en',
+    'gestational_week': None,
+    'is_postnatal': False
+}
+
+# Keywords answered by process_command() rather than the model
+COMMAND_KEYWORDS = {"HEALTH", "EXIT", "LANGUAGE", "EN", "SW", "SH", "EMERGENCY"}
+
+# End of a sentence (with any closing quotes/brackets) or of a line in streamed output
+SENTENCE_BOUNDARY = re.compile(r'[.!?]["\')\]]*\s+|\n+')
+
+
+def is_command(message: str) -> bool:
+    """Check whether a message is a chatbot command keyword."""
+    message_upper = message.strip().upper()
+    return message_upper in COMMAND_KEYWORDS or message_upper.startswith("WEEK ")
+
+
+def take_sentences(text: str, min_chars: int) -> Tuple[str, str]:
+    """
+    Split complete sentences off the front of streamed text.
+    
+    Args:
+        text: Text received so far
+        min_chars: Smallest part worth sending on its own
+        
+    Returns:
+        (part to send, remaining text); the part is empty until at least
+        min_chars of complete sentences are available
+    """
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        if match.start() + 1 >= min_chars:
+            return text[:match.end()].strip(), text[match.end():]
+    return "", text
+
 class MaternalHealthChatbot:
     """
     A WhatsApp chatbot that handles maternal health inquiries by forwarding messages
@@ -19,13 +78,50 @@ class MaternalHealthChatbot:
     2. Forwards messages to the Mistral API
     3. Sends responses back to users
     4. Handles special keywords for conversation flows
+    
+    Session state lives in SESSION_STORE, so every instance and worker
+    process sees the same sessions.
     """
     
+    # Shared pool for streamed replies, created on first use
+    _stream_executor = None
+    _stream_executor_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize the chatbot with configuration."""
         self.model_endpoint = getattr(settings, 'MISTRAL_API_ENDPOINT', 'http://192.168.8.18:11434/api/generate')
-        self.user_data = {}  # Store user context (language, pregnancy week, etc.)
-        self.active_sessions = set()  # Track active chatbot sessions
+    
+    def get_user_data(self, user_wa_id: str) -> Dict[str, Any]:
+        """
+        Get the user's context (language, pregnancy week, etc.), with defaults filled in.
+        
+        Args:
+            user_wa_id: WhatsApp ID of the user
+            
+        Returns:
+            User context
+        """
+        session = SESSION_STORE.get(user_wa_id) or {}
+        return {key: session.get(key, default) for key, default in DEFAULT_USER_DATA.items()}
+    
+    def update_user_data(self, user_wa_id: str, **changes) -> None:
+        """
+        Save changes to the user's context.
+        
+        Args:
+            user_wa_id: WhatsApp ID of the user
+            **changes: Context fields to set
+        """
+        SESSION_STORE.update(user_wa_id, changes)
+    
+    def _cache_context(self, user_wa_id: str) -> Dict[str, Any]:
+        """The user context answers are cached by (language and pregnancy stage)."""
+        user_data = self.get_user_data(user_wa_id)
+        return {
+            'language': user_data['user_language'],
+            'gestational_week': user_data['gestational_week'],
+            'is_postnatal': user_data['is_postnatal']
+        }
     
     def _generate_system_prompt(self, user_wa_id: str) -> str:
         """
@@ -37,61 +133,73 @@ class MaternalHealthChatbot:
         Returns:
             System prompt with user context
         """
-        # Get user data or use defaults
-        user_language = self.user_data.get(user_wa_id, {}).get('user_language', 'en')
-        gestational_week = self.user_data.get(user_wa_id, {}).get('gestational_week', None)
-        is_postnatal = self.user_data.get(user_wa_id, {}).get('is_postnatal', False)
+        context = self._cache_context(user_wa_id)
+        return f"{prompt_builder.system_prompt(context['language'])}\n{prompt_builder.user_context(**context)}"
+    
+    def _build_model_request(self, user_message: str, cache_context: Dict[str, Any], history: Dict[str, Any],
+                             stream: bool) -> Dict[str, Any]:
+        """
+        Build the model request for a message, with the user's recent conversation.
         
-        # Construct context
-        context = {
-            "user_language": user_language,
-            "gestational_week": gestational_week,
-            "is_postnatal": is_postnatal
+        Args:
+            user_message: Message from the user
+            cache_context: User context from _cache_context()
+            history: The user's conversation from CONVERSATION_HISTORY.get()
+            stream: Whether to stream the reply
+            
+        Returns:
+            Request payload
+        """
+        return {
+            "model": "mistral",
+            **prompt_builder.build_request(user_message, history=history, **cache_context),
+            "stream": stream
         }
+    
+    def _get_cached_response(self, user_wa_id: str, user_message: str, cache_context: Dict[str, Any],
+                             history: Dict[str, Any]) -> Optional[str]:
+        """
+        Answer a message from the response cache, if it can be.
         
-        # Create system prompt with context - enhanced for strict maternal health focus
-        system_prompt = (
-            "You are \"MamaCare\", a specialized maternal health assistant for Kenyan women. "
-            "Your sole purpose is to provide factual, evidence-based information about pregnancy, "
-            "childbirth, postnatal care, and infant health. "
-            f"Context: {json.dumps(context)}\n\n"
-            
-            "IMPORTANT CONSTRAINTS:\n"
-            "- ONLY respond to questions related to maternal health, pregnancy, childbirth, postnatal care, and infant health.\n"
-            "- If asked about ANY other topic, politely redirect to maternal health and suggest relevant topics.\n"
-            "- Do NOT engage with political, religious, entertainment, or other non-medical topics.\n"
-            "- Do NOT provide financial advice, relationship counseling, or career guidance.\n"
-            "- FOCUS exclusively on maternal health education and support.\n\n"
-            
-            "COMMUNICATION STYLE:\n"
-            "- Use simple, actionable language (Grade 4 reading level)\n"
-            "- Differentiate between \"normal\" vs \"warning\" symptoms in medical information\n"
-            "- Include emojis sparingly for warmth (e.g., 👶, 🏥)\n"
-            "- Cite sources when possible (e.g., \"WHO recommends...\")\n"
-            "- For emergencies, say: \"URGENT: Contact clinic NOW at [local emergency number]\"\n\n"
-            
-            f"FORMAT RESPONSES AS:\n[{user_language}] Response: [Your reply]\n\n"
-            
-            "CRITICAL HEALTH GUIDANCE:\n"
-            "- For specific medical questions: \"Please consult your healthcare provider about [topic].\"\n"
-            "- For emergency symptoms: \"This requires immediate medical attention. Go to the nearest hospital.\"\n"
-            "- Always emphasize the importance of regular antenatal care visits.\n"
-            "- Provide evidence-based information from WHO, CDC, or other reputable health organizations.\n"
-            "- Maintain cultural sensitivity to Kenyan maternal health traditions while promoting safe practices."
-        )
+        Follow-up questions are never answered from the cache: "what about
+        fish?" means something different in each conversation, and the cache
+        only holds answers given without earlier turns.
         
-        return system_prompt
+        Args:
+            user_wa_id: WhatsApp ID of the user
+            user_message: Message from the user
+            cache_context: User context from _cache_context()
+            history: The user's conversation from CONVERSATION_HISTORY.get()
+            
+        Returns:
+            The cached answer, or None
+        """
+        if history['turns']:
+            return None
+        cached = RESPONSE_CACHE.get(user_message, **cache_context)
+        if cached is not None:
+            logger.info(f"Answered {user_wa_id} from the response cache")
+            self._remember_turn(user_wa_id, user_message, cached, cache_context)
+        return cached
+    
+    def _remember_turn(self, user_wa_id: str, user_message: str, answer: str, cache_context: Dict[str, Any],
+                       model_context: Optional[List[int]] = None) -> None:
+        """Add an answered question to the user's conversation history."""
+        CONVERSATION_HISTORY.add_turn(user_wa_id, user_message, answer, model_context,
+                                      prompt_builder.context_key(**cache_context))
     
     def is_active_session(self, user_id: str) -> bool:
         """
         Check if the user has an active chatbot session.
-        First checks in-memory set, then falls back to database if needed.
+        Checks the session store first and only falls back to the database
+        for users it knows nothing about, remembering the answer either way.
         """
-        # First check in-memory set
-        if user_id in self.active_sessions:
-            return True
+        session = SESSION_STORE.get(user_id)
+        if session is not None and 'active' in session:
+            return session['active']
             
-        # If not found in memory, check database
+        # Not in the session store, check database
+        active = False
         try:
             # Check if a conversation exists with chatbot metadata
             conversation = Conversation.objects.filter(
@@ -103,28 +211,55 @@ class MaternalHealthChatbot:
             if conversation and conversation.metadata:
                 # Check if there's chatbot_active flag in metadata
                 metadata = conversation.metadata
-                if isinstance(metadata, dict) and metadata.get('chatbot_active') is True:
-                    # Sync with in-memory set
-                    self.active_sessions.add(user_id)
-                    return True
+                active = isinstance(metadata, dict) and metadata.get('chatbot_active') is True
         except Exception as e:
             logger.error(f"Error checking chatbot session in database: {str(e)}")
+            return False
         
-        return False
+        SESSION_STORE.update(user_id, {'active': active})
+        return active
+
+    def get_active_sessions(self, user_ids) -> set:
+        """
+        Check many users for active chatbot sessions with a single query.
+        Same rules as is_active_session(), for batch webhook ingestion.
+        """
+        user_ids = set(user_ids)
+        sessions = SESSION_STORE.get_many(user_ids)
+        active = {user_id for user_id, session in sessions.items() if session.get('active')}
+        remaining = {user_id for user_id in user_ids if 'active' not in sessions.get(user_id, {})}
+        if not remaining:
+            return active
+
+        try:
+            seen = set()
+            conversations = Conversation.objects.filter(
+                sender_id__in=remaining,
+                platform='whatsapp',
+                is_active=True
+            ).order_by('pk').values_list('sender_id', 'metadata')
+
+            for sender_id, metadata in conversations:
+                # Like is_active_session(), only the first active conversation counts
+                if sender_id in seen:
+                    continue
+                seen.add(sender_id)
+                if isinstance(metadata, dict) and metadata.get('chatbot_active') is True:
+                    active.add(sender_id)
+        except Exception as e:
+            logger.error(f"Error checking chatbot sessions in database: {str(e)}")
+            return active
+
+        for user_id in remaining:
+            SESSION_STORE.update(user_id, {'active': user_id in active})
+
+        return active
 
     def activate_session(self, user_id: str) -> None:
         """
         Activate a chatbot session for the user.
         """
-        self.active_sessions.add(user_id)
-        
-        # Initialize user data if not exists
-        if user_id not in self.user_data:
-            self.user_data[user_id] = {
-                'user_language': 'en',
-                'gestational_week': None,
-                'is_postnatal': False
-            }
+        SESSION_STORE.update(user_id, {'active': True}, defaults=DEFAULT_USER_DATA)
         
         # Also store in database for persistence
         try:
@@ -156,8 +291,8 @@ class MaternalHealthChatbot:
         Args:
             user_id: WhatsApp ID of the user
         """
-        if user_id in self.active_sessions:
-            self.active_sessions.remove(user_id)
+        SESSION_STORE.update(user_id, {'active': False})
+        CONVERSATION_HISTORY.clear(user_id)
         
         # Also update database
         try:
@@ -186,14 +321,6 @@ class MaternalHealthChatbot:
         Returns:
             Response message to send to the user
         """
-        # Set default user data for new users
-        if user_wa_id not in self.user_data:
-            self.user_data[user_wa_id] = {
-                'user_language': 'en',
-                'gestational_week': None,
-                'is_postnatal': False
-            }
-        
         # Welcome message for the maternal health flow
         welcome_message = (
             "[English] Response: Welcome to MamaCare, your maternal health assistant! 👶\n\n"
@@ -225,13 +352,7 @@ class MaternalHealthChatbot:
         """
         message_upper = message.strip().upper()
         
-        # Initialize user data if not exists
-        if user_wa_id not in self.user_data:
-            self.user_data[user_wa_id] = {
-                'user_language': 'en',
-                'gestational_week': None,
-                'is_postnatal': False
-            }
+        user_language = self.get_user_data(user_wa_id)['user_language']
         
         # Handle the HEALTH keyword
         if message_upper == "HEALTH":
@@ -240,7 +361,7 @@ class MaternalHealthChatbot:
         # Handle EXIT keyword to end the session
         if message_upper == "EXIT":
             self.deactivate_session(user_wa_id)
-            return f"[{self.user_data[user_wa_id]['user_language']}] Response: You've exited the maternal health assistant. If you need help with maternal health in the future, just send 'HEALTH' to start again."
+            return f"[{user_language}] Response: You've exited the maternal health assistant. If you need help with maternal health in the future, just send 'HEALTH' to start again."
         
         # Handle language change
         if message_upper == "LANGUAGE":
@@ -254,7 +375,8 @@ class MaternalHealthChatbot:
         # Set language preference
         if message_upper in ["EN", "SW", "SH"]:
             language_map = {"EN": "en", "SW": "sw", "SH": "sh"}
-            self.user_data[user_wa_id]['user_language'] = language_map.get(message_upper, "en")
+            user_language = language_map.get(message_upper, "en")
+            self.update_user_data(user_wa_id, user_language=user_language)
             
             response_messages = {
                 "en": "[English] Response: Language set to English! How can I help you today?",
@@ -262,24 +384,24 @@ class MaternalHealthChatbot:
                 "sh": "[Sheng] Response: Sasa tunaongea kwa Sheng! Nikupee usaidizi aje leo?"
             }
             
-            return response_messages[self.user_data[user_wa_id]['user_language']]
+            return response_messages[user_language]
         
         # Set pregnancy week
         if message_upper.startswith("WEEK "):
             try:
                 week = int(message_upper.replace("WEEK ", ""))
                 if 1 <= week <= 42:
-                    self.user_data[user_wa_id]['gestational_week'] = week
-                    return f"[{self.user_data[user_wa_id]['user_language']}] Response: Thanks! I've updated your pregnancy to week {week}. 👶"
+                    self.update_user_data(user_wa_id, gestational_week=week)
+                    return f"[{user_language}] Response: Thanks! I've updated your pregnancy to week {week}. 👶"
                 else:
-                    return f"[{self.user_data[user_wa_id]['user_language']}] Response: Please enter a valid pregnancy week between 1 and 42."
+                    return f"[{user_language}] Response: Please enter a valid pregnancy week between 1 and 42."
             except ValueError:
-                return f"[{self.user_data[user_wa_id]['user_language']}] Response: Please provide a valid number, e.g., \"WEEK 24\"."
+                return f"[{user_language}] Response: Please provide a valid number, e.g., \"WEEK 24\"."
         
         # Handle emergency keyword
         if message_upper == "EMERGENCY":
             return (
-                f"[{self.user_data[user_wa_id]['user_language']}] Response: ⚠️ URGENT: For maternal emergencies, contact your clinic immediately! ⚠️\n\n"
+                f"[{user_language}] Response: ⚠️ URGENT: For maternal emergencies, contact your clinic immediately! ⚠️\n\n"
                 "Warning signs that require immediate attention:\n"
                 "- Severe bleeding\n"
                 "- Severe headache with vision changes\n"
@@ -306,26 +428,31 @@ class MaternalHealthChatbot:
             Generated response from the model
         """
         try:
-            # Generate system prompt with user context
-            system_prompt = self._generate_system_prompt(user_wa_id)
+            # Common questions that open a conversation are answered from the response cache
+            cache_context = self._cache_context(user_wa_id)
+            history = CONVERSATION_HISTORY.get(user_wa_id)
+            cached = self._get_cached_response(user_wa_id, user_message, cache_context, history)
+            if cached is not None:
+                return cached
             
-            # Prepare request payload
-            payload = {
-                "model": "mistral",
-                "prompt": f"{system_prompt}\n\nUser: {user_message}",
-                "stream": False
-            }
+            # Prepare request payload with the system prompt, user context and recent conversation
+            payload = self._build_model_request(user_message, cache_context, history, stream=False)
             
             # Add timeout and debug logging
             logger.info(f"Sending request to Mistral API: {self.model_endpoint}")
             logger.debug(f"Payload: {json.dumps(payload)}")
             
-            # Make request to model API with increased timeout
-            response = requests.post(
-                self.model_endpoint,
-                headers={"Content-Type": "application/json"},
-                data=json.dumps(payload),
-                timeout=60  # Increased timeout to 60 seconds
+            # Make request to model API with increased timeout, through the
+            # gateway so identical prompts in flight share one generation
+            response = MODEL_GATEWAY.call(
+                (payload["prompt"], tuple(payload.get("context", ()))),
+                lambda: http_client.post(
+                    self.model_endpoint,
+                    headers={"Content-Type": "application/json"},
+                    data=json.dumps(payload),
+                    timeout=60  # Increased timeout to 60 seconds
+                ),
+                priority=message_priority(user_message)
             )
             
             # Log the response status
@@ -337,7 +464,12 @@ class MaternalHealthChatbot:
                 logger.debug(f"Mistral API raw response: {json.dumps(response_data)}")
                 
                 if 'response' in response_data:
-                    # Request successful, return the response
+                    # Request successful, return the response. Only answers
+                    # that didn't depend on earlier turns are shared
+                    if not history['turns']:
+                        RESPONSE_CACHE.set(user_message, response_data['response'], **cache_context)
+                    self._remember_turn(user_wa_id, user_message, response_data['response'], cache_context,
+                                        response_data.get('context'))
                     return response_data['response']
                 else:
                     # Unexpected response format, log and return error
@@ -356,6 +488,11 @@ class MaternalHealthChatbot:
                 # Return a fallback response instead of generic error
                 return self._get_fallback_response(user_wa_id, user_message)
                     
+        except ModelOverloaded:
+            # The model is at capacity; answer from the fallbacks rather than wait
+            logger.warning(f"Mistral API overloaded, sending {user_wa_id} a fallback response")
+            return self._get_fallback_response(user_wa_id, user_message)
+        
         except requests.exceptions.Timeout:
             # Handle timeout specifically
             logger.error("Mistral API request timed out after 60 seconds")
@@ -371,6 +508,161 @@ class MaternalHealthChatbot:
             logger.exception(f"Error getting Mistral API response: {str(e)}")
             return self._get_fallback_response(user_wa_id, user_message)
 
+    @staticmethod
+    def _get_streaming_config() -> Dict[str, Any]:
+        config = {
+            'ENABLED': False,
+            'MAX_WORKERS': 4,
+            'MIN_CHUNK_CHARS': 80,
+            'CONNECT_TIMEOUT': 5,
+            'READ_TIMEOUT': 60,
+        }
+        config.update(getattr(settings, 'CHATBOT_STREAMING', {}))
+        return config
+    
+    def is_streaming_enabled(self) -> bool:
+        """Whether model replies are streamed to users in parts."""
+        return bool(self._get_streaming_config()['ENABLED'])
+    
+    @classmethod
+    def _get_stream_executor(cls) -> ThreadPoolExecutor:
+        with cls._stream_executor_lock:
+            if cls._stream_executor is None:
+                cls._stream_executor = ThreadPoolExecutor(
+                    max_workers=cls._get_streaming_config()['MAX_WORKERS'], thread_name_prefix='chatbot-stream'
+                )
+            return cls._stream_executor
+    
+    def start_streaming_reply(self, user_wa_id: str, message_text: str, send_reply: Callable[[str], Any],
+                              on_complete: Optional[Callable[[str], Any]] = None) -> bool:
+        """
+        Answer a question in the background, sending the reply in sentence-sized parts.
+        
+        Commands are not streamed; they are answered instantly by process_message().
+        
+        Args:
+            user_wa_id: WhatsApp ID of the user
+            message_text: The user's question
+            send_reply: Called with each part of the reply as it is generated
+            on_complete: Called with the whole reply once it has been sent
+            
+        Returns:
+            True if the reply was scheduled, False if the caller should use process_message()
+        """
+        if not self.is_streaming_enabled() or is_command(message_text):
+            return False
+        
+        self._get_stream_executor().submit(self._stream_reply, user_wa_id, message_text, send_reply, on_complete)
+        logger.info(f"Streaming chatbot reply to {user_wa_id} in the background")
+        return True
+    
+    def _stream_reply(self, user_wa_id: str, message_text: str, send_reply: Callable[[str], Any],
+                      on_complete: Optional[Callable[[str], Any]]) -> None:
+        parts = []
+        try:
+            for part in self.stream_model_response(user_wa_id, message_text):
+                parts.append(part)
+                send_reply(part)
+            if on_complete:
+                on_complete("\n".join(parts))
+        except Exception as e:
+            logger.exception(f"Error streaming chatbot reply to {user_wa_id}: {str(e)}")
+        finally:
+            # Worker threads hold their own DB connections
+            connection.close()
+    
+    def stream_model_response(self, user_wa_id: str, user_message: str) -> Iterator[str]:
+        """
+        Get the model's reply as it is generated, split at sentence boundaries.
+        
+        Parts are at least CHATBOT_STREAMING['MIN_CHUNK_CHARS'] long, except
+        the last. If the model fails before saying anything, the same
+        fallback messages as get_model_response() are yielded instead.
+        
+        Args:
+            user_wa_id: WhatsApp ID of the user
+            user_message: Message from the user
+            
+        Yields:
+            Parts of the reply
+        """
+        cache_context = self._cache_context(user_wa_id)
+        history = CONVERSATION_HISTORY.get(user_wa_id)
+        cached = self._get_cached_response(user_wa_id, user_message, cache_context, history)
+        if cached is not None:
+            yield cached
+            return
+        
+        config = self._get_streaming_config()
+        payload = self._build_model_request(user_message, cache_context, history, stream=True)
+        
+        buffer = ""
+        parts = []
+        complete = False
+        model_context = None
+        failure = None
+        try:
+            logger.info(f"Streaming request to Mistral API: {self.model_endpoint}")
+            # The slot is held until the reply is complete. The read timeout
+            # applies between tokens, not to the whole reply
+            with MODEL_GATEWAY.slot(message_priority(user_message)), http_client.post(
+                self.model_endpoint,
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(payload),
+                stream=True,
+                timeout=(config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(f"Mistral API request failed with status {response.status_code}: {response.text}")
+                else:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if 'error' in chunk:
+                            logger.error(f"Mistral API error: {chunk['error']}")
+                            break
+                        
+                        buffer += chunk.get('response', '')
+                        part, buffer = take_sentences(buffer, config['MIN_CHUNK_CHARS'])
+                        while part:
+                            parts.append(part)
+                            yield part
+                            part, buffer = take_sentences(buffer, config['MIN_CHUNK_CHARS'])
+                        
+                        if chunk.get('done'):
+                            complete = True
+                            model_context = chunk.get('context')
+                            break
+        
+        except ModelOverloaded:
+            logger.warning(f"Mistral API overloaded, sending {user_wa_id} a fallback response")
+        
+        except requests.exceptions.Timeout:
+            logger.error(f"Mistral API stream stalled for {config['READ_TIMEOUT']} seconds")
+            failure = "[English] Response: I'm sorry, but the response is taking longer than expected. Let me know if you'd like general information about maternal health while we work on fixing this issue."
+        
+        except requests.exceptions.ConnectionError:
+            logger.error(f"Connection error to Mistral API at {self.model_endpoint}")
+            failure = "[English] Response: I'm having trouble connecting to my knowledge base right now. Please try again in a few moments, or ask me about common pregnancy symptoms or nutrition tips."
+        
+        except Exception as e:
+            logger.exception(f"Error streaming Mistral API response: {str(e)}")
+        
+        buffer = buffer.strip()
+        if buffer:
+            parts.append(buffer)
+            yield buffer
+        elif not parts:
+            yield failure or self._get_fallback_response(user_wa_id, user_message)
+        
+        # Only whole answers are remembered, and only those that didn't depend on earlier turns are shared
+        if complete and parts:
+            answer = "\n".join(parts)
+            if not history['turns']:
+                RESPONSE_CACHE.set(user_message, answer, **cache_context)
+            self._remember_turn(user_wa_id, user_message, answer, cache_context, model_context)
+
     def _get_fallback_response(self, user_wa_id: str, user_message: str) -> str:
         """
         Provide a relevant fallback response when the API fails.
@@ -384,7 +676,7 @@ class MaternalHealthChatbot:
             Fallback response
         """
         # Get user language from data or default to English
-        user_language = self.user_data.get(user_wa_id, {}).get('user_language', 'en')
+        user_language = self._cache_context(user_wa_id)['language']
         language_prefix = "[English]" if user_language == "en" else "[Swahili]" if user_language == "sw" else "[Sheng]"
         
         # Check if message contains keywords to provide relevant fallback
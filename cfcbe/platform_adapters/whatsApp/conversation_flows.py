@@ -4,8 +4,13 @@ import json
 import logging
 from typing import Dict, Any, Optional
 
+from platform_adapters.whatsApp.session_store import ChatbotSessionStore
+
 logger = logging.getLogger(__name__)
 
+# Conversation states of all users, shared by all workers
+STATE_STORE = ChatbotSessionStore('mamacare_flow')
+
 class MaternalHealthConversationFlow:
     """
     Manages the conversation flow for maternal health discussions.
@@ -15,6 +20,8 @@ class MaternalHealthConversationFlow:
     2. Provides structured flow for common maternal health scenarios
     3. Formats prompts for the Mistral model
     4. Processes model responses
+    
+    User states are kept in STATE_STORE rather than on the instance.
     """
     
     # Conversation states
@@ -28,9 +35,16 @@ class MaternalHealthConversationFlow:
         'GENERAL_CHAT': 'general_chat'    # General maternal health conversation
     }
     
-    def __init__(self):
-        """Initialize the conversation flow manager."""
-        self.user_states = {}  # Maps user IDs to states
+    # State of a user starting a conversation
+    DEFAULT_STATE = {
+        'state': STATES['INITIAL'],
+        'language': 'en',
+        'gestational_week': None,
+        'is_postnatal': False,
+        'last_topic': None,
+        'clinic_date': None,
+        'mood_rating': None
+    }
     
     def get_user_state(self, user_id: str) -> Dict[str, Any]:
         """
@@ -42,19 +56,12 @@ class MaternalHealthConversationFlow:
         Returns:
             User's conversation state data
         """
-        if user_id not in self.user_states:
-            # Initialize with default state
-            self.user_states[user_id] = {
-                'state': self.STATES['INITIAL'],
-                'language': 'en',
-                'gestational_week': None,
-                'is_postnatal': False,
-                'last_topic': None,
-                'clinic_date': None,
-                'mood_rating': None
-            }
-        
-        return self.user_states[user_id]
+        user_state = STATE_STORE.get(user_id)
+        if user_state is None:
+            # Initialize with default state, unless another worker just did
+            user_state = STATE_STORE.update(user_id, {}, defaults=self.DEFAULT_STATE)
+        
+        return user_state
     
     def update_user_state(self, user_id: str, updates: Dict[str, Any]) -> None:
         """
@@ -64,10 +71,7 @@ class MaternalHealthConversationFlow:
             user_id: WhatsApp ID of the user
             updates: Dictionary of state updates
         """
-        if user_id not in self.user_states:
-            self.get_user_state(user_id)
-        
-        self.user_states[user_id].update(updates)
+        STATE_STORE.update(user_id, updates, defaults=self.DEFAULT_STATE)
     
     def process_initial_message(self, user_id: str, message: str) -> str:
         """
@@ -95,7 +99,7 @@ class MaternalHealthConversationFlow:
             "3. Available features (weekly updates, symptom checks, reminders)\n"
             "4. Instructions to use commands like LANGUAGE, WEEK, EMERGENCY\n\n"
             "Keep it simple, friendly, and under 200 words. Add appropriate emojis."
-        ).format(user_language=self.user_states[user_id]['language'])
+        ).format(user_language=self.get_user_state(user_id)['language'])
         
         return prompt
     
@@ -0,0 +1,205 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Dict, Optional
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from platform_adapters.models import MediaCacheEntry
+
+logger = logging.getLogger(__name__)
+
+HEX_DIGEST = re.compile(r'^[0-9a-fA-F]{64}$')
+
+
+class MediaCache:
+    """
+    Content-addressed on-disk cache for WhatsApp media, keyed by sha256.
+
+    WhatsApp webhooks include a sha256 for every media item, so forwarded
+    images and repeated voice notes can be served from disk without calling
+    the Graph API for the media URL or downloading the bytes again. The
+    cache is bounded by MEDIA_CACHE_CONFIG['MAX_SIZE_BYTES'] and evicts the
+    least recently used files first.
+    """
+
+    def __init__(self):
+        """Initialize the MediaCache from settings."""
+        config = getattr(settings, 'MEDIA_CACHE_CONFIG', {})
+        self.enabled = config.get('ENABLED', True)
+        self.directory = config.get('DIRECTORY') or os.path.join(settings.MEDIA_ROOT, 'media_cache')
+        self.max_size = config.get('MAX_SIZE_BYTES', 512 * 1024 * 1024)
+
+    @staticmethod
+    def normalize_key(sha256: Optional[str]) -> Optional[str]:
+        """
+        Normalize a WhatsApp sha256 value to a lowercase hex digest.
+
+        WhatsApp may send the digest as hex or base64.
+
+        Args:
+            sha256: The sha256 value from the webhook
+
+        Returns:
+            64-character hex digest or None if the value is not a sha256 digest
+        """
+        if not sha256:
+            return None
+        if HEX_DIGEST.match(sha256):
+            return sha256.lower()
+        try:
+            digest = base64.b64decode(sha256, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+        return digest.hex() if len(digest) == 32 else None
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key[2:4], key)
+
+    def contains(self, sha256: Optional[str]) -> bool:
+        """Check whether media is cached, without marking it as used."""
+        key = self.normalize_key(sha256)
+        return bool(self.enabled and key and MediaCacheEntry.objects.filter(sha256=key).exists())
+
+    def get(self, sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Look up cached media and mark it as recently used.
+
+        Args:
+            sha256: The sha256 value from the webhook
+
+        Returns:
+            Dict with path, size and mime_type, or None on a miss
+        """
+        key = self.normalize_key(sha256)
+        if not self.enabled or not key:
+            return None
+
+        entry = MediaCacheEntry.objects.filter(sha256=key).first()
+        if not entry:
+            return None
+
+        if not os.path.exists(entry.path):
+            logger.warning(f"Media cache file missing for {key}, dropping index entry")
+            entry.delete()
+            return None
+
+        MediaCacheEntry.objects.filter(pk=entry.pk).update(
+            last_accessed=timezone.now(), hit_count=F('hit_count') + 1
+        )
+        logger.info(f"Media cache hit for {key} ({entry.size} bytes)")
+        return {'path': entry.path, 'size': entry.size, 'mime_type': entry.mime_type}
+
+    def open(self, sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Open cached media for reading.
+
+        Args:
+            sha256: The sha256 value from the webhook
+
+        Returns:
+            The get() result with an open binary 'file', or None on a miss
+        """
+        cached = self.get(sha256)
+        if not cached:
+            return None
+        try:
+            cached['file'] = open(cached['path'], 'rb')
+        except OSError as e:
+            logger.error(f"Error opening cached media {cached['path']}: {e}")
+            return None
+        return cached
+
+    def put(self, sha256: Optional[str], fileobj: BinaryIO, mime_type: str = '') -> bool:
+        """
+        Store media in the cache if its content matches the declared sha256.
+
+        The file is read from its start and left positioned at 0.
+
+        Args:
+            sha256: The sha256 value from the webhook
+            fileobj: Binary file holding the media
+            mime_type: MIME type of the media
+
+        Returns:
+            True if the media was cached
+        """
+        key = self.normalize_key(sha256)
+        if not self.enabled or not key:
+            return False
+
+        path = self._path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            fileobj.seek(0)
+            digest = hashlib.sha256()
+            size = 0
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+                for chunk in iter(lambda: fileobj.read(64 * 1024), b''):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            fileobj.seek(0)
+
+            if digest.hexdigest() != key:
+                os.unlink(tmp.name)
+                logger.warning(f"Media content does not match sha256 {key}, not caching")
+                return False
+
+            os.replace(tmp.name, path)
+            MediaCacheEntry.objects.update_or_create(
+                sha256=key,
+                defaults={
+                    'path': path,
+                    'size': size,
+                    'mime_type': mime_type or '',
+                    'last_accessed': timezone.now()
+                }
+            )
+            logger.info(f"Cached media {key} ({size} bytes)")
+        except Exception as e:
+            logger.error(f"Error caching media {key}: {e}")
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """
+        Remove least recently used files until the cache fits MAX_SIZE_BYTES.
+
+        Returns:
+            Number of evicted entries
+        """
+        total = MediaCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+        if total <= self.max_size:
+            return 0
+
+        evicted = 0
+        for entry in MediaCacheEntry.objects.order_by('last_accessed').iterator():
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error evicting cached media {entry.path}: {e}")
+                continue
+            total -= entry.size
+            entry.delete()
+            evicted += 1
+
+        logger.info(f"Evicted {evicted} media cache entries")
+        return evicted
+
+    def clear(self) -> None:
+        """Remove all cached media and index entries."""
+        MediaCacheEntry.objects.all().delete()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_EMERGENCY = 0
+PRIORITY_NORMAL = 1
+
+DEFAULT_CONFIG = {
+    'MAX_CONCURRENT': 2,  # Generations the model server runs at once (per worker process)
+    'MAX_QUEUE_DEPTH': 8,  # Normal requests waiting beyond this are shed to the fallback responses
+    'QUEUE_TIMEOUT': 20,  # Longest a request waits for a slot, in seconds
+    'EMERGENCY_KEYWORDS': (
+        'emergency', 'bleeding', 'blood', 'severe pain', 'convulsion', 'seizure', 'unconscious',
+        'fainted', 'not moving', 'water broke', 'waters broke', 'labour', 'labor', 'high fever',
+        'dharura', 'damu', 'uchungu', 'kifafa', 'kuzimia',
+    ),
+}
+
+
+class ModelOverloaded(Exception):
+    """Raised when a model request is shed instead of queued."""
+
+
+def message_priority(message: str, keywords: Iterable[str] = None) -> int:
+    """
+    Return the queue priority of a user message.
+
+    Args:
+        message: The user's message
+        keywords: Emergency keywords (defaults to CHATBOT_MODEL_GATEWAY['EMERGENCY_KEYWORDS'])
+
+    Returns:
+        PRIORITY_EMERGENCY if the message mentions an emergency keyword (as whole words), else PRIORITY_NORMAL
+    """
+    if keywords is None:
+        keywords = ModelGateway.get_config()['EMERGENCY_KEYWORDS']
+    message_lower = message.casefold()
+    for keyword in keywords:
+        if re.search(rf"\b{re.escape(keyword)}\b", message_lower):
+            return PRIORITY_EMERGENCY
+    return PRIORITY_NORMAL
+
+
+class _InFlight:
+    """A model call that identical requests wait on instead of repeating it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ModelGateway:
+    """
+    Admission control in front of the model server.
+
+    At most CHATBOT_MODEL_GATEWAY['MAX_CONCURRENT'] requests run at once.
+    Others wait in a priority queue, where messages mentioning an emergency
+    keyword go before everything else and requests of equal priority are
+    served in arrival order. A normal request is shed with ModelOverloaded
+    when MAX_QUEUE_DEPTH requests are already waiting, and any request is
+    shed after waiting QUEUE_TIMEOUT seconds, so callers can answer from the
+    fallback responses rather than time out. Emergency requests are never
+    shed for queue depth.
+
+    call() also coalesces identical in-flight prompts: a request for a prompt
+    already being generated waits for that generation and shares its result.
+
+    Slots are per worker process; size MAX_CONCURRENT so that all workers
+    together stay within the model server's capacity.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._in_flight = {}  # key -> _InFlight
+        self._counts = {'calls': 0, 'coalesced': 0, 'shed': 0, 'timeouts': 0}
+
+    @staticmethod
+    def get_config() -> Dict[str, Any]:
+        config = dict(DEFAULT_CONFIG)
+        config.update(getattr(settings, 'CHATBOT_MODEL_GATEWAY', {}))
+        return config
+
+    def _acquire(self, priority: int) -> None:
+        config = self.get_config()
+        with self._condition:
+            if self._active < config['MAX_CONCURRENT'] and not self._waiting:
+                self._active += 1
+                return
+
+            if priority != PRIORITY_EMERGENCY and len(self._waiting) >= config['MAX_QUEUE_DEPTH']:
+                self._counts['shed'] += 1
+                logger.warning(f"Model gateway queue full ({len(self._waiting)} waiting), shedding request")
+                raise ModelOverloaded("Model queue is full")
+
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + config['QUEUE_TIMEOUT']
+            while True:
+                if self._active < config['MAX_CONCURRENT'] and self._waiting[0] == entry:
+                    heapq.heappop(self._waiting)
+                    self._active += 1
+                    # The next request in line may fit too
+                    self._condition.notify_all()
+                    return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._counts['timeouts'] += 1
+                    self._condition.notify_all()
+                    logger.warning(f"Model request waited {config['QUEUE_TIMEOUT']}s for a slot, shedding it")
+                    raise ModelOverloaded("Timed out waiting for the model")
+                self._condition.wait(remaining)
+
+    def _release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL):
+        """
+        Hold a model slot for the duration of a with block (used for streamed replies).
+
+        Args:
+            priority: PRIORITY_EMERGENCY or PRIORITY_NORMAL
+
+        Raises:
+            ModelOverloaded: If the request is shed
+        """
+        self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def call(self, key: Hashable, func: Callable[[], Any], priority: int = PRIORITY_NORMAL) -> Any:
+        """
+        Run a model request, or join an identical one already in flight.
+
+        Args:
+            key: Identifies identical requests (e.g. the full prompt)
+            func: Makes the request; its result is shared with coalesced callers
+            priority: PRIORITY_EMERGENCY or PRIORITY_NORMAL
+
+        Returns:
+            The result of func
+
+        Raises:
+            ModelOverloaded: If the request is shed
+            Exception: Whatever func raised
+        """
+        with self._condition:
+            in_flight = self._in_flight.get(key)
+            joined = in_flight is not None
+            if joined:
+                self._counts['coalesced'] += 1
+            else:
+                in_flight = self._in_flight[key] = _InFlight()
+                self._counts['calls'] += 1
+
+        if joined:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            self._acquire(priority)
+            try:
+                in_flight.result = func()
+            finally:
+                self._release()
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._condition:
+                self._in_flight.pop(key, None)
+            in_flight.done.set()
+        return in_flight.result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the active and queued request counts and the call, coalesce and shed counts."""
+        with self._condition:
+            return {**self._counts, 'active': self._active, 'queued': len(self._waiting)}
@@ -0,0 +1,112 @@
+"""
+Single-pass parser for WhatsApp Cloud API webhook payloads.
+
+The payload is walked once and every message is turned into a compact,
+immutable WhatsAppInboundMessage. The view, the idempotency check and the
+adapter all consume these records instead of walking the nested
+entry/changes/messages structure again.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+MEDIA_MESSAGE_TYPES = ('image', 'video', 'audio', 'document')
+
+
+@dataclass(frozen=True, slots=True)
+class WhatsAppInboundMessage:
+    """One incoming WhatsApp message with the fields the gateway uses."""
+
+    message_id: Optional[str]
+    sender_id: Optional[str]
+    timestamp: Optional[str]
+    message_type: str = 'text'
+    text: str = ''
+    caption: str = ''
+    media_id: Optional[str] = None
+    media_url: Optional[str] = None
+    media_mime: Optional[str] = None
+    media_sha256: Optional[str] = None
+    contact_name: Optional[str] = None
+    contact_wa_id: Optional[str] = None
+    is_chatbot_message: bool = False
+
+    @property
+    def is_media(self) -> bool:
+        return self.message_type in MEDIA_MESSAGE_TYPES
+
+    @property
+    def contact_info(self) -> Dict[str, Any]:
+        """Contact information in the dict shape used by the adapter."""
+        if self.contact_name is None and self.contact_wa_id is None:
+            return {}
+        return {'name': self.contact_name, 'wa_id': self.contact_wa_id}
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any], contact_info: Optional[Dict[str, Any]] = None) -> 'WhatsAppInboundMessage':
+        """
+        Build a record from one raw WhatsApp message.
+
+        Args:
+            message: A message from value['messages']
+            contact_info: Dict with the sender's 'name' and 'wa_id' (optional)
+
+        Returns:
+            WhatsAppInboundMessage
+        """
+        contact_info = contact_info or {}
+        message_type = message.get('type', 'text')
+        media = (message.get(message_type) or {}) if message_type in MEDIA_MESSAGE_TYPES else {}
+        metadata = message.get('metadata') or {}
+
+        return cls(
+            message_id=message.get('id'),
+            sender_id=message.get('from'),
+            timestamp=message.get('timestamp'),
+            message_type=message_type,
+            text=(message.get('text') or {}).get('body', '') if message_type == 'text' else '',
+            caption=message.get('caption', ''),
+            media_id=media.get('id'),
+            media_url=media.get('url'),
+            media_mime=media.get('mime_type'),
+            media_sha256=media.get('sha256'),
+            contact_name=contact_info.get('name'),
+            contact_wa_id=contact_info.get('wa_id'),
+            is_chatbot_message=bool(metadata.get('is_chatbot_message'))
+        )
+
+
+def parse_whatsapp_payload(payload: Any) -> List[WhatsAppInboundMessage]:
+    """
+    Walk a WhatsApp webhook payload once and collect its messages.
+
+    Args:
+        payload: The parsed webhook payload
+
+    Returns:
+        List of WhatsAppInboundMessage records in payload order
+    """
+    if not isinstance(payload, dict):
+        return []
+
+    records = []
+    for entry in payload.get('entry') or ():
+        for change in entry.get('changes') or ():
+            value = change.get('value') or {}
+            messages = value.get('messages')
+            if not messages:
+                continue
+
+            # WhatsApp sends the sender's profile as the first contact
+            contacts = value.get('contacts')
+            contact_info = {}
+            if contacts:
+                contact_info = {
+                    'name': (contacts[0].get('profile') or {}).get('name'),
+                    'wa_id': contacts[0].get('wa_id')
+                }
+
+            for message in messages:
+                records.append(WhatsAppInboundMessage.from_message(message, contact_info))
+
+    return records
@@ -0,0 +1,186 @@
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from platform_adapters.whatsApp.session_store import ChatbotSessionStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'HISTORY_TURNS': 4,  # Question/answer pairs sent back to the model
+    'HISTORY_TTL_SECONDS': 1800,  # A conversation idle this long starts over
+    'MAX_TURN_CHARS': 500,  # Longer history messages are truncated
+    'REUSE_MODEL_CONTEXT': True,  # Continue from the model server's returned context when possible
+    'MAX_CONTEXT_TOKENS': 3072,  # Larger contexts are dropped and the prompt rebuilt from the history window
+}
+
+# Static part of the system prompt. Only the response language varies, so
+# the rendered prompt is computed once per language and forms an identical
+# prefix across requests.
+SYSTEM_PROMPT_TEMPLATE = (
+    "You are \"MamaCare\", a specialized maternal health assistant for Kenyan women. "
+    "Your sole purpose is to provide factual, evidence-based information about pregnancy, "
+    "childbirth, postnatal care, and infant health.\n\n"
+
+    "IMPORTANT CONSTRAINTS:\n"
+    "- ONLY respond to questions related to maternal health, pregnancy, childbirth, postnatal care, and infant health.\n"
+    "- If asked about ANY other topic, politely redirect to maternal health and suggest relevant topics.\n"
+    "- Do NOT engage with political, religious, entertainment, or other non-medical topics.\n"
+    "- Do NOT provide financial advice, relationship counseling, or career guidance.\n"
+    "- FOCUS exclusively on maternal health education and support.\n\n"
+
+    "COMMUNICATION STYLE:\n"
+    "- Use simple, actionable language (Grade 4 reading level)\n"
+    "- Differentiate between \"normal\" vs \"warning\" symptoms in medical information\n"
+    "- Include emojis sparingly for warmth (e.g., 👶, 🏥)\n"
+    "- Cite sources when possible (e.g., \"WHO recommends...\")\n"
+    "- For emergencies, say: \"URGENT: Contact clinic NOW at [local emergency number]\"\n\n"
+
+    "FORMAT RESPONSES AS:\n[{language}] Response: [Your reply]\n\n"
+
+    "CRITICAL HEALTH GUIDANCE:\n"
+    "- For specific medical questions: \"Please consult your healthcare provider about [topic].\"\n"
+    "- For emergency symptoms: \"This requires immediate medical attention. Go to the nearest hospital.\"\n"
+    "- Always emphasize the importance of regular antenatal care visits.\n"
+    "- Provide evidence-based information from WHO, CDC, or other reputable health organizations.\n"
+    "- Maintain cultural sensitivity to Kenyan maternal health traditions while promoting safe practices."
+)
+
+
+def get_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_CONFIG)
+    config.update(getattr(settings, 'CHATBOT_PROMPT', {}))
+    return config
+
+
+@lru_cache(maxsize=None)
+def system_prompt(language: str) -> str:
+    """Return the static system prompt for a response language."""
+    return SYSTEM_PROMPT_TEMPLATE.format(language=language)
+
+
+def user_context(language: str, gestational_week: Optional[int], is_postnatal: bool) -> str:
+    """Describe the user's pregnancy stage in one line."""
+    if is_postnatal:
+        stage = "has given birth (postnatal)"
+    elif gestational_week:
+        stage = f"is {gestational_week} weeks pregnant"
+    else:
+        stage = "has not shared her pregnancy week"
+    return f"User context: the user {stage} and prefers language '{language}'."
+
+
+def context_key(language: str, gestational_week: Optional[int], is_postnatal: bool) -> str:
+    """Identify the system prompt and user context a model context was generated under."""
+    return f"{language}|{gestational_week}|{is_postnatal}"
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+
+
+class ConversationHistory:
+    """
+    Rolling window of each user's recent questions and answers.
+
+    Kept in the chatbot session store, so reading it costs no database query.
+    Besides the last HISTORY_TURNS turns, it holds the context returned by the
+    model server for the last answer, tagged with the user context it was
+    generated under, so the next request can continue from it.
+    """
+
+    def __init__(self, store: ChatbotSessionStore):
+        self.store = store
+
+    def get(self, user_wa_id: str) -> Dict[str, Any]:
+        """
+        Get a user's conversation.
+
+        Args:
+            user_wa_id: WhatsApp ID of the user
+
+        Returns:
+            Dict with 'turns' ([question, answer] pairs), 'model_context' and 'context_key';
+            empty if the conversation has been idle for HISTORY_TTL_SECONDS
+        """
+        history = self.store.get(user_wa_id)
+        if not history or time.time() - history.get('updated_at', 0) > get_config()['HISTORY_TTL_SECONDS']:
+            return {'turns': [], 'model_context': None, 'context_key': ''}
+        return history
+
+    def add_turn(self, user_wa_id: str, question: str, answer: str, model_context: Optional[List[int]] = None,
+                 context_key: str = '') -> None:
+        """
+        Append a question and answer, keeping the last HISTORY_TURNS.
+
+        Args:
+            user_wa_id: WhatsApp ID of the user
+            question: The user's message
+            answer: The reply sent
+            model_context: Context returned by the model server with the answer, if any
+            context_key: The user context the answer was generated under
+        """
+        config = get_config()
+        if model_context and len(model_context) > config['MAX_CONTEXT_TOKENS']:
+            model_context = None
+        now = time.time()
+
+        def append(history):
+            turns = history.get('turns', [])
+            if now - history.get('updated_at', 0) > config['HISTORY_TTL_SECONDS']:
+                turns = []
+            turns = turns + [[
+                _truncate(question, config['MAX_TURN_CHARS']), _truncate(answer, config['MAX_TURN_CHARS'])
+            ]]
+            history.update({
+                'turns': turns[-config['HISTORY_TURNS']:] if config['HISTORY_TURNS'] else [],
+                'model_context': model_context or None,
+                'context_key': context_key,
+                'updated_at': now,
+            })
+
+        # Appended under the store's lock so concurrent answers don't drop turns
+        self.store.modify(user_wa_id, append)
+
+    def clear(self, user_wa_id: str) -> None:
+        """Forget a user's conversation."""
+        self.store.delete(user_wa_id)
+
+
+def build_request(message: str, language: str, gestational_week: Optional[int], is_postnatal: bool,
+                  history: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the prompt fields of a model request.
+
+    If the model server returned a context with the user's last answer and
+    the user context hasn't changed since, only the new message is sent with
+    that context, which already holds the system prompt and earlier turns.
+    Otherwise the prompt is the static system prompt, the user context, the
+    history window and the message, in that order, so requests share the
+    longest possible prefix.
+
+    Args:
+        message: The user's message
+        language: User language
+        gestational_week: User's pregnancy week, if known
+        is_postnatal: Whether the user has given birth
+        history: The user's conversation from ConversationHistory.get()
+
+    Returns:
+        Dict with 'prompt' and, when reusing the model context, 'context'
+    """
+    config = get_config()
+    key = context_key(language, gestational_week, is_postnatal)
+    if (config['REUSE_MODEL_CONTEXT'] and history.get('model_context')
+            and history.get('context_key') == key):
+        return {'prompt': f"User: {message}", 'context': history['model_context']}
+
+    lines = [system_prompt(language), user_context(language, gestational_week, is_postnatal), ""]
+    for question, answer in history.get('turns', []):
+        lines.append(f"User: {question}")
+        lines.append(f"MamaCare: {answer}")
+    lines.append(f"User: {message}")
+    return {'prompt': "\n".join(lines)}
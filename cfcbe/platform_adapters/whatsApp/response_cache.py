@@ -0,0 +1,234 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 2000,
+    'TTL_SECONDS': 86400,
+    'SIMILARITY_THRESHOLD': 0.8,  # 0 disables near matches
+    'MAX_QUESTION_CHARS': 300,  # Longer messages are personal, not common questions
+    'NGRAM_SIZE': 3,
+    'LOG_EVERY': 500,
+    # Words that change a question's meaning; near matches must use the same ones
+    'QUALIFIER_WORDS': (
+        'not', 'no', 'never', 'without', 't', 'stop', 'stopped', 'too', 'lot', 'much', 'many', 'more', 'less',
+        'little', 'few', 'light', 'heavy', 'raw', 'undercooked', 'cooked', 'safe', 'unsafe', 'before', 'after',
+        'hapana', 'si', 'sio', 'siyo', 'bila', 'sana',
+    ),
+}
+
+NON_WORD = re.compile(r'[^\w\s]+')
+WHITESPACE = re.compile(r'\s+')
+NUMBER = re.compile(r'\d+')
+
+
+def normalize_question(text: str) -> str:
+    """Casefold a question and strip punctuation and extra whitespace."""
+    return WHITESPACE.sub(' ', NON_WORD.sub(' ', text.casefold())).strip()
+
+
+def week_bucket(gestational_week: Optional[int], is_postnatal: bool = False) -> str:
+    """Group a pregnancy stage into the buckets answers are shared across (trimesters)."""
+    if is_postnatal:
+        return 'postnatal'
+    if not gestational_week:
+        return 'any'
+    if gestational_week <= 12:
+        return 't1'
+    if gestational_week <= 26:
+        return 't2'
+    return 't3'
+
+
+class ResponseCache:
+    """
+    In-process cache of model answers to common chatbot questions.
+
+    Answers are keyed by normalized question, language and week bucket, and
+    expire after CHATBOT_RESPONSE_CACHE['TTL_SECONDS'], with least recently
+    used answers evicted beyond MAX_ENTRIES. Questions that don't match
+    exactly are compared with the cached questions of the same language and
+    bucket by character n-gram (Jaccard) similarity, through an inverted
+    n-gram index, so near-duplicates such as "what should i eat" / "what
+    should I eat?" share an answer. Near matches must mention the same
+    numbers and the same QUALIFIER_WORDS, so "week 20" never answers
+    "week 21" and "not bleeding" never answers "bleeding".
+
+    Hit and miss counts are kept for stats() and logged every LOG_EVERY lookups.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # (language, bucket, question) -> (expires_at, response, ngrams, markers)
+        self._index = defaultdict(set)  # (language, bucket, ngram) -> keys
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'near_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def get_config() -> Dict[str, Any]:
+        config = dict(DEFAULT_CONFIG)
+        config.update(getattr(settings, 'CHATBOT_RESPONSE_CACHE', {}))
+        return config
+
+    def _key(self, question: str, language: str, gestational_week: Optional[int],
+             is_postnatal: bool) -> Optional[Tuple[str, str, str]]:
+        """Return the cache key, or None for messages that shouldn't be cached."""
+        config = self.get_config()
+        if not config['ENABLED'] or len(question) > config['MAX_QUESTION_CHARS']:
+            return None
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        return (language, week_bucket(gestational_week, is_postnatal), normalized)
+
+    @staticmethod
+    def _ngrams(text: str, size: int) -> frozenset:
+        padded = f" {text} "
+        return frozenset(padded[i:i + size] for i in range(max(1, len(padded) - size + 1)))
+
+    @staticmethod
+    def _markers(text: str, qualifier_words) -> Tuple[Tuple[str, ...], frozenset]:
+        """Return the numbers and qualifier words a near match has to share."""
+        return tuple(NUMBER.findall(text)), frozenset(text.split()) & frozenset(qualifier_words)
+
+    def get(self, question: str, language: str = 'en', gestational_week: Optional[int] = None,
+            is_postnatal: bool = False) -> Optional[str]:
+        """
+        Look up a cached answer.
+
+        Args:
+            question: The user's message
+            language: User language
+            gestational_week: User's pregnancy week, if known
+            is_postnatal: Whether the user has given birth
+
+        Returns:
+            The cached answer, or None
+        """
+        key = self._key(question, language, gestational_week, is_postnatal)
+        if key is None:
+            return None
+
+        config = self.get_config()
+        threshold = config['SIMILARITY_THRESHOLD']
+        now = time.monotonic()
+        with self._lock:
+            outcome = 'hits'
+            response = self._get_exact(key, now)
+            if response is None and threshold > 0:
+                outcome = 'near_hits'
+                response = self._get_similar(key, threshold, config, now)
+            self._count(outcome if response is not None else 'misses', config)
+            return response
+
+    def _get_exact(self, key, now) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _get_similar(self, key, threshold: float, config: Dict[str, Any], now) -> Optional[str]:
+        language, bucket, question = key
+        ngrams = self._ngrams(question, config['NGRAM_SIZE'])
+        markers = self._markers(question, config['QUALIFIER_WORDS'])
+
+        # Count shared n-grams per cached question through the inverted index
+        shared = defaultdict(int)
+        for ngram in ngrams:
+            for candidate in self._index.get((language, bucket, ngram), ()):
+                shared[candidate] += 1
+
+        best_key, best_score = None, threshold
+        for candidate, overlap in shared.items():
+            _, _, candidate_ngrams, candidate_markers = self._entries[candidate]
+            if candidate_markers != markers:
+                continue
+            score = overlap / (len(ngrams) + len(candidate_ngrams) - overlap)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is None:
+            return None
+        return self._get_exact(best_key, now)
+
+    def set(self, question: str, response: str, language: str = 'en', gestational_week: Optional[int] = None,
+            is_postnatal: bool = False) -> None:
+        """
+        Cache a model answer.
+
+        Args:
+            question: The user's message
+            response: The model's answer
+            language: User language
+            gestational_week: User's pregnancy week, if known
+            is_postnatal: Whether the user has given birth
+        """
+        key = self._key(question, language, gestational_week, is_postnatal)
+        if key is None or not response:
+            return
+
+        config = self.get_config()
+        ngrams = self._ngrams(key[2], config['NGRAM_SIZE'])
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + config['TTL_SECONDS'], response, ngrams,
+                                  self._markers(key[2], config['QUALIFIER_WORDS']))
+            for ngram in ngrams:
+                self._index[(key[0], key[1], ngram)].add(key)
+            self._counts['stores'] += 1
+
+            while len(self._entries) > config['MAX_ENTRIES']:
+                self._remove(next(iter(self._entries)))
+                self._counts['evictions'] += 1
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for ngram in entry[2]:
+            index_key = (key[0], key[1], ngram)
+            keys = self._index.get(index_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[index_key]
+
+    def _count(self, outcome: str, config: Dict[str, Any]) -> None:
+        self._counts[outcome] += 1
+        lookups = self._counts['hits'] + self._counts['near_hits'] + self._counts['misses']
+        if config['LOG_EVERY'] and lookups % config['LOG_EVERY'] == 0:
+            logger.info(f"Chatbot response cache: {self._stats()}")
+
+    def _stats(self) -> Dict[str, Any]:
+        lookups = self._counts['hits'] + self._counts['near_hits'] + self._counts['misses']
+        hits = self._counts['hits'] + self._counts['near_hits']
+        return {
+            **self._counts,
+            'entries': len(self._entries),
+            'lookups': lookups,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counts, the hit rate and the number of cached answers."""
+        with self._lock:
+            return self._stats()
+
+    def clear(self) -> None:
+        """Drop all cached answers and reset the counts."""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            for outcome in self._counts:
+                self._counts[outcome] = 0
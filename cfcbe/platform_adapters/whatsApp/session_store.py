@@ -0,0 +1,256 @@
+import copy
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class ChatbotSessionStore:
+    """
+    Chatbot session state kept in the Django cache.
+
+    Sessions live in the default cache for CHATBOT_USER_DATA_TTL seconds. With
+    the shared backend configured in settings.CACHES (the database cache table,
+    or Redis/Memcached), every worker process sees the same session and state
+    survives worker restarts; a per-process backend such as LocMemCache gives
+    neither.
+
+    A bounded in-process LRU sits in front of the cache. Entries in it are
+    trusted for CHATBOT_SESSION_STORE['LOCAL_TTL_SECONDS'], so handling one
+    message costs at most one cache round trip however often the session is
+    read. Writes go to both.
+
+    Sessions are plain dicts. Callers get deep copies and save changes with
+    set(), update() or modify(). update() and modify() read the shared copy
+    and write it back under a per-user cache lock, so concurrent updates from
+    different workers don't overwrite each other.
+    """
+
+    CACHE_KEY_PREFIX = 'chatbot_session'
+
+    def __init__(self, namespace: str):
+        """
+        Initialize a store.
+
+        Args:
+            namespace: Keeps the sessions of different chatbot components apart
+        """
+        self.namespace = namespace
+        self._local = OrderedDict()  # user_id -> (trusted_until, session)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_settings():
+        """Return (ttl_seconds, local_max_entries, local_ttl_seconds) from settings."""
+        config = getattr(settings, 'CHATBOT_SESSION_STORE', {})
+        return (
+            getattr(settings, 'CHATBOT_USER_DATA_TTL', 86400),
+            config.get('LOCAL_MAX_ENTRIES', 1000),
+            config.get('LOCAL_TTL_SECONDS', 2)
+        )
+
+    @staticmethod
+    def _get_lock_settings():
+        """Return (lock_timeout_seconds, lock_wait_seconds) from settings."""
+        config = getattr(settings, 'CHATBOT_SESSION_STORE', {})
+        return config.get('LOCK_TIMEOUT_SECONDS', 5), config.get('LOCK_WAIT_SECONDS', 2)
+
+    def _cache_key(self, user_id: str) -> str:
+        return f"{self.CACHE_KEY_PREFIX}:{self.namespace}:{user_id}"
+
+    def _get_local(self, user_id: str):
+        """Return (found, session) from the in-process LRU."""
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self._local[user_id]
+                return False, None
+            self._local.move_to_end(user_id)
+            return True, entry[1]
+
+    def _put_local(self, user_id: str, session: Dict[str, Any]) -> None:
+        _, max_entries, local_ttl = self._get_settings()
+        with self._lock:
+            self._local[user_id] = (time.monotonic() + local_ttl, session)
+            self._local.move_to_end(user_id)
+            while len(self._local) > max_entries:
+                self._local.popitem(last=False)
+
+    def _from_cache(self, user_id: str, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Unwrap a cache entry, refreshing its TTL once it is half used so active sessions don't lapse."""
+        if entry is None:
+            return None
+        ttl, _, _ = self._get_settings()
+        if time.time() - entry.get('saved_at', 0) > ttl / 2:
+            self._save(user_id, entry['session'])
+        else:
+            self._put_local(user_id, entry['session'])
+        return entry['session']
+
+    def _save(self, user_id: str, session: Dict[str, Any]) -> None:
+        ttl, _, _ = self._get_settings()
+        self._put_local(user_id, session)
+        try:
+            cache.set(self._cache_key(user_id), {'session': session, 'saved_at': time.time()}, timeout=ttl)
+        except Exception as e:
+            logger.error(f"Error saving chatbot session for {user_id}: {str(e)}")
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's session.
+
+        Args:
+            user_id: WhatsApp ID of the user
+
+        Returns:
+            A copy of the session, or None if the user has none
+        """
+        found, session = self._get_local(user_id)
+        if not found:
+            try:
+                session = self._from_cache(user_id, cache.get(self._cache_key(user_id)))
+            except Exception as e:
+                logger.error(f"Error reading chatbot session for {user_id}: {str(e)}")
+                session = None
+        return copy.deepcopy(session) if session is not None else None
+
+    def get_many(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the sessions of many users with at most one cache round trip.
+
+        Args:
+            user_ids: WhatsApp IDs
+
+        Returns:
+            Copies of the sessions found, by user ID
+        """
+        sessions = {}
+        missing = []
+        for user_id in user_ids:
+            found, session = self._get_local(user_id)
+            if found:
+                sessions[user_id] = session
+            else:
+                missing.append(user_id)
+
+        if missing:
+            keys = {self._cache_key(user_id): user_id for user_id in missing}
+            try:
+                entries = cache.get_many(list(keys))
+            except Exception as e:
+                logger.error(f"Error reading chatbot sessions: {str(e)}")
+                entries = {}
+            for key, entry in entries.items():
+                sessions[keys[key]] = self._from_cache(keys[key], entry)
+
+        return {user_id: copy.deepcopy(session) for user_id, session in sessions.items() if session is not None}
+
+    def set(self, user_id: str, session: Dict[str, Any]) -> None:
+        """
+        Replace a user's session (and restart its TTL).
+
+        Args:
+            user_id: WhatsApp ID of the user
+            session: The session data
+        """
+        self._save(user_id, copy.deepcopy(session))
+
+    @contextmanager
+    def _locked(self, user_id: str):
+        """Hold the user's cache lock; after LOCK_WAIT_SECONDS carry on without it rather than drop the message."""
+        lock_timeout, lock_wait = self._get_lock_settings()
+        lock_key = f"{self._cache_key(user_id)}:lock"
+        lock_token = uuid.uuid4().hex
+        deadline = time.monotonic() + lock_wait
+        acquired = False
+        try:
+            while not acquired:
+                acquired = cache.add(lock_key, lock_token, timeout=lock_timeout)
+                if not acquired:
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"Timed out waiting for the chatbot session lock of {user_id}")
+                        break
+                    time.sleep(0.01)
+        except Exception as e:
+            logger.error(f"Error locking chatbot session for {user_id}: {str(e)}")
+
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    # Only release the lock if it is still ours
+                    if cache.get(lock_key) == lock_token:
+                        cache.delete(lock_key)
+                except Exception as e:
+                    logger.error(f"Error unlocking chatbot session for {user_id}: {str(e)}")
+
+    def modify(self, user_id: str, change: Callable[[Dict[str, Any]], None],
+               defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Atomically change a user's session, creating it from defaults if needed.
+
+        The shared copy is read (bypassing the in-process LRU), changed and
+        written back while holding the user's cache lock.
+
+        Args:
+            user_id: WhatsApp ID of the user
+            change: Called with the session dict to change in place
+            defaults: Initial session for users without one
+
+        Returns:
+            A copy of the changed session
+        """
+        with self._locked(user_id):
+            try:
+                entry = cache.get(self._cache_key(user_id))
+            except Exception as e:
+                logger.error(f"Error reading chatbot session for {user_id}: {str(e)}")
+                entry = None
+            session = copy.deepcopy(entry['session'] if entry is not None else (defaults or {}))
+            change(session)
+            self._save(user_id, session)
+        return copy.deepcopy(session)
+
+    def update(self, user_id: str, updates: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Atomically update fields of a user's session, creating it from defaults if needed.
+
+        Args:
+            user_id: WhatsApp ID of the user
+            updates: Fields to change
+            defaults: Initial session for users without one
+
+        Returns:
+            A copy of the updated session
+        """
+        return self.modify(user_id, lambda session: session.update(copy.deepcopy(updates)), defaults)
+
+    def delete(self, user_id: str) -> None:
+        """
+        Remove a user's session.
+
+        Args:
+            user_id: WhatsApp ID of the user
+        """
+        with self._lock:
+            self._local.pop(user_id, None)
+        try:
+            cache.delete(self._cache_key(user_id))
+        except Exception as e:
+            logger.error(f"Error deleting chatbot session for {user_id}: {str(e)}")
+
+    def clear_local(self) -> None:
+        """Drop the in-process copies (the shared sessions are kept)."""
+        with self._lock:
+            self._local.clear()
@@ -1,7 +1,11 @@
 import logging
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
-import requests
+from shared import http_client
 from django.conf import settings
+from django.core.cache import cache
 from webhook_handler.models import Organization, WhatsAppCredential
 
 logger = logging.getLogger(__name__)
@@ -9,8 +13,21 @@ logger = logging.getLogger(__name__)
 class TokenManager:
     """
     Manages WhatsApp API tokens, including retrieval, validation, and refreshing.
+    
+    Validated tokens are kept in an in-process store backed by the Django
+    cache, keyed by organization, so the debug_token round trip only happens
+    when a token nears expiry, its validation window lapses, or a caller
+    reports a 401 via invalidate_token().
     """
     
+    CACHE_KEY_PREFIX = 'whatsapp_token'
+    
+    # In-process token store: org key -> {'token', 'expires_at', 'validated_at'}
+    _token_cache = {}
+    _default_org_id = None
+    _cache_lock = threading.Lock()
+    _refresh_locks = {}
+    
     @staticmethod
     def ensure_aware_datetime(dt):
         """Convert naive datetime to timezone-aware datetime."""
@@ -29,7 +46,7 @@ class TokenManager:
         url = f"https://graph.facebook.com/debug_token?input_token={access_token}&access_token={access_token}"
         
         try:
-            response = requests.get(url)
+            response = http_client.get(url)
             
             if response.status_code == 200:
                 data = response.json()
@@ -63,12 +80,116 @@ class TokenManager:
             logger.error(f"Error determining token type: {e}")
             return False
     
+    @staticmethod
+    def _get_cache_settings():
+        """Return (revalidate_seconds, expiry_margin_seconds) from settings."""
+        config = getattr(settings, 'WHATSAPP_TOKEN_CACHE_CONFIG', {})
+        return (
+            config.get('REVALIDATE_SECONDS', 3600),
+            config.get('EXPIRY_MARGIN_SECONDS', 600)
+        )
+    
+    @classmethod
+    def _cache_key(cls, org_id):
+        return f"{cls.CACHE_KEY_PREFIX}:{org_id}"
+    
+    @classmethod
+    def _is_fresh(cls, entry):
+        """Check whether a cached token entry can be used without revalidation."""
+        if not entry or not entry.get('token'):
+            return False
+        
+        revalidate_seconds, expiry_margin = cls._get_cache_settings()
+        now = time.time()
+        
+        if now - entry.get('validated_at', 0) > revalidate_seconds:
+            return False
+        
+        expires_at = entry.get('expires_at')
+        if expires_at and now > expires_at - expiry_margin:
+            return False
+        
+        return True
+    
+    @classmethod
+    def _get_cached_token(cls, org_id):
+        """Look up a fresh token in the in-process store, then the shared cache."""
+        key = cls._cache_key(org_id)
+        entry = cls._token_cache.get(key)
+        if cls._is_fresh(entry):
+            return entry['token']
+        
+        entry = cache.get(key)
+        if cls._is_fresh(entry):
+            cls._token_cache[key] = entry
+            return entry['token']
+        
+        return None
+    
+    @classmethod
+    def _store_token(cls, org_id, token, expires_at=None):
+        """Remember a validated token in both the in-process store and the shared cache."""
+        key = cls._cache_key(org_id)
+        entry = {
+            'token': token,
+            'expires_at': expires_at,
+            'validated_at': time.time()
+        }
+        cls._token_cache[key] = entry
+        
+        revalidate_seconds, _ = cls._get_cache_settings()
+        cache.set(key, entry, timeout=revalidate_seconds)
+    
+    @classmethod
+    def invalidate_token(cls, org_id=None):
+        """
+        Drop the cached token so the next call revalidates it.
+        
+        Call this after the Graph API rejects a token with a 401.
+        
+        Args:
+            org_id: Organization ID (optional, defaults to the default organization)
+        """
+        org_id = org_id or cls._default_org_id
+        if not org_id:
+            return
+        
+        key = cls._cache_key(org_id)
+        cls._token_cache.pop(key, None)
+        cache.delete(key)
+        logger.info(f"Invalidated cached access token for org {org_id}.")
+    
+    @classmethod
+    def _get_refresh_lock(cls, org_id):
+        with cls._cache_lock:
+            return cls._refresh_locks.setdefault(str(org_id), threading.Lock())
+    
+    @classmethod
+    def _resolve_default_org_id(cls):
+        """Return the default organization ID, creating the organization if needed."""
+        if cls._default_org_id:
+            return cls._default_org_id
+        
+        org = Organization.objects.first()
+        if not org:
+            # Create a default organization if none exists
+            org = Organization.objects.create(
+                name="Default Organization",
+                email="default@example.com"
+            )
+        cls._default_org_id = org.id
+        return cls._default_org_id
+    
     @classmethod
     def get_access_token(cls, org_id=None):
         """
         Retrieve the access token for the given organization.
         If expired or short-term, refresh it.
         
+        Cached tokens are returned without contacting the Graph API. When
+        revalidation is needed only one caller per organization performs it;
+        concurrent callers wait for and reuse its result.
+        
         Args:
             org_id: Organization ID (optional)
             
@@ -78,20 +199,62 @@ class TokenManager:
         # If org_id not provided, try to get the first organization
         if not org_id:
             try:
-                org = Organization.objects.first()
-                if org:
-                    org_id = org.id
-                else:
-                    # Create a default organization if none exists
-                    org = Organization.objects.create(
-                        name="Default Organization",
-                        email="default@example.com"
-                    )
-                    org_id = org.id
+                org_id = cls._resolve_default_org_id()
             except Exception as e:
                 logger.error(f"Error getting default organization: {e}")
                 return cls._get_default_token()
         
+        token = cls._get_cached_token(org_id)
+        if token:
+            return token
+        
+        # Single-flight: one thread per process, one process via a cache lock
+        with cls._get_refresh_lock(org_id):
+            token = cls._get_cached_token(org_id)
+            if token:
+                return token
+            
+            # The lock value identifies this caller, so it never releases a lock
+            # another worker acquired after ours expired
+            lock_key = f"{cls._cache_key(org_id)}:lock"
+            lock_token = uuid.uuid4().hex
+            acquired = cache.add(lock_key, lock_token, timeout=30)
+            if not acquired:
+                # Another worker is validating; give it a moment to publish the result
+                for _ in range(20):
+                    time.sleep(0.25)
+                    token = cls._get_cached_token(org_id)
+                    if token:
+                        return token
+                # Still no token; validate ourselves, taking the lock if it was released
+                acquired = cache.add(lock_key, lock_token, timeout=30)
+            
+            try:
+                return cls._validate_access_token(org_id)
+            finally:
+                if acquired:
+                    cls._release_lock(lock_key, lock_token)
+    
+    @staticmethod
+    def _release_lock(lock_key, lock_token):
+        """Delete a refresh lock if it is still the one this caller acquired."""
+        try:
+            if cache.get(lock_key) == lock_token:
+                cache.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Error releasing token refresh lock {lock_key}: {e}")
+    
+    @classmethod
+    def _validate_access_token(cls, org_id):
+        """
+        Load, validate and (if needed) refresh the stored token for an organization.
+        
+        Args:
+            org_id: Organization ID
+            
+        Returns:
+            Access token or None if retrieval fails
+        """
         try:
             # Get credentials for organization
             creds = WhatsAppCredential.objects.filter(organization_id=org_id).first()
@@ -116,6 +279,11 @@ class TokenManager:
             
             if token_info and token_info.get("is_valid"):
                 logger.info(f"Using stored access token for org {org_id}.")
+                # expires_at of 0 means the token never expires
+                expires_at = token_info.get("expires_at") or (
+                    token_expiry.timestamp() if token_expiry else None
+                )
+                cls._store_token(org_id, creds.access_token, expires_at)
                 return creds.access_token
             else:
                 logger.info(f"Invalid token detected for org {org_id}, refreshing...")
@@ -175,6 +343,8 @@ class TokenManager:
                     }
                 )
                 
+                cls._store_token(organization.id, new_token, expiry.timestamp())
+                
                 return {
                     'status': 'success',
                     'token': new_token,
@@ -201,7 +371,7 @@ class TokenManager:
             )
             
             # Make request
-            response = requests.get(exchange_url)
+            response = http_client.get(exchange_url)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -212,6 +382,7 @@ class TokenManager:
                     creds.access_token = new_token
                     creds.token_expiry = datetime.now(timezone.utc) + timedelta(days=60)
                     creds.save()
+                    cls._store_token(org_id, new_token, creds.token_expiry.timestamp())
                     
                     logger.info(f"Successfully refreshed access token for org {org_id}.")
                     return new_token
@@ -4,19 +4,27 @@ import json
 import uuid
 import time
 import logging
+import threading
 import requests
+from shared import http_client
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace as dataclass_replace
 from datetime import datetime, timezone, timedelta
 from django.core.files.base import ContentFile
+from django.db import connection
 
 from platform_adapters.base_adapter import BaseAdapter
 from shared.models.standard_message import StandardMessage
+from shared import media_stream
 from webhook_handler.models import (
     Contact, WhatsAppMedia, WhatsAppMessage, WhatsAppResponse,
     Organization, WhatsAppCredential, Conversation, WebhookMessage
 )
 from django.conf import settings
 from platform_adapters.whatsApp.token_manager import TokenManager
+from platform_adapters.whatsApp.media_cache import MediaCache
+from platform_adapters.whatsApp.payload_parser import WhatsAppInboundMessage, parse_whatsapp_payload
 from platform_adapters.whatsApp.chatbot_adapter import MaternalHealthChatbot
 
 logger = logging.getLogger(__name__)
@@ -30,10 +38,15 @@ class WhatsAppAdapter(BaseAdapter):
     maternal health chatbot functionality for messages containing "HEALTH".
     """
     
+    # Shared pool for media downloads, bounded by MAX_CONCURRENT_DOWNLOADS
+    _media_executor = None
+    _media_executor_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize the WhatsApp Adapter."""
         self.config = self._get_config()
         self.chatbot = MaternalHealthChatbot()  # Initialize chatbot
+        self.media_cache = MediaCache()
     
     def _get_config(self):
         """Get configuration from settings."""
@@ -62,7 +75,9 @@ class WhatsAppAdapter(BaseAdapter):
         headers = {"Authorization": f"Bearer {access_token}"}
         
         try:
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
+            if response.status_code == 401:
+                TokenManager.invalidate_token()
             response.raise_for_status()
             
             # Extract media URL from response
@@ -95,7 +110,9 @@ class WhatsAppAdapter(BaseAdapter):
         headers = {"Authorization": f"Bearer {access_token}"}
 
         try:
-            response = requests.get(media_url, headers=headers)
+            response = http_client.get(media_url, headers=headers)
+            if response.status_code == 401:
+                TokenManager.invalidate_token()
             response.raise_for_status()
 
             # Determine the file extension based on media type
@@ -117,17 +134,77 @@ class WhatsAppAdapter(BaseAdapter):
             logger.error(f"Error downloading media: {e}")
             return None
     
-    def download_and_encode_media_for_transmission(self, media_id, media_type):
+    def _download_media_to_spool(self, media_id, media_config, media_url=None):
+        """
+        Stream a WhatsApp media item into a spooled temp file.
+        
+        Args:
+            media_id: ID of the media to fetch
+            media_config: MEDIA_PROCESSING_CONFIG settings
+            media_url: Media URL if already fetched (optional)
+            
+        Returns:
+            Tuple of (file, size, content type) or None if the download failed
+        """
+        # Get media URL from WhatsApp unless the caller already has it
+        if not media_url:
+            logger.info(f"🔗 Getting media URL for ID: {media_id}")
+            media_url = self.get_media_url_from_whatsapp(media_id)
+            if not media_url:
+                logger.error(f"❌ Failed to get media URL for media_id: {media_id}")
+                return None
+        logger.info(f"✅ Got media URL: {media_url[:100]}..." if len(media_url) > 100 else f"✅ Got media URL: {media_url}")
+        
+        # Get access token for downloading
+        access_token = TokenManager.get_access_token()
+        if not access_token:
+            logger.error("Missing WhatsApp API token for media download")
+            return None
+        
+        headers = {"Authorization": f"Bearer {access_token}"}
+        
+        # Get timeout from configuration
+        download_timeout = media_config.get('DOWNLOAD_TIMEOUT_SECONDS', 30)
+        max_file_size = media_config.get('MAX_FILE_SIZE_BYTES', 16 * 1024 * 1024)  # 16MB default
+        
+        # Stream the download into a spooled temp file so memory use doesn't grow with file size
+        logger.info(f"⬇️ Downloading media from URL with timeout: {download_timeout}s")
+        try:
+            media_file, content_length, actual_mime_type = media_stream.download_to_spool(
+                media_url,
+                headers=headers,
+                timeout=download_timeout,
+                max_size=max_file_size,
+                chunk_size=media_config.get('DOWNLOAD_CHUNK_SIZE', media_stream.DEFAULT_CHUNK_SIZE),
+                spool_max_memory=media_config.get('SPOOL_MAX_MEMORY_BYTES', media_stream.DEFAULT_SPOOL_MAX_MEMORY)
+            )
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 401:
+                TokenManager.invalidate_token()
+            raise
+        except media_stream.MediaTooLargeError as e:
+            logger.error(f"❌ {e}")
+            return None
+        logger.info(f"✅ Download successful, {content_length} bytes (limit: {max_file_size} bytes)")
+        return media_file, content_length, actual_mime_type
+    
+    def download_and_encode_media_for_transmission(self, media_id, media_type, sha256=None, media_url=None):
         """
         Download media and encode to base64 for helpline transmission.
-        This method downloads media in-memory and encodes to base64 without persistent storage.
+        
+        The download is streamed into a spooled temp file. With
+        MEDIA_PROCESSING_CONFIG['STREAMING_ENABLED'] the file is returned as
+        media_file and base64-encoded while the router sends it; otherwise it
+        is encoded here into media_content.
         
         Args:
             media_id: ID of the media to fetch
             media_type: Type of media (image, video, audio, document)
+            sha256: WhatsApp sha256 of the media, used as the media cache key (optional)
+            media_url: Media URL if already fetched (optional)
             
         Returns:
-            Dict with media_content (base64), media_mime, media_filename, media_size or None if failed
+            Dict with media_file or media_content (base64), media_mime, media_filename, media_size or None if failed
         """
         try:
             logger.info(f"📥 DOWNLOAD START - Media ID: {media_id}, Type: {media_type}")
@@ -137,42 +214,20 @@ class WhatsAppAdapter(BaseAdapter):
             if not media_config.get('ENCODING_ENABLED', True):
                 logger.info("⚙️ Media encoding is disabled in settings")
                 return None
-            # Get media URL from WhatsApp
-            logger.info(f"🔗 Getting media URL for ID: {media_id}")
-            media_url = self.get_media_url_from_whatsapp(media_id)
-            if not media_url:
-                logger.error(f"❌ Failed to get media URL for media_id: {media_id}")
-                return None
-            logger.info(f"✅ Got media URL: {media_url[:100]}..." if len(media_url) > 100 else f"✅ Got media URL: {media_url}")
             
-            # Get access token for downloading
-            access_token = TokenManager.get_access_token()
-            if not access_token:
-                logger.error("Missing WhatsApp API token for media download")
-                return None
-            
-            headers = {"Authorization": f"Bearer {access_token}"}
-            
-            # Get timeout from configuration
-            download_timeout = media_config.get('DOWNLOAD_TIMEOUT_SECONDS', 30)
-            
-            # Download media content directly to memory
-            logger.info(f"⬇️ Downloading media from URL with timeout: {download_timeout}s")
-            response = requests.get(media_url, headers=headers, timeout=download_timeout)
-            response.raise_for_status()
-            logger.info(f"✅ Download successful, status: {response.status_code}")
-            
-            # Check file size against configuration limit
-            content_length = len(response.content)
-            max_file_size = media_config.get('MAX_FILE_SIZE_BYTES', 16 * 1024 * 1024)  # 16MB default
-            logger.info(f"📊 File size: {content_length} bytes (limit: {max_file_size} bytes)")
-            
-            if content_length > max_file_size:
-                logger.error(f"❌ Media file too large: {content_length} bytes > {max_file_size} bytes limit")
-                return None
+            # Repeated media (forwards, re-sent voice notes) is served from the media cache
+            cached = self.media_cache.open(sha256) if sha256 else None
+            if cached:
+                media_file, content_length, actual_mime_type = cached['file'], cached['size'], cached['mime_type'] or None
+                logger.info(f"♻️ Using cached media for ID: {media_id}, {content_length} bytes")
+            else:
+                downloaded = self._download_media_to_spool(media_id, media_config, media_url)
+                if not downloaded:
+                    return None
+                media_file, content_length, actual_mime_type = downloaded
+                self.media_cache.put(sha256, media_file, actual_mime_type)
             
             # Get actual MIME type from response headers or use default mapping
-            actual_mime_type = response.headers.get('content-type')
             if not actual_mime_type:
                 # Use default MIME type mapping
                 mime_type_map = {
@@ -207,21 +262,27 @@ class WhatsAppAdapter(BaseAdapter):
             # Generate filename
             filename = f"{media_id}.{file_extension}"
             
-            # Encode to base64
-            logger.info(f"🔄 Encoding {len(response.content)} bytes to base64...")
-            media_content_bytes = response.content
-            base64_content = base64.b64encode(media_content_bytes).decode('utf-8')
-            
-            logger.info(f"✅ ENCODING COMPLETE - Media ID: {media_id}, Original size: {len(media_content_bytes)} bytes, Base64 length: {len(base64_content)} chars")
-            logger.info(f"📁 Generated filename: {filename}, MIME type: {actual_mime_type}")
-            
-            return {
-                'media_content': base64_content,
+            result = {
+                'media_content': None,
+                'media_file': None,
                 'media_mime': actual_mime_type,
                 'media_filename': filename,
-                'media_size': len(media_content_bytes)
+                'media_size': content_length
             }
             
+            if media_config.get('STREAMING_ENABLED', True):
+                # The router encodes base64 incrementally while sending
+                result['media_file'] = media_file
+                logger.info(f"✅ MEDIA READY FOR STREAMING - Media ID: {media_id}, Size: {content_length} bytes")
+            else:
+                with media_file:
+                    result['media_content'] = media_stream.encode_file_base64(media_file)
+                logger.info(f"✅ ENCODING COMPLETE - Media ID: {media_id}, Original size: {content_length} bytes, Base64 length: {len(result['media_content'])} chars")
+            
+            logger.info(f"📁 Generated filename: {filename}, MIME type: {actual_mime_type}")
+            
+            return result
+            
         except requests.exceptions.RequestException as e:
             logger.error(f"Network error downloading media {media_id}: {e}")
             return None
@@ -281,108 +342,142 @@ class WhatsAppAdapter(BaseAdapter):
         
         return False
     
-    def parse_messages(self, request: Any) -> List[Dict[str, Any]]:
+    def parse_messages(self, request: Any, records: Optional[List[WhatsAppInboundMessage]] = None) -> List[Dict[str, Any]]:
         """
         Extract messages from WhatsApp webhook data.
         
         Args:
             request: The incoming HttpRequest or data
+            records: Messages already parsed with parse_whatsapp_payload (optional)
             
         Returns:
             List of parsed messages in StandardMessage format
         """
         standard_messages = []
         
-        # Parse the request body
-        if isinstance(request, HttpRequest):
-            try:
-                data = json.loads(request.body)
-            except json.JSONDecodeError:
-                logger.error("Failed to parse JSON from WhatsApp webhook")
-                return []
-        else:
-            data = request
-
-        # Process each entry and change
-        for entry in data.get('entry', []):
-            for change in entry.get('changes', []):
-                value = change.get('value', {})
-                
-                # Process messages
-                messages = value.get('messages', [])
-                contacts = value.get('contacts', [])
-                
-                # Extract contact information
-                contact_info = {}
-                if contacts and len(contacts) > 0:
-                    contact = contacts[0]
-                    profile = contact.get('profile', {})
-                    contact_info = {
-                        'name': profile.get('name'),
-                        'wa_id': contact.get('wa_id')
-                    }
-                
-                # Process each message
-                for message in messages:
-                    # Check if this is a chatbot message
-                    is_chatbot = False
-                    sender_id = message.get('from')
-                    
-                    # Check if this is a "HEALTH" message or from active session
-                    if message.get('type') == 'text':
-                        text_content = message.get('text', {}).get('body', '')
-                        if text_content.strip().upper() == "HEALTH" or self.chatbot.is_active_session(sender_id):
-                            is_chatbot = True
-                            # Handle via chatbot (will be processed in process_incoming_message)
-                            # Just mark the message so we know to handle it
-                            if 'metadata' not in message:
-                                message['metadata'] = {}
-                            message['metadata']['is_chatbot_message'] = True
-                    
-                    # Handle media if present
-                    media_instance = None
-                    if message.get('type') in ['image', 'video', 'audio', 'document']:
-                        # Media handling code would be here 
-                        # For simplicity, we're skipping the detailed implementation
-                        pass
-                    
-                    # Create or get contact
-                    contact_name = contact_info.get('name')
-                    
-                    if sender_id:
-                        # First, create or get the contact
-                        contact, created = Contact.objects.get_or_create(
-                            wa_id=sender_id,
-                            defaults={'name': contact_name or 'Unknown'}
-                        )
-                        
-                        # Ensure contact is saved, even if it was just created
-                        if created:
-                            contact.save()
-
-                        # Create the WhatsAppMessage
-                        whatsapp_message = WhatsAppMessage.objects.create(
-                            sender=contact,
-                            recipient=None,  # No recipient for incoming message
-                            message_type=message.get('type', 'text'),
-                            content=message.get('text', {}).get('body', '') if message.get('type') == 'text' else '',
-                            caption=message.get('caption', ''),
-                            media=media_instance,
-                            status="received"
-                        )
-
-                        # Add the newly created message ID to the metadata
-                        if 'metadata' not in message:
-                            message['metadata'] = {}
-                        message['metadata']['whatsapp_message_id'] = whatsapp_message.id
-                    
-                    # Convert to standard message
-                    standard_message = self._convert_to_standard_message(message, contact_info)
-                    if standard_message:
-                        standard_messages.append(standard_message.to_dict())
+        if records is None:
+            # Parse the request body
+            if isinstance(request, HttpRequest):
+                try:
+                    data = json.loads(request.body)
+                except json.JSONDecodeError:
+                    logger.error("Failed to parse JSON from WhatsApp webhook")
+                    return []
+            else:
+                data = request
+            
+            # Walk the payload once; contacts and message records are then
+            # written with a fixed number of queries
+            records = parse_whatsapp_payload(data)
+        
+        if not records:
+            return standard_messages
+        
+        # Create or get contacts for all senders at once
+        sender_names = {}
+        for record in records:
+            if record.sender_id:
+                sender_names.setdefault(record.sender_id, record.contact_name)
+        
+        contacts_by_wa_id = {
+            contact.wa_id: contact
+            for contact in Contact.objects.filter(wa_id__in=sender_names)
+        }
+        new_contacts = [
+            Contact(wa_id=wa_id, name=name or 'Unknown')
+            for wa_id, name in sender_names.items() if wa_id not in contacts_by_wa_id
+        ]
+        if new_contacts:
+            Contact.objects.bulk_create(new_contacts, ignore_conflicts=True)
+            contacts_by_wa_id.update({contact.wa_id: contact for contact in new_contacts})
+        
+        chatbot_sessions = self.chatbot.get_active_sessions(sender_names)
+        
+        # Process each message
+        batch = []
+        whatsapp_messages = []
+        for record in records:
+            # Check if this is a "HEALTH" message or from active session
+            if record.message_type == 'text' and not record.is_chatbot_message:
+                if record.text.strip().upper() == "HEALTH" or record.sender_id in chatbot_sessions:
+                    # Handle via chatbot (will be processed in process_incoming_message)
+                    # Just mark the message so we know to handle it
+                    record = dataclass_replace(record, is_chatbot_message=True)
+            batch.append(record)
+            
+            if record.sender_id:
+                whatsapp_messages.append(WhatsAppMessage(
+                    sender=contacts_by_wa_id[record.sender_id],
+                    recipient=None,  # No recipient for incoming message
+                    message_type=record.message_type,
+                    content=record.text,
+                    caption=record.caption,
+                    media=None,
+                    status="received"
+                ))
+        
+        if whatsapp_messages:
+            WhatsAppMessage.objects.bulk_create(whatsapp_messages)
+        
+        # Convert to standard messages; media downloads run in parallel
+        for standard_message in self._convert_batch_to_standard_messages(batch):
+            if standard_message:
+                standard_messages.append(standard_message.to_dict())
         
         return standard_messages
     
+    @classmethod
+    def _get_media_executor(cls) -> Optional[ThreadPoolExecutor]:
+        """Get the shared media download pool, or None if downloads run serially."""
+        media_config = getattr(settings, 'MEDIA_PROCESSING_CONFIG', {})
+        max_workers = media_config.get('MAX_CONCURRENT_DOWNLOADS', 4)
+        if max_workers <= 1:
+            return None
+        
+        with cls._media_executor_lock:
+            if cls._media_executor is None:
+                cls._media_executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix='whatsapp-media'
+                )
+            return cls._media_executor
+    
+    def _convert_in_worker(self, record: WhatsAppInboundMessage) -> Optional[StandardMessage]:
+        try:
+            return self._record_to_standard_message(record)
+        finally:
+            # Worker threads hold their own DB connections (media cache index)
+            connection.close()
+    
+    def _convert_batch_to_standard_messages(self, records: List[WhatsAppInboundMessage]) -> List[Optional[StandardMessage]]:
+        """
+        Convert parsed messages to StandardMessages, preserving order.
+        
+        Messages with attachments fan out across the shared media pool, so
+        an album of N images takes about as long as a single download.
+        
+        Args:
+            records: Parsed WhatsApp messages
+            
+        Returns:
+            List of StandardMessage objects (None where conversion failed)
+        """
+        media_indexes = [index for index, record in enumerate(records) if record.is_media]
+        executor = self._get_media_executor() if len(media_indexes) > 1 else None
+        
+        futures = {}
+        if executor:
+            logger.info(f"Fetching {len(media_indexes)} media attachments in parallel")
+            for index in media_indexes:
+                futures[index] = executor.submit(self._convert_in_worker, records[index])
+        
+        results = []
+        for index, record in enumerate(records):
+            if index in futures:
+                results.append(futures[index].result())
+            else:
+                results.append(self._record_to_standard_message(record))
+        return results
+    
     def _convert_to_standard_message(self, message: Dict[str, Any], contact_info: Dict[str, Any]) -> Optional[StandardMessage]:
         """
         Convert a WhatsApp message to StandardMessage format.
@@ -391,85 +486,93 @@ class WhatsAppAdapter(BaseAdapter):
             message: WhatsApp message data
             contact_info: Contact information
             
+        Returns:
+            StandardMessage object or None if conversion fails
+        """
+        return self._record_to_standard_message(WhatsAppInboundMessage.from_message(message, contact_info))
+    
+    def _record_to_standard_message(self, record: WhatsAppInboundMessage) -> Optional[StandardMessage]:
+        """
+        Convert a parsed WhatsApp message to StandardMessage format.
+        
+        Args:
+            record: Parsed WhatsApp message
+            
         Returns:
             StandardMessage object or None if conversion fails
         """
         try:
-            message_id = message.get('id', str(uuid.uuid4()))
-            sender_id = message.get('from')
-            timestamp_str = message.get('timestamp')
+            message_id = record.message_id or str(uuid.uuid4())
+            sender_id = record.sender_id
             
-            if not sender_id or not timestamp_str:
-                logger.error(f"Missing required fields in WhatsApp message: {message}")
+            if not sender_id or not record.timestamp:
+                logger.error(f"Missing required fields in WhatsApp message {message_id}")
                 return None
             
             # Convert timestamp to float
-            timestamp = int(timestamp_str) / 1000.0  # Convert milliseconds to seconds
+            timestamp = int(record.timestamp) / 1000.0  # Convert milliseconds to seconds
             
             # Extract message content based on type
-            message_type = message.get('type', 'text')
+            message_type = record.message_type
             content = ""
             media_url = None
             media_content = None
+            media_file = None
             media_mime = None
             media_filename = None
             media_size = None
             
             if message_type == 'text':
-                content = message.get('text', {}).get('body', '')
-            elif message_type in ['image', 'video', 'audio', 'document']:
-                # For media messages, extract media information
-                media_data = message.get(message_type, {})
-                
+                content = record.text
+            elif record.is_media:
                 # Prefer URL from message if already fetched, otherwise use ID
-                media_url = media_data.get('url')
-                media_id = media_data.get('id')
+                media_url = record.media_url
+                media_id = record.media_id
                 
-                if not media_url and media_id:
+                # Cached media needs neither the URL lookup nor the download
+                if not media_url and media_id and not self.media_cache.contains(record.media_sha256):
                     # Try to get the URL on-demand if not already fetched
                     media_url = self.get_media_url_from_whatsapp(media_id)
                 
                 # Download and encode media for helpline transmission
                 if media_id:
                     logger.info(f"🎬 MEDIA PROCESSING START - Media ID: {media_id}, Type: {message_type}")
-                    media_encoded = self.download_and_encode_media_for_transmission(media_id, message_type)
+                    media_encoded = self.download_and_encode_media_for_transmission(
+                        media_id, message_type, sha256=record.media_sha256, media_url=media_url
+                    )
                     if media_encoded:
                         media_content = media_encoded['media_content']
+                        media_file = media_encoded.get('media_file')
                         media_mime = media_encoded['media_mime'] 
                         media_filename = media_encoded['media_filename']
                         media_size = media_encoded['media_size']
                         logger.info(f"✅ MEDIA ENCODING SUCCESS - File: {media_filename}, Size: {media_size} bytes, MIME: {media_mime}")
-                        logger.info(f"📝 Base64 content length: {len(media_content)} characters")
+                        if media_content:
+                            logger.info(f"📝 Base64 content length: {len(media_content)} characters")
                     else:
                         logger.warning(f"❌ MEDIA ENCODING FAILED for media_id: {media_id}")
                 else:
                     logger.warning(f"⚠️ NO MEDIA ID found in message type: {message_type}")
                 
-                caption = message.get('caption', '')
-                content = caption or f"{message_type} message"
+                content = record.caption or f"{message_type} message"
             
             # Create metadata
             metadata = {
-                'contact_name': contact_info.get('name'),
+                'contact_name': record.contact_name,
                 'message_type': message_type,
                 'whatsapp_message_id': message_id,
             }
             
             # For media messages, add media details
-            if message_type in ['image', 'video', 'audio', 'document']:
-                media_data = message.get(message_type, {})
+            if record.is_media:
                 metadata['media'] = {
-                    'mime_type': media_data.get('mime_type'),
-                    'sha256': media_data.get('sha256'),
-                    'id': media_data.get('id')
+                    'mime_type': record.media_mime,
+                    'sha256': record.media_sha256,
+                    'id': record.media_id
                 }
-                
-                # Add any additional media metadata from previous processing
-                if 'metadata' in message and 'media_file_id' in message['metadata']:
-                    metadata['media']['file_id'] = message['metadata']['media_file_id']
             
             # Check if this is a chatbot message
-            if 'metadata' in message and message['metadata'].get('is_chatbot_message'):
+            if record.is_chatbot_message:
                 metadata['is_chatbot_message'] = True
             
             # Create StandardMessage
@@ -487,7 +590,8 @@ class WhatsAppAdapter(BaseAdapter):
                 media_mime=media_mime,
                 media_filename=media_filename,
                 media_size=media_size,
-                metadata=metadata
+                metadata=metadata,
+                media_file=media_file
             )
         
         except Exception as e:
@@ -603,6 +707,30 @@ class WhatsAppAdapter(BaseAdapter):
             Processing result
         """
         try:
+            # Questions for the model are answered in the background when streaming is on
+            def send_part(text):
+                response_data = self.send_message(sender_id, {'message_type': 'text', 'content': text})
+                if response_data.get('status') == 'success':
+                    WebhookMessage.objects.create(
+                        message_id=response_data.get('message_id') or f"response-{message_id}-{uuid.uuid4().hex[:8]}",
+                        conversation=conversation,
+                        sender_id='system',
+                        platform='whatsapp',
+                        content=text,
+                        message_type='text'
+                    )
+                return response_data
+            
+            if self.chatbot.start_streaming_reply(sender_id, message_text, send_part):
+                return {
+                    'status': 'success',
+                    'message_id': message_id,
+                    'sender_id': sender_id,
+                    'response_text': None,
+                    'chatbot_handled': True,
+                    'streaming': True
+                }
+            
             # Get response from chatbot
             response_text = self.chatbot.process_message(sender_id, message_text)
             
@@ -732,7 +860,11 @@ class WhatsAppAdapter(BaseAdapter):
             
             # Make API request
             logger.info(f"Sending WhatsApp message to {recipient_id}")
-            response = requests.post(url, json=request_body, headers=headers)
+            response = http_client.post(url, json=request_body, headers=headers)
+            
+            # A rejected token must be revalidated on the next call
+            if response.status_code == 401:
+                TokenManager.invalidate_token()
             
             # Check response
             if response.status_code == 200:
@@ -928,7 +1060,7 @@ class WhatsAppAdapter(BaseAdapter):
                     logger.info("Message appears to be in StandardMessage format already")
                     
                     # Check if media content is present
-                    if message_data.get('media_content'):
+                    if message_data.get('media_content') or message_data.get('media_file'):
                         logger.info(f"🎬 MEDIA CONTENT PRESERVED - Size: {message_data.get('media_size')} bytes, File: {message_data.get('media_filename')}")
                     else:
                         logger.info("📝 No media content in StandardMessage dict")
@@ -952,7 +1084,8 @@ class WhatsAppAdapter(BaseAdapter):
                         media_mime=message_data.get('media_mime'),
                         media_filename=message_data.get('media_filename'),
                         media_size=message_data.get('media_size'),
-                        metadata=message_data.get('metadata', {})
+                        metadata=message_data.get('metadata', {}),
+                        media_file=message_data.get('media_file')
                     )
                     
                 # This appears to be a raw WhatsApp message
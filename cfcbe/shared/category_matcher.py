@@ -0,0 +1,178 @@
+"""
+Precompiled fuzzy matcher for mapping free-text categories to reference lists.
+
+Helpline categories arrive as free text ("child labor", "Labour", "FGM")
+and have to be mapped onto the item lists of CPIMS or CEEMIS. A
+CategoryMatcher is built once per reference list and holds:
+
+- an exact map of normalized descriptions (and item IDs)
+- an alias table resolved to items at build time
+- token and character-trigram indexes for partial and misspelt input
+
+match() returns the best candidate; candidates() returns them all, ranked
+by score, so callers can log or inspect near misses.
+
+Usage:
+    from shared.category_matcher import CategoryMatcher
+
+    matcher = CategoryMatcher(category_data, aliases={'child labor': 'Child Labour'})
+    result = matcher.match('Child labor')
+    if result:
+        item_id = result.item['item_id']
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+SCORE_EXACT = 1.0
+SCORE_ALIAS = 0.95
+SCORE_CONTAINS = 0.7   # Plus up to 0.2 for how much of the text overlaps
+SCORE_FUZZY = 0.6      # Scaled by trigram similarity
+
+NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text: Any) -> str:
+    """Lowercase, trim and collapse whitespace."""
+    return ' '.join(str(text or '').lower().split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized text into alphanumeric tokens."""
+    return [token for token in NON_WORD.split(text) if token]
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of the text with spaces as word boundaries."""
+    padded = f" {' '.join(tokenize(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class CategoryMatch:
+    """A reference item matched to the input, with how and how well it matched."""
+
+    item: Dict[str, Any]
+    score: float
+    method: str  # 'exact', 'id', 'alias', 'contains' or 'fuzzy'
+
+
+class CategoryMatcher:
+    """Matches free-text categories against one reference list."""
+
+    def __init__(self, items: List[Dict[str, Any]], aliases: Optional[Dict[str, str]] = None,
+                 description_key: str = 'item_description', id_key: str = 'item_id',
+                 min_score: float = 0.45):
+        """
+        Build the lookup tables.
+
+        Args:
+            items: Reference items (dicts with a description and an ID)
+            aliases: Map of alternative names to item descriptions
+            description_key: Key holding the item description
+            id_key: Key holding the item ID
+            min_score: Minimum score for fuzzy matches
+        """
+        self.items = [item for item in items or [] if normalize(item.get(description_key))]
+        self.id_key = id_key
+        self.min_score = min_score
+
+        self._exact = {}
+        self._ids = {}
+        self._descriptions = []
+        self._tokens = {}
+        self._trigrams = []
+        self._trigram_index = {}
+
+        for index, item in enumerate(self.items):
+            description = normalize(item.get(description_key))
+            self._descriptions.append(description)
+            self._exact.setdefault(description, index)
+            if item.get(id_key) is not None:
+                self._ids.setdefault(str(item[id_key]), index)
+
+            for token in set(tokenize(description)):
+                self._tokens.setdefault(token, []).append(index)
+
+            grams = trigrams(description)
+            self._trigrams.append(grams)
+            for gram in grams:
+                self._trigram_index.setdefault(gram, []).append(index)
+
+        # Resolve aliases to items now, dropping those whose target isn't in the list
+        self._aliases = {}
+        for alias, target in (aliases or {}).items():
+            index = self._exact.get(normalize(target))
+            if index is not None:
+                self._aliases[normalize(alias)] = index
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def candidates(self, text: Any, limit: Optional[int] = 5) -> List[CategoryMatch]:
+        """
+        Rank reference items against the input.
+
+        Args:
+            text: The free-text category
+            limit: Maximum number of candidates (None for all)
+
+        Returns:
+            Candidates ordered by score, best first; ties keep list order
+        """
+        query = normalize(text)
+        if not query:
+            return []
+
+        index = self._exact.get(query)
+        if index is not None:
+            return [CategoryMatch(self.items[index], SCORE_EXACT, 'exact')]
+
+        index = self._ids.get(str(text).strip())
+        if index is not None:
+            return [CategoryMatch(self.items[index], SCORE_EXACT, 'id')]
+
+        index = self._aliases.get(query)
+        if index is not None:
+            return [CategoryMatch(self.items[index], SCORE_ALIAS, 'alias')]
+
+        # Only items sharing a token or a trigram with the input are scored
+        query_grams = trigrams(query)
+        shortlist = set()
+        for token in tokenize(query):
+            shortlist.update(self._tokens.get(token, ()))
+        for gram in query_grams:
+            shortlist.update(self._trigram_index.get(gram, ()))
+
+        scored = []
+        for index in shortlist:
+            description = self._descriptions[index]
+            if query in description or description in query:
+                overlap = min(len(query), len(description)) / max(len(query), len(description))
+                scored.append((SCORE_CONTAINS + 0.2 * overlap, index, 'contains'))
+                continue
+
+            grams = self._trigrams[index]
+            similarity = len(query_grams & grams) / len(query_grams | grams)
+            score = SCORE_FUZZY * similarity
+            if similarity and score >= self.min_score * SCORE_FUZZY:
+                scored.append((score, index, 'fuzzy'))
+
+        scored.sort(key=lambda entry: (-entry[0], entry[1]))
+        if limit is not None:
+            scored = scored[:limit]
+        return [CategoryMatch(self.items[index], round(score, 3), method) for score, index, method in scored]
+
+    def match(self, text: Any) -> Optional[CategoryMatch]:
+        """
+        Find the best reference item for the input.
+
+        Args:
+            text: The free-text category
+
+        Returns:
+            The best CategoryMatch, or None if nothing scores high enough
+        """
+        ranked = self.candidates(text, limit=1)
+        return ranked[0] if ranked else None
@@ -0,0 +1,150 @@
+"""
+Per-endpoint circuit breaker kept in the Django cache.
+
+The state is shared by all workers only when CACHES is a shared backend
+(the database cache configured in settings by default). With a
+per-process backend such as LocMemCache each process has its own circuit
+and opens it after its own failures. Failure counts use cache.incr(),
+which the database cache implements as a read and a write, so concurrent
+failures from different workers can be undercounted and the circuit may
+open a little after FAILURE_THRESHOLD.
+
+After FAILURE_THRESHOLD consecutive failures (timeouts, connection errors,
+5xx responses) the circuit opens and callers fail fast instead of blocking
+on a dead upstream. After RESET_TIMEOUT_SECONDS one caller is let through
+as a probe: success closes the circuit, failure keeps it open for another
+RESET_TIMEOUT_SECONDS.
+
+Usage:
+    from shared.circuit_breaker import get_breaker
+
+    breaker = get_breaker('cpims')
+    if not breaker.allow_request():
+        ...  # fail fast / queue for retry
+    try:
+        response = http_client.post(...)
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+    breaker.record_result(response.status_code)
+
+Configuration (settings.CIRCUIT_BREAKER_CONFIG):
+    FAILURE_THRESHOLD: Consecutive failures that open the circuit
+    RESET_TIMEOUT_SECONDS: How long the circuit stays open before a probe
+    ENDPOINTS: Per-endpoint overrides, e.g. {'cpims': {'FAILURE_THRESHOLD': 3}}
+"""
+
+import logging
+import time
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'FAILURE_THRESHOLD': 5,
+    'RESET_TIMEOUT_SECONDS': 60,
+}
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+def get_config(name: str) -> Dict[str, Any]:
+    config = dict(DEFAULT_CONFIG)
+    breaker_config = getattr(settings, 'CIRCUIT_BREAKER_CONFIG', {}) or {}
+    config.update({k: v for k, v in breaker_config.items() if k != 'ENDPOINTS'})
+    config.update((breaker_config.get('ENDPOINTS') or {}).get(name, {}))
+    return config
+
+
+class CircuitBreaker:
+    """Circuit breaker for one upstream endpoint."""
+
+    CACHE_KEY_PREFIX = 'circuit'
+
+    def __init__(self, name: str):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Endpoint name, used for the cache keys and configuration
+        """
+        self.name = name
+        self.config = get_config(name)
+        self._failures_key = f"{self.CACHE_KEY_PREFIX}:{name}:failures"
+        self._opened_key = f"{self.CACHE_KEY_PREFIX}:{name}:opened_at"
+        self._probe_key = f"{self.CACHE_KEY_PREFIX}:{name}:probe"
+
+    @property
+    def state(self) -> str:
+        opened_at = cache.get(self._opened_key)
+        if opened_at is None:
+            return STATE_CLOSED
+        if time.time() - opened_at < self.config['RESET_TIMEOUT_SECONDS']:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through (0 when closed)."""
+        opened_at = cache.get(self._opened_key)
+        if opened_at is None:
+            return 0.0
+        return max(0.0, opened_at + self.config['RESET_TIMEOUT_SECONDS'] - time.time())
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request to the endpoint should be attempted.
+
+        Returns:
+            True when closed, or for the single probe of a half-open circuit
+        """
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN:
+            # Only one caller among the workers sharing the cache gets to probe
+            return cache.add(self._probe_key, 1, timeout=self.config['RESET_TIMEOUT_SECONDS'])
+        return False
+
+    def record_success(self) -> None:
+        if cache.get(self._opened_key) is not None:
+            logger.info(f"Circuit for {self.name} closed, endpoint recovered")
+        cache.delete_many([self._failures_key, self._opened_key, self._probe_key])
+
+    def record_failure(self) -> None:
+        if cache.get(self._opened_key) is not None:
+            # A failed probe keeps the circuit open for another period
+            cache.set(self._opened_key, time.time(), timeout=None)
+            cache.delete(self._probe_key)
+            logger.warning(f"Circuit for {self.name} probe failed, staying open")
+            return
+
+        cache.add(self._failures_key, 0, timeout=None)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            failures = 1
+            cache.set(self._failures_key, failures, timeout=None)
+
+        if failures >= self.config['FAILURE_THRESHOLD']:
+            cache.set(self._opened_key, time.time(), timeout=None)
+            logger.error(f"Circuit for {self.name} opened after {failures} consecutive failures")
+
+    def record_result(self, status_code: int) -> None:
+        """Record an HTTP response; 5xx counts as a failure, anything else as success."""
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def reset(self) -> None:
+        cache.delete_many([self._failures_key, self._opened_key, self._probe_key])
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker for an endpoint."""
+    return CircuitBreaker(name)
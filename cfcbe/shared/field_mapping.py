@@ -0,0 +1,403 @@
+"""
+Declarative field mappings compiled into plain Python functions.
+
+A mapping spec describes an output payload as data. It is compiled once into
+a function that takes a source dict and returns the payload. Values read by
+several fields are only looked up once per call.
+
+Spec nodes:
+    "text", 1, None, True          Constant
+    {"key": spec, ...}             Object with each value mapped
+    [spec, ...]                    List with each item mapped
+    {"$path": "a.b.0.c"}           Value from the source (dict keys and list
+                                   indexes); None if any level is missing
+    {"$value": spec}               Run $apply/$lookup/$default on another node
+    {"$each": "path", "$item": spec, "$limit": n}
+                                   Map each non-empty dict among the first n
+                                   items of a source list ($limit optional),
+                                   with paths in $item relative to the item
+                                   ("$root.a.b" still reads from the source)
+    {"$if": spec, "$then": spec, "$else": spec}
+                                   Choose by the truthiness of $if
+    {"$format": "Text {x}", "$args": {"x": spec}}
+                                   str.format() with mapped arguments
+    {"$use": "name"}               A spec from the file's "definitions"; all
+                                   uses in one function share the built value
+
+Value nodes ($path / $value) accept:
+    "$apply": ["lower", ["prefix", "^"]]
+                                   Functions applied in order; [name, *args]
+                                   calls name(value, *args)
+    "$lookup": "table"             Replace the value from a lookup table
+                                   (None if the table has no entry)
+    "$default": spec               Used when the value is None or "", before
+                                   or after $apply/$lookup
+
+A spec file is JSON with "mapping" and optional "lookups" and "definitions":
+
+    {
+        "lookups": {"gender_ids": {"male": "121", "female": "122"}},
+        "definitions": {"person": {"fname": {"$path": "name", "$default": ""}}},
+        "mapping": {"reporter": {"$use": "person"}, ...}
+    }
+
+Usage:
+    from shared.field_mapping import load_mapping
+
+    CASE_MAPPING = load_mapping(os.path.join(os.path.dirname(__file__), 'case_mapping.json'))
+    payload = CASE_MAPPING({'victim': {...}, 'narrative': '...'})
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _prefix(value, prefix):
+    return f"{prefix}{value}"
+
+
+def _suffix(value, suffix):
+    return f"{value}{suffix}"
+
+
+def _truncate(value, length):
+    return value[:length]
+
+
+def _exclude(value, *excluded):
+    return None if value in excluded else value
+
+
+def _not_blank(value):
+    return None if isinstance(value, str) and not value.strip() else value
+
+
+BUILTIN_FUNCTIONS = {
+    'str': str,
+    'int': int,
+    'lower': str.lower,
+    'upper': str.upper,
+    'strip': str.strip,
+    'lstrip': str.lstrip,
+    'rstrip': str.rstrip,
+    'capitalize': str.capitalize,
+    'title': str.title,
+    'prefix': _prefix,
+    'suffix': _suffix,
+    'truncate': _truncate,
+    'exclude': _exclude,
+    'not_blank': _not_blank,
+}
+
+VALUE_KEYS = {'$path', '$value', '$apply', '$lookup', '$default'}
+OPERATORS = {
+    '$each': {'$each', '$item', '$limit'},
+    '$if': {'$if', '$then', '$else'},
+    '$format': {'$format', '$args'},
+    '$use': {'$use'},
+}
+
+_LITERALS = (str, int, float, bool, type(None))
+
+
+class _Scope:
+    """Generated statements and already-computed values for one function body."""
+
+    def __init__(self, source_var: str, parent: Optional['_Scope'] = None):
+        self.source_var = source_var
+        self.lines = []
+        # path tuple or value-node key -> variable holding it
+        self.values = dict(parent.values) if parent else {}
+
+    def branch(self) -> '_Scope':
+        """A nested block: it can reuse values from here, but not the reverse."""
+        return _Scope(self.source_var, self)
+
+
+class _Compiler:
+    # Objects with at least this many constant fields are built from a template
+    TEMPLATE_MIN_CONSTANTS = 8
+
+    def __init__(self, functions: Dict[str, Callable], lookups: Dict[str, Dict[str, Any]],
+                 definitions: Dict[str, Any], name: str):
+        self.functions = dict(BUILTIN_FUNCTIONS, **(functions or {}))
+        self.lookups = lookups or {}
+        self.definitions = definitions or {}
+        self.name = name
+        self.namespace = {'__builtins__': __builtins__, '_dict': dict, '_list': (list, tuple)}
+        self.defs = []
+        self._counter = 0
+        self._using = []
+
+    def _new(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def _global(self, prefix: str, value: Any) -> str:
+        name = self._new(prefix)
+        self.namespace[name] = value
+        return name
+
+    def compile(self, spec: Any) -> Callable[[Dict[str, Any]], Any]:
+        entry = self._function(spec)
+        source = "\n\n".join(self.defs)
+        exec(compile(source, f"<field mapping {self.name}>", 'exec'), self.namespace)
+        transform = self.namespace[entry]
+        transform.source = source
+        return transform
+
+    def _function(self, spec: Any) -> str:
+        name = self._new('_map')
+        scope = _Scope('src')
+        expr = self._expr(spec, scope)
+        header = [f"def {name}(src, root=None):", "    if root is None: root = src"]
+        body = header + [f"    {line}" for line in scope.lines] + [f"    return {expr}"]
+        self.defs.append("\n".join(body))
+        return name
+
+    def _expr(self, spec: Any, scope: _Scope) -> str:
+        if isinstance(spec, _LITERALS):
+            return repr(spec)
+
+        if isinstance(spec, list):
+            return "[" + ", ".join(self._expr(item, scope) for item in spec) + "]"
+
+        if not isinstance(spec, dict):
+            raise ValueError(f"Unsupported spec node in mapping {self.name}: {spec!r}")
+
+        operators = [key for key in spec if key.startswith('$')]
+        if not operators:
+            return self._object(spec, scope)
+
+        if '$path' in spec or '$value' in spec:
+            unknown = set(spec) - VALUE_KEYS
+            if unknown:
+                raise ValueError(f"Unknown keys {sorted(unknown)} in mapping {self.name}")
+            return self._value(spec, scope)
+
+        for operator, allowed in OPERATORS.items():
+            if operator in spec:
+                unknown = set(spec) - allowed
+                if unknown:
+                    raise ValueError(f"Unknown keys {sorted(unknown)} in mapping {self.name}")
+                return getattr(self, f"_op_{operator[1:]}")(spec, scope)
+
+        raise ValueError(f"Unknown operator {operators} in mapping {self.name}")
+
+    def _object(self, spec: Dict[str, Any], scope: _Scope) -> str:
+        constant = {key: value for key, value in spec.items() if isinstance(value, _LITERALS)}
+        if len(constant) < self.TEMPLATE_MIN_CONSTANTS:
+            return "{" + ", ".join(f"{key!r}: {self._expr(value, scope)}" for key, value in spec.items()) + "}"
+
+        # Mostly-constant objects are copied from a prebuilt template (a fast
+        # C-level copy) and only the mapped fields are filled in
+        template = self._global('_template', {key: constant.get(key) for key in spec})
+        values = [(key, self._expr(value, scope)) for key, value in spec.items() if key not in constant]
+        target = self._new('o')
+        scope.lines.append(f"{target} = {template}.copy()")
+        scope.lines.extend(f"{target}[{key!r}] = {expr}" for key, expr in values)
+        return target
+
+    def _path(self, path: str, scope: _Scope) -> str:
+        parts = tuple(part for part in str(path).split('.') if part)
+        if not parts:
+            return scope.source_var
+
+        var = scope.source_var
+        start = 0
+        if parts[0] == '$root':
+            var, start = 'root', 1
+        for i in range(start, len(parts)):
+            key = parts[:i + 1]
+            if key in scope.values:
+                var = scope.values[key]
+                continue
+
+            part = parts[i]
+            target = self._new('v')
+            if part.isdigit():
+                index = int(part)
+                scope.lines.append(
+                    f"{target} = {var}[{index}] if isinstance({var}, _list) and len({var}) > {index} else None"
+                )
+            elif var in (scope.source_var, 'root'):
+                # Mapping functions are only ever called with a dict
+                scope.lines.append(f"{target} = {var}.get({part!r})")
+            else:
+                scope.lines.append(f"{target} = {var}.get({part!r}) if isinstance({var}, _dict) else None")
+            scope.values[key] = target
+            var = target
+        return var
+
+    def _value(self, spec: Dict[str, Any], scope: _Scope) -> str:
+        # Identical value nodes in one function are computed once
+        key = ('$value', json.dumps(spec, sort_keys=True, default=repr))
+        if key in scope.values:
+            return scope.values[key]
+
+        if '$path' in spec:
+            source = self._path(spec['$path'], scope)
+        else:
+            source = self._expr(spec['$value'], scope)
+
+        steps = []
+        for step in spec.get('$apply', []):
+            name, args = (step[0], step[1:]) if isinstance(step, list) else (step, [])
+            if name not in self.functions:
+                raise ValueError(f"Unknown function '{name}' in mapping {self.name}")
+            if not all(isinstance(arg, _LITERALS) for arg in args):
+                raise ValueError(f"Arguments to '{name}' must be constants in mapping {self.name}")
+            self.namespace[f"_fn_{name}"] = self.functions[name]
+            call_args = "".join(f", {arg!r}" for arg in args)
+            steps.append(f"{{v}} = _fn_{name}({{v}}{call_args})")
+
+        if '$lookup' in spec:
+            table = spec['$lookup']
+            if table not in self.lookups:
+                raise ValueError(f"Unknown lookup '{table}' in mapping {self.name}")
+            steps.append(f"{{v}} = {self._global('_table', self.lookups[table])}.get({{v}})")
+
+        if not steps and '$default' not in spec:
+            scope.values[key] = source
+            return source
+
+        target = self._new('r')
+        default = spec.get('$default')
+        scope.lines.append(f"{target} = {source}")
+        scope.lines.append(f"if {target} is None or {target} == '':")
+        self._assign_default(target, default, scope, "    ")
+        if steps:
+            scope.lines.append("else:")
+            scope.lines.extend(f"    {step.format(v=target)}" for step in steps)
+            scope.lines.append(f"    if {target} is None or {target} == '':")
+            self._assign_default(target, default, scope, "        ")
+
+        scope.values[key] = target
+        return target
+
+    def _assign_default(self, target: str, default: Any, scope: _Scope, indent: str) -> None:
+        # The default is only evaluated when it's needed
+        branch = scope.branch()
+        default_expr = self._expr(default, branch)
+        scope.lines.extend(f"{indent}{line}" for line in branch.lines)
+        scope.lines.append(f"{indent}{target} = {default_expr}")
+
+    def _op_each(self, spec: Dict[str, Any], scope: _Scope) -> str:
+        items = self._path(spec['$each'], scope)
+        item_function = self._function(spec.get('$item'))
+        limit = spec.get('$limit')
+        sequence = f"{items}[:{int(limit)}]" if limit is not None else items
+        return (f"[{item_function}(item, root) for item in ({sequence} if isinstance({items}, _list) else ()) "
+                f"if item and isinstance(item, _dict)]")
+
+    def _op_if(self, spec: Dict[str, Any], scope: _Scope) -> str:
+        condition = self._expr(spec['$if'], scope)
+        return f"({self._lazy(spec.get('$then'), scope)} if {condition} else {self._lazy(spec.get('$else'), scope)})"
+
+    def _lazy(self, spec: Any, scope: _Scope) -> str:
+        """Expression for a branch that is only evaluated when taken."""
+        branch = scope.branch()
+        expr = self._expr(spec, branch)
+        if not branch.lines:
+            return expr
+
+        # Statements can't go inside an expression, so the branch becomes a
+        # function; it can't see this function's variables and starts afresh
+        branch = _Scope(scope.source_var)
+        expr = self._expr(spec, branch)
+        name = self._new('_branch')
+        body = [f"def {name}(src, root):"] + [f"    {line}" for line in branch.lines] + [f"    return {expr}"]
+        self.defs.append("\n".join(body))
+        return f"{name}(src, root)"
+
+    def _op_format(self, spec: Dict[str, Any], scope: _Scope) -> str:
+        args = spec.get('$args') or {}
+        call_args = ", ".join(f"{name}={self._expr(value, scope)}" for name, value in args.items())
+        return f"{str(spec['$format'])!r}.format({call_args})"
+
+    def _op_use(self, spec: Dict[str, Any], scope: _Scope) -> str:
+        name = spec['$use']
+        if name not in self.definitions:
+            raise ValueError(f"Unknown definition '{name}' in mapping {self.name}")
+        if name in self._using:
+            raise ValueError(f"Definition '{name}' refers to itself in mapping {self.name}")
+        # Every use in a function shares one built value, like a variable would
+        key = ('$use', name)
+        if key in scope.values:
+            return scope.values[key]
+
+        self._using.append(name)
+        try:
+            expr = self._expr(self.definitions[name], scope)
+        finally:
+            self._using.pop()
+
+        target = self._new('u')
+        scope.lines.append(f"{target} = {expr}")
+        scope.values[key] = target
+        return target
+
+
+def compile_mapping(spec: Any, functions: Optional[Dict[str, Callable]] = None,
+                    lookups: Optional[Dict[str, Dict[str, Any]]] = None,
+                    definitions: Optional[Dict[str, Any]] = None,
+                    name: str = 'mapping') -> Callable[[Dict[str, Any]], Any]:
+    """
+    Compile a mapping spec into a transform function.
+
+    Args:
+        spec: The mapping spec (see the module docstring)
+        functions: Extra functions usable in $apply, by name
+        lookups: Lookup tables usable in $lookup, by name
+        definitions: Specs usable with $use, by name
+        name: Name used in error messages and tracebacks
+
+    Returns:
+        Function taking the source dict and returning the mapped payload.
+        Its generated code is available as `.source`.
+
+    Raises:
+        ValueError: If the spec refers to unknown functions, lookups or
+            definitions, or uses an unknown operator
+    """
+    return _Compiler(functions, lookups, definitions, name).compile(spec)
+
+
+def load_mapping(path: str, functions: Optional[Dict[str, Callable]] = None,
+                 name: Optional[str] = None) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Load and compile a mapping spec file.
+
+    settings.FIELD_MAPPING_FILES can point a mapping name at a different
+    file, e.g. {'cpims_case': '/etc/cfcbe/cpims_case.json'}.
+
+    Args:
+        path: The spec file shipped with the code
+        functions: Extra functions usable in $apply, by name
+        name: Mapping name (defaults to the file name without extension)
+
+    Returns:
+        The compiled transform function
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    override = (getattr(settings, 'FIELD_MAPPING_FILES', {}) or {}).get(name)
+    if override:
+        logger.info(f"Using {override} for field mapping {name}")
+        path = override
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    return compile_mapping(
+        data['mapping'],
+        functions=functions,
+        lookups=data.get('lookups'),
+        definitions=data.get('definitions'),
+        name=name
+    )
@@ -0,0 +1,162 @@
+"""
+Pooled, keep-alive HTTP client shared by the platform adapters.
+
+Calling ``requests.get``/``requests.post`` directly opens a new TCP+TLS
+connection for every request. This module keeps one ``requests.Session``
+per host with a sized connection pool, so repeated calls to the Graph API,
+the helpline API or CPIMS reuse warm connections.
+
+Usage:
+    from shared import http_client
+
+    response = http_client.post(url, json=payload, headers=headers)
+
+Configuration (``settings.HTTP_CLIENT_CONFIG``):
+    POOL_CONNECTIONS: Number of per-host pools to cache on each session
+    POOL_MAXSIZE: Maximum connections kept alive per host
+    MAX_RETRIES: Connection-level retries (connect errors only)
+    CONNECT_TIMEOUT / READ_TIMEOUT: Defaults applied when a caller passes no timeout
+    VERIFY_SSL_ALWAYS: Hosts that always verify TLS, regardless of
+        ``DISABLE_SSL_VERIFICATION``
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 20,
+    'MAX_RETRIES': 0,
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 30,
+    'VERIFY_SSL_ALWAYS': ['graph.facebook.com'],
+}
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def get_config() -> Dict[str, Any]:
+    """Return the HTTP client configuration merged over the defaults."""
+    config = dict(DEFAULT_CONFIG)
+    config.update(getattr(settings, 'HTTP_CLIENT_CONFIG', {}) or {})
+    return config
+
+
+def default_timeout() -> tuple:
+    """Return the default (connect, read) timeout tuple."""
+    config = get_config()
+    return (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+
+
+def verify_ssl_for(host: str) -> bool:
+    """
+    Determine whether TLS certificates should be verified for a host.
+
+    Args:
+        host: The host name (without port)
+
+    Returns:
+        True unless DISABLE_SSL_VERIFICATION is set and the host is not
+        listed in VERIFY_SSL_ALWAYS
+    """
+    if host in get_config()['VERIFY_SSL_ALWAYS']:
+        return True
+    return not getattr(settings, 'DISABLE_SSL_VERIFICATION', False)
+
+
+def _session_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _build_session(url: str) -> requests.Session:
+    config = get_config()
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=config['POOL_CONNECTIONS'],
+        pool_maxsize=config['POOL_MAXSIZE'],
+        max_retries=config['MAX_RETRIES']
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    host = urlsplit(url).hostname or ''
+    session.verify = verify_ssl_for(host)
+    if not session.verify:
+        logger.warning(f"SSL verification disabled by configuration for: {host}")
+
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Return the pooled session for the scheme and host of a URL.
+
+    Args:
+        url: Any URL on the target host
+
+    Returns:
+        A shared requests.Session with a sized connection pool
+    """
+    key = _session_key(url)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _build_session(url)
+                _sessions[key] = session
+                logger.info(f"Created pooled HTTP session for {key}")
+    return session
+
+
+def close_all() -> None:
+    """Close and forget all pooled sessions."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send a request through the pooled session for the URL's host.
+
+    Args:
+        method: HTTP method
+        url: Target URL
+        **kwargs: Passed through to requests; a default timeout is applied
+            when none is given
+
+    Returns:
+        The requests.Response
+    """
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session(url).request(method, url, **kwargs)
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+    """Send a GET request through the pooled session."""
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session(url).get(url, params=params, **kwargs)
+
+
+def post(url: str, data: Any = None, json: Any = None, **kwargs) -> requests.Response:
+    """Send a POST request through the pooled session."""
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session(url).post(url, data=data, json=json, **kwargs)
+
+
+def put(url: str, data: Any = None, **kwargs) -> requests.Response:
+    """Send a PUT request through the pooled session."""
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session(url).put(url, data=data, **kwargs)
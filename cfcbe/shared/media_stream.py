@@ -0,0 +1,179 @@
+"""
+Streaming helpers for forwarding media without holding it in memory.
+
+Media is downloaded in chunks into a SpooledTemporaryFile (kept in memory
+up to a small threshold, then on disk), and sent on as a JSON body whose
+base64 field is encoded incrementally while the request is being written.
+Peak memory per message is therefore bounded by the chunk and spool sizes
+rather than by the size of the attachment.
+"""
+
+import base64
+import json
+import logging
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from shared import http_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_SPOOL_MAX_MEMORY = 1024 * 1024
+
+# Base64 encodes 3 input bytes to 4 output bytes; reading multiples of 3
+# lets each chunk be encoded independently without padding in the middle
+BASE64_READ_SIZE = 3 * 16 * 1024
+
+
+class MediaTooLargeError(ValueError):
+    """Raised when a media download exceeds the configured size limit."""
+
+
+def download_to_spool(url: str, headers: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None, max_size: Optional[int] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      spool_max_memory: int = DEFAULT_SPOOL_MAX_MEMORY) -> Tuple[BinaryIO, int, Optional[str]]:
+    """
+    Download a URL in chunks into a spooled temporary file.
+
+    Args:
+        url: The media URL
+        headers: Request headers
+        timeout: Request timeout in seconds
+        max_size: Maximum allowed size in bytes (None for no limit)
+        chunk_size: Size of each chunk read from the network
+        spool_max_memory: Bytes kept in memory before spilling to disk
+
+    Returns:
+        Tuple of (file positioned at 0, size in bytes, content type header)
+
+    Raises:
+        MediaTooLargeError: If the media exceeds max_size
+        requests.exceptions.RequestException: On network or HTTP errors
+    """
+    kwargs = {'headers': headers or {}, 'stream': True}
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+
+    response = http_client.get(url, **kwargs)
+    try:
+        response.raise_for_status()
+
+        declared_size = response.headers.get('content-length')
+        if max_size and declared_size and declared_size.isdigit() and int(declared_size) > max_size:
+            raise MediaTooLargeError(f"Media file too large: {declared_size} bytes > {max_size} bytes limit")
+
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_max_memory)
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise MediaTooLargeError(f"Media file too large: more than {max_size} bytes")
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+
+        spool.seek(0)
+        return spool, size, response.headers.get('content-type')
+    finally:
+        response.close()
+
+
+def base64_length(size: int) -> int:
+    """Return the length of the base64 encoding of `size` bytes."""
+    return 4 * ((size + 2) // 3)
+
+
+def iter_base64(fileobj: BinaryIO, read_size: int = BASE64_READ_SIZE) -> Iterator[bytes]:
+    """
+    Yield the base64 encoding of a file in chunks.
+
+    Args:
+        fileobj: A binary file positioned at the start of the data
+        read_size: Bytes read per chunk (rounded down to a multiple of 3)
+
+    Yields:
+        Base64-encoded chunks
+    """
+    read_size = max(3, read_size - read_size % 3)
+    while True:
+        chunk = fileobj.read(read_size)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk)
+
+
+def encode_file_base64(fileobj: BinaryIO) -> str:
+    """Base64-encode a whole file into a string (for paths that need the full value)."""
+    fileobj.seek(0)
+    encoded = b''.join(iter_base64(fileobj)).decode('ascii')
+    fileobj.seek(0)
+    return encoded
+
+
+class StreamingJSONBody:
+    """
+    File-like JSON request body with one field streamed as base64.
+
+    The rest of the payload is serialized up front; the streamed field's
+    value is produced from the file while the request is being sent. The
+    total length is known in advance, so requests sends a normal
+    Content-Length body and the receiver sees the same JSON it would get
+    from ``requests.post(json=...)``.
+    """
+
+    PLACEHOLDER = '__streamed_media_content__'
+
+    def __init__(self, payload: Dict[str, Any], field: str, fileobj: BinaryIO, size: Optional[int] = None):
+        """
+        Initialize the body.
+
+        Args:
+            payload: The JSON payload without the streamed field's value
+            field: Name of the field to fill with base64 file content
+            fileobj: Binary file holding the raw content
+            size: Size of the raw content in bytes (measured from the file if omitted)
+        """
+        if size is None:
+            fileobj.seek(0, 2)
+            size = fileobj.tell()
+
+        body = dict(payload)
+        body[field] = self.PLACEHOLDER
+        serialized = json.dumps(body)
+        prefix, suffix = serialized.split(json.dumps(self.PLACEHOLDER), 1)
+
+        self._prefix = (prefix + '"').encode('utf-8')
+        self._suffix = ('"' + suffix).encode('utf-8')
+        self._length = len(self._prefix) + base64_length(size) + len(self._suffix)
+
+        fileobj.seek(0)
+        self._parts = self._iter_parts(fileobj)
+        self._buffer = b''
+
+    def _iter_parts(self, fileobj: BinaryIO) -> Iterator[bytes]:
+        yield self._prefix
+        yield from iter_base64(fileobj)
+        yield self._suffix
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes of the body (all remaining if negative)."""
+        while size < 0 or len(self._buffer) < size:
+            part = next(self._parts, None)
+            if part is None:
+                break
+            self._buffer += part
+
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
@@ -26,10 +26,11 @@ class StandardMessage:
     media_filename: Optional[str] = None  # Generated filename for media
     media_size: Optional[int] = None  # File size in bytes
     metadata: Dict[str, Any] = field(default_factory=dict)
+    media_file: Optional[Any] = None  # Raw media in a temp file, streamed as base64 instead of media_content
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert the StandardMessage to a dictionary."""
-        return {
+        data = {
             'source': self.source,
             'source_uid': self.source_uid,
             'source_address': self.source_address,
@@ -45,6 +46,10 @@ class StandardMessage:
             'media_size': self.media_size,
             'metadata': self.metadata
         }
+        # Only present when media is being streamed; file objects aren't JSON serializable
+        if self.media_file is not None:
+            data['media_file'] = self.media_file
+        return data
     
     def get_iso_timestamp(self) -> str:
         """
@@ -70,5 +75,6 @@ class StandardMessage:
             media_mime=data.get('media_mime'),
             media_filename=data.get('media_filename'),
             media_size=data.get('media_size'),
-            metadata=data.get('metadata', {})
+            metadata=data.get('metadata', {}),
+            media_file=data.get('media_file')
         )
\ No newline at end of file
@@ -1,5 +1,19 @@
 from django.test import TestCase
 from shared.models.standard_message import StandardMessage
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+from django.core.cache import cache
+from django.test import override_settings
+from shared import http_client, media_stream
+from shared.circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, get_breaker
+from shared.field_mapping import compile_mapping, load_mapping
+
 
 class StandardMessageModelTestCase(TestCase):
     def test_create_standard_message(self):
@@ -21,4 +35,183 @@ class StandardMessageModelTestCase(TestCase):
         )
         self.assertIsInstance(message, StandardMessage)
         self.assertEqual(message.source, 'test_source')
-        self.assertEqual(message.content, 'Test content')
\ No newline at end of file
+        self.assertEqual(message.content, 'Test content')
+
+
+class HttpClientTestCase(TestCase):
+    def tearDown(self):
+        http_client.close_all()
+
+    def test_session_reused_per_host(self):
+        first = http_client.get_session('https://api.example.com/one')
+        second = http_client.get_session('https://api.example.com/two?x=1')
+        other = http_client.get_session('https://other.example.com/')
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    @override_settings(DISABLE_SSL_VERIFICATION=True)
+    def test_ssl_verification_per_host(self):
+        self.assertFalse(http_client.get_session('https://helpline.example.com/').verify)
+        self.assertTrue(http_client.get_session('https://graph.facebook.com/').verify)
+
+    @patch('requests.Session.post')
+    def test_default_timeout_applied(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        http_client.post('https://api.example.com/cases', json={'a': 1})
+        self.assertEqual(mock_post.call_args.kwargs['timeout'], http_client.default_timeout())
+
+        http_client.post('https://api.example.com/cases', json={'a': 1}, timeout=60)
+        self.assertEqual(mock_post.call_args.kwargs['timeout'], 60)
+
+
+class MediaStreamTestCase(TestCase):
+    def test_streaming_json_body_matches_inline_json(self):
+        raw = bytes(range(256)) * 1000
+        payload = {'channel': 'whatsApp', 'message': 'SGVsbG8=', 'media_mime': 'image/jpeg'}
+
+        body = media_stream.StreamingJSONBody(payload, 'media_content', io.BytesIO(raw))
+        chunks = []
+        while True:
+            chunk = body.read(8192)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        streamed = b''.join(chunks)
+
+        self.assertEqual(len(streamed), len(body))
+        expected = dict(payload, media_content=base64.b64encode(raw).decode('ascii'))
+        self.assertEqual(json.loads(streamed), expected)
+
+    @patch('shared.http_client.get')
+    def test_download_to_spool_enforces_size_limit(self, mock_get):
+        response = MagicMock()
+        response.headers = {'content-type': 'image/jpeg'}
+        response.iter_content.return_value = [b'a' * 10, b'b' * 10]
+        mock_get.return_value = response
+
+        media_file, size, content_type = media_stream.download_to_spool('https://example.com/m', max_size=20)
+        self.assertEqual(size, 20)
+        self.assertEqual(content_type, 'image/jpeg')
+        self.assertEqual(media_file.read(), b'a' * 10 + b'b' * 10)
+
+        with self.assertRaises(media_stream.MediaTooLargeError):
+            media_stream.download_to_spool('https://example.com/m', max_size=15)
+
+
+@override_settings(CIRCUIT_BREAKER_CONFIG={'FAILURE_THRESHOLD': 2, 'RESET_TIMEOUT_SECONDS': 30})
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = get_breaker('upstream')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+
+        self.breaker.record_result(503)
+        self.assertEqual(self.breaker.state, STATE_OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertGreater(self.breaker.retry_after(), 0)
+
+    def test_single_probe_when_half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        with patch('shared.circuit_breaker.time.time', return_value=time.time() + 31):
+            self.assertEqual(self.breaker.state, STATE_HALF_OPEN)
+            self.assertTrue(self.breaker.allow_request())
+            self.assertFalse(get_breaker('upstream').allow_request())
+
+            # A failed probe keeps the circuit open for another period
+            self.breaker.record_failure()
+            self.assertEqual(self.breaker.state, STATE_OPEN)
+
+        with patch('shared.circuit_breaker.time.time', return_value=time.time() + 62):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_result(201)
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+
+class FieldMappingTestCase(TestCase):
+    def test_paths_defaults_and_lookups(self):
+        mapping = compile_mapping({
+            "src": "webform",
+            "name": {"$path": "victim.name", "$apply": ["not_blank"], "$default": "Anonymous"},
+            "age": {"$path": "victim.age", "$apply": ["str"], "$default": "0"},
+            "sex_id": {"$path": "victim.gender", "$apply": ["lower"], "$lookup": "genders", "$default": ""},
+            "first_tag": {"$path": "tags.0"},
+            "services": [],
+        }, lookups={"genders": {"female": "122"}})
+
+        self.assertEqual(mapping({"victim": {"name": "Jane", "age": 12, "gender": "Female"}, "tags": ["a"]}), {
+            "src": "webform", "name": "Jane", "age": "12", "sex_id": "122", "first_tag": "a", "services": [],
+        })
+        self.assertEqual(mapping({"victim": {"name": "  ", "gender": "other"}, "tags": "a"}), {
+            "src": "webform", "name": "Anonymous", "age": "0", "sex_id": "", "first_tag": None, "services": [],
+        })
+
+    def test_each_if_and_format(self):
+        mapping = compile_mapping({
+            "people": {"$each": "people", "$limit": 3, "$item": {
+                "name": {"$path": "name"},
+                "date": {"$path": "dob", "$default": {"$path": "$root.today"}},
+            }},
+            "status": {"$if": {"$path": "people"}, "$then": "known", "$else": "unknown"},
+            "notes": {"$format": "Employer in {sector} sector", "$args": {"sector": {"$path": "sector", "$default": "Unknown"}}},
+        })
+
+        result = mapping({"people": [{"name": "A", "dob": "2010"}, {}, {"name": "B"}, {"name": "C"}], "today": "2024-01-01"})
+        self.assertEqual(result["people"], [{"name": "A", "date": "2010"}, {"name": "B", "date": "2024-01-01"}])
+        self.assertEqual(result["status"], "known")
+        self.assertEqual(result["notes"], "Employer in Unknown sector")
+        self.assertEqual(mapping({})["people"], [])
+        self.assertEqual(mapping({})["status"], "unknown")
+
+    def test_values_are_computed_once(self):
+        calls = []
+
+        def upper(value):
+            calls.append(value)
+            return value.upper()
+
+        mapping = compile_mapping({
+            "a": {"$path": "x", "$apply": ["shout"]},
+            "b": [{"$path": "x", "$apply": ["shout"]}],
+            "reporter": {"$use": "person"},
+            "clients": [{"$use": "person"}],
+        }, functions={"shout": upper}, definitions={"person": {"name": {"$path": "x", "$apply": ["shout"]}}})
+
+        result = mapping({"x": "hi"})
+        self.assertEqual(calls, ["hi"])
+        self.assertEqual(result["reporter"], {"name": "HI"})
+        self.assertEqual(result["clients"], [{"name": "HI"}])
+        # Mutable constants are fresh on every call
+        self.assertIsNot(mapping({})["b"], mapping({})["b"])
+
+    def test_invalid_specs_fail_at_compile_time(self):
+        with self.assertRaises(ValueError):
+            compile_mapping({"a": {"$path": "x", "$apply": ["missing"]}})
+        with self.assertRaises(ValueError):
+            compile_mapping({"a": {"$use": "missing"}})
+        with self.assertRaises(ValueError):
+            compile_mapping({"a": {"$path": "x", "$unknown": 1}})
+
+    def test_load_mapping_from_file_and_override(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shipped = os.path.join(directory, 'shipped.json')
+        override = os.path.join(directory, 'override.json')
+        with open(shipped, 'w') as f:
+            json.dump({"mapping": {"src": "shipped"}}, f)
+        with open(override, 'w') as f:
+            json.dump({"mapping": {"src": "override"}}, f)
+
+        self.assertEqual(load_mapping(shipped)({}), {"src": "shipped"})
+        with override_settings(FIELD_MAPPING_FILES={'example': override}):
+            self.assertEqual(load_mapping(shipped, name='example')({}), {"src": "override"})
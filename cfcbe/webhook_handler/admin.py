@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Conversation, WebhookMessage, Person, Complaint, CaseNote,
     ComplaintStatus, Notification, Voicenote, Contact, WhatsAppMedia,
-    WhatsAppMessage, WhatsAppResponse, Organization, WhatsAppCredential
+    WhatsAppMessage, WhatsAppResponse, Organization, WhatsAppCredential,
+    WebhookInbox
 )
 
 # Core Gateway Models
@@ -18,6 +19,12 @@ class WebhookMessageAdmin(admin.ModelAdmin):
     list_filter = ('platform', 'message_type')
     search_fields = ('message_id', 'sender_id', 'content')
 
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'platform', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('platform', 'status')
+    search_fields = ('last_error',)
+
 # Webform (Complaint) Models
 @admin.register(Person)
 class PersonAdmin(admin.ModelAdmin):
@@ -0,0 +1,59 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from webhook_handler.models import WebhookInbox
+from webhook_handler.services.inbox_service import InboxService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process acknowledged webhook payloads stored in the inbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            help='Number of worker threads (defaults to WEBHOOK_INBOX_CONFIG WORKERS)')
+        parser.add_argument('--once', action='store_true',
+                            help='Process the currently pending entries and exit')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the inbox is empty')
+
+    def handle(self, *args, **options):
+        config = getattr(settings, 'WEBHOOK_INBOX_CONFIG', {})
+        workers = max(1, options['workers'] or config.get('WORKERS', 4))
+        inbox_service = InboxService()
+
+        self.stdout.write(f"Processing webhook inbox with {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook-inbox') as executor:
+            try:
+                while True:
+                    inbox_service.reclaim_stale()
+
+                    entries = inbox_service.claim(workers)
+                    for future in [executor.submit(self._process, inbox_service, entry.pk) for entry in entries]:
+                        future.result()
+
+                    if not entries:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping webhook inbox worker')
+
+        self.stdout.write(self.style.SUCCESS('Webhook inbox processed'))
+
+    def _process(self, inbox_service, entry_id):
+        try:
+            entry = WebhookInbox.objects.get(pk=entry_id)
+            inbox_service.process(entry)
+        except Exception as e:
+            logger.exception(f"Error processing webhook inbox entry {entry_id}: {str(e)}")
+        finally:
+            # Worker threads hold their own DB connections
+            connection.close()
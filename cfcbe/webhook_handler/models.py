@@ -36,7 +36,46 @@ class WebhookMessage(models.Model):
       
     def __str__(self):
         return f"Message from {self.sender_id} on {self.platform}"
-    
+
+class WebhookInbox(models.Model):
+    """
+    Raw webhook payloads acknowledged before processing.
+
+    Platforms listed in WEBHOOK_INBOX_CONFIG['ACK_FIRST_PLATFORMS'] are stored
+    here and answered with 200 immediately; the process_webhook_inbox worker
+    runs the regular ingestion pipeline afterwards.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_PROCESSED = 'processed'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    platform = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    received_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        verbose_name_plural = 'Webhook inbox'
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.platform} webhook received {self.received_at} ({self.status})"
+
 #######################################
 # Authentication Models
 #######################################
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from django.utils import timezone
 from webhook_handler.models import Conversation, Contact
 
@@ -52,7 +52,66 @@ class ConversationService:
             conversation.save(update_fields=['last_activity'])
         
         return conversation
-    
+
+    def get_or_create_conversations(self, senders: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Conversation]:
+        """
+        Find or create conversations for many senders with set-based queries.
+
+        Behaves like get_or_create_conversation() for each sender, but the
+        number of queries does not grow with the number of senders.
+
+        Args:
+            senders: (sender_id, platform) pairs
+
+        Returns:
+            Dict mapping (sender_id, platform) to the conversation object
+        """
+        senders = list(dict.fromkeys(senders))
+        if not senders:
+            return {}
+
+        now = timezone.now()
+        conversation_ids = {f"{platform}:{sender_id}": (sender_id, platform) for sender_id, platform in senders}
+
+        # Refresh last activity on the active conversations we already have
+        existing = Conversation.objects.filter(conversation_id__in=conversation_ids, is_active=True)
+        existing_ids = set(existing.values_list('conversation_id', flat=True))
+        if existing_ids:
+            Conversation.objects.filter(conversation_id__in=existing_ids).update(last_activity=now)
+
+        missing_ids = [conversation_id for conversation_id in conversation_ids if conversation_id not in existing_ids]
+        if missing_ids:
+            Conversation.objects.bulk_create([
+                Conversation(
+                    conversation_id=conversation_id,
+                    sender_id=conversation_ids[conversation_id][0],
+                    platform=conversation_ids[conversation_id][1],
+                    is_active=True,
+                    last_activity=now
+                )
+                for conversation_id in missing_ids
+            ])
+
+        conversations = {
+            conversation_ids[conversation.conversation_id]: conversation
+            for conversation in Conversation.objects.filter(conversation_id__in=conversation_ids, is_active=True)
+        }
+
+        # Link new WhatsApp conversations to their contacts if they exist
+        new_whatsapp = {
+            conversation_ids[conversation_id][0]: conversations[conversation_ids[conversation_id]]
+            for conversation_id in missing_ids
+            if conversation_ids[conversation_id][1] == 'whatsapp'
+        }
+        if new_whatsapp:
+            contacts = list(Contact.objects.filter(wa_id__in=new_whatsapp, conversation__isnull=True))
+            for contact in contacts:
+                contact.conversation = new_whatsapp[contact.wa_id]
+            if contacts:
+                Contact.objects.bulk_update(contacts, ['conversation'])
+
+        return conversations
+
     def close_conversation(self, conversation_id: str) -> bool:
         """
         Mark a conversation as inactive.
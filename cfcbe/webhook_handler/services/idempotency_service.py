@@ -0,0 +1,169 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from webhook_handler.models import WebhookMessage
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyService:
+    """
+    Detects redelivered webhook messages keyed on (platform, message_id).
+
+    Checks run cheapest first: a bounded in-process LRU of recently seen
+    IDs, then the WebhookMessage unique index, then an atomic cache.add()
+    claim so concurrent workers don't both accept the same message.
+    """
+
+    CACHE_KEY_PREFIX = 'webhook_seen'
+
+    # Shared by all instances in the process: (platform, message_id) -> True
+    _seen = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self):
+        """Initialize the IdempotencyService."""
+        config = getattr(settings, 'WEBHOOK_DEDUP_CONFIG', {})
+        self.lru_size = config.get('LRU_SIZE', 10000)
+        self.claim_timeout = config.get('CLAIM_TIMEOUT_SECONDS', 86400)
+
+    def extract_message_ids(self, platform: str, payload: Dict[str, Any]) -> List[str]:
+        """
+        Pull platform message IDs out of a raw webhook payload.
+
+        Args:
+            platform: The platform identifier
+            payload: The parsed webhook payload
+
+        Returns:
+            List of message IDs (empty if the platform has no stable IDs)
+        """
+        if platform != 'whatsapp' or not isinstance(payload, dict):
+            return []
+
+        message_ids = []
+        for entry in payload.get('entry', []):
+            for change in entry.get('changes', []):
+                for message in change.get('value', {}).get('messages', []):
+                    if message.get('id'):
+                        message_ids.append(message['id'])
+        return message_ids
+
+    def _remember(self, key) -> None:
+        with self._lock:
+            self._seen[key] = True
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.lru_size:
+                self._seen.popitem(last=False)
+
+    def _cache_key(self, platform: str, message_id: str) -> str:
+        return f"{self.CACHE_KEY_PREFIX}:{platform}:{message_id}"
+
+    def claim(self, platform: str, message_id: str) -> bool:
+        """
+        Claim a message for processing.
+
+        Args:
+            platform: The platform identifier
+            message_id: The platform message ID
+
+        Returns:
+            True if this caller should process the message, False if it is a duplicate
+        """
+        key = (platform, message_id)
+
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return False
+
+        if WebhookMessage.objects.filter(message_id=message_id, platform=platform).exists():
+            self._remember(key)
+            return False
+
+        if not cache.add(self._cache_key(platform, message_id), 1, timeout=self.claim_timeout):
+            self._remember(key)
+            return False
+
+        self._remember(key)
+        return True
+
+    def release(self, platform: str, message_ids: List[str]) -> None:
+        """
+        Forget claims for messages that failed processing so a redelivery is accepted.
+
+        Args:
+            platform: The platform identifier
+            message_ids: The message IDs to release
+        """
+        with self._lock:
+            for message_id in message_ids:
+                self._seen.pop((platform, message_id), None)
+        cache.delete_many([self._cache_key(platform, message_id) for message_id in message_ids])
+
+    def filter_duplicates(self, platform: str, payload: Dict[str, Any],
+                          message_ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Claim new messages and drop duplicates from the payload in place.
+
+        Args:
+            platform: The platform identifier
+            payload: The parsed webhook payload
+            message_ids: IDs already extracted from the payload (optional)
+
+        Returns:
+            The message IDs that were claimed by this call
+        """
+        if message_ids is None:
+            message_ids = self.extract_message_ids(platform, payload)
+        if not message_ids:
+            return []
+
+        claimed = [
+            message_id for message_id in dict.fromkeys(message_ids)
+            if self.claim(platform, message_id)
+        ]
+
+        if len(claimed) < len(message_ids):
+            logger.info(f"Skipping {len(message_ids) - len(claimed)} duplicate {platform} messages")
+            kept = set()
+            for entry in payload.get('entry', []):
+                for change in entry.get('changes', []):
+                    value = change.get('value', {})
+                    if 'messages' not in value:
+                        continue
+                    messages = []
+                    for message in value['messages']:
+                        message_id = message.get('id')
+                        if message_id and (message_id not in claimed or message_id in kept):
+                            continue
+                        kept.add(message_id)
+                        messages.append(message)
+                    value['messages'] = messages
+
+        return claimed
+
+    def filter_records(self, records: List[Any], claimed: List[str]) -> List[Any]:
+        """
+        Drop duplicates from parsed message records, matching filter_duplicates().
+
+        Args:
+            records: Parsed message records with a message_id attribute
+            claimed: The message IDs claimed by filter_duplicates()
+
+        Returns:
+            The records to process, in payload order
+        """
+        claimed = set(claimed)
+        kept = set()
+        filtered = []
+        for record in records:
+            message_id = record.message_id
+            if message_id and (message_id not in claimed or message_id in kept):
+                continue
+            kept.add(message_id)
+            filtered.append(record)
+        return filtered
@@ -0,0 +1,223 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from webhook_handler.models import WebhookInbox, WebhookMessage
+from webhook_handler.services.conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+
+class InboxService:
+    """
+    Persists raw webhook payloads for acknowledge-first processing and runs
+    the incoming message pipeline for them.
+
+    The same ingest_messages() pipeline is used by UnifiedWebhookView for
+    synchronous processing, so both paths behave identically.
+    """
+
+    def __init__(self, router=None):
+        """
+        Initialize the InboxService.
+
+        Args:
+            router: MessageRouter used to forward messages (created lazily if omitted)
+        """
+        self._router = router
+        self.config = getattr(settings, 'WEBHOOK_INBOX_CONFIG', {})
+
+    @property
+    def router(self):
+        if self._router is None:
+            from endpoint_integration.message_router import MessageRouter
+            self._router = MessageRouter()
+        return self._router
+
+    def is_ack_first(self, platform: str) -> bool:
+        """Check whether a platform's webhooks are acknowledged before processing."""
+        return platform in self.config.get('ACK_FIRST_PLATFORMS', [])
+
+    def enqueue(self, platform: str, payload: Dict[str, Any]) -> WebhookInbox:
+        """
+        Store a raw webhook payload for background processing.
+
+        Args:
+            platform: The platform identifier
+            payload: The parsed webhook payload
+
+        Returns:
+            The created WebhookInbox entry
+        """
+        entry = WebhookInbox.objects.create(platform=platform, payload=payload)
+        logger.info(f"Stored {platform} webhook in inbox (entry {entry.pk})")
+        return entry
+
+    def ingest_messages(self, adapter, payload: Dict[str, Any], records: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Parse, persist and route every message in a webhook payload.
+
+        The payload is handled as one batch: conversations are resolved with
+        set-based queries, WebhookMessage rows are written with a single
+        bulk_create and the messages are handed to the router together, so
+        the number of database round trips does not grow with the number of
+        messages.
+
+        Ingestion is idempotent: messages already stored by an earlier attempt
+        (e.g. an inbox entry reclaimed from a worker that died after routing)
+        keep their existing rows and are not routed again. Rows are written
+        in the same transaction as the routing, so an attempt that fails
+        part way stores nothing and its retry routes every message.
+
+        Args:
+            adapter: The platform adapter
+            payload: The parsed webhook payload
+            records: Messages the view already parsed from the payload, so the
+                adapter doesn't walk it again (WhatsApp only)
+
+        Returns:
+            List of per-message routing results
+        """
+        # Parse messages from the platform-specific format
+        if records is not None:
+            messages = adapter.parse_messages(payload, records=records)
+        else:
+            messages = adapter.parse_messages(payload)
+        if not messages:
+            return []
+
+        # Convert to standard message format
+        standard_messages = [adapter.to_standard_message(message_data) for message_data in messages]
+
+        conversations = ConversationService().get_or_create_conversations(
+            (message.source_uid, message.platform) for message in standard_messages
+        )
+
+        message_ids = [message.message_id for message in standard_messages]
+        with transaction.atomic():
+            # Messages stored by an earlier attempt have already been routed
+            existing = set(WebhookMessage.objects.filter(
+                message_id__in=message_ids
+            ).values_list('message_id', flat=True))
+            new_messages = [message for message in standard_messages if message.message_id not in existing]
+            if existing:
+                logger.info(f"Skipping {len(existing)} already routed messages: {sorted(existing)}")
+
+            # Create the webhook message records; rows written concurrently are kept
+            now = timezone.now()
+            WebhookMessage.objects.bulk_create([
+                WebhookMessage(
+                    message_id=message.message_id,
+                    conversation=conversations[(message.source_uid, message.platform)],
+                    sender_id=message.source_uid,
+                    platform=message.platform,
+                    content=message.content,
+                    media_url=message.media_url,
+                    message_type=message.content_type,
+                    timestamp=now,
+                    metadata=message.metadata
+                )
+                for message in new_messages
+            ], ignore_conflicts=True)
+
+            # Conflicting rows get no IDs from bulk_create, so read them all back
+            ids = dict(WebhookMessage.objects.filter(
+                message_id__in=message_ids
+            ).values_list('message_id', 'id'))
+
+            # Route to endpoints; a failure rolls the rows back so a retry routes them
+            routed = iter(self.router.route_batch(new_messages, conversations) if new_messages else [])
+
+        return [
+            {
+                'webhook_message_id': str(ids.get(message.message_id)),
+                'response': (
+                    {'status': 'duplicate', 'message': 'Message was already routed'}
+                    if message.message_id in existing else next(routed)
+                )
+            }
+            for message in standard_messages
+        ]
+
+    def claim(self, limit: int) -> List[WebhookInbox]:
+        """
+        Atomically mark up to `limit` pending inbox entries as processing.
+
+        Args:
+            limit: Maximum number of entries to claim
+
+        Returns:
+            The claimed entries, oldest first
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                WebhookInbox.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=WebhookInbox.STATUS_PENDING)
+                .order_by('received_at', 'id')
+                .values_list('id', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            WebhookInbox.objects.filter(
+                id__in=ids, status=WebhookInbox.STATUS_PENDING
+            ).update(status=WebhookInbox.STATUS_PROCESSING, locked_at=now)
+        return list(WebhookInbox.objects.filter(id__in=ids, locked_at=now).order_by('received_at', 'id'))
+
+    def reclaim_stale(self, stale_after: Optional[int] = None) -> int:
+        """
+        Return entries left in processing by a crashed worker to the queue.
+
+        Args:
+            stale_after: Seconds after which a processing entry is considered stale
+
+        Returns:
+            Number of reclaimed entries
+        """
+        stale_after = stale_after or self.config.get('STALE_AFTER_SECONDS', 300)
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+        reclaimed = WebhookInbox.objects.filter(
+            status=WebhookInbox.STATUS_PROCESSING, locked_at__lt=cutoff
+        ).update(status=WebhookInbox.STATUS_PENDING, locked_at=None)
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} stale webhook inbox entries")
+        return reclaimed
+
+    def process(self, entry: WebhookInbox) -> Dict[str, Any]:
+        """
+        Run the incoming message pipeline for a claimed inbox entry.
+
+        Args:
+            entry: A WebhookInbox entry in processing state
+
+        Returns:
+            Result dictionary with status and per-message responses
+        """
+        from platform_adapters.adapter_factory import AdapterFactory
+
+        entry.attempts += 1
+        entry.locked_at = None
+
+        try:
+            adapter = AdapterFactory.get_adapter(entry.platform)
+            responses = self.ingest_messages(adapter, entry.payload)
+
+            entry.status = WebhookInbox.STATUS_PROCESSED
+            entry.processed_at = timezone.now()
+            entry.last_error = ''
+            entry.save()
+            return {'status': 'success', 'responses': responses}
+
+        except Exception as e:
+            logger.exception(f"Error processing webhook inbox entry {entry.pk}: {str(e)}")
+            max_attempts = self.config.get('MAX_ATTEMPTS', 3)
+            entry.status = (
+                WebhookInbox.STATUS_FAILED if entry.attempts >= max_attempts
+                else WebhookInbox.STATUS_PENDING
+            )
+            entry.last_error = str(e)
+            entry.save()
+            return {'status': 'error', 'error': str(e)}
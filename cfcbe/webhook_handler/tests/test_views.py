@@ -3,6 +3,19 @@ from django.urls import reverse
 import json
 
 from django.test import TestCase, Client, override_settings
+import threading
+import time
+from copy import deepcopy
+from unittest.mock import MagicMock, patch
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from endpoint_integration.models import OutboundMessage
+from platform_adapters.adapter_factory import AdapterFactory
+from webhook_handler.models import Contact, Conversation, WebhookInbox, WebhookMessage, WhatsAppMessage
+from webhook_handler.services.idempotency_service import IdempotencyService
+from webhook_handler.services.inbox_service import InboxService
 
 @override_settings(PLATFORM_CONFIGS={
     'whatsapp': {
@@ -55,4 +68,324 @@ class UnifiedWebhookViewTestCase(TestCase):
             }]
         }
         response = self.client.post(url, json.dumps(data), content_type='application/json')
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+
+WHATSAPP_TEXT_PAYLOAD = {
+    "object": "whatsapp_business_account",
+    "entry": [{
+        "id": "WHATSAPP_BUSINESS_ACCOUNT_ID",
+        "changes": [{
+            "value": {
+                "messaging_product": "whatsapp",
+                "contacts": [{"profile": {"name": "Test User"}, "wa_id": "WHATSAPP_ID"}],
+                "messages": [{
+                    "from": "SENDER_WHATSAPP_ID",
+                    "id": "INBOX_MESSAGE_ID",
+                    "timestamp": "1678886400",
+                    "text": {"body": "Hello"},
+                    "type": "text"
+                }]
+            },
+            "field": "messages"
+        }]
+    }]
+}
+
+
+@override_settings(WEBHOOK_INBOX_CONFIG={'ACK_FIRST_PLATFORMS': ['whatsapp'], 'MAX_ATTEMPTS': 2})
+class AckFirstWebhookTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        # Adapters read their config on creation; don't leak ours into other tests
+        AdapterFactory._adapter_instances.clear()
+
+    @patch('webhook_handler.views.inbox_service.ingest_messages')
+    def test_ack_first_stores_payload_without_processing(self, mock_ingest):
+        url = reverse('unified-webhook', kwargs={'platform': 'whatsapp'})
+        with patch.dict('webhook_handler.views.inbox_service.config', {'ACK_FIRST_PLATFORMS': ['whatsapp']}):
+            response = self.client.post(url, json.dumps(WHATSAPP_TEXT_PAYLOAD), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        mock_ingest.assert_not_called()
+        entry = WebhookInbox.objects.get()
+        self.assertEqual(entry.platform, 'whatsapp')
+        self.assertEqual(entry.status, WebhookInbox.STATUS_PENDING)
+        self.assertEqual(entry.payload['entry'][0]['id'], 'WHATSAPP_BUSINESS_ACCOUNT_ID')
+
+    def test_process_claimed_entry(self):
+        router = MagicMock()
+        router.route_batch.side_effect = lambda messages, conversations: [{'status': 'success'}] * len(messages)
+        inbox_service = InboxService(router)
+        inbox_service.enqueue('whatsapp', WHATSAPP_TEXT_PAYLOAD)
+
+        entries = inbox_service.claim(10)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(inbox_service.claim(10), [])
+
+        result = inbox_service.process(entries[0])
+
+        self.assertEqual(result['status'], 'success')
+        entries[0].refresh_from_db()
+        self.assertEqual(entries[0].status, WebhookInbox.STATUS_PROCESSED)
+        self.assertTrue(WebhookMessage.objects.filter(message_id='INBOX_MESSAGE_ID').exists())
+        router.route_batch.assert_called_once()
+
+    def test_failed_entry_is_retried_then_marked_failed(self):
+        inbox_service = InboxService(MagicMock())
+        entry = inbox_service.enqueue('whatsapp', WHATSAPP_TEXT_PAYLOAD)
+
+        with patch.object(InboxService, 'ingest_messages', side_effect=Exception('boom')):
+            inbox_service.process(inbox_service.claim(1)[0])
+            entry.refresh_from_db()
+            self.assertEqual(entry.status, WebhookInbox.STATUS_PENDING)
+
+            inbox_service.process(inbox_service.claim(1)[0])
+            entry.refresh_from_db()
+            self.assertEqual(entry.status, WebhookInbox.STATUS_FAILED)
+            self.assertEqual(entry.last_error, 'boom')
+
+    def test_retry_after_failed_routing_routes_messages(self):
+        router = MagicMock()
+        router.route_batch.side_effect = [Exception('router down'), [{'status': 'success'}]]
+        inbox_service = InboxService(router)
+        entry = inbox_service.enqueue('whatsapp', WHATSAPP_TEXT_PAYLOAD)
+
+        self.assertEqual(inbox_service.process(inbox_service.claim(1)[0])['status'], 'error')
+        self.assertFalse(WebhookMessage.objects.filter(message_id='INBOX_MESSAGE_ID').exists())
+
+        result = inbox_service.process(inbox_service.claim(1)[0])
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['responses'][0]['response'], {'status': 'success'})
+        self.assertEqual(router.route_batch.call_count, 2)
+        self.assertEqual(WebhookMessage.objects.filter(message_id='INBOX_MESSAGE_ID').count(), 1)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, WebhookInbox.STATUS_PROCESSED)
+
+    def test_reprocessed_entry_is_delivered_once(self):
+        router = MagicMock()
+        router.route_batch.side_effect = lambda messages, conversations: [{'status': 'success'}] * len(messages)
+        inbox_service = InboxService(router)
+        entry = inbox_service.enqueue('whatsapp', WHATSAPP_TEXT_PAYLOAD)
+
+        first = inbox_service.process(inbox_service.claim(1)[0])
+        stored = WebhookMessage.objects.get(message_id='INBOX_MESSAGE_ID')
+
+        # A worker that dies before saving the entry leaves it to be reclaimed and run again
+        entry.refresh_from_db()
+        second = inbox_service.process(entry)
+
+        self.assertEqual(first['status'], 'success')
+        self.assertEqual(second['status'], 'success')
+        router.route_batch.assert_called_once()
+        self.assertEqual(second['responses'][0]['webhook_message_id'], str(stored.id))
+        self.assertEqual(second['responses'][0]['response']['status'], 'duplicate')
+        self.assertEqual(WebhookMessage.objects.filter(message_id='INBOX_MESSAGE_ID').count(), 1)
+
+
+class IdempotentIngestionTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('unified-webhook', kwargs={'platform': 'whatsapp'})
+        IdempotencyService._seen.clear()
+        cache.clear()
+
+    def tearDown(self):
+        IdempotencyService._seen.clear()
+        cache.clear()
+        AdapterFactory._adapter_instances.clear()
+
+    @patch('webhook_handler.views.inbox_service.ingest_messages', return_value=[])
+    def test_redelivery_is_short_circuited(self, mock_ingest):
+        payload = json.dumps(WHATSAPP_TEXT_PAYLOAD)
+
+        self.assertEqual(self.client.post(self.url, payload, content_type='application/json').status_code, 200)
+        self.assertEqual(self.client.post(self.url, payload, content_type='application/json').status_code, 200)
+        mock_ingest.assert_called_once()
+
+    def test_existing_webhook_message_is_duplicate(self):
+        conversation = Conversation.objects.create(
+            conversation_id='whatsapp:SENDER_WHATSAPP_ID', sender_id='SENDER_WHATSAPP_ID', platform='whatsapp'
+        )
+        WebhookMessage.objects.create(
+            message_id='INBOX_MESSAGE_ID', conversation=conversation,
+            sender_id='SENDER_WHATSAPP_ID', platform='whatsapp'
+        )
+        self.assertFalse(IdempotencyService().claim('whatsapp', 'INBOX_MESSAGE_ID'))
+
+    def test_partial_duplicates_are_removed_from_payload(self):
+        service = IdempotencyService()
+        service.claim('whatsapp', 'INBOX_MESSAGE_ID')
+
+        payload = deepcopy(WHATSAPP_TEXT_PAYLOAD)
+        messages = payload['entry'][0]['changes'][0]['value']['messages']
+        messages.append(dict(messages[0], id='NEW_MESSAGE_ID'))
+
+        claimed = service.filter_duplicates('whatsapp', payload)
+
+        self.assertEqual(claimed, ['NEW_MESSAGE_ID'])
+        remaining = payload['entry'][0]['changes'][0]['value']['messages']
+        self.assertEqual([m['id'] for m in remaining], ['NEW_MESSAGE_ID'])
+
+    @patch('webhook_handler.views.inbox_service.ingest_messages', side_effect=Exception('helpline down'))
+    def test_failed_processing_releases_claim(self, mock_ingest):
+        payload = json.dumps(WHATSAPP_TEXT_PAYLOAD)
+
+        self.assertEqual(self.client.post(self.url, payload, content_type='application/json').status_code, 500)
+        self.assertEqual(self.client.post(self.url, payload, content_type='application/json').status_code, 500)
+        self.assertEqual(mock_ingest.call_count, 2)
+
+
+def whatsapp_batch_payload(count):
+    """Build a WhatsApp payload with `count` text messages from three senders."""
+    payload = deepcopy(WHATSAPP_TEXT_PAYLOAD)
+    value = payload['entry'][0]['changes'][0]['value']
+    value['messages'] = [
+        {
+            "from": f"SENDER_{index % 3}",
+            "id": f"BATCH_MESSAGE_{index}",
+            "timestamp": "1678886400",
+            "text": {"body": f"Message {index}"},
+            "type": "text"
+        }
+        for index in range(count)
+    ]
+    return payload
+
+
+@override_settings(ENDPOINT_CONFIG={'messaging_endpoint': {'url': 'http://helpline.test/api/msg/', 'queued': True}})
+class BatchIngestionTestCase(TestCase):
+    def tearDown(self):
+        AdapterFactory._adapter_instances.clear()
+
+    def _ingest(self, payload):
+        from endpoint_integration.message_router import MessageRouter
+
+        adapter = AdapterFactory.get_adapter('whatsapp')
+        with CaptureQueriesContext(connection) as queries:
+            responses = InboxService(MessageRouter()).ingest_messages(adapter, payload)
+        return responses, len(queries)
+
+    def test_batch_is_persisted_and_queued(self):
+        responses, _ = self._ingest(whatsapp_batch_payload(5))
+
+        self.assertEqual(len(responses), 5)
+        self.assertTrue(all(r['response']['status'] == 'queued' for r in responses))
+        self.assertEqual(WebhookMessage.objects.filter(message_id__startswith='BATCH_MESSAGE_').count(), 5)
+        self.assertEqual(Conversation.objects.filter(sender_id__startswith='SENDER_').count(), 3)
+        self.assertEqual(Contact.objects.filter(wa_id__startswith='SENDER_').count(), 3)
+        self.assertEqual(WhatsAppMessage.objects.count(), 5)
+        self.assertEqual(
+            Contact.objects.get(wa_id='SENDER_0').conversation,
+            Conversation.objects.get(conversation_id='whatsapp:SENDER_0')
+        )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        _, small = self._ingest(whatsapp_batch_payload(3))
+        Conversation.objects.all().delete()
+        Contact.objects.all().delete()
+        _, large = self._ingest(whatsapp_batch_payload(30))
+        self.assertEqual(small, large)
+
+
+def cpims_case(case_id, narrative="Child reported missing from home"):
+    return {"id": case_id, "narrative": narrative, "created_on": "1700000000"}
+
+
+class CPIMSBatchForwardingTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('helpline_cpims_abuse_batch')
+        patcher = patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.HelplineCPIMSAbuseAdapter.warm_reference_data')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        AdapterFactory._adapter_instances.clear()
+
+    def post(self, payload):
+        return self.client.post(self.url, data=json.dumps(payload), content_type='application/json')
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.HelplineCPIMSAbuseAdapter._send_to_cpims')
+    def test_results_are_returned_per_case_in_order(self, mock_send):
+        def send(case, **kwargs):
+            if case['id'] == 'C2':
+                return {"status": "error", "message": "CPIMS API error: 500"}
+            return {"status": "success", "message": "Case successfully sent to CPIMS", "payload_sent": {"x": 1}}
+
+        mock_send.side_effect = send
+
+        response = self.post({"cases": [cpims_case('C1'), cpims_case('C2'), cpims_case('C3', narrative=' ')]})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['status'], body['total'], body['succeeded'], body['failed']), ('partial_success', 3, 1, 2))
+        self.assertEqual([r['case_id'] for r in body['results']], ['C1', 'C2', 'C3'])
+        self.assertEqual([r['status'] for r in body['results']], ['success', 'error', 'rejected'])
+        self.assertNotIn('payload_sent', body['results'][0])
+        # The invalid case never reached CPIMS
+        self.assertEqual(mock_send.call_count, 2)
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.HelplineCPIMSAbuseAdapter._send_to_cpims')
+    def test_cases_are_forwarded_concurrently(self, mock_send):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def send(case, **kwargs):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+            return {"status": "success"}
+
+        mock_send.side_effect = send
+
+        response = self.post([cpims_case(f"C{i}") for i in range(12)])
+
+        self.assertEqual(response.json()['succeeded'], 12)
+        self.assertGreater(state['peak'], 1)
+        self.assertLessEqual(state['peak'], settings.CPIMS_BATCH_CONFIG['MAX_CONCURRENCY'])
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.post({"cases": []}).status_code, 400)
+        self.assertEqual(self.post({"id": "C1"}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, data='not json', content_type='application/json').status_code, 400)
+
+    @override_settings(CPIMS_BATCH_CONFIG={'MAX_CASES': 1000, 'SYNC_MAX_CASES': 2})
+    def test_synchronous_batches_are_capped(self):
+        response = self.post([cpims_case(f"C{i}") for i in range(3)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("the limit is 2", response.json()['message'])
+
+    @override_settings(CPIMS_BATCH_CONFIG={'MAX_CASES': 1000, 'SYNC_MAX_CASES': 2},
+                       ENDPOINT_CONFIG={'cpims': {'adapter': 'cpims_abuse', 'retry_queue': True, 'max_attempts': 3}})
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.HelplineCPIMSAbuseAdapter._send_to_cpims')
+    def test_batches_are_queued_when_the_retry_queue_is_enabled(self, mock_send):
+        response = self.post([cpims_case('C1'), cpims_case('C2', narrative=' '), cpims_case('C3')])
+
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual((body['status'], body['queued'], body['failed']), ('partial_success', 2, 1))
+        self.assertEqual([r['status'] for r in body['results']], ['queued', 'rejected', 'queued'])
+        mock_send.assert_not_called()
+
+        outbound = OutboundMessage.objects.get(pk=body['results'][2]['outbound_id'])
+        self.assertEqual((outbound.endpoint, outbound.message_id, outbound.max_attempts), ('cpims', 'C3', 3))
+        self.assertEqual(outbound.payload, cpims_case('C3'))
+        self.assertEqual(OutboundMessage.objects.count(), 2)
+
+    @patch('platform_adapters.cpims.helpline_cpims_abuse_adapter.HelplineCPIMSAbuseAdapter._send_to_cpims')
+    def test_dry_run_is_passed_through(self, mock_send):
+        mock_send.return_value = {"status": "success", "dry_run": True, "payload": {}}
+
+        response = self.client.post(f"{self.url}?dry_run=true", data=json.dumps([cpims_case('C1')]),
+                                    content_type='application/json')
+
+        self.assertEqual(response.json()['succeeded'], 1)
+        mock_send.assert_called_once_with(cpims_case('C1'), dry_run=True)
@@ -2,7 +2,7 @@ from django.urls import path
 
 from webhook_handler import auth_views
 from webhook_handler.views_eemis import EEMISWebhookView
-from .views import CaseStatusCheckView, HelplineCEEMISUpdateView, HelplineCEEMISView, UnifiedWebhookView, CEEMISHelplineView, HelplineCPIMSAbuseView 
+from .views import CaseStatusCheckView, HelplineCEEMISUpdateView, HelplineCEEMISView, UnifiedWebhookView, CEEMISHelplineView, HelplineCPIMSAbuseView, HelplineCPIMSAbuseBatchView
 # from .views import CaseCategoryExportView, HelplineCEEMISView, LocationExportView, TokenGenerationView, UnifiedWebhookView, WebformCategoriesView
 
 urlpatterns = [
@@ -19,6 +19,7 @@ urlpatterns = [
     path('webhook/ceemis/create/', CEEMISHelplineView.as_view(), name='ceemis-helpline'),
     path('case/status/<str:case_reference>/', CaseStatusCheckView.as_view(), name='case-status-check'),
     path('webhook/helpline/cpims/abuse/', HelplineCPIMSAbuseView.as_view(), name='helpline_cpims_abuse'),
+    path('webhook/helpline/cpims/abuse/batch/', HelplineCPIMSAbuseBatchView.as_view(), name='helpline_cpims_abuse_batch'),
 ]
 
 
@@ -10,6 +10,7 @@ from django.utils import timezone
 from datetime import datetime
 import logging
 import requests
+from shared import http_client
 import csv
 from django.http import JsonResponse, HttpResponse
 from cfcbe import settings
@@ -18,6 +19,9 @@ from platform_adapters.adapter_factory import AdapterFactory
 from endpoint_integration.message_router import MessageRouter
 from shared.models.standard_message import StandardMessage
 from webhook_handler.services.conversation_service import ConversationService
+from webhook_handler.services.inbox_service import InboxService
+from webhook_handler.services.idempotency_service import IdempotencyService
+from platform_adapters.whatsApp.payload_parser import parse_whatsapp_payload
 from webhook_handler.models import (
     Contact, Person, Complaint, WhatsAppMessage, 
     WhatsAppMedia, Conversation, WebhookMessage,
@@ -30,6 +34,8 @@ from platform_adapters.whatsApp.chatbot_adapter import MaternalHealthChatbot
 
 logger = logging.getLogger(__name__)
 router = MessageRouter()
+inbox_service = InboxService(router)
+idempotency_service = IdempotencyService()
 @method_decorator(csrf_exempt, name='dispatch')
 class UnifiedWebhookView(View):
     """
@@ -78,24 +84,21 @@ class UnifiedWebhookView(View):
             adapter = AdapterFactory.get_adapter(platform)
             
             # Parse the request body
+            records = None
             try:
                 payload = json.loads(request.body)
-                # Log full raw payload for debugging
-                logger.info(f"THIS IS THE PAYLOAD{payload}")
+                # Log full raw payload for debugging (formatted only when DEBUG is enabled)
+                logger.debug("Webhook payload: %s", payload)
                 
-                # Enhanced logging for media messages
-                if platform == 'whatsapp' and 'entry' in payload:
-                    for entry in payload.get('entry', []):
-                        for change in entry.get('changes', []):
-                            messages = change.get('value', {}).get('messages', [])
-                            for message in messages:
-                                if message.get('type') in ['image', 'video', 'audio', 'document']:
-                                    media_info = message.get(message.get('type'), {})
-                                    logger.info(f"🎬 INCOMING MEDIA MESSAGE DETECTED!")
-                                    logger.info(f"📄 Type: {message.get('type')}")
-                                    logger.info(f"🆔 Media ID: {media_info.get('id', 'NOT_FOUND')}")
-                                    logger.info(f"🎭 MIME: {media_info.get('mime_type', 'NOT_FOUND')}")
-                                    logger.info(f"📝 Caption: {message.get('caption', 'NO_CAPTION')}")
+                # WhatsApp payloads are walked once; every later stage uses the records
+                if platform == 'whatsapp':
+                    records = parse_whatsapp_payload(payload)
+                    for record in records:
+                        if record.is_media:
+                            logger.info(
+                                f"🎬 Incoming {record.message_type} message - Media ID: {record.media_id or 'NOT_FOUND'}, "
+                                f"MIME: {record.media_mime or 'NOT_FOUND'}, Caption: {record.caption or 'NO_CAPTION'}"
+                            )
             except json.JSONDecodeError:
                 # If the body isn't JSON, treat it as form data
                 payload = request.POST.dict()
@@ -189,7 +192,27 @@ class UnifiedWebhookView(View):
             elif direction == 'token':
                 return self._handle_token_operation(adapter, platform, payload, request)
             else:
-                return self._handle_incoming_message(adapter, platform, payload, request)
+                # Short-circuit redelivered messages before any adapter work
+                claimed_ids = []
+                if records is not None:
+                    message_ids = [record.message_id for record in records if record.message_id]
+                else:
+                    message_ids = idempotency_service.extract_message_ids(platform, payload)
+                if message_ids:
+                    claimed_ids = idempotency_service.filter_duplicates(platform, payload, message_ids)
+                    if not claimed_ids:
+                        logger.info(f"Ignoring duplicate {platform} delivery: {message_ids}")
+                        return HttpResponse(status=200)
+                    if records is not None and len(claimed_ids) < len(message_ids):
+                        records = idempotency_service.filter_records(records, claimed_ids)
+                
+                response = self._handle_incoming_message(adapter, platform, payload, request, records=records)
+                
+                # Let the platform redeliver messages we failed to process
+                if claimed_ids and response.status_code >= 400:
+                    idempotency_service.release(platform, claimed_ids)
+                
+                return response
                 
         except Exception as e:
             logger.exception(f"Error processing webhook: {str(e)}")
@@ -242,8 +265,8 @@ class UnifiedWebhookView(View):
                 # Save to database if needed
                 # self._save_message(message, request)
                 
-                # Send to CEEMIS
-                response = adapter.send_message("ceemis", message.metadata)
+                # Send to CEEMIS (or queue it when async forwarding is on)
+                response = adapter.submit_message(message.metadata)
                 responses.append(response)
             
             # Format response
@@ -265,31 +288,23 @@ class UnifiedWebhookView(View):
             message_content = None
             
             # Check for WhatsApp business format
-            if 'entry' in payload and len(payload['entry']) > 0:
-                for entry in payload['entry']:
-                    if 'changes' in entry and len(entry['changes']) > 0:
-                        for change in entry['changes']:
-                            if 'value' in change and 'messages' in change['value']:
-                                messages = change['value']['messages']
-                                if messages and len(messages) > 0:
-                                    message = messages[0]
-                                    
-                                    # Extract sender ID and message content
-                                    sender_id = message.get('from')
-                                    
-                                    # Check for text message
-                                    if message.get('type') == 'text' and 'text' in message:
-                                        message_content = message['text'].get('body', '')
-                                        
-                                        # Check for HEALTH keyword directly
-                                        if message_content.strip().upper() == 'HEALTH':
-                                            logger.info(f"Found HEALTH keyword in raw payload from {sender_id}")
-                                            return True, sender_id, message_content
-                                            
-                                        # Also check if SEVBTFRI is the encoded form of HEALTH
-                                        if message_content.strip().upper() == 'SEVBTFRI':
-                                            logger.info(f"Found SEVBTFRI (encoded HEALTH) in raw payload from {sender_id}")
-                                            return True, sender_id, 'HEALTH'
+            for record in parse_whatsapp_payload(payload):
+                # Extract sender ID and message content
+                sender_id = record.sender_id
+                
+                # Check for text message
+                if record.message_type == 'text':
+                    message_content = record.text
+                    
+                    # Check for HEALTH keyword directly
+                    if message_content.strip().upper() == 'HEALTH':
+                        logger.info(f"Found HEALTH keyword in raw payload from {sender_id}")
+                        return True, sender_id, message_content
+                        
+                    # Also check if SEVBTFRI is the encoded form of HEALTH
+                    if message_content.strip().upper() == 'SEVBTFRI':
+                        logger.info(f"Found SEVBTFRI (encoded HEALTH) in raw payload from {sender_id}")
+                        return True, sender_id, 'HEALTH'
             
             # Also check simpler format (might be after transformation)
             if not sender_id and 'from' in payload:
@@ -405,27 +420,44 @@ class UnifiedWebhookView(View):
             if text_content.strip().upper() == "HEALTH":
                 chatbot.activate_session(sender_id)
                 
+            def send_reply(text, part=False):
+                # Send response back to user
+                response_data = adapter.send_message(sender_id, {
+                    'message_type': 'text',
+                    'content': text
+                })
+                
+                # Record outgoing message
+                if response_data.get('status') == 'success':
+                    metadata = {'chatbot_response': True}
+                    fallback_id = f"response-{message_id}"
+                    if part:
+                        metadata['partial'] = True
+                        fallback_id = f"{fallback_id}-{uuid.uuid4().hex[:8]}"
+                    WebhookMessage.objects.create(
+                        message_id=response_data.get('message_id', fallback_id),
+                        conversation=conversation,
+                        sender_id='system',
+                        platform='whatsapp',
+                        content=text,
+                        message_type='text',
+                        timestamp=timezone.now(),
+                        metadata=metadata
+                    )
+                return response_data
+            
+            # Model answers are streamed in parts from the background when enabled,
+            # so the webhook returns straight away
+            if chatbot.start_streaming_reply(sender_id, text_content, lambda text: send_reply(text, part=True)):
+                return adapter.format_webhook_response([{
+                    'status': 'success',
+                    'message_id': message_id,
+                    'streaming': True
+                }])
+            
             # Process the message and get response
             response_text = chatbot.process_message(sender_id, text_content)
-            
-            # Send response back to user
-            response_data = adapter.send_message(sender_id, {
-                'message_type': 'text',
-                'content': response_text
-            })
-            
-            # Record outgoing message
-            if response_data.get('status') == 'success':
-                outgoing_message = WebhookMessage.objects.create(
-                    message_id=response_data.get('message_id', f"response-{message_id}"),
-                    conversation=conversation,
-                    sender_id='system',
-                    platform='whatsapp',
-                    content=response_text,
-                    message_type='text',
-                    timestamp=timezone.now(),
-                    metadata={'chatbot_response': True}
-                )
+            send_reply(response_text)
             
             # Format the webhook response
             return adapter.format_webhook_response([{
@@ -439,7 +471,7 @@ class UnifiedWebhookView(View):
             return HttpResponse("Processing failed", status=500)
 
     
-    def _handle_incoming_message(self, adapter, platform, payload, request):
+    def _handle_incoming_message(self, adapter, platform, payload, request, records=None):
         """
         Process incoming messages from platforms.
         
@@ -448,6 +480,7 @@ class UnifiedWebhookView(View):
             platform: The platform identifier
             payload: The request payload
             request: The HTTP request
+            records: Messages already parsed from the payload (WhatsApp only)
             
         Returns:
             HTTP response
@@ -462,38 +495,13 @@ class UnifiedWebhookView(View):
             if not is_valid:
                 return HttpResponse("Validation failed", status=403)
                 
-            # Parse messages from the platform-specific format
-            messages = adapter.parse_messages(payload)
+            # Acknowledge-first platforms are answered immediately and
+            # processed by the process_webhook_inbox worker
+            if inbox_service.is_ack_first(platform):
+                inbox_service.enqueue(platform, payload)
+                return adapter.format_webhook_response([])
             
-            responses = []
-            for message_data in messages:
-                # Convert to standard message format
-                standard_message = adapter.to_standard_message(message_data)
-                
-                # Create a webhook message record
-                conversation = ConversationService().get_or_create_conversation(
-                    standard_message.source_uid, standard_message.platform
-                )
-                
-                webhook_message = WebhookMessage.objects.create(
-                    message_id=standard_message.message_id,
-                    conversation=conversation,
-                    sender_id=standard_message.source_uid,
-                    platform=standard_message.platform,
-                    content=standard_message.content,
-                    media_url=standard_message.media_url,
-                    message_type=standard_message.content_type,
-                    timestamp=timezone.now(),
-                    metadata=standard_message.metadata
-                )
-                
-                # Route to endpoint
-                endpoint_response = router.route_to_endpoint(standard_message)
-                
-                responses.append({
-                    'webhook_message_id': str(webhook_message.id),
-                    'response': endpoint_response
-                })
+            responses = inbox_service.ingest_messages(adapter, payload, records=records)
             
             # Format the webhook response
             return adapter.format_webhook_response(responses)
@@ -883,8 +891,8 @@ class HelplineCEEMISView(View):
                 # Create StandardMessage object
                 message = StandardMessage(**msg_dict)
                 print(f"THIS IS THE MESSAGE in the for loop {message.metadata}")
-                # Send to CEEMIS
-                response = adapter.send_message("ceemis", message.metadata)
+                # Send to CEEMIS (or queue it when async forwarding is on)
+                response = adapter.submit_message(message.metadata)
                 print(f"THIS IS THE RESPONSE {response}")
                 responses.append(response)
             
@@ -930,13 +938,19 @@ class CEEMISHelplineView(View):
                     "message": "Invalid CEEMIS case data"
                 }, status=400)
             # print(f"Validated CEEMIS payload: {ceemis_payload}")
-            response = adapter.send_to_helpline(ceemis_payload)
+            response = adapter.submit_to_helpline(ceemis_payload)
             if response.get("status") == "success":
                 return JsonResponse({
                     "status": "success",
                     "message": "Case successfully forwarded to Helpline",
                     "helpline_response": response
                 })
+            elif response.get("status") == "queued":
+                return JsonResponse({
+                    "status": "queued",
+                    "message": "Case queued for forwarding to Helpline",
+                    "outbound_id": response.get("outbound_id")
+                }, status=202)
             else:
                 return JsonResponse({
                     "status": "error",
@@ -1003,8 +1017,8 @@ class HelplineCEEMISUpdateView(View):
             # Get the message dictionary (first one)
             message_dict = message_dicts[0]
             
-            # Process the update - pass the dictionary directly
-            response = adapter.send_message("ceemis", message_dict)
+            # Process the update (queued and coalesced per case when async forwarding is on)
+            response = adapter.submit_message(message_dict["metadata"])
             
             # Log the response for debugging
             print(f"THIS IS THE RESPONSE {response}")
@@ -1075,7 +1089,7 @@ class CaseStatusCheckView(View):
             
             # Make request to helpline API
             logger.info(f"Fetching case status for case ID: {case_id}")
-            response = requests.get(helpline_url, headers=headers)
+            response = http_client.get(helpline_url, headers=headers)
             
             if response.status_code == 200:
                 try:
@@ -1149,10 +1163,18 @@ class CaseStatusCheckView(View):
                 'message': 'An unexpected error occurred while checking case status'
             }, status=500)
 
+def _is_dry_run(request) -> bool:
+    """Whether a CPIMS forwarding request asked to map cases without sending them."""
+    return request.GET.get('dry_run', '').lower() in ('true', '1', 'yes')
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class HelplineCPIMSAbuseView(View):
     """
     Dedicated view for handling Helpline to CPIMS abuse case forwarding.
+
+    With ?dry_run=true the case is validated and mapped, and the CPIMS
+    payload is returned without being sent.
     """
     
     def post(self, request, *args, **kwargs):
@@ -1201,7 +1223,7 @@ class HelplineCPIMSAbuseView(View):
                 logger.info(f"Processing message for CPIMS: {message.source_uid}")
                 
                 # Send to CPIMS
-                response = adapter.send_message("cpims", message.metadata)
+                response = adapter.send_message("cpims", message.metadata, dry_run=_is_dry_run(request))
                 logger.info(f"CPIMS response: {response}")
                 responses.append(response)
             
@@ -1214,6 +1236,88 @@ class HelplineCPIMSAbuseView(View):
                 "status": "error",
                 "message": f"Failed to process case: {str(e)}"
             }, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class HelplineCPIMSAbuseBatchView(View):
+    """
+    Forwards many Helpline abuse cases to CPIMS in one request (e.g. back-fills).
+
+    Accepts a JSON array of cases, or {"cases": [...]}, in the same format as
+    HelplineCPIMSAbuseView, and returns one result per case. Supports
+    ?dry_run=true like the single-case view.
+
+    When the CPIMS retry queue is enabled, valid cases are put on the outbound
+    queue (up to CPIMS_BATCH_CONFIG['MAX_CASES']) and the view answers 202
+    with each case's outbound_id; the queue worker forwards them. Otherwise
+    cases are forwarded within the request, so at most SYNC_MAX_CASES are
+    accepted to finish inside the worker timeout.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handle POST requests with a batch of Helpline abuse cases.
+        """
+        try:
+            try:
+                payload = json.loads(request.body)
+            except json.JSONDecodeError:
+                return JsonResponse({
+                    "status": "error",
+                    "message": "Invalid JSON payload"
+                }, status=400)
+
+            cases = payload.get("cases") if isinstance(payload, dict) else payload
+            if not isinstance(cases, list) or not cases:
+                return JsonResponse({
+                    "status": "error",
+                    "message": "Expected a non-empty list of cases"
+                }, status=400)
+
+            adapter = AdapterFactory.get_adapter('cpims_abuse')
+            dry_run = _is_dry_run(request)
+            use_queue = not dry_run and adapter.retry_queue_enabled()
+
+            max_cases = adapter.max_batch_cases(queued=use_queue)
+            if len(cases) > max_cases:
+                return JsonResponse({
+                    "status": "error",
+                    "message": f"Too many cases in one batch ({len(cases)}), the limit is {max_cases}"
+                }, status=400)
+
+            logger.info(f"📥 Received batch of {len(cases)} cases from Helpline for CPIMS processing")
+
+            if use_queue:
+                results = adapter.queue_batch(cases)
+            else:
+                results = adapter.send_batch(cases, dry_run=dry_run)
+
+            succeeded = sum(1 for result in results if result.get("status") in ("success", "partial_success"))
+            queued = sum(1 for result in results if result.get("status") == "queued")
+            failed = len(results) - succeeded - queued
+            if not failed:
+                status = "queued" if use_queue else "success"
+            elif succeeded or queued:
+                status = "partial_success"
+            else:
+                status = "error"
+
+            logger.info(f"CPIMS batch finished: {succeeded}/{len(results)} cases forwarded, {queued} queued for retry")
+            return JsonResponse({
+                "status": status,
+                "total": len(results),
+                "succeeded": succeeded,
+                "queued": queued,
+                "failed": failed,
+                "results": results
+            }, status=202 if use_queue else 200)
+
+        except Exception as e:
+            logger.exception(f"Error processing Helpline to CPIMS batch: {str(e)}")
+            return JsonResponse({
+                "status": "error",
+                "message": f"Failed to process batch: {str(e)}"
+            }, status=500)
         
 # Assuming you have a logger set up
 # logger = logging.getLogger(__name__)
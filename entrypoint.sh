@@ -6,6 +6,9 @@ set -e
 # Run migrations
 python manage.py migrate --noinput
 
+# Create the shared cache table (see CACHES in settings)
+python manage.py createcachetable
+
 # Collect static (if needed)
 python manage.py collectstatic --noinput
 